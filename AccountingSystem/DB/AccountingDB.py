@@ -31,6 +31,9 @@ class AccountingDB(DB):
     self.__deadLockRetries = 2
     self.__queuedRecordsLock = ThreadSafe.Synchronizer()
     self.__queuedRecordsToInsert = []
+    # Records loaded from the in buffer tables and not inserted yet
+    self.__recordsInQueue = 0
+    self.__recordsInQueueLock = threading.Lock()
     self.dbCatalog = {}
     self.dbBucketsLength = {}
     self.__keysCache = {}
@@ -65,6 +68,31 @@ class AccountingDB(DB):
                               "Accounting",
                               "seconds",
                               gMonitor.OP_MEAN)
+    gMonitor.registerActivity("pendingrecords",
+                              "Records waiting for insertion",
+                              "Accounting",
+                              "records",
+                              gMonitor.OP_MEAN)
+    gMonitor.registerActivity("flushtime",
+                              "Record bundle insertion time",
+                              "Accounting",
+                              "seconds",
+                              gMonitor.OP_MEAN)
+    gMonitor.registerActivity("bucketsflushed",
+                              "Buckets updated",
+                              "Accounting",
+                              "buckets",
+                              gMonitor.OP_ACUM)
+    gMonitor.registerActivity("compactedbuckets",
+                              "Buckets compacted",
+                              "Accounting",
+                              "buckets",
+                              gMonitor.OP_ACUM)
+    gMonitor.registerActivity("compactiontime",
+                              "Compaction slice time",
+                              "Accounting",
+                              "seconds",
+                              gMonitor.OP_MEAN)
 
     self.__compactTime = datetime.time(hour=2,
                                        minute=random.randint(0, 59),
@@ -74,6 +102,12 @@ class AccountingDB(DB):
                 minute=0,
                 second=0)
     self.__lastCompactionEpoch = Time.toEpoch(lcd)
+    self.compactionTableName = _getTableName("catalog", "Compaction")
+    # ( typeName, bucketLength ) -> start time of the buckets still to compact
+    self.__compactionCheckpoints = None
+    # ( typeName, bucketLength ) -> number of buckets of the next length per compaction slice
+    self.__compactionSliceBuckets = {}
+    self.__compactionStatus = {}
 
     self.__registerTypes()
 
@@ -91,6 +125,12 @@ class AccountingDB(DB):
 
   def __periodicAutoCompactDB(self):
     while self.autoCompact:
+      # Compact continuously, or once a day
+      compactionPeriod = int(self.getCSOption("CompactionPeriod", 0))
+      if compactionPeriod > 0:
+        time.sleep(compactionPeriod)
+        self.compactBuckets()
+        continue
       nct = Time.dateTime()
       if nct.hour >= self.__compactTime.hour:
         nct = nct + datetime.timedelta(days=1)
@@ -238,16 +278,23 @@ class AccountingDB(DB):
         valuesList = list(record[1:-2])
         recordsToProcess.append((iD, typeName, startTime, endTime, valuesList, now))
         if len(recordsToProcess) % recordsPerSlot == 0:
-          self.__threadPool.generateJobAndQueueIt(self.__insertFromINTable,
-                                                  args=(recordsToProcess, ))
+          self.__queueRecords(recordsToProcess)
           recordsToProcess = []
       if recordsToProcess:
-        self.__threadPool.generateJobAndQueueIt(self.__insertFromINTable,
-                                                args=(recordsToProcess, ))
+        self.__queueRecords(recordsToProcess)
     self.log.info("[PENDING] Got %s records requests for all types" % pending)
+    gMonitor.addMark("pendingrecords", self.__recordsInQueue)
     self.__doingPendingLockTime = 0
     return S_OK()
 
+  def __queueRecords(self, recordTuples):
+    """
+    Queue a bundle of records of a type for insertion
+    """
+    with self.__recordsInQueueLock:
+      self.__recordsInQueue += len(recordTuples)
+    self.__threadPool.generateJobAndQueueIt(self.__insertFromINTable, args=(recordTuples, ))
+
   def __addToCatalog(self, typeName, keyFields, valueFields, bucketsLength):
     """
     Add type to catalog
@@ -594,15 +641,22 @@ class AccountingDB(DB):
   def insertRecordBundleThroughQueue(self, recordsToQueue):
     if self.__readOnly:
       return S_ERROR("ReadOnly mode enabled. No modification allowed")
-    recordsToProcess = []
-    now = Time.toEpoch()
-    for record in recordsToQueue:
-      typeName, startTime, endTime, valuesList = record
-      result = self.__insertInQueueTable(typeName, startTime, endTime, valuesList)
+    # One multi-row insert per type
+    rowsByType = {}
+    for typeName, startTime, endTime, valuesList in recordsToQueue:
+      if typeName not in self.dbCatalog:
+        return S_ERROR("Type %s has not been defined in the db" % typeName)
+      rowsByType.setdefault(typeName, []).append(['0', '0', 'UTC_TIMESTAMP()'] + valuesList + [startTime, endTime])
+    for typeName, rows in rowsByType.iteritems():
+      sqlFields = ['id', 'taken', 'takenSince'] + self.dbCatalog[typeName]['typeFields']
+      for row in rows:
+        if len(row) != len(sqlFields):
+          return S_ERROR("Fields mismatch for record %s. %s fields and %s expected" % (typeName,
+                                                                                       len(row) - 3,
+                                                                                       len(sqlFields) - 3))
+      result = self.insertMany(_getTableName("in", typeName), sqlFields, rows)
       if not result['OK']:
         return result
-      iD = result['Value']
-      recordsToProcess.append((iD, typeName, startTime, endTime, valuesList, now))
 
     return S_OK()
 
@@ -628,9 +682,112 @@ class AccountingDB(DB):
 
   def __insertFromINTable(self, recordTuples):
     """
-    Do the real insert and delete from the in buffer table
+    Do the real insert and delete from the in buffer table. The records of the bundle, all of
+    the same type, are merged in memory by key values and bucket, and written with multi-row
+    statements in a single transaction. If that fails, they are inserted one by one.
     """
     self.log.verbose("Received bundle to process", "of %s elements" % len(recordTuples))
+    flushStartTime = time.time()
+    try:
+      result = self.__insertBundle(recordTuples)
+      if not result['OK']:
+        self.log.warn("Can't insert the bundle of records, inserting them one by one", result['Message'])
+        self.__insertRecordsOneByOne(recordTuples)
+      gMonitor.addMark("flushtime", time.time() - flushStartTime)
+    finally:
+      with self.__recordsInQueueLock:
+        self.__recordsInQueue -= len(recordTuples)
+
+  def __insertBundle(self, recordTuples):
+    """
+    Insert the raw records, add their merged contributions to the buckets and delete them
+    from the in buffer table, in a transaction
+    """
+    if self.__readOnly:
+      return S_ERROR("ReadOnly mode enabled. No modification allowed")
+    typeName = recordTuples[0][1]
+    if typeName not in self.dbCatalog:
+      return S_ERROR("Type %s has not been defined in the db" % typeName)
+    numKeys = len(self.dbCatalog[typeName]['keys'])
+    nowEpoch = int(Time.toEpoch(Time.dateTime()))
+    rawRows = []
+    # ( startTime, bucketLength, key ids ) -> [ values..., entriesInBucket ]
+    bucketDeltas = {}
+    for _iD, _typeName, startTime, endTime, valuesList, _insertionEpoch in recordTuples:
+      keyIds = []
+      for keyPos in range(numKeys):
+        retVal = self.__addKeyValue(typeName, self.dbCatalog[typeName]['keys'][keyPos], valuesList[keyPos])
+        if not retVal['OK']:
+          return retVal
+        keyIds.append(retVal['Value'])
+      values = list(valuesList[numKeys:])
+      rawRows.append(keyIds + values + [startTime, endTime])
+      # One more value to count the entries in the buckets, as in insertRecordDirectly
+      values.append(1)
+      keyIds = tuple(keyIds)
+      buckets = self.calculateBuckets(typeName, startTime, endTime, nowEpoch)
+      for bucketStartTime, proportion, bucketLength in buckets:
+        bucketValues = bucketDeltas.setdefault((bucketStartTime, bucketLength, keyIds), [0.0] * len(values))
+        for pos, value in enumerate(values):
+          bucketValues[pos] += value * proportion
+
+    retVal = self.transactionStart()
+    if not retVal['OK']:
+      return retVal
+    committed = False
+    try:
+      retVal = self.insertMany(_getTableName("type", typeName), self.dbCatalog[typeName]['typeFields'], rawRows)
+      if not retVal['OK']:
+        return retVal
+      retVal = self.__writeBucketDeltas(typeName, bucketDeltas)
+      if not retVal['OK']:
+        return retVal
+      recordIds = ", ".join(str(record[0]) for record in recordTuples)
+      retVal = self._update("DELETE FROM `%s` WHERE id IN (%s)" % (_getTableName("in", typeName), recordIds))
+      if not retVal['OK']:
+        return retVal
+      retVal = self.transactionCommit()
+      if not retVal['OK']:
+        return retVal
+      committed = True
+    finally:
+      if not committed:
+        self.transactionRollback()
+    gMonitor.addMark("registeradded", len(recordTuples))
+    gMonitor.addMark("registeradded:%s" % typeName, len(recordTuples))
+    gMonitor.addMark("bucketsflushed", len(bucketDeltas))
+    now = Time.toEpoch()
+    for record in recordTuples:
+      gMonitor.addMark("insertiontime", now - record[-1])
+    self.log.info("Inserted bundle of records", "%d records of %s in %d buckets" % (len(recordTuples), typeName,
+                                                                                    len(bucketDeltas)))
+    return S_OK()
+
+  def __writeBucketDeltas(self, typeName, bucketDeltas):
+    """
+    Add values to buckets, with multi-row INSERT ... ON DUPLICATE KEY UPDATE statements
+
+      - bucketDeltas -> { ( startTime, bucketLength, key ids ) : [ values..., entriesInBucket ] }
+    """
+    valueFields = self.dbCatalog[typeName]['values'] + ['entriesInBucket']
+    sqlFields = ['startTime', 'bucketLength'] + self.dbCatalog[typeName]['keys'] + valueFields
+    sqlUpData = ["`%s`=`%s`+VALUES(`%s`)" % (field, field, field) for field in valueFields]
+    valuesGroups = ["( %s )" % ",".join([str(bucketStartTime), str(bucketLength)] +
+                                        [str(keyId) for keyId in keyIds] +
+                                        [repr(float(value)) for value in values])
+                    for (bucketStartTime, bucketLength, keyIds), values in bucketDeltas.iteritems()]
+    for valuesChunk in List.breakListIntoChunks(valuesGroups, 1000):
+      retVal = self._update("INSERT INTO `%s` ( %s ) VALUES %s ON DUPLICATE KEY UPDATE %s" % (
+          _getTableName("bucket", typeName), ", ".join("`%s`" % field for field in sqlFields),
+          ", ".join(valuesChunk), ", ".join(sqlUpData)))
+      if not retVal['OK']:
+        return retVal
+    return S_OK()
+
+  def __insertRecordsOneByOne(self, recordTuples):
+    """
+    Insert records one by one and delete them from the in buffer table
+    """
     for record in recordTuples:
       iD, typeName, startTime, endTime, valuesList, insertionEpoch = record
       result = self.insertRecordDirectly(typeName, startTime, endTime, valuesList)
@@ -1160,218 +1317,202 @@ class AccountingDB(DB):
       self.__doingCompaction = True
     finally:
       gSynchro.unlock()
-    slow = True
-    for typeName in self.dbCatalog:
-      if typeFilter and typeName.find(typeFilter) == -1:
-        self.log.info("[COMPACT] Skipping %s" % typeName)
-        continue
-      if self.dbCatalog[typeName]['dataTimespan'] > 0:
-        self.log.info("[COMPACT] Deleting records older that timespan for type %s" % typeName)
-        self.__deleteRecordsOlderThanDataTimespan(typeName)
-      self.log.info("[COMPACT] Compacting %s" % typeName)
-      if slow:
-        self.__slowCompactBucketsForType(typeName)
-      else:
-        self.__compactBucketsForType(typeName)
-    self.log.info("[COMPACT] Compaction finished")
-    self.__lastCompactionEpoch = int(Time.toEpoch())
-    gSynchro.lock()
     try:
-      if self.__doingCompaction:
-        self.__doingCompaction = False
+      for typeName in self.dbCatalog:
+        if typeFilter and typeName.find(typeFilter) == -1:
+          self.log.info("[COMPACT] Skipping %s" % typeName)
+          continue
+        if self.dbCatalog[typeName]['dataTimespan'] > 0:
+          self.log.info("[COMPACT] Deleting records older that timespan for type %s" % typeName)
+          self.__deleteRecordsOlderThanDataTimespan(typeName)
+        self.log.info("[COMPACT] Compacting %s" % typeName)
+        result = self.__compactBucketsForType(typeName)
+        if not result['OK']:
+          self.log.error("[COMPACT] Error while compacting", "%s: %s" % (typeName, result['Message']))
     finally:
+      gSynchro.lock()
+      self.__doingCompaction = False
       gSynchro.unlock()
+    self.log.info("[COMPACT] Compaction finished")
+    self.__lastCompactionEpoch = int(Time.toEpoch())
     return S_OK()
 
-  def __selectForCompactBuckets(self, typeName, timeLimit, bucketLength, nextBucketLength, connObj=False):
+  def getCompactionStatus(self):
     """
-    Nasty SQL query to get ideal buckets using grouping by date calculations and adding value contents
+    Get the progress of the compaction of the buckets
+
+    :return: S_OK( { typeName : { bucketLength : { 'checkpoint', 'timeLimit', 'pendingSeconds',
+                                                   'bucketsCompacted', 'slices', 'sliceBuckets' } } } )
     """
-    tableName = _getTableName("bucket", typeName)
-    selectSQL = "SELECT "
-    sqlSelectList = []
-    for field in self.dbCatalog[typeName]['keys']:
-      sqlSelectList.append("`%s`.`%s`" % (tableName, field))
-    for field in self.dbCatalog[typeName]['values']:
-      sqlSelectList.append("SUM( `%s`.`%s` )" % (tableName, field))
-    sqlSelectList.append("SUM( `%s`.`entriesInBucket` )" % (tableName))
-    sqlSelectList.append("MIN( `%s`.`startTime` )" % tableName)
-    sqlSelectList.append("MAX( `%s`.`startTime` )" % tableName)
-    selectSQL += ", ".join(sqlSelectList)
-    selectSQL += " FROM `%s`" % tableName
-    selectSQL += " WHERE `%s`.`startTime` < '%s' AND" % (tableName, timeLimit)
-    selectSQL += " `%s`.`bucketLength` = %s" % (tableName, bucketLength)
-    # MAGIC bucketing
-    sqlGroupList = [_bucketizeDataField("`%s`.`startTime`" % tableName, nextBucketLength)]
-    for field in self.dbCatalog[typeName]['keys']:
-      sqlGroupList.append("`%s`.`%s`" % (tableName, field))
-    selectSQL += " GROUP BY %s" % ", ".join(sqlGroupList)
-    return self._query(selectSQL, conn=connObj)
+    status = {}
+    for (typeName, bucketLength), levelStatus in self.__compactionStatus.items():
+      status.setdefault(typeName, {})[bucketLength] = dict(levelStatus)
+    return S_OK(status)
 
-  def __deleteForCompactBuckets(self, typeName, timeLimit, bucketLength, connObj=False):
+  def __loadCompactionCheckpoints(self):
     """
-    Delete compacted buckets
+    Load the compaction checkpoints, creating their table if needed
     """
-    tableName = _getTableName("bucket", typeName)
-    deleteSQL = "DELETE FROM `%s` WHERE " % tableName
-    deleteSQL += "`%s`.`startTime` < '%s' AND " % (tableName, timeLimit)
-    deleteSQL += "`%s`.`bucketLength` = %s" % (tableName, bucketLength)
-    return self._update(deleteSQL, conn=connObj)
+    if self.__compactionCheckpoints is not None:
+      return S_OK()
+    result = self.__loadTablesCreated()
+    if not result['OK']:
+      return result
+    if self.compactionTableName not in result['Value']:
+      result = self._createTables({self.compactionTableName: {
+          'Fields': {'typeName': "VARCHAR(64) NOT NULL",
+                     'bucketLength': "MEDIUMINT UNSIGNED NOT NULL",
+                     'checkpoint': "INT UNSIGNED NOT NULL"},
+          'PrimaryKey': ['typeName', 'bucketLength']}})
+      if not result['OK']:
+        return result
+    result = self._query("SELECT `typeName`, `bucketLength`, `checkpoint` FROM `%s`" % self.compactionTableName)
+    if not result['OK']:
+      return result
+    self.__compactionCheckpoints = dict(((row[0], int(row[1])), int(row[2])) for row in result['Value'])
+    return S_OK()
 
-  def __compactBucketsForType(self, typeName):
+  def __resetCompactionCheckpoints(self, typeName):
     """
-    Compact all buckets for a given type
+    Forget the compaction checkpoints of a type, its buckets are regenerated
     """
-    nowEpoch = Time.toEpoch()
-    #retVal = self.__startTransaction( connObj )
-    # if not retVal[ 'OK' ]:
-    #  return retVal
-    for bPos in range(len(self.dbBucketsLength[typeName]) - 1):
-      self.log.info("[COMPACT] Query %d of %d" % (bPos + 1, len(self.dbBucketsLength[typeName]) - 1))
-      secondsLimit = self.dbBucketsLength[typeName][bPos][0]
-      bucketLength = self.dbBucketsLength[typeName][bPos][1]
-      timeLimit = (nowEpoch - nowEpoch % bucketLength) - secondsLimit
-      nextBucketLength = self.dbBucketsLength[typeName][bPos + 1][1]
-      self.log.info(
-          "[COMPACT] Compacting data newer that %s with bucket size %s" %
-          (Time.fromEpoch(timeLimit), bucketLength))
-      # Retrieve the data
-      retVal = self.__selectForCompactBuckets(typeName, timeLimit, bucketLength, nextBucketLength)
-      if not retVal['OK']:
-        #self.__rollbackTransaction( connObj )
-        return retVal
-      bucketsData = retVal['Value']
-      self.log.info("[COMPACT] Got %d records to compact" % len(bucketsData))
-      if len(bucketsData) == 0:
-        continue
-      retVal = self.__deleteForCompactBuckets(typeName, timeLimit, bucketLength)
-      if not retVal['OK']:
-        #self.__rollbackTransaction( connObj )
-        return retVal
-      self.log.info(
-          "[COMPACT] Compacting %s records %s seconds size for %s" %
-          (len(bucketsData), bucketLength, typeName))
-      # Add data
-      for record in bucketsData:
-        startTime = record[-2]
-        endTime = record[-1]
-        valuesList = record[:-2]
-        retVal = self.__splitInBuckets(typeName, startTime, endTime, valuesList)
-        if not retVal['OK']:
-          #self.__rollbackTransaction( connObj )
-          self.log.error("[COMPACT] Error while compacting data for record", "%s: %s" % (typeName, retVal['Value']))
-      self.log.info("[COMPACT] Finished compaction %d of %d" % (bPos, len(self.dbBucketsLength[typeName]) - 1))
-    # return self.__commitTransaction( connObj )
-    return S_OK()
+    self.__compactionSliceBuckets = dict((key, value) for key, value in self.__compactionSliceBuckets.iteritems()
+                                         if key[0] != typeName)
+    result = self.__loadCompactionCheckpoints()
+    if not result['OK']:
+      return result
+    self.__compactionCheckpoints = dict((key, value) for key, value in self.__compactionCheckpoints.iteritems()
+                                        if key[0] != typeName)
+    result = self._escapeString(typeName)
+    if not result['OK']:
+      return result
+    return self._update("DELETE FROM `%s` WHERE `typeName` = %s" % (self.compactionTableName, result['Value']))
 
-  def __slowCompactBucketsForType(self, typeName):
+  def __compactBucketsForType(self, typeName):
     """
-    Compact all buckets for a given type
+    Compact the buckets of a type, one bucket length after the other, in time slices small
+    enough not to lock the bucket table for long. Each slice is compacted in a transaction and
+    moves the checkpoint of its bucket length forward, so that the compaction resumes where it
+    stopped. After each slice the compaction sleeps CompactionThrottle times the slice time.
     """
-    nowEpoch = Time.toEpoch()
-    for bPos in range(len(self.dbBucketsLength[typeName]) - 1):
-      self.log.info("[COMPACT] Query %d of %d" % (bPos, len(self.dbBucketsLength[typeName]) - 1))
-      secondsLimit = self.dbBucketsLength[typeName][bPos][0]
-      bucketLength = self.dbBucketsLength[typeName][bPos][1]
+    result = self.__loadCompactionCheckpoints()
+    if not result['OK']:
+      return result
+    targetSliceSize = int(self.getCSOption("CompactionSliceSize", 10000))
+    throttle = float(self.getCSOption("CompactionThrottle", 1.0))
+    nowEpoch = int(Time.toEpoch())
+    bucketsLength = self.dbBucketsLength[typeName]
+    for bPos in range(len(bucketsLength) - 1):
+      secondsLimit, bucketLength = bucketsLength[bPos]
+      nextBucketLength = bucketsLength[bPos + 1][1]
+      # Only whole buckets of the next length are compacted
       timeLimit = (nowEpoch - nowEpoch % bucketLength) - secondsLimit
-      self.log.info("[COMPACT] Compacting data newer that %s with bucket size %s for %s" % (
-          Time.fromEpoch(timeLimit),
-          bucketLength,
-          typeName))
-      querySize = 10000
-      previousRecordsSelected = querySize
-      totalCompacted = 0
-      while previousRecordsSelected == querySize:
-        # Retrieve the data
-        self.log.info("[COMPACT] Retrieving buckets to compact newer that %s with size %s" % (
-            Time.fromEpoch(timeLimit),
-            bucketLength))
-        roundStartTime = time.time()
-        result = self.__selectIndividualForCompactBuckets(typeName, timeLimit, bucketLength,
-                                                          querySize)
+      timeLimit -= timeLimit % nextBucketLength
+      levelKey = (typeName, bucketLength)
+      sliceStart = self.__compactionCheckpoints.get(levelKey)
+      if sliceStart is None:
+        result = self._query("SELECT MIN(`startTime`) FROM `%s` WHERE `bucketLength` = %d" %
+                             (_getTableName("bucket", typeName), bucketLength))
         if not result['OK']:
-          #self.__rollbackTransaction( connObj )
           return result
-        bucketsData = result['Value']
-        previousRecordsSelected = len(bucketsData)
-        selectEndTime = time.time()
-        self.log.info("[COMPACT] Got %d buckets (%d done) (took %.2f secs)" % (previousRecordsSelected,
-                                                                               totalCompacted,
-                                                                               selectEndTime - roundStartTime))
-        if len(bucketsData) == 0:
-          break
-
-        result = self.__deleteIndividualForCompactBuckets(typeName, bucketsData)
+        sliceStart = result['Value'][0][0] if result['Value'] and result['Value'][0][0] is not None else timeLimit
+        sliceStart = int(sliceStart)
+        self.__compactionCheckpoints[levelKey] = sliceStart
+      sliceStart -= sliceStart % nextBucketLength
+      levelStatus = self.__compactionStatus.setdefault(levelKey, {'bucketsCompacted': 0, 'slices': 0})
+      self.log.info("[COMPACT] Compacting buckets of %s seconds" % bucketLength,
+                    "for %s from %s to %s" % (typeName, Time.fromEpoch(sliceStart), Time.fromEpoch(timeLimit)))
+      while sliceStart < timeLimit:
+        sliceBuckets = self.__compactionSliceBuckets.get(levelKey, 1)
+        sliceEnd = min(timeLimit, sliceStart + sliceBuckets * nextBucketLength)
+        sliceStartTime = time.time()
+        result = self.__compactSlice(typeName, bucketLength, nextBucketLength, sliceStart, sliceEnd)
         if not result['OK']:
-          #self.__rollbackTransaction( connObj )
           return result
-        bucketsData = result['Value']
-        deleteEndTime = time.time()
-        self.log.info("[COMPACT] Deleted %s out-of-bounds buckets (took %.2f secs)" % (len(bucketsData),
-                                                                                       deleteEndTime - selectEndTime))
-        # Add data
-        for record in bucketsData:
-          startTime = record[-2]
-          endTime = record[-2] + record[-1]
-          valuesList = record[:-2]
-          retVal = self.__splitInBuckets(typeName, startTime, endTime, valuesList)
-          if not retVal['OK']:
-            self.log.error("[COMPACT] Error while compacting data for buckets", "%s: %s" % (typeName, retVal['Value']))
-        totalCompacted += len(bucketsData)
-        insertElapsedTime = time.time() - deleteEndTime
-        self.log.info("[COMPACT] Records compacted (took %.2f secs, %.2f secs/bucket)" %
-                      (insertElapsedTime, insertElapsedTime / len(bucketsData)))
-      self.log.info("[COMPACT] Finised compaction %d of %d" % (bPos, len(self.dbBucketsLength[typeName]) - 1))
-    # return self.__commitTransaction( connObj )
+        compacted = result['Value']
+        sliceTime = time.time() - sliceStartTime
+        gMonitor.addMark("compactedbuckets", compacted)
+        gMonitor.addMark("compactiontime", sliceTime)
+        # Aim at targetSliceSize buckets per slice
+        if compacted < targetSliceSize / 2:
+          sliceBuckets = min(sliceBuckets * 2, 1024)
+        elif compacted > targetSliceSize * 2:
+          sliceBuckets = max(1, sliceBuckets / 2)
+        self.__compactionSliceBuckets[levelKey] = sliceBuckets
+        self.__compactionCheckpoints[levelKey] = sliceEnd
+        levelStatus['bucketsCompacted'] += compacted
+        levelStatus['slices'] += 1
+        sliceStart = sliceEnd
+        if compacted and throttle > 0:
+          time.sleep(sliceTime * throttle)
+      levelStatus.update({'checkpoint': sliceStart,
+                          'timeLimit': timeLimit,
+                          'pendingSeconds': max(0, timeLimit - sliceStart),
+                          'sliceBuckets': self.__compactionSliceBuckets.get(levelKey, 1)})
+      self.log.info("[COMPACT] Compacted buckets of %s seconds" % bucketLength,
+                    "for %s: %d buckets in %d slices" % (typeName, levelStatus['bucketsCompacted'],
+                                                         levelStatus['slices']))
     return S_OK()
 
-  def __selectIndividualForCompactBuckets(self, typeName, timeLimit, bucketLength, querySize, connObj=False):
+  def __compactSlice(self, typeName, bucketLength, nextBucketLength, sliceStart, sliceEnd):
     """
-    Nasty SQL query to get ideal buckets using grouping by date calculations and adding value contents
-    """
-    tableName = _getTableName("bucket", typeName)
-    selectSQL = "SELECT "
-    sqlSelectList = []
-    for field in self.dbCatalog[typeName]['keys']:
-      sqlSelectList.append("`%s`.`%s`" % (tableName, field))
-    for field in self.dbCatalog[typeName]['values']:
-      sqlSelectList.append("`%s`.`%s`" % (tableName, field))
-    sqlSelectList.append("`%s`.`entriesInBucket`" % (tableName))
-    sqlSelectList.append("`%s`.`startTime`" % tableName)
-    sqlSelectList.append("`%s`.bucketLength" % (tableName))
-    selectSQL += ", ".join(sqlSelectList)
-    selectSQL += " FROM `%s`" % tableName
-    selectSQL += " WHERE `%s`.`startTime` < '%s' AND" % (tableName, timeLimit)
-    selectSQL += " `%s`.`bucketLength` = %s" % (tableName, bucketLength)
-    # MAGIC bucketing
-    selectSQL += " LIMIT %d" % querySize
-    return self._query(selectSQL, conn=connObj)
-
-  def __deleteIndividualForCompactBuckets(self, typeName, bucketsData, connObj=False):
-    """
-    Delete compacted buckets
+    Replace, in a transaction, the buckets of bucketLength starting in [ sliceStart, sliceEnd )
+    by buckets of nextBucketLength holding the same sums, and save the checkpoint
+
+    :return: S_OK( number of buckets compacted )
     """
     tableName = _getTableName("bucket", typeName)
     keyFields = self.dbCatalog[typeName]['keys']
-    deleteQueryLimit = 50
-    deletedBuckets = []
-    for bLimit in range(0, len(bucketsData), deleteQueryLimit):
-      delCondsSQL = []
-      for record in bucketsData[bLimit: bLimit + deleteQueryLimit]:
-        condSQL = []
-        for iPos in range(len(keyFields)):
-          field = keyFields[iPos]
-          condSQL.append("`%s`.`%s` = %s" % (tableName, field, record[iPos]))
-        condSQL.append("`%s`.`startTime` = %d" % (tableName, record[-2]))
-        condSQL.append("`%s`.`bucketLength` = %d" % (tableName, record[-1]))
-        delCondsSQL.append("(%s)" % " AND ".join(condSQL))
-      delSQL = "DELETE FROM `%s` WHERE %s" % (tableName, " OR ".join(delCondsSQL))
-      result = self._update(delSQL, conn=connObj)
+    valueFields = self.dbCatalog[typeName]['values'] + ['entriesInBucket']
+    sliceCond = "`startTime` >= %d AND `startTime` < %d AND `bucketLength` = %d" % (sliceStart, sliceEnd, bucketLength)
+    selectSQL = "SELECT %s FROM `%s` WHERE %s GROUP BY %s FOR UPDATE" % (
+        ", ".join([_bucketizeDataField("`startTime`", nextBucketLength)] +
+                  ["`%s`" % field for field in keyFields] +
+                  ["SUM( `%s` )" % field for field in valueFields] +
+                  ["COUNT(*)"]),
+        tableName, sliceCond,
+        ", ".join([_bucketizeDataField("`startTime`", nextBucketLength)] + ["`%s`" % field for field in keyFields]))
+    result = self._escapeString(typeName)
+    if not result['OK']:
+      return result
+    escapedTypeName = result['Value']
+    result = self.transactionStart()
+    if not result['OK']:
+      return result
+    committed = False
+    try:
+      result = self._query(selectSQL)
       if not result['OK']:
-        self.log.error("Cannot delete individual records for compaction", result['Message'])
-      else:
-        deletedBuckets.extend(bucketsData[bLimit: bLimit + deleteQueryLimit])
-    return S_OK(deletedBuckets)
+        return result
+      compactedData = result['Value']
+      expected = sum(int(row[-1]) for row in compactedData)
+      if compactedData:
+        result = self._update("DELETE FROM `%s` WHERE %s" % (tableName, sliceCond))
+        if not result['OK']:
+          return result
+        if result['Value'] != expected:
+          return S_ERROR("Deleted %d buckets instead of %d" % (result['Value'], expected))
+        sqlFields = ["`startTime`", "`bucketLength`"] + ["`%s`" % field for field in keyFields + valueFields]
+        sqlUpData = ["`%s`=`%s`+VALUES(`%s`)" % (field, field, field) for field in valueFields]
+        for rowsChunk in List.breakListIntoChunks(compactedData, 1000):
+          valuesGroups = ["( %s )" % ",".join(str(val) for val in (row[0], nextBucketLength) + tuple(row[1:-1]))
+                          for row in rowsChunk]
+          result = self._update("INSERT INTO `%s` ( %s ) VALUES %s ON DUPLICATE KEY UPDATE %s" %
+                                (tableName, ", ".join(sqlFields), ", ".join(valuesGroups), ", ".join(sqlUpData)))
+          if not result['OK']:
+            return result
+      result = self._update("REPLACE INTO `%s` ( `typeName`, `bucketLength`, `checkpoint` ) VALUES ( %s, %d, %d )" %
+                            (self.compactionTableName, escapedTypeName, bucketLength, sliceEnd))
+      if not result['OK']:
+        return result
+      result = self.transactionCommit()
+      if not result['OK']:
+        return result
+      committed = True
+      return S_OK(expected)
+    finally:
+      if not committed:
+        self.transactionRollback()
 
   def __deleteRecordsOlderThanDataTimespan(self, typeName):
     """
@@ -1414,6 +1555,9 @@ class AccountingDB(DB):
     #  return retVal
     self.log.info("[REBUCKET] Deleting buckets for %s" % typeName)
     retVal = self._update("DELETE FROM `%s`" % _getTableName("bucket", typeName))
+    if not retVal['OK']:
+      return retVal
+    retVal = self.__resetCompactionCheckpoints(typeName)
     if not retVal['OK']:
       return retVal
     # Generate the common part of the query
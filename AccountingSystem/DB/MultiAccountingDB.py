@@ -68,6 +68,15 @@ class MultiAccountingDB(object):
         end = res
     return end
 
+  def getCompactionStatus(self):
+    status = {}
+    for dbName in self.__allDBs:
+      result = self.__allDBs[dbName].getCompactionStatus()
+      if not result['OK']:
+        return result
+      status.update(result['Value'])
+    return S_OK(status)
+
   def __db(self, acType):
     return self.__allDBs[self.__dbByType.get(acType, self.__defaultDB)]
 
@@ -4,8 +4,10 @@
 # pylint: disable=protected-access
 
 # imports
+import re
+import time
 import unittest
-from mock import MagicMock
+from mock import MagicMock, patch
 
 import DIRAC.AccountingSystem.DB.AccountingDB as moduleTested
 
@@ -390,6 +392,177 @@ ORDER BY startTime" % (expectedStartTime, expectedEndTime)
     self.assertTrue(retVal)
     self.assertEqual(retVal, expectedQuery)
 
+class Compaction(TestCase):
+  """ testing the compaction of the buckets in time slices, on a fake bucket table
+  """
+
+  def setUp(self):
+    super(Compaction, self).setUp()
+    self.module = self.testClass()
+    self.typeName = "LHCb-Certification_Pilot"
+    self.module.dbCatalog = {self.typeName: {'keys': ['Site'], 'values': ['Jobs'], 'dataTimespan': 0}}
+    now = int(time.time())
+    # Three levels of buckets, the last week is not compacted
+    self.module.dbBucketsLength[self.typeName] = [(86400 * 7, 3600), (86400 * 60, 86400), (86400 * 365, 604800)]
+    # ( startTime, bucketLength, Site ) -> [ Jobs, entriesInBucket ]
+    self.buckets = {}
+    for hour in xrange(24 * 10):
+      bucketTime = now - now % 3600 - hour * 3600
+      for site in (1, 2):
+        self.buckets[(bucketTime, 3600, site)] = [hour * site, 1]
+    self.totals = self.__totals()
+    self.checkpoints = {}
+    self.module._query = self.query
+    self.module._update = self.update
+    self.module._escapeString = lambda value: {'OK': True, 'Value': "'%s'" % value}
+    self.module.getCSOption = MagicMock(side_effect=lambda option, default=None: default)
+    self.module.transactionStart = MagicMock(return_value={'OK': True})
+    self.module.transactionCommit = MagicMock(return_value={'OK': True})
+    self.module.transactionRollback = MagicMock(return_value={'OK': True})
+
+  def __totals(self):
+    totals = {}
+    for (_bucketTime, _bucketLength, site), values in self.buckets.iteritems():
+      total = totals.setdefault(site, [0, 0])
+      total[0] += values[0]
+      total[1] += values[1]
+    return totals
+
+  def __slice(self, cmd):
+    start, end, length = re.search(r"`startTime` >= (\d+) AND `startTime` < (\d+) AND `bucketLength` = (\d+)",
+                                   cmd).groups()
+    return [key for key in self.buckets if int(start) <= key[0] < int(end) and key[1] == int(length)]
+
+  def query(self, cmd):
+    if cmd == "show tables":
+      return {'OK': True, 'Value': ()}
+    if cmd.startswith("SELECT `typeName`"):
+      return {'OK': True, 'Value': tuple((key[0], key[1], value) for key, value in self.checkpoints.iteritems())}
+    if cmd.startswith("SELECT MIN"):
+      length = int(cmd.split()[-1])
+      return {'OK': True, 'Value': ((min([key[0] for key in self.buckets if key[1] == length] or [None]),),)}
+    nextLength = int(re.search(r"% (\d+)", cmd).group(1))
+    groups = {}
+    for key in self.__slice(cmd):
+      group = groups.setdefault((key[0] - key[0] % nextLength, key[2]), [0, 0, 0])
+      group[0] += self.buckets[key][0]
+      group[1] += self.buckets[key][1]
+      group[2] += 1
+    return {'OK': True, 'Value': tuple(key + tuple(value) for key, value in groups.iteritems())}
+
+  def update(self, cmd):
+    if cmd.startswith("DELETE"):
+      keys = self.__slice(cmd)
+      for key in keys:
+        del self.buckets[key]
+      return {'OK': True, 'Value': len(keys)}
+    if cmd.startswith("INSERT"):
+      rows = re.findall(r"\( (\d+),(\d+),(\d+),(\d+),(\d+) \)", cmd)
+      for startTime, length, site, jobs, entries in rows:
+        values = self.buckets.setdefault((int(startTime), int(length), int(site)), [0, 0])
+        values[0] += int(jobs)
+        values[1] += int(entries)
+      return {'OK': True, 'Value': len(rows)}
+    if cmd.startswith("REPLACE"):
+      typeName, length, checkpoint = re.search(r"VALUES \( '(.*)', (\d+), (\d+) \)", cmd).groups()
+      self.checkpoints[(typeName, int(length))] = int(checkpoint)
+      return {'OK': True, 'Value': 1}
+    return {'OK': True, 'Value': 0}
+
+  def test_compactBuckets(self):
+    with patch.object(self.moduleTested.time, 'sleep') as mock_sleep:
+      self.assertTrue(self.module.compactBuckets()['OK'])
+    # The sums are kept, the old buckets are daily ones now
+    self.assertEqual(self.__totals(), self.totals)
+    timeLimit = self.module.getCompactionStatus()['Value'][self.typeName][3600]['timeLimit']
+    self.assertEqual(timeLimit % 86400, 0)
+    self.assertFalse([key for key in self.buckets if key[1] == 3600 and key[0] < timeLimit])
+    self.assertTrue([key for key in self.buckets if key[1] == 86400])
+    self.assertEqual(self.checkpoints[(self.typeName, 3600)], timeLimit)
+    status = self.module.getCompactionStatus()['Value'][self.typeName][3600]
+    self.assertEqual(status['pendingSeconds'], 0)
+    self.assertEqual(status['bucketsCompacted'], len(self.totals) * 24 * 10 - len(
+        [key for key in self.buckets if key[1] == 3600]))
+    self.assertTrue(mock_sleep.called)
+
+    # Nothing left to do, the compaction resumes from the checkpoint
+    self.module.transactionStart.reset_mock()
+    self.module.compactBuckets()
+    self.assertFalse(self.module.transactionStart.called)
+
+  def test_sliceRollback(self):
+    # The slice is not committed if the buckets changed in between
+    self.module._update = MagicMock(return_value={'OK': True, 'Value': 0})
+    with patch.object(self.moduleTested.time, 'sleep'):
+      self.assertTrue(self.module.compactBuckets()['OK'])
+    self.assertTrue(self.module.transactionRollback.called)
+    self.assertFalse(self.module.transactionCommit.called)
+    self.assertEqual(self.__totals(), self.totals)
+
+
+class BundleInsertion(TestCase):
+  """ testing the insertion of a bundle of records from the in buffer table
+  """
+
+  def setUp(self):
+    super(BundleInsertion, self).setUp()
+    self.module = self.testClass()
+    self.typeName = "LHCb-Certification_Pilot"
+    self.module.dbCatalog = {self.typeName: {'keys': ['Site'], 'values': ['Jobs', 'Entries'],
+                                             'typeFields': ['Site', 'Jobs', 'Entries', 'startTime', 'endTime']}}
+    self.module.dbBucketsLength[self.typeName] = [(86400 * 7, 3600), (86400 * 365, 86400)]
+    self.module._AccountingDB__addKeyValue = MagicMock(
+        side_effect=lambda typeName, keyName, keyValue: {'OK': True, 'Value': {'CERN': 1, 'PIC': 2}[keyValue]})
+    self.module._update = MagicMock(return_value={'OK': True, 'Value': 1})
+    self.module.insertMany = MagicMock(return_value={'OK': True, 'Value': 1})
+    self.module.transactionStart = MagicMock(return_value={'OK': True})
+    self.module.transactionCommit = MagicMock(return_value={'OK': True})
+    self.module.transactionRollback = MagicMock(return_value={'OK': True})
+    self.module._AccountingDB__insertRecordsOneByOne = MagicMock()
+    now = int(time.time())
+    self.hour = now - now % 3600 - 3600
+    self.records = [(1, self.typeName, self.hour, self.hour, ['CERN', 2, 1], now),
+                    (2, self.typeName, self.hour + 600, self.hour + 600, ['CERN', 3, 1], now),
+                    (3, self.typeName, self.hour + 1800, self.hour + 5400, ['PIC', 4, 2], now)]
+
+  def test_insertBundle(self):
+    self.module._AccountingDB__queueRecords(self.records)
+    self.module._AccountingDB__insertFromINTable(self.records)
+    self.assertFalse(self.module._AccountingDB__insertRecordsOneByOne.called)
+    self.assertTrue(self.module.transactionCommit.called)
+    self.assertFalse(self.module.transactionRollback.called)
+    self.assertEqual(self.module._AccountingDB__recordsInQueue, 0)
+
+    # The raw records are inserted with a single statement
+    self.module.insertMany.assert_called_once_with("ac_type_%s" % self.typeName,
+                                                   ['Site', 'Jobs', 'Entries', 'startTime', 'endTime'],
+                                                   [[1, 2, 1, self.hour, self.hour],
+                                                    [1, 3, 1, self.hour + 600, self.hour + 600],
+                                                    [2, 4, 2, self.hour + 1800, self.hour + 5400]])
+    bucketCmd, deleteCmd = [call[0][0] for call in self.module._update.call_args_list]
+    # The two CERN records are merged in a bucket, the PIC one is split in two halves, each counting
+    # for half an entry in entriesInBucket
+    rows = re.findall(r"\( (\d+),(\d+),(\d+),([\d.]+),([\d.]+),([\d.]+) \)", bucketCmd)
+    self.assertEqual(sorted((int(start), int(length), int(site), float(jobs), float(entries), float(inBucket))
+                            for start, length, site, jobs, entries, inBucket in rows),
+                     [(self.hour, 3600, 1, 5.0, 2.0, 2.0),
+                      (self.hour, 3600, 2, 2.0, 1.0, 0.5),
+                      (self.hour + 3600, 3600, 2, 2.0, 1.0, 0.5)])
+    self.assertIn("ON DUPLICATE KEY UPDATE `Jobs`=`Jobs`+VALUES(`Jobs`)", bucketCmd)
+    self.assertEqual(deleteCmd, "DELETE FROM `ac_in_%s` WHERE id IN (1, 2, 3)" % self.typeName)
+
+  def test_insertBundleFailure(self):
+    # The transaction is rolled back and the records are inserted one by one
+    self.module.insertMany.return_value = {'OK': False, 'Message': 'Deadlock'}
+    self.module._AccountingDB__queueRecords(self.records)
+    self.module._AccountingDB__insertFromINTable(self.records)
+    self.assertTrue(self.module.transactionRollback.called)
+    self.assertFalse(self.module.transactionCommit.called)
+    self.assertFalse(self.module._update.called)
+    self.module._AccountingDB__insertRecordsOneByOne.assert_called_once_with(self.records)
+    self.assertEqual(self.module._AccountingDB__recordsInQueue, 0)
+
+
 #############################################################################
 # Test Suite run
 #############################################################################
@@ -398,4 +571,6 @@ ORDER BY startTime" % (expectedStartTime, expectedEndTime)
 if __name__ == '__main__':
   suite = unittest.defaultTestLoader.loadTestsFromTestCase(TestCase)
   suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(MakeQuery))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(Compaction))
+  suite.addTest(unittest.defaultTestLoader.loadTestsFromTestCase(BundleInsertion))
   testResult = unittest.TextTestRunner(verbosity=2).run(suite)
@@ -182,6 +182,17 @@ class DataStoreHandler(RequestHandler):
 
     return RPCClient('Accounting/DataStoreMaster').compactDB()
 
+  types_getCompactionStatus = []
+
+  def export_getCompactionStatus(self):
+    """
+    Get the progress of the compaction of the buckets, per type and bucket length
+    """
+    if self.runBucketing:
+      return self.__acDB.getCompactionStatus()  # pylint: disable=no-member
+
+    return RPCClient('Accounting/DataStoreMaster').getCompactionStatus()
+
   types_remove = [basestring, datetime.datetime, datetime.datetime, list]
 
   def export_remove(self, typeName, startTime, endTime, valuesList):
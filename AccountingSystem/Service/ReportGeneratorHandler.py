@@ -56,6 +56,7 @@ class ReportGeneratorHandler( RequestHandler ):
       gLogger.fatal( "Can't write to %s" % dataPath )
       return S_ERROR( "Data location is not writable" )
     gDataCache.setGraphsLocation( dataPath )
+    gDataCache.setDataCacheSize( gConfig.getValue( "%s/DataCacheSize" % reportSection, 256 ) * 1024 * 1024 )
     gMonitor.registerActivity( "plotsDrawn", "Drawn plot images", "Accounting reports", "plots", gMonitor.OP_SUM )
     gMonitor.registerActivity( "reportsRequested", "Generated reports", "Accounting reports", "reports", gMonitor.OP_SUM )
     return S_OK()
@@ -141,6 +142,13 @@ class ReportGeneratorHandler( RequestHandler ):
     reportRequest[ 'generatePlot' ] = False
     return reporter.generate( reportRequest, self.getRemoteCredentials() )
 
+  types_getDataCacheStats = []
+  def export_getDataCacheStats( self ):
+    """
+    Get the hits, misses, coalesced requests and size of the report data cache
+    """
+    return S_OK( gDataCache.getStats() )
+
   types_listReports = [ types.StringTypes ]
   def export_listReports( self, typeName ):
     """
@@ -1,6 +1,8 @@
 """ Class that collects utilities used in Accounting and Monitoring systems
 """
 
+import numpy
+
 from DIRAC.Core.Utilities import Time
 
 class DBUtils(object):
@@ -75,51 +77,58 @@ class DBUtils(object):
     nowEpoch = Time.toEpoch()
     return self._acDB.calculateBucketLengthForTime( self._setup, typeName, nowEpoch, momentEpoch )
 
-  def _spanToGranularity( self, granularity, bucketsData ):
+  def _regridBuckets( self, granularity, bucketsData ):
     """
+    Split the buckets proportionally over buckets of the given granularity, all at once
+    on columnar arrays ( start, length, values ) instead of bucket by bucket.
     bucketsData must be a list of lists where each list contains
       - field 0: datetime
       - field 1: bucketLength
       - fields 2-n: numericalFields
+    Returns ( bucket epochs, matrix with a row per bucket epoch holding the values
+    and, in the last column, the sum of the proportions added to the bucket )
     """
-    normData = {}
+    starts = numpy.array( [ bucketData[0] for bucketData in bucketsData ], dtype = numpy.int64 )
+    lengths = numpy.array( [ bucketData[1] for bucketData in bucketsData ], dtype = numpy.int64 )
+    # None becomes nan, and then 0
+    values = numpy.array( [ bucketData[2:] for bucketData in bucketsData ], dtype = numpy.float64 )
+    values[ numpy.isnan( values ) ] = 0.
+    ends = starts + lengths
+    alignedStarts = starts - starts % granularity
+    # Buckets with the target granularity are kept as they are, zero length buckets are aligned
+    keep = lengths == granularity
+    split = ~( keep | ( lengths == 0 ) )
+    nPieces = numpy.where( split, numpy.maximum( 0, -( ( alignedStarts - ends ) // granularity ) ), 1 )
+    rows = numpy.repeat( numpy.arange( len( starts ) ), nPieces )
+    pieceIndex = numpy.arange( len( rows ) ) - numpy.repeat( numpy.cumsum( nPieces ) - nPieces, nPieces )
+    pieceEpochs = numpy.where( keep[ rows ], starts[ rows ], alignedStarts[ rows ] + pieceIndex * granularity )
+    proportions = numpy.ones( len( rows ) )
+    split = split[ rows ]
+    splitRows = rows[ split ]
+    pieceStarts = numpy.maximum( pieceEpochs[ split ], starts[ splitRows ] )
+    pieceEnds = numpy.minimum( pieceEpochs[ split ] + granularity, ends[ splitRows ] )
+    proportions[ split ] = ( pieceEnds - pieceStarts ).astype( numpy.float64 ) / lengths[ splitRows ]
+
+    bucketEpochs, bucketIndex = numpy.unique( pieceEpochs, return_inverse = True )
+    normData = numpy.empty( ( len( bucketEpochs ), values.shape[1] + 1 ) )
+    # bincount adds the pieces in order, as the bucket by bucket sum did
+    for iP in range( values.shape[1] ):
+      normData[ :, iP ] = numpy.bincount( bucketIndex, weights = values[ rows, iP ] * proportions,
+                                          minlength = len( bucketEpochs ) )
+    normData[ :, -1 ] = numpy.bincount( bucketIndex, weights = proportions, minlength = len( bucketEpochs ) )
+    return bucketEpochs, normData
 
-    def addToNormData( bucketDate, data, proportion = 1.0 ):
-      if bucketDate in normData:
-        for iP in range( len( data ) ):
-          val = data[ iP ]
-          if val == None:
-            val = 0
-          normData[ bucketDate ][iP] += float( val ) * proportion
-        normData[ bucketDate ][ -1 ] += proportion
-      else:
-        normData[ bucketDate ] = []
-        for fD in data:
-          if fD == None:
-            fD = 0
-          normData[ bucketDate ].append( float( fD ) * proportion )
-        normData[ bucketDate ].append( proportion )
-
-    for bucketData in bucketsData:
-      bucketDate = bucketData[0]
-      originalBucketLength = bucketData[1]
-      bucketValues = bucketData[2:]
-      if originalBucketLength == granularity:
-        addToNormData( bucketDate, bucketValues )
-      else:
-        startEpoch = bucketDate
-        endEpoch = bucketDate + originalBucketLength
-        newBucketEpoch = startEpoch - startEpoch % granularity
-        if startEpoch == endEpoch:
-          addToNormData( newBucketEpoch, bucketValues )
-        else:
-          while newBucketEpoch < endEpoch:
-            start = max( newBucketEpoch, startEpoch )
-            end = min( newBucketEpoch + granularity, endEpoch )
-            proportion = float( end - start ) / originalBucketLength
-            addToNormData( newBucketEpoch, bucketValues, proportion )
-            newBucketEpoch += granularity
-    return normData
+  def _spanToGranularity( self, granularity, bucketsData ):
+    """
+    bucketsData must be a list of lists where each list contains
+      - field 0: datetime
+      - field 1: bucketLength
+      - fields 2-n: numericalFields
+    """
+    if not bucketsData:
+      return {}
+    bucketEpochs, normData = self._regridBuckets( granularity, bucketsData )
+    return dict( zip( bucketEpochs.tolist(), normData.tolist() ) )
 
   def _sumToGranularity( self, granularity, bucketsData ):
     """
@@ -128,10 +137,10 @@ class DBUtils(object):
       - field 1: bucketLength
       - fields 2-n: numericalFields
     """
-    normData = self._spanToGranularity( granularity, bucketsData )
-    for bDate in normData:
-      del( normData[ bDate ][-1] )
-    return normData
+    if not bucketsData:
+      return {}
+    bucketEpochs, normData = self._regridBuckets( granularity, bucketsData )
+    return dict( zip( bucketEpochs.tolist(), normData[ :, :-1 ].tolist() ) )
 
   def _averageToGranularity( self, granularity, bucketsData ):
     """
@@ -140,12 +149,11 @@ class DBUtils(object):
       - field 1: bucketLength
       - fields 2-n: numericalFields
     """
-    normData = self._spanToGranularity( granularity, bucketsData )
-    for bDate in normData:
-      for iP in range( len( normData[ bDate ] ) ):
-        normData[ bDate ][iP] = float( normData[ bDate ][iP] ) / normData[ bDate ][-1]
-      del( normData[ bDate ][-1] )
-    return normData
+    if not bucketsData:
+      return {}
+    bucketEpochs, normData = self._regridBuckets( granularity, bucketsData )
+    normData = normData[ :, :-1 ] / normData[ :, -1: ]
+    return dict( zip( bucketEpochs.tolist(), normData.tolist() ) )
 
   def _convertNoneToZero( self, bucketsData ):
     """
@@ -168,11 +176,10 @@ class DBUtils(object):
       - dataDict = { 'key' : { time1 : value,  time2 : value... }, 'key2'.. }
     """
     startBucketEpoch = startEpoch - startEpoch % granularity
+    timeEpochs = set( range( int( startBucketEpoch ), int( endEpoch ), granularity ) )
     for key in dataDict:
       currentDict = dataDict[ key ]
-      for timeEpoch in range( int( startBucketEpoch ), int( endEpoch ), granularity ):
-        if timeEpoch not in currentDict:
-          currentDict[ timeEpoch ] = 0
+      currentDict.update( dict.fromkeys( timeEpochs.difference( currentDict ), 0 ) )
     return dataDict
 
   def _getAccumulationMaxValue( self, dataDict ):
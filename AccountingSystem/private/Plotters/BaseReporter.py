@@ -1,4 +1,4 @@
-import time, copy, types
+import time, copy, types, hashlib
 from DIRAC                                  import S_OK, S_ERROR, gLogger
 from DIRAC.AccountingSystem.private.DBUtils import DBUtils
 from DIRAC.Core.Utilities.Plotting          import gDataCache
@@ -146,18 +146,25 @@ class BaseReporter( DBUtils ):
         condDict[ keyword ] = preCondDict[ keyword ]
     #Query!
     timeGrouping = ( "%%s, %s" % groupingFields[0], [ 'startTime' ] + groupingFields[1] )
-    retVal = self._retrieveBucketedData( self._typeName,
-                                          startTime,
-                                          endTime,
-                                          selectFields,
-                                          condDict,
-                                          timeGrouping,
-                                          ( '%s', [ 'startTime' ] )
-                                          )
+
+    def queryFunc( queryStartTime, queryEndTime ):
+      return self._retrieveBucketedData( self._typeName,
+                                         queryStartTime,
+                                         queryEndTime,
+                                         selectFields,
+                                         copy.deepcopy( condDict ),
+                                         timeGrouping,
+                                         ( '%s', [ 'startTime' ] )
+                                         )
+
+    #The buckets of the same query over a previous time range can be reused
+    queryHash = hashlib.md5( repr( ( self._setup, self._typeName, selectFields,
+                                     sorted( condDict.items() ), timeGrouping ) ) ).hexdigest()
+    coarsestGranularity = self._getBucketLengthForTime( self._typeName, startTime )
+    retVal = gDataCache.getBucketedData( queryHash, startTime, endTime, coarsestGranularity, queryFunc )
     if not retVal[ 'OK' ]:
       return retVal
     dataDict = self._groupByField( 0, retVal[ 'Value' ] )
-    coarsestGranularity = self._getBucketLengthForTime( self._typeName, startTime )
     #Transform!
     for keyField in dataDict:
       if metadataDict[ self._PARAM_CHECK_FOR_NONE ]:
@@ -0,0 +1,137 @@
+""" Test the bucket regridding of DBUtils against the bucket by bucket implementation it replaced
+"""
+
+# pylint: disable=protected-access
+
+import copy
+import random
+from decimal import Decimal
+
+import pytest
+
+from DIRAC.AccountingSystem.private.DBUtils import DBUtils
+
+__RCSID__ = "$Id$"
+
+
+def referenceSpanToGranularity(granularity, bucketsData):
+  """ DBUtils._spanToGranularity before it was vectorized """
+  normData = {}
+
+  def addToNormData(bucketDate, data, proportion=1.0):
+    if bucketDate in normData:
+      for iP in range(len(data)):
+        val = data[iP]
+        if val is None:
+          val = 0
+        normData[bucketDate][iP] += float(val) * proportion
+      normData[bucketDate][-1] += proportion
+    else:
+      normData[bucketDate] = []
+      for fD in data:
+        if fD is None:
+          fD = 0
+        normData[bucketDate].append(float(fD) * proportion)
+      normData[bucketDate].append(proportion)
+
+  for bucketData in bucketsData:
+    bucketDate = bucketData[0]
+    originalBucketLength = bucketData[1]
+    bucketValues = bucketData[2:]
+    if originalBucketLength == granularity:
+      addToNormData(bucketDate, bucketValues)
+    else:
+      startEpoch = bucketDate
+      endEpoch = bucketDate + originalBucketLength
+      newBucketEpoch = startEpoch - startEpoch % granularity
+      if startEpoch == endEpoch:
+        addToNormData(newBucketEpoch, bucketValues)
+      else:
+        while newBucketEpoch < endEpoch:
+          start = max(newBucketEpoch, startEpoch)
+          end = min(newBucketEpoch + granularity, endEpoch)
+          proportion = float(end - start) / originalBucketLength
+          addToNormData(newBucketEpoch, bucketValues, proportion)
+          newBucketEpoch += granularity
+  return normData
+
+
+def referenceAverageToGranularity(granularity, bucketsData):
+  normData = referenceSpanToGranularity(granularity, bucketsData)
+  for bDate in normData:
+    for iP in range(len(normData[bDate])):
+      normData[bDate][iP] = float(normData[bDate][iP]) / normData[bDate][-1]
+    del normData[bDate][-1]
+  return normData
+
+
+def referenceFillWithZero(granularity, startEpoch, endEpoch, dataDict):
+  startBucketEpoch = startEpoch - startEpoch % granularity
+  for key in dataDict:
+    currentDict = dataDict[key]
+    for timeEpoch in range(int(startBucketEpoch), int(endEpoch), granularity):
+      if timeEpoch not in currentDict:
+        currentDict[timeEpoch] = 0
+  return dataDict
+
+
+def generateBuckets(startEpoch, endEpoch, nbFields=3, seed=0):
+  """ Buckets as the AccountingDB returns them: the older, the longer, plus a few odd ones """
+  rand = random.Random(seed)
+  bucketsData = []
+  epoch = startEpoch
+  while epoch < endEpoch:
+    length = rand.choice((900, 3600, 3600, 86400, 604800))
+    epoch -= epoch % length
+    values = [rand.choice((None, rand.randint(0, 1000), rand.random() * 1e6, Decimal('%.3f' % rand.random())))
+              for _field in xrange(nbFields)]
+    bucketsData.append([epoch, length] + values)
+    if rand.random() < 0.05:
+      # zero length bucket and unaligned bucket
+      bucketsData.append([epoch + rand.randint(0, length), rand.choice((0, 7, length))] + values)
+    epoch += length
+  return bucketsData
+
+
+dbUtils = DBUtils(None, 'Test')
+
+
+@pytest.mark.parametrize("granularity", [300, 900, 3600, 86400, 604800])
+def test_regridParity(granularity):
+  bucketsData = generateBuckets(1500000000, 1500000000 + 86400 * 365, seed=granularity)
+  assert dbUtils._spanToGranularity(granularity, bucketsData) == \
+      referenceSpanToGranularity(granularity, bucketsData)
+  assert dbUtils._averageToGranularity(granularity, bucketsData) == \
+      referenceAverageToGranularity(granularity, bucketsData)
+  expected = referenceSpanToGranularity(granularity, bucketsData)
+  for values in expected.itervalues():
+    del values[-1]
+  assert dbUtils._sumToGranularity(granularity, bucketsData) == expected
+
+
+def test_regrid():
+  bucketsData = [[3600, 3600, 10, None],
+                 [7200, 7200, 20, 4],
+                 [10000, 0, 1, 1]]
+  assert dbUtils._sumToGranularity(3600, bucketsData) == {3600: [10., 0.],
+                                                          7200: [11., 3.],
+                                                          10800: [10., 2.]}
+  assert dbUtils._spanToGranularity(86400, bucketsData)[0] == [31., 5., 3.]
+  assert dbUtils._averageToGranularity(86400, []) == {}
+
+
+@pytest.mark.parametrize("values", [[1, 2, 3], [0.1, 0.2, 1e10, 0.3]])
+def test_fillWithZeroParity(values):
+  granularity = 3600
+  startEpoch, endEpoch = 1500001234, 1500001234 + 86400 * 30
+  rand = random.Random(len(values))
+  dataDict = {}
+  for key in ('CERN', 'CNAF', 'Empty'):
+    dataDict[key] = {}
+    if key != 'Empty':
+      for timeEpoch in rand.sample(range(startEpoch - startEpoch % granularity, endEpoch, granularity), 100):
+        dataDict[key][timeEpoch] = rand.choice(values)
+  reference = copy.deepcopy(dataDict)
+
+  assert dbUtils._fillWithZero(granularity, startEpoch, endEpoch, dataDict) == \
+      referenceFillWithZero(granularity, startEpoch, endEpoch, reference)
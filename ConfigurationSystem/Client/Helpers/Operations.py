@@ -73,13 +73,24 @@
 import thread
 import os
 from DIRAC import S_OK, S_ERROR, gConfig
-from DIRAC.Core.Utilities import CFG, LockRing
+from DIRAC.Core.Utilities import CFG, LockRing, List
 from DIRAC.ConfigurationSystem.Client.Helpers import Registry, CSGlobals
 from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.ConfigurationSystem.private.OptionIndex import OptionIndex
 from DIRAC.Core.Security.ProxyInfo import getVOfromProxyGroup
 from DIRAC.Core.Utilities.Decorators import deprecated
 
 
+def _castOptionValue(optionValue, defaultType):
+  """ Cast the string value of an option like CFG.getOption, raise an exception if it can't
+  """
+  if defaultType == list:
+    return List.fromChar(optionValue, ',')
+  elif defaultType == bool:
+    return optionValue.lower() in ("y", "yes", "true", "1")
+  return defaultType(optionValue)
+
+
 class Operations(object):
   """ Operations class
 
@@ -127,6 +138,11 @@ class Operations(object):
       self.__setup = CSGlobals.getSetup()
 
   def __getCache(self):
+    return self.__getCacheEntry()[0]
+
+  def __getCacheEntry(self):
+    """ Get the merged CFG of the search paths and its OptionIndex, for the current version
+    """
     Operations.__cacheLock.acquire()
     try:
       currentVersion = gConfigurationData.getVersion()
@@ -145,7 +161,7 @@ class Operations(object):
         if pathCFG:
           mergedCFG = mergedCFG.mergeWith(pathCFG)
 
-      Operations.__cache[cacheKey] = mergedCFG
+      Operations.__cache[cacheKey] = (mergedCFG, OptionIndex(mergedCFG))
 
       return Operations.__cache[cacheKey]
     finally:
@@ -187,7 +203,23 @@ class Operations(object):
     return paths
 
   def getValue(self, optionPath, defaultValue=None):
-    return self.__getCache().getOption(optionPath, defaultValue)
+    """ Get an option, cast to the type of defaultValue as CFG.getOption does
+    """
+    optionIndex = self.__getCacheEntry()[1]
+    if defaultValue is None:
+      optionValue = optionIndex.getRawValue(optionPath)
+      return defaultValue if optionValue is None else optionValue
+
+    if isinstance(defaultValue, type):
+      defaultType = defaultValue
+    else:
+      defaultType = type(defaultValue)
+    try:
+      optionValue = optionIndex.getTypedValue(optionPath, defaultType,
+                                              lambda value: _castOptionValue(value, defaultType))
+    except Exception:  # pylint: disable=broad-except
+      return defaultValue
+    return defaultValue if optionValue is None else optionValue
 
   def __getCFG(self, sectionPath):
     cacheCFG = self.__getCache()
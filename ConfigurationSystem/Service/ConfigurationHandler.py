@@ -5,8 +5,9 @@ __RCSID__ = "$Id$"
 
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.ConfigurationSystem.private.ServiceInterface import ServiceInterface
-from DIRAC.Core.DISET.RequestHandler import RequestHandler
+from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
 from DIRAC.Core.Utilities import DErrno
+from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
 
 gServiceInterface = None
 gPilotSynchronizer = None
@@ -14,7 +15,14 @@ gPilotSynchronizer = None
 
 def initializeConfigurationHandler(serviceInfo):
   global gServiceInterface
-  gServiceInterface = ServiceInterface(serviceInfo['URL'])
+  gServiceInterface = ServiceInterface(serviceInfo['URL'],
+                                       deltaHistorySize=getServiceOption(serviceInfo, 'DeltaHistorySize', 10))
+  gMonitor.registerActivity("deltaSent", "Configuration deltas sent",
+                            "Configuration", "Updates/min", gMonitor.OP_SUM)
+  gMonitor.registerActivity("fullSent", "Full configurations sent",
+                            "Configuration", "Updates/min", gMonitor.OP_SUM)
+  gMonitor.registerActivity("bytesSaved", "Bytes saved by sending deltas",
+                            "Configuration", "Bytes/min", gMonitor.OP_SUM)
   return S_OK()
 
 
@@ -42,6 +50,20 @@ class ConfigurationHandler(RequestHandler):
       retDict['data'] = gServiceInterface.getCompressedConfigurationData()
     return S_OK(retDict)
 
+  types_getDeltaIfNewer = [basestring]
+
+  def export_getDeltaIfNewer(self, sClientVersion):
+    """ Same as getCompressedDataIfNewer, but sends only the modifications since the version
+        of the client when possible, see ServiceInterface.getDeltaIfNewer
+    """
+    retDict = gServiceInterface.getDeltaIfNewer(sClientVersion)
+    if 'delta' in retDict:
+      gMonitor.addMark("deltaSent", 1)
+      gMonitor.addMark("bytesSaved", retDict['fullSize'] - len(retDict['delta']))
+    elif 'data' in retDict:
+      gMonitor.addMark("fullSent", 1)
+    return S_OK(retDict)
+
   types_publishSlaveServer = [basestring]
 
   def export_publishSlaveServer(self, sURL):
@@ -14,6 +14,33 @@ from DIRAC.ConfigurationSystem.private.Refresher import gRefresher
 __RCSID__ = "$Id$"
 
 
+def _getRequestedType(typeValue):
+  """ typeValue is either a type or a default object
+  """
+  if isinstance(typeValue, type):
+    return typeValue
+  return type(typeValue)
+
+
+def _castOptionValue(optionValue, requestedType):
+  """ Cast the string value of an option to the requested type, raise an exception if it can't
+  """
+  if requestedType in (list, tuple, set):
+    return requestedType(List.fromChar(optionValue, ','))
+  elif requestedType == bool:
+    return optionValue.lower() in ("y", "yes", "true", "1")
+  elif requestedType == dict:
+    splitOption = List.fromChar(optionValue, ',')
+    value = {}
+    for opt in splitOption:
+      keyVal = [x.strip() for x in opt.split(':')]
+      if len(keyVal) == 1:
+        keyVal.append(True)
+      value[keyVal[0]] = keyVal[1]
+    return value
+  return requestedType(optionValue)
+
+
 class ConfigurationClient(object):
 
   def __init__(self, fileToLoadList=None):
@@ -65,59 +92,49 @@ class ConfigurationClient(object):
     return gConfigurationData.useServerCertificate()
 
   def getValue(self, optionPath, defaultValue=None):
-    retVal = self.getOption(optionPath, defaultValue)
-    return retVal['Value'] if retVal['OK'] else defaultValue
-
-  def getOption(self, optionPath, typeValue=None):
+    # Missing options are frequent: don't build an S_ERROR just to drop it
+    try:
+      optionValue = self.__getOptionValue(optionPath, defaultValue)
+    except Exception:  # pylint: disable=broad-except
+      return defaultValue
+    return defaultValue if optionValue is None else optionValue
+
+  @staticmethod
+  def __getOptionValue(optionPath, typeValue):
+    """ Get the value of an option cast to the type of typeValue,
+        None if the option does not exist. The cast values are memoized in the
+        index of the configuration until it changes.
+    """
     gRefresher.refreshConfigurationIfNeeded()
-    optionValue = gConfigurationData.extractOptionFromCFG(optionPath)
-
-    if optionValue is None:
-      return S_ERROR("Path %s does not exist or it's not an option" % optionPath)
-
-    # Value has been returned from the configuration
+    optionIndex = gConfigurationData.getOptionIndex()
     if typeValue is None:
-      return S_OK(optionValue)
+      return optionIndex.getRawValue(optionPath)
+    requestedType = _getRequestedType(typeValue)
+    return optionIndex.getTypedValue(optionPath, requestedType,
+                                     lambda value: _castOptionValue(value, requestedType))
 
-    # Casting to typeValue's type
-    if not isinstance(typeValue, type):
-      # typeValue is not a type but a default object
-      requestedType = type(typeValue)
-    else:
-      requestedType = typeValue
-
-    if requestedType in (list, tuple, set):
-      try:
-        return S_OK(requestedType(List.fromChar(optionValue, ',')))
-      except Exception as e:
+  def getOption(self, optionPath, typeValue=None):
+    try:
+      optionValue = self.__getOptionValue(optionPath, typeValue)
+    except Exception as e:
+      optionValue = gConfigurationData.getOptionIndex().getRawValue(optionPath)
+      requestedType = _getRequestedType(typeValue)
+      if requestedType in (list, tuple, set):
         return S_ERROR("Can't convert value (%s) to comma separated list \n%s" % (str(optionValue),
                                                                                   repr(e)))
-    elif requestedType == bool:
-      try:
-        return S_OK(optionValue.lower() in ("y", "yes", "true", "1"))
-      except Exception as e:
+      elif requestedType == bool:
         return S_ERROR("Can't convert value (%s) to Boolean \n%s" % (str(optionValue),
                                                                      repr(e)))
-    elif requestedType == dict:
-      try:
-        splitOption = List.fromChar(optionValue, ',')
-        value = {}
-        for opt in splitOption:
-          keyVal = [x.strip() for x in opt.split(':')]
-          if len(keyVal) == 1:
-            keyVal.append(True)
-          value[keyVal[0]] = keyVal[1]
-        return S_OK(value)
-      except Exception as e:
+      elif requestedType == dict:
         return S_ERROR("Can't convert value (%s) to Dict \n%s" % (str(optionValue),
                                                                   repr(e)))
-    else:
-      try:
-        return S_OK(requestedType(optionValue))
-      except Exception as e:
-        return S_ERROR(
-            "Type mismatch between default (%s) and configured value (%s) \n%s" %
-            (str(typeValue), optionValue, repr(e)))
+      return S_ERROR(
+          "Type mismatch between default (%s) and configured value (%s) \n%s" %
+          (str(typeValue), optionValue, repr(e)))
+
+    if optionValue is None:
+      return S_ERROR("Path %s does not exist or it's not an option" % optionPath)
+    return S_OK(optionValue)
 
   def getSections(self, sectionPath, listOrdered=True):
     gRefresher.refreshConfigurationIfNeeded()
@@ -14,6 +14,8 @@ from DIRAC.Core.Utilities import List, Time
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.Utilities.CFG import CFG
 from DIRAC.Core.Utilities.LockRing import LockRing
+from DIRAC.ConfigurationSystem.private.OptionIndex import OptionIndex
+from DIRAC.ConfigurationSystem.private.DeltaHistory import getCFGChecksum
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 
 __RCSID__ = "$Id$"
@@ -34,6 +36,9 @@ class ConfigurationData( object ):
     self.remoteCFG = CFG()
     self.mergedCFG = CFG()
     self.remoteServerList = []
+    # ( mergedCFG, OptionIndex of its options ), built on demand after every sync
+    self.__optionIndex = None
+    self.__syncCounter = 0
     if loadDefaultCFG:
       defaultCFGFile = os.path.join( DIRAC.rootPath, "etc", "dirac.cfg" )
       gLogger.debug( "dirac.cfg should be at", "%s" % defaultCFGFile )
@@ -61,6 +66,26 @@ class ConfigurationData( object ):
       self.remoteServerList.extend( List.fromChar( remoteServers, "," ) )
     self.remoteServerList = List.uniqueElements( self.remoteServerList )
     self.__compressedConfigurationData = None
+    self.__syncCounter += 1
+    self.__optionIndex = None
+
+  def getOptionIndex( self ):
+    """ Get the OptionIndex of the merged configuration, valid until the next sync
+    """
+    optionIndex = self.__optionIndex
+    if optionIndex is not None and optionIndex[0] is self.mergedCFG:
+      return optionIndex[1]
+    self.dangerZoneStart()
+    try:
+      syncCounter = self.__syncCounter
+      mergedCFG = self.mergedCFG
+      optionIndex = ( mergedCFG, OptionIndex( mergedCFG ) )
+      # Don't keep an index built from a configuration replaced in between
+      if syncCounter == self.__syncCounter:
+        self.__optionIndex = optionIndex
+    finally:
+      self.dangerZoneEnd()
+    return optionIndex[1]
 
   def loadFile( self, fileName ):
     try:
@@ -87,6 +112,29 @@ class ConfigurationData( object ):
     sUncompressedData = zlib.decompress( data )
     self.loadRemoteCFGFromMem( sUncompressedData )
 
+  def applyRemoteModifications( self, modList, checksum = None ):
+    """
+    Apply a list of modifications ( see CFG.getModifications ) to the remote CFG
+
+    :param list modList: modifications to apply
+    :param str checksum: expected checksum of the resulting CFG, see DeltaHistory.getCFGChecksum
+    :return: S_OK/S_ERROR, the remote CFG is left untouched on error
+    """
+    newCFG = self.remoteCFG.clone()
+    try:
+      result = newCFG.applyModifications( modList )
+    except Exception as e:
+      return S_ERROR( "Cannot apply modifications: %s" % repr( e ) )
+    if not result[ 'OK' ]:
+      return result
+    if checksum and getCFGChecksum( newCFG ) != checksum:
+      return S_ERROR( "Checksum mismatch after applying modifications" )
+    self.lock()
+    self.remoteCFG = newCFG
+    self.unlock()
+    self.sync()
+    return S_OK()
+
   def loadRemoteCFGFromMem( self, data ):
     self.lock()
     self.remoteCFG.loadFromBuffer( data )
@@ -148,7 +196,7 @@ class ConfigurationData( object ):
 
   def extractOptionFromCFG( self, path, cfg = False, disableDangerZones = False ):
     if not cfg:
-      cfg = self.mergedCFG
+      return self.getOptionIndex().getRawValue( path )
     if not disableDangerZones:
       self.dangerZoneStart()
     try:
@@ -0,0 +1,85 @@
+""" DeltaHistory keeps the last versions of the configuration served by a CS server, to send
+    to the clients only the modifications since the version they have instead of the full CFG
+
+    A delta is the list of modifications from CFG.getModifications, the same operations
+    that Modificator and the AutoMerge of the master use, DEncoded and compressed. It is
+    computed once per ( client version, newest version ) and comes with the checksum of the
+    newest CFG, so that the client can check that it rebuilt exactly the same configuration.
+"""
+
+__RCSID__ = "$Id$"
+
+import hashlib
+import threading
+import zlib
+
+from DIRAC.Core.Utilities import DEncode
+
+
+def getCFGChecksum(cfg):
+  """ Checksum of the contents of a CFG, as it is shipped in full
+  """
+  return hashlib.md5(str(cfg)).hexdigest()
+
+
+def encodeModifications(modList):
+  return zlib.compress(DEncode.encode(modList), 9)
+
+
+def decodeModifications(data):
+  return DEncode.decode(zlib.decompress(data))[0]
+
+
+class DeltaHistory(object):
+
+  def __init__(self, maxVersions=10):
+    """ :param int maxVersions: number of versions kept, the older clients get the full CFG
+    """
+    self.__maxVersions = max(1, maxVersions)
+    # [ ( version, CFG, checksum ) ], oldest first
+    self.__versions = []
+    # ( fromVersion, toVersion ) -> delta dictionary
+    self.__deltas = {}
+    self.__lock = threading.Lock()
+
+  def getNewestVersion(self):
+    versions = self.__versions
+    return versions[-1][0] if versions else None
+
+  def addVersion(self, version, cfg):
+    """ Record a new version of the configuration
+
+        :param str version: version of the CFG
+        :param cfg: CFG object, it is kept as is and must not be modified afterwards
+    """
+    with self.__lock:
+      if self.__versions and self.__versions[-1][0] == version:
+        return
+      self.__versions.append((version, cfg, getCFGChecksum(cfg)))
+      del self.__versions[:-self.__maxVersions]
+      known = set(entry[0] for entry in self.__versions)
+      self.__deltas = dict((key, delta) for key, delta in self.__deltas.iteritems()
+                           if key[0] in known and key[1] in known)
+
+  def getDelta(self, fromVersion):
+    """ Get the modifications bringing a CFG at fromVersion to the newest recorded version
+
+        :return: dictionary with the newest 'version', the encoded modifications in 'data' and
+                 the 'checksum' of the newest CFG, or None if fromVersion is not known any more
+    """
+    with self.__lock:
+      if not self.__versions:
+        return None
+      toVersion, toCFG, checksum = self.__versions[-1]
+      key = (fromVersion, toVersion)
+      if key not in self.__deltas:
+        fromCFG = None
+        for version, cfg, _checksum in self.__versions:
+          if version == fromVersion:
+            fromCFG = cfg
+        if fromCFG is None:
+          return None
+        self.__deltas[key] = {'version': toVersion,
+                              'data': encodeModifications(fromCFG.getModifications(toCFG)),
+                              'checksum': checksum}
+      return self.__deltas[key]
@@ -0,0 +1,80 @@
+""" OptionIndex is a frozen, flat view of the options of a CFG
+
+    Looking up an option in a CFG splits the path and walks the sections, and the value
+    is cast to the requested type at every call. The index maps the full path of every
+    option to its value, and memoizes the typed values, so that a lookup is a dictionary
+    access. It has to be thrown away when the CFG changes: ConfigurationData rebuilds it
+    after every sync (new version from the CS, local modification) and Operations for
+    every new configuration version.
+"""
+
+__RCSID__ = "$Id$"
+
+import copy
+
+# Typed values handed out as copies, so that the callers can't modify the cached ones
+_mutableTypes = (list, dict, set)
+# Marks the options known not to exist in the typed values cache
+_missing = object()
+
+
+def normalizePath(path):
+  """ Normalize a CFG path the way CFG lookups understand it: "a//b/ c/" -> "/a/b/c"
+  """
+  return "/%s" % "/".join(level.strip() for level in path.split("/") if level.strip())
+
+
+class OptionIndex(object):
+  """ Index of the options of a CFG: normalized full path -> value, and the typed values
+      already asked for. Built from a CFG that is not modified afterwards; ConfigurationData
+      and Operations rebuild it when the configuration changes.
+  """
+
+  def __init__(self, cfg):
+    """ :param cfg: CFG object to index. It must not be modified while the index is used
+    """
+    self.__options = {}
+    self.__typedValues = {}
+    self.__indexSection(cfg, "")
+
+  def __indexSection(self, cfg, sectionPath):
+    for option in cfg.listOptions():
+      self.__options["%s/%s" % (sectionPath, option)] = cfg[option]
+    for section in cfg.listSections():
+      self.__indexSection(cfg[section], "%s/%s" % (sectionPath, section))
+
+  def __len__(self):
+    return len(self.__options)
+
+  def getRawValue(self, path):
+    """ Get the string value of an option
+
+        :param str path: full path of the option
+        :return: the value or None if the option does not exist
+    """
+    try:
+      return self.__options[path]
+    except KeyError:
+      return self.__options.get(normalizePath(path))
+
+  def getTypedValue(self, path, typeKey, castFunction):
+    """ Get the value of an option cast with castFunction, memoized per ( path, typeKey )
+
+        :param str path: full path of the option
+        :param typeKey: hashable description of the cast, usually the requested type
+        :param castFunction: function casting the string value, it can raise an exception
+        :return: the cast value or None if the option does not exist
+    """
+    cacheKey = (path, typeKey)
+    try:
+      value = self.__typedValues[cacheKey]
+    except KeyError:
+      rawValue = self.getRawValue(path)
+      # The cache is only filled: concurrent threads may both compute the same value, that is harmless
+      value = _missing if rawValue is None else castFunction(rawValue)
+      self.__typedValues[cacheKey] = value
+    if value is _missing:
+      return None
+    if isinstance(value, _mutableTypes):
+      return copy.copy(value)
+    return value
@@ -10,20 +10,81 @@ import time
 import random
 from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
 from DIRAC.ConfigurationSystem.Client.PathFinder import getGatewayURLs
+from DIRAC.ConfigurationSystem.private.DeltaHistory import decodeModifications
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 from DIRAC.Core.Utilities import List, LockRing
 from DIRAC.Core.Utilities.EventDispatcher import gEventDispatcher
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 
 
+# Servers that do not know about deltas ( older versions ), they are asked for the full data
+_noDeltaServers = set()
+# Counters of the configuration updates, see Refresher.getUpdateStats
+_updateStats = {'deltaUpdates': 0, 'fullUpdates': 0, 'failedDeltas': 0,
+                'bytesReceived': 0, 'bytesSaved': 0}
+
+
+def _updateFromDelta(serviceClient, localVersion):
+  """ Try to update the configuration applying the modifications since the local version
+
+      :return: S_OK( True ) if up to date, S_OK( False ) if the full data has to be downloaded,
+               S_ERROR if the server can't be contacted
+  """
+  if serviceClient.serviceURL in _noDeltaServers:
+    return S_OK(False)
+  retVal = serviceClient.getDeltaIfNewer(localVersion)
+  if not retVal['OK']:
+    if not retVal['Message'].startswith("Unknown method"):
+      return retVal
+    _noDeltaServers.add(serviceClient.serviceURL)
+    return S_OK(False)
+  dataDict = retVal['Value']
+  if localVersion >= dataDict['newestVersion']:
+    return S_OK(True)
+  if 'delta' not in dataDict:
+    # Too old, or the delta is not worth it: the server sent the full data
+    _updateStats['fullUpdates'] += 1
+    _updateStats['bytesReceived'] += len(dataDict['data'])
+    gLogger.debug("New version available", "Updating to version %s..." % dataDict['newestVersion'])
+    gConfigurationData.loadRemoteCFGFromCompressedMem(dataDict['data'])
+    return S_OK(True)
+  gLogger.debug("New version available", "Applying delta to version %s..." % dataDict['newestVersion'])
+  try:
+    modList = decodeModifications(dataDict['delta'])
+  except Exception as excp:  # pylint: disable=broad-except
+    retVal = S_ERROR("Cannot decode delta: %s" % repr(excp))
+  else:
+    retVal = gConfigurationData.applyRemoteModifications(modList, dataDict['checksum'])
+  if not retVal['OK'] or gConfigurationData.getVersion() != dataDict['newestVersion']:
+    _updateStats['failedDeltas'] += 1
+    gLogger.warn("Cannot apply configuration delta, downloading the full configuration",
+                 retVal.get('Message', "wrong version %s" % gConfigurationData.getVersion()))
+    return S_OK(False)
+  _updateStats['deltaUpdates'] += 1
+  _updateStats['bytesReceived'] += len(dataDict['delta'])
+  _updateStats['bytesSaved'] += dataDict['fullSize'] - len(dataDict['delta'])
+  return S_OK(True)
+
+
 def _updateFromRemoteLocation(serviceClient):
   gLogger.debug("", "Trying to refresh from %s" % serviceClient.serviceURL)
   localVersion = gConfigurationData.getVersion()
+  retVal = _updateFromDelta(serviceClient, localVersion)
+  if not retVal['OK']:
+    return retVal
+  if retVal['Value']:
+    if localVersion != gConfigurationData.getVersion():
+      gLogger.debug("Updated to version %s" % gConfigurationData.getVersion())
+      gEventDispatcher.triggerEvent("CSNewVersion", gConfigurationData.getVersion(), threaded=True)
+    return S_OK()
+  localVersion = gConfigurationData.getVersion()
   retVal = serviceClient.getCompressedDataIfNewer(localVersion)
   if retVal['OK']:
     dataDict = retVal['Value']
     if localVersion < dataDict['newestVersion']:
       gLogger.debug("New version available", "Updating to version %s..." % dataDict['newestVersion'])
+      _updateStats['fullUpdates'] += 1
+      _updateStats['bytesReceived'] += len(dataDict['data'])
       gConfigurationData.loadRemoteCFGFromCompressedMem(dataDict['data'])
       gLogger.debug("Updated to version %s" % gConfigurationData.getVersion())
       gEventDispatcher.triggerEvent("CSNewVersion", dataDict['newestVersion'], threaded=True)
@@ -57,6 +118,12 @@ class Refresher(threading.Thread):
   def isEnabled(self):
     return self.__refreshEnabled
 
+  def getUpdateStats(self):
+    """ Counters of the configuration updates of this process: number of updates done
+        with a delta or with the full data, failed deltas, bytes received and saved
+    """
+    return dict(_updateStats)
+
   def addListenerToNewVersionEvent(self, functor):
     gEventDispatcher.addListener("CSNewVersion", functor)
 
@@ -14,6 +14,7 @@ import DIRAC
 from DIRAC.Core.Utilities.File import mkDir
 from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData, ConfigurationData
 from DIRAC.ConfigurationSystem.private.Refresher import gRefresher
+from DIRAC.ConfigurationSystem.private.DeltaHistory import DeltaHistory
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.DISET.RPCClient import RPCClient
@@ -21,9 +22,10 @@ from DIRAC.Core.DISET.RPCClient import RPCClient
 
 class ServiceInterface(threading.Thread):
 
-  def __init__(self, sURL):
+  def __init__(self, sURL, deltaHistorySize=10):
     threading.Thread.__init__(self)
     self.sURL = sURL
+    self.__deltaHistory = DeltaHistory(deltaHistorySize)
     gLogger.info("Initializing Configuration Service", "URL is %s" % sURL)
     self.__modificationsIgnoreMask = ['/DIRAC/Configuration/Servers', '/DIRAC/Configuration/Version']
     gConfigurationData.setAsService()
@@ -160,6 +162,42 @@ class ServiceInterface(threading.Thread):
   def getVersion(self):
     return gConfigurationData.getVersion()
 
+  def __recordCurrentVersion(self):
+    """ Keep the current configuration in the history of versions used to compute the deltas
+    """
+    if self.__deltaHistory.getNewestVersion() == gConfigurationData.getVersion():
+      return
+    gConfigurationData.dangerZoneStart()
+    try:
+      sVersion = gConfigurationData.getVersion()
+      remoteCFG = gConfigurationData.getRemoteCFG().clone()
+    finally:
+      gConfigurationData.dangerZoneEnd()
+    self.__deltaHistory.addVersion(sVersion, remoteCFG)
+
+  def getDeltaIfNewer(self, sClientVersion):
+    """ Get what a client at version sClientVersion needs to update its configuration:
+        the modifications since its version if they are known and smaller than the
+        compressed configuration, the compressed configuration otherwise
+
+        :return: dictionary with the 'newestVersion', the size of the full data in 'fullSize'
+                 and either the 'delta' and its 'checksum' or the full 'data'
+    """
+    self.__recordCurrentVersion()
+    sVersion = gConfigurationData.getVersion()
+    retDict = {'newestVersion': sVersion}
+    if sClientVersion >= sVersion:
+      return retDict
+    sData = gConfigurationData.getCompressedData()
+    retDict['fullSize'] = len(sData)
+    delta = self.__deltaHistory.getDelta(sClientVersion)
+    if delta and delta['version'] == sVersion and len(delta['data']) < len(sData):
+      retDict['delta'] = delta['data']
+      retDict['checksum'] = delta['checksum']
+    else:
+      retDict['data'] = sData
+    return retDict
+
   def getCommitHistory(self):
     files = self.__getCfgBackups(gConfigurationData.getBackupDir())
     backups = [".".join(fileName.split(".")[1:-1]).split("@") for fileName in files]
@@ -0,0 +1,68 @@
+""" Test the deltas between configuration versions, as served by the CS and applied by the clients
+"""
+
+from DIRAC.Core.Utilities.CFG import CFG
+from DIRAC.ConfigurationSystem.private.ConfigurationData import ConfigurationData
+from DIRAC.ConfigurationSystem.private.DeltaHistory import DeltaHistory, decodeModifications, getCFGChecksum
+
+
+def getCFG(version, extra=""):
+  return CFG().loadFromBuffer("""
+DIRAC
+{
+  Configuration
+  {
+    Version = %s
+  }
+}
+Resources
+{
+  Sites
+  {
+    LCG.CERN.cern
+    {
+      SE = CERN-DISK
+      %s
+    }
+  }
+}
+""" % (version, extra))
+
+
+def test_deltaHistory():
+  history = DeltaHistory(maxVersions=2)
+  assert history.getDelta("1") is None
+  history.addVersion("1", getCFG("1"))
+  history.addVersion("2", getCFG("2", "CE = ce1.cern.ch"))
+  assert history.getNewestVersion() == "2"
+
+  delta = history.getDelta("1")
+  assert delta['version'] == "2"
+  assert delta['checksum'] == getCFGChecksum(getCFG("2", "CE = ce1.cern.ch"))
+  # Cached until a new version comes
+  assert history.getDelta("1") is delta
+
+  history.addVersion("3", getCFG("3"))
+  assert history.getDelta("1") is None
+  assert history.getDelta("2")['version'] == "3"
+
+
+def test_applyRemoteModifications():
+  newCFG = getCFG("2", "CE = ce1.cern.ch")
+  history = DeltaHistory()
+  history.addVersion("1", getCFG("1"))
+  history.addVersion("2", newCFG)
+  delta = history.getDelta("1")
+
+  confData = ConfigurationData(False)
+  confData.setRemoteCFG(getCFG("1"))
+  result = confData.applyRemoteModifications(decodeModifications(delta['data']), delta['checksum'])
+  assert result['OK'], result
+  assert confData.getVersion() == "2"
+  assert str(confData.getRemoteCFG()) == str(newCFG)
+  assert confData.mergedCFG.getOption("/Resources/Sites/LCG.CERN.cern/CE") == "ce1.cern.ch"
+
+  # A client not at the version the delta starts from keeps its configuration
+  confData.setRemoteCFG(getCFG("1", "SE = OTHER-DISK"))
+  assert not confData.applyRemoteModifications(decodeModifications(delta['data']), delta['checksum'])['OK']
+  assert confData.getVersion() == "1"
@@ -0,0 +1,97 @@
+""" Test the OptionIndex and its use by the configuration client
+"""
+
+# pylint: disable=protected-access
+
+from DIRAC.Core.Utilities.CFG import CFG
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.ConfigurationSystem.private.ConfigurationClient import ConfigurationClient
+from DIRAC.ConfigurationSystem.private.OptionIndex import OptionIndex, normalizePath
+
+cfgContent = """
+Systems
+{
+  WorkloadManagement
+  {
+    Production
+    {
+      Agents
+      {
+        JobCleaningAgent
+        {
+          PollingTime = 120
+          Enabled = yes
+          RemoveStatusDelay = Done:7, Killed:2
+          JobTypes = User, MCSimulation
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def getCFG():
+  cfg = CFG()
+  cfg.loadFromBuffer(cfgContent)
+  return cfg
+
+
+def test_normalizePath():
+  assert normalizePath("Systems//WorkloadManagement/ Production/") == "/Systems/WorkloadManagement/Production"
+  assert normalizePath("") == "/"
+
+
+def test_optionIndex():
+  cfg = getCFG()
+  optionIndex = OptionIndex(cfg)
+  path = "/Systems/WorkloadManagement/Production/Agents/JobCleaningAgent"
+  assert len(optionIndex) == 4
+  assert optionIndex.getRawValue("%s/PollingTime" % path) == "120"
+  assert optionIndex.getRawValue("Systems/WorkloadManagement//Production/Agents/JobCleaningAgent/PollingTime") == "120"
+  # Sections are not options
+  assert optionIndex.getRawValue(path) is None
+  assert optionIndex.getRawValue("%s/Missing" % path) is None
+
+  casts = []
+
+  def castList(value):
+    casts.append(value)
+    return [v.strip() for v in value.split(",")]
+
+  jobTypes = optionIndex.getTypedValue("%s/JobTypes" % path, list, castList)
+  assert jobTypes == ["User", "MCSimulation"]
+  jobTypes.append("Modified")
+  # The value is cast once, and callers get copies
+  assert optionIndex.getTypedValue("%s/JobTypes" % path, list, castList) == ["User", "MCSimulation"]
+  assert len(casts) == 1
+  assert optionIndex.getTypedValue("%s/Missing" % path, list, castList) is None
+
+
+def test_configurationClient():
+  gConfigurationData.localCFG = CFG()
+  gConfigurationData.remoteCFG = CFG()
+  gConfigurationData.mergedCFG = CFG()
+  gConfigurationData.generateNewVersion()
+  gConfig = ConfigurationClient()
+  gConfig.loadCFG(getCFG())
+
+  path = "/Systems/WorkloadManagement/Production/Agents/JobCleaningAgent"
+  assert gConfig.getValue("%s/PollingTime" % path, 0) == 120
+  assert gConfig.getValue("%s/Enabled" % path, False) is True
+  assert gConfig.getValue("%s/JobTypes" % path, []) == ["User", "MCSimulation"]
+  assert gConfig.getValue("%s/RemoveStatusDelay" % path, {}) == {"Done": "7", "Killed": "2"}
+  assert gConfig.getValue("%s/Missing" % path, 5) == 5
+  assert not gConfig.getOption("%s/JobTypes" % path, 0)["OK"]
+  assert gConfig.getOptionsDict(path)["Value"]["PollingTime"] == "120"
+
+  # Any change of the configuration rebuilds the index
+  optionIndex = gConfigurationData.getOptionIndex()
+  assert gConfigurationData.getOptionIndex() is optionIndex
+  gConfig.setOptionValue("%s/PollingTime" % path, "60")
+  assert gConfigurationData.getOptionIndex() is not optionIndex
+  assert gConfig.getValue("%s/PollingTime" % path, 0) == 60
+
+  gConfigurationData.localCFG = CFG()
+  gConfigurationData.mergedCFG = CFG()
+  gConfigurationData.generateNewVersion()
@@ -5,6 +5,7 @@ __RCSID__ = "$Id$"
 
 
 from DIRAC.Core.DISET.private.InnerRPCClient import InnerRPCClient
+from DIRAC.Core.Utilities.ReturnValues import S_OK
 
 class _MagicMethod( object ):
   """ This object allows to bundle together a function calling
@@ -45,6 +46,58 @@ class _MagicMethod( object ):
   def __str__( self ):
     return "<RPCClient method %s>" % self.__remoteFuncName
 
+class RPCBatch( object ):
+  """ Collects RPC calls to send them to the service in a single round trip.
+      It is obtained with RPCClient.batch, and any method called on it is queued::
+
+        rpc = RPCClient('WorkloadManagement/JobStateUpdate')
+        with rpc.batch() as batch:
+          batch.setJobStatus( 1, 'Running', 'Application', 'Job' )
+          batch.setJobParameter( 1, 'CPUNormalizationFactor', '10.' )
+        jobStatusResult, jobParameterResult = batch.result['Value']
+
+      The service executes the calls in order and checks the authorization of each of them.
+      The result is S_OK with the list of S_OK/S_ERROR of the calls, in the same order.
+  """
+
+  def __init__( self, innerRPCClient ):
+    self.__innerRPCClient = innerRPCClient
+    self.__calls = []
+    self.result = None
+
+  def __queueCall( self, sFunctionName, args ):
+    """ Queue a call, returns its position in the batch
+    """
+    self.__calls.append( ( sFunctionName, args ) )
+    return len( self.__calls ) - 1
+
+  def __getattr__( self, attrName ):
+    return _MagicMethod( self.__queueCall, attrName )
+
+  def __len__( self ):
+    return len( self.__calls )
+
+  def execute( self ):
+    """ Send the queued calls and empty the queue
+
+        :return: S_OK( [ result of each call ] ) / S_ERROR
+    """
+    calls = self.__calls
+    self.__calls = []
+    if not calls:
+      self.result = S_OK( [] )
+    else:
+      self.result = self.__innerRPCClient.executeRPCBatch( calls )
+    return self.result
+
+  def __enter__( self ):
+    return self
+
+  def __exit__( self, excType, excValue, traceback ):
+    if excType is None:
+      self.execute()
+    return False
+
 class RPCClient( object ):
   """ This class contains the mechanism to convert normal calls to RPC calls.
 
@@ -91,6 +144,11 @@ class RPCClient( object ):
 
 
 
+  def batch( self ):
+    """ Get an RPCBatch object to group several calls in a single round trip
+    """
+    return RPCBatch( self.__innerRPCClient )
+
   def __getattr__( self, attrName ):
     """ Function for emulating the existance of functions.
 
@@ -121,6 +121,8 @@ class RequestHandler(object):
     try:
       if actionType == "RPC":
         retVal = self.__doRPC(actionTuple[1])
+      elif actionType == "RPCBatch":
+        retVal = self.__doRPCBatch()
       elif actionType == "FileTransfer":
         retVal = self.__doFileTransfer(actionTuple[1])
       elif actionType == "Connection":
@@ -237,6 +239,37 @@ class RequestHandler(object):
     self.__logRemoteQuery("RPC/%s" % method, args)
     return self.__RPCCallFunction(method, args)
 
+  def __doRPCBatch(self):
+    """
+    Execute a batch of RPC calls, in order. The authorization is checked for each of them.
+
+    :return: S_OK with the list of S_OK/S_ERROR of the calls
+    """
+    retVal = self.__trPool.receive(self.__trid)
+    if not retVal['OK']:
+      raise RequestHandler.ConnectionError("Error while receiving arguments %s %s" %
+                                           (self.srv_getFormattedRemoteCredentials(), retVal['Message']))
+    calls = retVal['Value']
+    if not isinstance(calls, (list, tuple)):
+      return S_ERROR("Invalid RPC batch")
+    maxBatchSize = self.srv_getCSOption("MaxRPCBatchSize", 1000)
+    if len(calls) > maxBatchSize:
+      return S_ERROR("RPC batch too big: %s calls, max %s" % (len(calls), maxBatchSize))
+    authorizeAction = self.serviceInfoDict['actionAuthorizer']
+    credDict = self.getRemoteCredentials()
+    results = []
+    for method, args in calls:
+      actionTuple = ("RPC", method)
+      self.serviceInfoDict['actionTuple'] = actionTuple
+      result = authorizeAction(actionTuple, self.__trid, credDict)
+      if result['OK']:
+        self.__logRemoteQuery("RPC/%s" % method, args)
+        result = self.__RPCCallFunction(method, args)
+        if not isReturnStructure(result):
+          result = S_ERROR("Method %s for action RPC does not return a S_OK/S_ERROR!" % method)
+      results.append(result)
+    return S_OK(results)
+
   def __RPCCallFunction(self, method, args):
     """
       Check the arguments then call the RPC function
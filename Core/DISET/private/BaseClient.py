@@ -4,17 +4,21 @@
 
 __RCSID__ = "$Id$"
 
+import os
 import time
 import thread
+import itertools
+from hashlib import md5
 import DIRAC
 from DIRAC.Core.DISET.private.Protocols import gProtocolDict
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
-from DIRAC.Core.Utilities import List, Network
+from DIRAC.Core.Utilities import List, Network, DEncode
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
 from DIRAC.ConfigurationSystem.Client.PathFinder import getServiceURL, getServiceFailoverURL
 from DIRAC.Core.Security import CS
 from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+from DIRAC.Core.DISET.private.ConnectionPool import getGlobalConnectionPool
 from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
 
 
@@ -38,8 +42,11 @@ class BaseClient(object):
   KW_PROXY_CHAIN = "proxyChain"
   KW_SKIP_CA_CHECK = "skipCACheck"
   KW_KEEP_ALIVE_LAPSE = "keepAliveLapse"
+  KW_KEEP_CONNECTION = "keepConnection"
 
   __threadConfig = ThreadConfig()
+  # Identifies the proposals sent on a connection, so that answers can be matched
+  __requestCounter = itertools.count(1)
 
   def __init__(self, serviceName, **kwargs):
     """
@@ -57,6 +64,8 @@ class BaseClient(object):
       :param proxyChain: Specify the proxy chain
       :param skipCACheck: Do not check the CA
       :param keepAliveLapse: Duration for keepAliveLapse (heartbeat like)
+      :param keepConnection: Ask the service to keep the connection open for further calls
+                             (default /DIRAC/Connection/KeepConnection, True)
     """
 
     if not isinstance(serviceName, basestring):
@@ -80,6 +89,8 @@ class BaseClient(object):
     self.__nbOfRetry = 3  # by default we try try times
     self.__retryCounter = 1
     self.__bannedUrls = []
+    self.__keepConnection = self.kwargs.get(self.KW_KEEP_CONNECTION,
+                                            gConfig.getValue("/DIRAC/Connection/KeepConnection", True))
     for initFunc in (self.__discoverSetup, self.__discoverVO, self.__discoverTimeout,
                      self.__discoverURL, self.__discoverCredentialsToUse,
                      self.__checkTransportSanity,
@@ -496,6 +507,46 @@ and this is thread %s
     """
     getGlobalTransportPool().close(trid)
 
+  def _getConnectionKey(self):
+    """ Key identifying the connections that can be shared: same URL and same credentials
+    """
+    proxyString = self.kwargs.get(self.KW_PROXY_STRING)
+    if proxyString:
+      proxyString = md5(proxyString).hexdigest()
+    return (self.serviceURL,
+            tuple(sorted(self.__idDict.items())),
+            str(self.__extraCredentials),
+            bool(self.__useCertificates),
+            self.kwargs.get(self.KW_PROXY_LOCATION, os.environ.get('X509_USER_PROXY')),
+            proxyString,
+            bool(self.kwargs.get(self.KW_SKIP_CA_CHECK)))
+
+  def _getPooledConnection(self):
+    """ Get a connection kept open by a previous call, if any
+
+        :return: S_OK( ( trid, transport ) ) or S_ERROR if there is none to reuse
+    """
+    if not self.__keepConnection or not self.__initStatus['OK']:
+      return S_ERROR("No connection to reuse")
+    # Same checks as _connect, as they can change the credentials to use
+    if gConfig.useServerCertificate() != self.__useCertificates and self.__forceUseCertificates is None:
+      return S_ERROR("No connection to reuse")
+    self.__discoverExtraCredentials()
+    connection = getGlobalConnectionPool().get(self._getConnectionKey())
+    if not connection:
+      return S_ERROR("No connection to reuse")
+    gLogger.debug("Reusing connection to: %s" % self.serviceURL)
+    return S_OK(connection)
+
+  def _releaseConnection(self, trid, transport, idleTime):
+    """ Put a connection back in the pool for further calls
+
+        :param trid: Transport ID in the transportPool
+        :param transport: Transport object
+        :param idleTime: time the service keeps the connection while idle
+    """
+    getGlobalConnectionPool().put(self._getConnectionKey(), trid, transport, idleTime)
+
   def _proposeAction(self, transport, action):
     """ Proposes an action by sending a tuple containing
 
@@ -523,12 +574,24 @@ and this is thread %s
     stConnectionInfo = ((self.__URLTuple[3], self.setup, self.vo),
                         action,
                         self.__extraCredentials)
+    requestID = next(self.__requestCounter)
 
     # Send the connection info and get the answer back
-    retVal = transport.sendData(S_OK(stConnectionInfo))
+    # The supported DEncode versions are announced, old servers just ignore them
+    proposal = S_OK(stConnectionInfo)
+    proposal['DEncodeVersions'] = list(DEncode.DENCODE_VERSIONS)
+    # Same for asking to keep the connection open after the action
+    if self.__keepConnection and action[0] in ('RPC', 'RPCBatch'):
+      proposal['KeepConnection'] = True
+      proposal['RequestID'] = requestID
+    retVal = transport.sendData(proposal)
     if not retVal['OK']:
       return retVal
     serverReturn = transport.receiveData()
+    if 'RequestID' in serverReturn and serverReturn['RequestID'] != requestID:
+      return S_ERROR("Answer to request %s received for request %s" % (serverReturn['RequestID'], requestID))
+    if serverReturn.get('DEncodeVersion') in DEncode.DENCODE_VERSIONS:
+      transport.setDEncodeVersion(serverReturn['DEncodeVersion'])
 
     # TODO: Check if delegation is required. This seems to be used only for the GatewayService
     if serverReturn['OK'] and 'Value' in serverReturn and isinstance(serverReturn['Value'], dict):
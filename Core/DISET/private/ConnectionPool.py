@@ -0,0 +1,168 @@
+""" ConnectionPool keeps client transports open between RPC calls.
+
+    Once a service has accepted to keep a connection open (see Service._processInThread),
+    the transport is put back in the pool after the call instead of being closed.
+    The next call to the same URL with the same credentials reuses it, saving the
+    connection and the TLS handshake.
+
+    Transports are only used by one call at a time, and are evicted once they have been
+    idle for longer than what the service announced.
+
+    The pool belongs to the process that created it: a forked child gets a new one,
+    the sockets inherited from the parent are left to the parent.
+"""
+
+__RCSID__ = "$Id$"
+
+import os
+import time
+import select
+import threading
+
+from DIRAC import gLogger
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
+from DIRAC.Core.DISET.private.TransportPool import getGlobalTransportPool
+
+
+class ConnectionPool(object):
+  """ Pool of idle client transports, indexed by (URL, credentials) keys
+  """
+
+  # Seconds between two purges of the expired transports
+  purgePeriod = 5
+  # Maximum number of idle transports kept for a given key
+  maxIdlePerKey = 10
+
+  def __init__(self):
+    self.log = gLogger.getSubLogger("ConnectionPool")
+    self.__lock = threading.Lock()
+    # key -> list of ( expirationTime, trid, transport )
+    self.__idle = {}
+    self.__stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'released': 0}
+    self.__purgeTaskId = None
+    result = gThreadScheduler.addPeriodicTask(self.purgePeriod, self.purgeExpired)
+    if not result['OK']:
+      self.log.error("Cannot add task to thread scheduler", result['Message'])
+    else:
+      self.__purgeTaskId = result['Value']
+
+  @staticmethod
+  def __isUsable(transport):
+    """ An idle transport must not have anything to read. If it has, the service either
+        closed it (EOF) or sent something unexpected, so it can't be reused.
+    """
+    try:
+      sock = transport.getSocket()
+      if transport.byteStream:
+        return False
+      readable, _w, _e = select.select([sock], [], [], 0)
+      return not readable
+    except Exception:  # pylint: disable=broad-except
+      return False
+
+  def get(self, key):
+    """ Get an idle transport for the key
+
+        :param key: the (URL, credentials) key, see BaseClient._getConnectionKey
+        :return: ( trid, transport ) or None
+    """
+    now = time.time()
+    while True:
+      with self.__lock:
+        entries = self.__idle.get(key)
+        if not entries:
+          self.__stats['misses'] += 1
+          return None
+        expiration, trid, transport = entries.pop()
+        if not entries:
+          del self.__idle[key]
+      if expiration > now and self.__isUsable(transport):
+        with self.__lock:
+          self.__stats['hits'] += 1
+        return (trid, transport)
+      with self.__lock:
+        self.__stats['stale'] += 1
+      getGlobalTransportPool().close(trid)
+
+  def put(self, key, trid, transport, idleTime):
+    """ Give back a transport after a successful call
+
+        :param key: the (URL, credentials) key
+        :param trid: transport id in the global TransportPool
+        :param transport: the transport object
+        :param idleTime: seconds the service keeps the connection open while idle
+    """
+    # Keep a margin to avoid reusing a connection the service is just closing
+    expiration = time.time() + max(0, idleTime - 1)
+    with self.__lock:
+      entries = self.__idle.setdefault(key, [])
+      if len(entries) < self.maxIdlePerKey:
+        entries.append((expiration, trid, transport))
+        self.__stats['released'] += 1
+        return
+    getGlobalTransportPool().close(trid)
+
+  def purgeExpired(self):
+    """ Close the transports that have been idle for too long
+    """
+    now = time.time()
+    toClose = []
+    with self.__lock:
+      for key in list(self.__idle):
+        entries = self.__idle[key]
+        alive = [entry for entry in entries if entry[0] > now]
+        toClose.extend(entry[1] for entry in entries if entry[0] <= now)
+        if alive:
+          self.__idle[key] = alive
+        else:
+          del self.__idle[key]
+      self.__stats['evictions'] += len(toClose)
+    for trid in toClose:
+      getGlobalTransportPool().close(trid)
+
+  def closeAll(self):
+    """ Close all the idle transports
+    """
+    with self.__lock:
+      toClose = [entry[1] for entries in self.__idle.itervalues() for entry in entries]
+      self.__idle = {}
+    for trid in toClose:
+      getGlobalTransportPool().close(trid)
+
+  def abandon(self):
+    """ Forget the idle transports without closing them, and stop purging them.
+        Used in a forked process, where the transports are still used by the parent.
+    """
+    if self.__purgeTaskId:
+      gThreadScheduler.removeTask(self.__purgeTaskId)
+      self.__purgeTaskId = None
+    with self.__lock:
+      self.__idle = {}
+
+  def getStats(self):
+    """ Get the pool counters
+
+        :return: dict with hits, misses, stale (idle transports found unusable),
+                 evictions, released (transports put back) and idle (currently pooled)
+    """
+    with self.__lock:
+      stats = dict(self.__stats)
+      stats['idle'] = sum(len(entries) for entries in self.__idle.itervalues())
+    return stats
+
+
+gConnectionPool = None
+gConnectionPoolPid = None
+
+
+def getGlobalConnectionPool():
+  global gConnectionPool
+  global gConnectionPoolPid
+  if gConnectionPool and gConnectionPoolPid != os.getpid():
+    # Forked: the pooled transports are the parent's ones
+    gConnectionPool.abandon()
+    gConnectionPool = None
+  if not gConnectionPool:
+    gConnectionPool = ConnectionPool()
+    gConnectionPoolPid = os.getpid()
+  return gConnectionPool
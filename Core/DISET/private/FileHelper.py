@@ -2,6 +2,7 @@ __RCSID__ = "$Id$"
 
 import os
 import hashlib
+import itertools
 import threading
 import cStringIO
 import tarfile
@@ -260,6 +261,41 @@ class FileHelper(object):
     self.__fileBytes = sentBytes
     return S_OK()
 
+  def iterableToNetwork( self, dataIterable ):
+    """ Send the strings produced by an iterable ( e.g. a generator formatting DB rows
+        as they are read ) to the DISET client, grouped in packets of packetSize bytes,
+        without building the whole data in memory
+    """
+    self.__oMD5 = hashlib.md5()
+    iPacketSize = self.packetSize
+    self.__fileBytes = 0
+    sentBytes = 0
+    try:
+      bufferList = []
+      bufferSize = 0
+      for sData in itertools.chain( dataIterable, [ None ] ):
+        if sData:
+          bufferList.append( sData )
+          bufferSize += len( sData )
+        if not bufferSize or ( sData is not None and bufferSize < iPacketSize ):
+          continue
+        sBuffer = "".join( bufferList )
+        bufferList = []
+        bufferSize = 0
+        dRetVal = self.sendData( sBuffer )
+        if not dRetVal[ 'OK' ]:
+          return dRetVal
+        if 'AbortTransfer' in dRetVal and dRetVal[ 'AbortTransfer' ]:
+          self.__log.verbose( "Transfer aborted" )
+          return S_OK()
+        sentBytes += len( sBuffer )
+      self.sendEOF()
+    except Exception as e:
+      gLogger.exception( "Error while sending data" )
+      return S_ERROR( "Error while sending data: %s" % str( e ) )
+    self.__fileBytes = sentBytes
+    return S_OK()
+
   def getFileDescriptor( self, uFile, sFileMode ):
     closeAfter = True
     if isinstance( uFile, basestring ):
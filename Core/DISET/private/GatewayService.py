@@ -224,6 +224,9 @@ class GatewayService(Service):
     elif actionType == "RPC":
       gLogger.info("Forwarding %s/%s action to %s for %s" % (actionType, actionMethod, targetService, idString))
       retVal = self.__forwardRPCCall(targetService, clientInitArgs, actionMethod, retVal['Value'])
+    elif actionType == "RPCBatch":
+      gLogger.info("Forwarding %s/%s action to %s for %s" % (actionType, actionMethod, targetService, idString))
+      retVal = RPCClient(targetService, **clientInitArgs).executeRPCBatch(retVal['Value'])
     elif actionType == "Connection" and actionMethod == "new":
       gLogger.info("Initiating a messaging connection to %s for %s" % (targetService, idString))
       retVal = self._msgForwarder.addClient(trid, targetService, clientInitArgs, retVal['Value'])
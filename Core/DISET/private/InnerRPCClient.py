@@ -11,11 +11,11 @@ class InnerRPCClient( BaseClient ):
   """ This class instruments the BaseClient to perform RPC calls.
       At every RPC call, this class:
 
-        * connects
+        * connects, or reuses a connection kept open by a previous call
         * proposes the action
         * sends the method parameters
         * retrieve the result
-        * disconnect
+        * disconnect, or gives the connection back to the pool if the service agreed to keep it
   """
 
   # Number of times we retry the call.
@@ -33,30 +33,63 @@ class InnerRPCClient( BaseClient ):
 
 
     """
-    retVal = self._connect()
-
     # Generate the stub which contains all the connection and call options
     stub = ( self._getBaseStub(), functionName, args )
+    return self.__executeAction( ( "RPC", functionName ), args, stub )
+
+  def executeRPCBatch( self, calls ):
+    """ Perform several RPC calls in a single round trip.
+        The service executes them in order, checking the authorization of each of them.
+
+        :param calls: list of ( functionName, args ) tuples
+
+        :return: S_OK( list with the S_OK/S_ERROR of each call ), or S_ERROR if the batch
+                 as a whole could not be executed. The stub replays the whole batch.
+    """
+    calls = [ ( functionName, tuple( args ) ) for functionName, args in calls ]
+    stub = ( self._getBaseStub(), "executeRPCBatch", ( calls, ) )
+    return self.__executeAction( ( "RPCBatch", "batch" ), calls, stub )
+
+  def __executeAction( self, actionTuple, args, stub ):
+    """ Connect, propose the action, send the arguments and get the result back
+
+        :param actionTuple: ( actionType, actionName ) to propose
+        :param args: what to send once the action is accepted
+        :param stub: call stub added to the result
+    """
+    # Reuse a connection kept open by a previous call if there is one
+    retVal = self._getPooledConnection()
+    reusedConnection = retVal[ 'OK' ]
+    if not reusedConnection:
+      retVal = self._connect()
+
     if not retVal[ 'OK' ]:
       retVal[ 'rpcStub' ] = stub
       return retVal
     # Get the transport connection ID as well as the Transport object
     trid, transport = retVal[ 'Value' ]
+    keepConnection = False
     try:
-      # Handshake to perform the RPC call for functionName
-      retVal = self._proposeAction( transport, ( "RPC", functionName ) )
+      # Handshake to perform the action
+      retVal = self._proposeAction( transport, actionTuple )
       if not retVal['OK']:
+        if reusedConnection and not cmpError( retVal, ENOAUTH ):
+          # The service dropped the connection while it was idle, go for a new one
+          return self.__executeAction( actionTuple, args, stub )
         if cmpError( retVal, ENOAUTH ):  # This query is unauthorized
           retVal[ 'rpcStub' ] = stub
           return retVal
         else:  # we have network problem or the service is not responding
           if self.__retry < 3:
             self.__retry += 1
-            return self.executeRPC( functionName, args )
+            return self.__executeAction( actionTuple, args, stub )
           else:
             retVal[ 'rpcStub' ] = stub
             return retVal
 
+      # The service tells for how long it keeps the connection open if it accepted to
+      idleTime = retVal.get( 'KeepConnection', 0 )
+
       # Send the arguments to the function
       retVal = transport.sendData( S_OK( args ) )
       if not retVal[ 'OK' ]:
@@ -65,7 +98,12 @@ class InnerRPCClient( BaseClient ):
       # Get the result of the call and append the stub to it
       receivedData = transport.receiveData()
       if isinstance( receivedData, dict ):
+        # An error may come from the connection itself, do not risk reusing it then
+        keepConnection = idleTime and receivedData.get( 'OK' )
         receivedData[ 'rpcStub' ] = stub
       return receivedData
     finally:
-      self._disconnect( trid )
+      if keepConnection:
+        self._releaseConnection( trid, transport, idleTime )
+      else:
+        self._disconnect( trid )
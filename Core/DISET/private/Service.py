@@ -10,6 +10,7 @@
 
 import os
 import time
+import select
 import threading
 
 import DIRAC
@@ -36,7 +37,8 @@ class Service( object ):
   SVC_VALID_ACTIONS = { 'RPC' : 'export',
                         'FileTransfer': 'transfer',
                         'Message' : 'msg',
-                        'Connection' : 'Message' }
+                        'Connection' : 'Message',
+                        'RPCBatch' : 'RPC' }
   SVC_SECLOG_CLIENT = SecurityLogClient()
 
   def __init__( self, serviceData ):
@@ -70,6 +72,9 @@ class Service( object ):
     self._transportPool = getGlobalTransportPool()
     self.__cloneId = 0
     self.__maxFD = 0
+    #Transports kept open to serve several RPCs
+    self.__persistentLock = threading.Lock()
+    self.__persistentTrids = set()
 
   def setCloneProcessId( self, cloneId ):
     self.__cloneId = cloneId
@@ -106,6 +111,7 @@ class Service( object ):
                               'URL' : self._cfg.getURL(),
                               'messageSender' : MessageSender( self._name, self._msgBroker ),
                               'validNames' : self._validNames,
+                              'actionAuthorizer' : self._authorizeProposal,
                               'csPaths' : [ PathFinder.getServiceSection( svcName ) for svcName in self._validNames ]
                             }
     #Call static initialization function
@@ -310,6 +316,8 @@ class Service( object ):
       and call RequestHandler._rh_executeAction()
     - Receive arguments/file/something else (depending on action) in the RequestHandler
     - Executing the action asked by the client
+    - If the client asked to keep the connection open and there is a free slot,
+      wait for the next proposal on the same connection (see _serveProposal)
 
     :param clientTransport: Object who describe the opened connection (SSLTransport or PlainTransport)
 
@@ -336,20 +344,16 @@ class Service( object ):
       trid = self._transportPool.add( clientTransport )
       if not trid:
         return
-      #Receive and check proposal
-      result = self._receiveAndCheckProposal( trid )
-      if not result[ 'OK' ]:
-        self._transportPool.sendAndClose( trid, result )
-        return
-      proposalTuple = result[ 'Value' ]
-      #Instantiate handler
-      result = self._instantiateHandler( trid, proposalTuple )
-      if not result[ 'OK' ]:
-        self._transportPool.sendAndClose( trid, result )
+      result = self._serveProposal( trid )
+      #Serve the next proposals if the client asked to keep the connection open
+      while result and not result[ 'closeTransport' ] and result[ 'OK' ] and trid in self.__persistentTrids:
+        if not self.__waitForNextProposal( trid ):
+          result[ 'closeTransport' ] = True
+          break
+        result = self._serveProposal( trid )
+      #Rejected proposal, already answered and closed
+      if not result:
         return
-      handlerObj = result[ 'Value' ]
-      #Execute the action
-      result = self._processProposal( trid, proposalTuple, handlerObj )
       #Close the connection if required
       if result[ 'closeTransport' ] or not result[ 'OK' ]:
         if not result[ 'OK' ]:
@@ -357,10 +361,85 @@ class Service( object ):
         self._transportPool.close( trid )
       return result
     finally:
+      self.__releasePersistentConnection( clientTransport )
       self._lockManager.unlockGlobal()
       if monReport:
         self.__endReportToMonitoring( *monReport )
 
+  def _serveProposal( self, trid ):
+    """
+    Receive a proposal, instantiate the handler and execute the action
+
+    :param trid: transport id
+    :return: S_OK/S_ERROR with "closeTransport", None if the proposal was rejected:
+             the error is sent to the client and the connection closed
+    """
+    self._monitor.addMark( "Queries" )
+    #Receive and check proposal
+    result = self._receiveAndCheckProposal( trid )
+    if not result[ 'OK' ]:
+      self._transportPool.sendAndClose( trid, result )
+      return None
+    proposalTuple = result[ 'Value' ]
+    #Instantiate handler
+    result = self._instantiateHandler( trid, proposalTuple )
+    if not result[ 'OK' ]:
+      self._transportPool.sendAndClose( trid, result )
+      return None
+    handlerObj = result[ 'Value' ]
+    #Execute the action
+    return self._processProposal( trid, proposalTuple, handlerObj )
+
+  def __grantPersistentConnection( self, trid ):
+    """
+    Accept to keep a connection open after the RPC if there are free slots.
+    Each persistent connection holds a thread while it waits for the next proposal.
+    """
+    with self.__persistentLock:
+      if trid in self.__persistentTrids:
+        return True
+      if len( self.__persistentTrids ) >= self._cfg.getMaxPersistentConnections():
+        return False
+      self.__persistentTrids.add( trid )
+      return True
+
+  def __releasePersistentConnection( self, clientTransport ):
+    """
+    Free the persistent connection slot, if any, once the connection is closed
+    """
+    with self.__persistentLock:
+      for trid in list( self.__persistentTrids ):
+        if self._transportPool.get( trid ) in ( None, clientTransport ):
+          self.__persistentTrids.discard( trid )
+
+  def __waitForNextProposal( self, trid ):
+    """
+    Wait for the client to send a new proposal on a persistent connection
+
+    :return: True if there is something to read, False if the connection was idle for too long
+    """
+    clientTransport = self._transportPool.get( trid )
+    if not clientTransport:
+      return False
+    if clientTransport.byteStream:
+      return True
+    sock = clientTransport.getSocket()
+    # SSL connections may hold already decrypted data
+    if hasattr( sock, 'pending' ) and sock.pending():
+      return True
+    try:
+      readable, _w, _e = select.select( [ sock ], [], [], self._cfg.getPersistentConnectionIdleTime() )
+    except Exception:
+      return False
+    if not readable:
+      return False
+    #Readable also means the client closed the connection, read now to tell the difference
+    result = clientTransport._read( 16384, skipReadyCheck = True )
+    if not result[ 'OK' ] or not result[ 'Value' ]:
+      return False
+    clientTransport.byteStream += result[ 'Value' ]
+    return True
+
 
   def _createIdentityString( self, credDict, clientTransport = None ):
     if 'username' in credDict:
@@ -391,6 +470,10 @@ class Service( object ):
       return S_ERROR( "Invalid action proposal" )
     proposalTuple = retVal[ 'Value' ]
     gLogger.debug( "Received action from client", "/".join( list( proposalTuple[1] ) ) )
+    #Negotiate the wire encoding. Old clients do not announce anything and stay in version 1
+    clientVersions = [ v for v in retVal.get( 'DEncodeVersions', [] ) if v <= self._cfg.getMaxDEncodeVersion() ]
+    if clientVersions:
+      clientTransport.setDEncodeVersion( max( clientVersions ) )
     #Check if there are extra credentials
     if proposalTuple[2]:
       clientTransport.setExtraCredentials( proposalTuple[2] )
@@ -406,6 +489,15 @@ class Service( object ):
     result = self._authorizeProposal( proposalTuple[1], trid, credDict )
     if not result[ 'OK' ]:
       return result
+    #Check if the client wants the connection to be kept open for further RPCs
+    keepConnection = False
+    if retVal.get( 'KeepConnection' ) and requestedActionType in ( 'RPC', 'RPCBatch' ):
+      keepConnection = self.__grantPersistentConnection( trid )
+    elif trid in self.__persistentTrids:
+      with self.__persistentLock:
+        self.__persistentTrids.discard( trid )
+    self._transportPool.associateData( trid, 'keepConnection', keepConnection )
+    self._transportPool.associateData( trid, 'requestID', retVal.get( 'RequestID' ) )
     #Proposal is OK
     return S_OK( proposalTuple )
 
@@ -487,8 +579,17 @@ class Service( object ):
     return S_OK( handlerInstance )
 
   def _processProposal( self, trid, proposalTuple, handlerObj ):
-    #Notify the client we're ready to execute the action
-    retVal = self._transportPool.send( trid, S_OK() )
+    #Notify the client we're ready to execute the action, and with which encoding
+    readyMsg = S_OK()
+    clientTransport = self._transportPool.get( trid )
+    if clientTransport and clientTransport.getDEncodeVersion() > 1:
+      readyMsg[ 'DEncodeVersion' ] = clientTransport.getDEncodeVersion()
+    keepConnection = self._transportPool.getAssociatedData( trid, 'keepConnection' )
+    if keepConnection:
+      readyMsg[ 'KeepConnection' ] = self._cfg.getPersistentConnectionIdleTime()
+    if self._transportPool.getAssociatedData( trid, 'requestID' ) is not None:
+      readyMsg[ 'RequestID' ] = self._transportPool.getAssociatedData( trid, 'requestID' )
+    retVal = self._transportPool.send( trid, readyMsg )
     if not retVal[ 'OK' ]:
       return retVal
 
@@ -516,7 +617,7 @@ class Service( object ):
       if not result[ 'OK' ]:
         self._msgBroker.removeTransport( trid )
 
-    result[ 'closeTransport' ] = not messageConnection or not result[ 'OK' ]
+    result[ 'closeTransport' ] = not ( messageConnection or keepConnection ) or not result[ 'OK' ]
     return result
 
   def _mbConnect( self, trid, handlerObj = None ):
@@ -555,7 +656,6 @@ class Service( object ):
 
 
   def __startReportToMonitoring( self ):
-    self._monitor.addMark( "Queries" )
     now = time.time()
     stats = os.times()
     cpuTime = stats[0] + stats[2]
@@ -80,6 +80,24 @@ class ServiceConfiguration:
     except:
       return 15
 
+  def getMaxPersistentConnections( self ):
+    try:
+      return int( self.getOption( "MaxPersistentConnections" ) )
+    except:
+      return self.getMaxThreads() // 2
+
+  def getPersistentConnectionIdleTime( self ):
+    try:
+      return int( self.getOption( "PersistentConnectionIdleTime" ) )
+    except:
+      return 5
+
+  def getMaxDEncodeVersion( self ):
+    try:
+      return int( self.getOption( "MaxDEncodeVersion" ) )
+    except:
+      return 2
+
   def getCloneProcesses( self ):
     try:
       return int( self.getOption( "CloneProcesses" ) )
@@ -58,6 +58,8 @@ class BaseTransport(object):
     self.waitingForKeepAlivePong = False
     self.__keepAliveLapse = 0
     self.oSocket = None
+    # Wire version used to encode outgoing data. Incoming data is always autodetected
+    self.__dEncodeVersion = 1
     if 'keepAliveLapse' in kwargs:
       try:
         self.__keepAliveLapse = max(150, int(kwargs['keepAliveLapse']))
@@ -76,6 +78,20 @@ class BaseTransport(object):
   def getKeepAliveLapse(self):
     return self.__keepAliveLapse
 
+  def setDEncodeVersion(self, version):
+    """ Select the DEncode wire version used to send data.
+        It is negotiated at proposal time, see BaseClient._proposeAction
+
+        :param int version: one of DEncode.DENCODE_VERSIONS
+    """
+    if version not in DEncode.DENCODE_VERSIONS:
+      return S_ERROR("Unknown DEncode version %s" % version)
+    self.__dEncodeVersion = version
+    return S_OK()
+
+  def getDEncodeVersion(self):
+    return self.__dEncodeVersion
+
   def handshake(self):
     """ This method is overwritten by SSLTransport if we use a secured transport.
     """
@@ -159,7 +175,7 @@ class BaseTransport(object):
 
   def sendData(self, uData, prefix=False):
     self.__updateLastActionTimestamp()
-    sCodedData = DEncode.encode(uData)
+    sCodedData = DEncode.encodeVersion(uData, self.__dEncodeVersion)
     if prefix:
       dataToSend = "%s%s:%s" % (prefix, len(sCodedData), sCodedData)
     else:
@@ -250,7 +266,7 @@ class BaseTransport(object):
           data = pkgMem.read(pkgSize)
           self.byteStream = pkgMem.read()
       try:
-        data = DEncode.decode(data)[0]
+        data = DEncode.decodeAny(data)[0]
       except Exception as e:
         return S_ERROR("Could not decode received data: %s" % str(e))
       if idleReceive:
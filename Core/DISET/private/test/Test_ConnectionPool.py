@@ -0,0 +1,107 @@
+""" Unit tests for the client ConnectionPool
+"""
+
+# pylint: disable=protected-access
+
+import socket
+import time
+
+from mock import MagicMock, patch
+
+from DIRAC.Core.DISET.private import ConnectionPool as moduleTested
+from DIRAC.Core.DISET.private.ConnectionPool import ConnectionPool
+
+
+class FakeTransport(object):
+  """ Minimal transport: a socket pair, of which we keep one end """
+
+  def __init__(self):
+    self.sock, self.peer = socket.socketpair()
+    self.byteStream = ""
+
+  def getSocket(self):
+    return self.sock
+
+
+def getPool():
+  """ Pool with a mocked transport pool, returned as well """
+  trPool = MagicMock()
+  with patch('DIRAC.Core.DISET.private.ConnectionPool.gThreadScheduler'):
+    pool = ConnectionPool()
+  return pool, trPool
+
+
+def test_hitAndMiss():
+  """ A released transport is given back for the same key only """
+  pool, trPool = getPool()
+  tr = FakeTransport()
+  with patch('DIRAC.Core.DISET.private.ConnectionPool.getGlobalTransportPool', return_value=trPool):
+    assert pool.get('key') is None
+    pool.put('key', 'trid', tr, 10)
+    assert pool.get('otherKey') is None
+    assert pool.get('key') == ('trid', tr)
+    # It is not in the pool any more while in use
+    assert pool.get('key') is None
+  stats = pool.getStats()
+  assert stats['hits'] == 1
+  assert stats['misses'] == 3
+  assert stats['idle'] == 0
+
+
+def test_staleTransport():
+  """ A transport closed by the service is not reused but closed """
+  pool, trPool = getPool()
+  tr = FakeTransport()
+  tr.peer.close()
+  with patch('DIRAC.Core.DISET.private.ConnectionPool.getGlobalTransportPool', return_value=trPool):
+    pool.put('key', 'trid', tr, 10)
+    assert pool.get('key') is None
+  trPool.close.assert_called_once_with('trid')
+  assert pool.getStats()['stale'] == 1
+
+
+def test_purgeExpired():
+  """ Idle transports are closed after the time the service keeps them """
+  pool, trPool = getPool()
+  with patch('DIRAC.Core.DISET.private.ConnectionPool.getGlobalTransportPool', return_value=trPool):
+    pool.put('key', 'trid1', FakeTransport(), 0)
+    pool.put('key', 'trid2', FakeTransport(), 100)
+    time.sleep(0.01)
+    pool.purgeExpired()
+    trPool.close.assert_called_once_with('trid1')
+    assert pool.getStats()['idle'] == 1
+    assert pool.getStats()['evictions'] == 1
+    pool.closeAll()
+  assert pool.getStats()['idle'] == 0
+
+
+def test_maxIdlePerKey():
+  """ Extra transports beyond maxIdlePerKey are closed """
+  pool, trPool = getPool()
+  pool.maxIdlePerKey = 1
+  with patch('DIRAC.Core.DISET.private.ConnectionPool.getGlobalTransportPool', return_value=trPool):
+    pool.put('key', 'trid1', FakeTransport(), 10)
+    pool.put('key', 'trid2', FakeTransport(), 10)
+  trPool.close.assert_called_once_with('trid2')
+
+
+def test_fork(monkeypatch):
+  """ A forked process gets its own pool, the parent's transports are not closed """
+  monkeypatch.setattr(moduleTested, 'gConnectionPool', None)
+  monkeypatch.setattr(moduleTested, 'gConnectionPoolPid', None)
+  trPool = MagicMock()
+  with patch('DIRAC.Core.DISET.private.ConnectionPool.gThreadScheduler') as scheduler, \
+          patch('DIRAC.Core.DISET.private.ConnectionPool.getGlobalTransportPool', return_value=trPool):
+    scheduler.addPeriodicTask.return_value = {'OK': True, 'Value': 'purgeTask'}
+    parentPool = moduleTested.getGlobalConnectionPool()
+    parentPool.put('key', 'trid', FakeTransport(), 10)
+    assert moduleTested.getGlobalConnectionPool() is parentPool
+
+    with patch('DIRAC.Core.DISET.private.ConnectionPool.os.getpid', return_value=-1):
+      childPool = moduleTested.getGlobalConnectionPool()
+      assert childPool is not parentPool
+      assert childPool.get('key') is None
+      assert moduleTested.getGlobalConnectionPool() is childPool
+    scheduler.removeTask.assert_called_once_with('purgeTask')
+  assert not trPool.close.called
+  assert parentPool.getStats()['idle'] == 0
@@ -0,0 +1,50 @@
+""" Test the streaming of data to the DISET clients """
+
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.Core.DISET.private.FileHelper import FileHelper
+
+__RCSID__ = "$Id$"
+
+
+def getFileHelper(packetSize):
+  transport = MagicMock()
+  transport.sendData.return_value = S_OK()
+  transport.receiveData.return_value = S_OK()
+  fileHelper = FileHelper(transport)
+  fileHelper.setDirection("toClient")
+  fileHelper.packetSize = packetSize
+  return fileHelper, transport
+
+
+def sentPackets(transport):
+  return [call[0][0]['Value'] for call in transport.sendData.call_args_list]
+
+
+def test_iterableToNetwork():
+  fileHelper, transport = getFileHelper(10)
+  data = ("line%d\n" % i for i in xrange(5))
+  assert fileHelper.iterableToNetwork(data)['OK']
+  packets = sentPackets(transport)
+  # Data packets are grouped up to the packet size, then the EOF with the checksum
+  assert [packet[0] for packet in packets] == [True, True, True, False]
+  assert "".join(packet[1] for packet in packets[:-1]) == "".join("line%d\n" % i for i in xrange(5))
+  assert packets[-1][1] == fileHelper.getHash()
+  assert fileHelper.getTransferedBytes() == 30
+  assert fileHelper.finishedTransmission()
+
+
+def test_iterableToNetworkErrors():
+  fileHelper, transport = getFileHelper(10)
+  assert fileHelper.iterableToNetwork([])['OK']
+  assert sentPackets(transport) == [(False, fileHelper.getHash())]
+
+  def failing():
+    yield "some data"
+    raise RuntimeError("DB gone")
+
+  fileHelper, transport = getFileHelper(10)
+  result = fileHelper.iterableToNetwork(failing())
+  assert not result['OK']
+  assert "DB gone" in result['Message']
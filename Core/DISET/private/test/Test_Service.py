@@ -0,0 +1,85 @@
+""" Unit tests for the persistent connections of the Service
+"""
+
+# pylint: disable=protected-access
+
+import socket
+import threading
+
+from mock import MagicMock, patch
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.DISET.private.Service import Service
+
+
+class FakeTransport(object):
+  """ Transport reading from one end of a socket pair, as M2SSLTransport does """
+
+  def __init__(self):
+    self.sock, self.peer = socket.socketpair()
+    self.byteStream = ""
+
+  def getSocket(self):
+    return self.sock
+
+  def _read(self, bufSize=4096, skipReadyCheck=False):
+    return S_OK(self.sock.recv(bufSize))
+
+
+def getService(transport):
+  """ Service waiting for the proposals of a single transport """
+  service = Service.__new__(Service)
+  service._transportPool = MagicMock()
+  service._transportPool.get.return_value = transport
+  service._cfg = MagicMock()
+  service._cfg.getPersistentConnectionIdleTime.return_value = 1
+  service._monitor = MagicMock()
+  return service
+
+
+def test_waitForNextProposal():
+  transport = FakeTransport()
+  service = getService(transport)
+
+  transport.peer.sendall("12:next proposal")
+  assert service._Service__waitForNextProposal(1)
+  assert transport.byteStream == "12:next proposal"
+
+  # Nothing to wait for while data is buffered
+  assert service._Service__waitForNextProposal(1)
+
+  # The client closed the connection
+  transport.byteStream = ""
+  transport.peer.close()
+  assert not service._Service__waitForNextProposal(1)
+
+
+def test_queriesMark():
+  """ The queries are counted once per proposal, not per connection """
+  service = getService(FakeTransport())
+  service._receiveAndCheckProposal = MagicMock(return_value=S_ERROR('Invalid proposal'))
+  for _ in range(3):
+    assert service._serveProposal(1) is None
+  assert [call[0] for call in service._monitor.addMark.call_args_list] == [("Queries",)] * 3
+
+
+@patch('DIRAC.Core.DISET.private.Service.gLogger')
+def test_rejectedProposal(logger):
+  """ A rejected proposal is answered and the connection closed, without logging an error """
+  transport = FakeTransport()
+  transport.oSocket = transport.sock
+  transport.handshake = MagicMock(return_value=S_OK())
+  service = getService(transport)
+  service._lockManager = MagicMock()
+  service._Service__maxFD = 0
+  service._Service__persistentLock = threading.Lock()
+  service._Service__persistentTrids = set()
+  service._Service__startReportToMonitoring = MagicMock(return_value=False)
+  service._transportPool.add.return_value = 1
+  rejection = S_ERROR('Unauthorized query')
+  service._receiveAndCheckProposal = MagicMock(return_value=rejection)
+
+  assert service._processInThread(transport) is None
+  service._transportPool.sendAndClose.assert_called_once_with(1, rejection)
+  assert not service._transportPool.close.called
+  assert not logger.error.called
@@ -0,0 +1,45 @@
+""" Unit tests for the client side of RPC batches
+"""
+
+# pylint: disable=protected-access
+
+from mock import MagicMock
+
+from DIRAC import S_OK
+from DIRAC.Core.DISET.RPCClient import RPCBatch
+
+
+def test_batchQueuesCalls():
+  """ Calls are queued in order and sent at once when leaving the context """
+  inner = MagicMock()
+  inner.executeRPCBatch.return_value = S_OK([S_OK(1), S_OK(2)])
+  with RPCBatch(inner) as batch:
+    assert batch.setJobStatus(1, 'Running') == 0
+    assert batch.setJobParameter(1, 'Par', 'Val') == 1
+    assert len(batch) == 2
+    inner.executeRPCBatch.assert_not_called()
+  inner.executeRPCBatch.assert_called_once_with([('setJobStatus', (1, 'Running')),
+                                                  ('setJobParameter', (1, 'Par', 'Val'))])
+  assert batch.result['Value'] == [S_OK(1), S_OK(2)]
+  assert not len(batch)
+
+
+def test_emptyBatch():
+  """ Nothing is sent for an empty batch """
+  inner = MagicMock()
+  batch = RPCBatch(inner)
+  assert batch.execute() == S_OK([])
+  inner.executeRPCBatch.assert_not_called()
+
+
+def test_exceptionInContext():
+  """ The batch is not sent if the context exits with an exception """
+  inner = MagicMock()
+  try:
+    with RPCBatch(inner) as batch:
+      batch.setJobStatus(1, 'Running')
+      raise RuntimeError()
+  except RuntimeError:
+    pass
+  inner.executeRPCBatch.assert_not_called()
+  assert batch.result is None
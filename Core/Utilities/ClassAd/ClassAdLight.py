@@ -3,98 +3,92 @@
 """
 
 from __future__ import print_function
-__RCSID__ = "$Id$"
 
+import re
 
-class ClassAd(object):
+from DIRAC.Core.Utilities.DictCache import DictCache
 
-  def __init__(self, jdl):
-    """ClassAd constructor from a JDL string
-    """
-    self.contents = {}
-    result = self.__analyse_jdl(jdl)
-    if result:
-      self.contents = result
-
-  def __analyse_jdl(self, jdl, index=0):
-    """Analyse one [] jdl enclosure
-    """
+__RCSID__ = "$Id$"
 
-    jdl = jdl.strip()
-
-    # Strip all the blanks first
-    # temp = jdl.replace(' ','').replace('\n','')
-    temp = jdl
-
-    result = {}
-
-    if temp[0] != '[' or temp[-1] != ']':
-      print("Invalid JDL: it should start with [ and end with ]")
-      return result
-
-    # Parse the jdl string now
-    body = temp[1:-1]
-    index = 0
-    namemode = 1
-    valuemode = 0
-    while index < len(body):
-      if namemode:
-        ind = body.find("=", index)
-        if ind != -1:
-          name = body[index:ind]
-          index = ind + 1
-          valuemode = 1
-          namemode = 0
-        else:
-          break
-      elif valuemode:
-        ind1 = body.find("[", index)
-        ind2 = body.find(";", index)
-        if ind1 != -1 and ind1 < ind2:
-          value, newind = self.__find_subjdl(body, ind1)
-        elif ind1 == -1 and ind2 == -1:
-          value = body[index:]
-          newind = len(body)
-        else:
-          if index == ind2:
-            return {}
-          else:
-            value = body[index:ind2]
-            newind = ind2 + 1
+# Tokens delimiting an attribute value: quoted strings, brackets and separators
+_VALUE_TOKENS = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"?|[\[\];]')
+
+# Parsed JDLs, keyed by the JDL string; a JDL is parsed the same way as long as the process lives
+_parsedJDLs = DictCache(maxSize=1000)
+PARSED_JDL_VALIDITY = 86400
+
+
+def _valueEnd(body, index):
+  """ End of the value starting at index: the first ; outside of the quoted strings and of the [] enclosures
+  """
+  depth = 0
+  for token in _VALUE_TOKENS.finditer(body, index):
+    separator = token.group()
+    if separator == '[':
+      depth += 1
+    elif separator == ']':
+      depth -= 1
+    elif separator == ';' and depth <= 0:
+      return token.start()
+  return len(body)
+
+
+def parseJDL(jdl):
+  """ Parse a JDL string in one pass
+
+  :param str jdl: JDL, a [] enclosure of "name = value;" statements
+  :return: tuple of (name, value) pairs, empty if the JDL is not valid
+  """
+  jdl = jdl.strip()
+  if jdl[:1] != '[' or jdl[-1:] != ']':
+    print("Invalid JDL: it should start with [ and end with ]")
+    return ()
+
+  body = jdl[1:-1]
+  length = len(body)
+  attributes = []
+  index = 0
+  while index < length:
+    equal = body.find('=', index)
+    if equal == -1:
+      break
+    start = equal + 1
+    end = body.find(';', start)
+    if end == -1:
+      end = length
+    value = body[start:end]
+    if '[' in value or '\\' in value or value.count('"') % 2:
+      # A [] enclosure, or a ; that may be in a quoted string
+      end = _valueEnd(body, start)
+      value = body[start:end]
+    elif not value and end < length:
+      # name = ;
+      return ()
+    attributes.append((body[index:equal].strip(), value.strip().replace('\n', '')))
+    index = end + 1
+  return tuple(attributes)
+
+
+def getParsedJDL(jdl):
+  """ Parsed JDL, from the cache if the same JDL was already parsed
+
+  :param str jdl: JDL string
+  :return: tuple of (name, value) pairs, as returned by parseJDL()
+  """
+  attributes = _parsedJDLs.get(jdl)
+  if attributes is None:
+    attributes = parseJDL(jdl)
+    if attributes:
+      _parsedJDLs.add(jdl, PARSED_JDL_VALIDITY, attributes)
+  return attributes
 
-        result[name.strip()] = value.strip().replace('\n', '')
-        index = newind
-        valuemode = 0
-        namemode = 1
 
-    return result
+class ClassAd(object):
 
-  def __find_subjdl(self, body, index):
-    """ Find a full [] enclosure starting from index
+  def __init__(self, jdl):
+    """ClassAd constructor from a JDL string
     """
-    result = ''
-    if body[index] != '[':
-      return (result, 0)
-
-    depth = 0
-    ind = index
-    while depth < 10:
-      ind1 = body.find(']', ind + 1)
-      ind2 = body.find('[', ind + 1)
-      if ind2 != -1 and ind2 < ind1:
-        depth += 1
-        ind = ind2
-      else:
-        if depth > 0:
-          depth -= 1
-          ind = ind1
-        else:
-          result = body[index:ind1 + 1]
-          if body[ind1 + 1] == ";":
-            return (result, ind1 + 2)
-          return result, 0
-
-    return result, 0
+    self.contents = dict(getParsedJDL(jdl))
 
   def insertAttributeInt(self, name, attribute):
     """Insert a named integer attribute
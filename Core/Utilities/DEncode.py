@@ -11,6 +11,10 @@ Encoding and decoding for dirac, Ids:
  l -> list
  t -> tuple
  d -> dictionary
+
+A binary, length-prefixed variant (wire version 2) is also provided through
+encodeBinary/decodeBinary. Its streams start with BINARY_MAGIC, so that
+decodeAny can handle both versions.
 """
 from __future__ import print_function
 __RCSID__ = "$Id$"
@@ -18,6 +22,7 @@ __RCSID__ = "$Id$"
 import types
 import datetime
 import os
+import struct
 
 import inspect
 import traceback
@@ -376,6 +381,396 @@ g_dEncodeFunctions[types.DictType] = encodeDict
 g_dDecodeFunctions["d"] = decodeDict
 
 
+#######
+#
+# Binary codec (wire version 2)
+#
+# Every value is a one byte type tag followed by a fixed size struct field or a
+# length-prefixed payload, so decoding never has to scan for separators.
+# Homogeneous lists of strings or integers, and dictionaries with string keys,
+# are packed with a single struct call for all the lengths / values.
+#
+#######
+
+# Prefix identifying a binary encoded stream. It can never be the start of a
+# version 1 stream, which always starts with a lowercase type letter.
+BINARY_MAGIC = "\x00\x02"
+
+# Wire versions understood by this module, in order of preference
+DENCODE_VERSIONS = (2, 1)
+
+_structUInt = struct.Struct('>I')
+_structInt = struct.Struct('>q')
+_structFloat = struct.Struct('>d')
+_structDateTime = struct.Struct('>HBBBBBI')
+_maxInt64 = 2 ** 63 - 1
+_minInt64 = -2 ** 63
+
+g_bEncodeFunctions = {}
+g_bDecodeFunctions = {}
+
+
+def _bEncodeStrList(lValue, eList, tag):
+  """ Packs a list of str as tag, count, all the lengths and the concatenated data """
+  eList.append(tag)
+  eList.append(_structUInt.pack(len(lValue)))
+  if lValue:
+    eList.append(struct.pack('>%dI' % len(lValue), *[len(sValue) for sValue in lValue]))
+    eList.append("".join(lValue))
+
+
+def _bDecodeStrList(data, i):
+  """ Unpacks what was packed by _bEncodeStrList, i points after the tag """
+  count = _structUInt.unpack_from(data, i)[0]
+  i += 4
+  if not count:
+    return [], i
+  lengths = struct.unpack_from('>%dI' % count, data, i)
+  i += 4 * count
+  oL = []
+  for length in lengths:
+    oL.append(data[i:i + length])
+    i += length
+  return oL, i
+
+
+def _isHomogeneous(lValue, oType):
+  """ Tells whether all the elements of lValue are exactly of the given type """
+  for uObject in lValue:
+    if type(uObject) is not oType:
+      return False
+  return True
+
+
+def bEncodeInt(iValue, eList):
+  """ Binary encoding of ints """
+  if _minInt64 <= iValue <= _maxInt64:
+    eList.append('i')
+    eList.append(_structInt.pack(iValue))
+  else:
+    sValue = str(iValue)
+    eList.extend(('j', _structUInt.pack(len(sValue)), sValue))
+
+
+def bDecodeInt(data, i):
+  """ Binary decoding of ints """
+  return (_structInt.unpack_from(data, i + 1)[0], i + 9)
+
+
+def bDecodeBigInt(data, i):
+  """ Binary decoding of ints not fitting in 64 bits """
+  length = _structUInt.unpack_from(data, i + 1)[0]
+  i += 5
+  return (int(data[i:i + length]), i + length)
+
+
+g_bEncodeFunctions[types.IntType] = bEncodeInt
+g_bDecodeFunctions['i'] = bDecodeInt
+g_bDecodeFunctions['j'] = bDecodeBigInt
+
+
+def bEncodeLong(iValue, eList):
+  """ Binary encoding of longs """
+  sValue = str(iValue)
+  eList.extend(('I', _structUInt.pack(len(sValue)), sValue))
+
+
+def bDecodeLong(data, i):
+  """ Binary decoding of longs """
+  length = _structUInt.unpack_from(data, i + 1)[0]
+  i += 5
+  return (long(data[i:i + length]), i + length)
+
+
+g_bEncodeFunctions[types.LongType] = bEncodeLong
+g_bDecodeFunctions['I'] = bDecodeLong
+
+
+def bEncodeFloat(fValue, eList):
+  """ Binary encoding of floats. Unlike version 1 this is exact """
+  eList.append('f')
+  eList.append(_structFloat.pack(fValue))
+
+
+def bDecodeFloat(data, i):
+  """ Binary decoding of floats """
+  return (_structFloat.unpack_from(data, i + 1)[0], i + 9)
+
+
+g_bEncodeFunctions[types.FloatType] = bEncodeFloat
+g_bDecodeFunctions['f'] = bDecodeFloat
+
+
+def bEncodeBool(bValue, eList):
+  """ Binary encoding of booleans """
+  eList.append('T' if bValue else 'F')
+
+
+def bDecodeTrue(_data, i):
+  """ Binary decoding of True """
+  return (True, i + 1)
+
+
+def bDecodeFalse(_data, i):
+  """ Binary decoding of False """
+  return (False, i + 1)
+
+
+g_bEncodeFunctions[types.BooleanType] = bEncodeBool
+g_bDecodeFunctions['T'] = bDecodeTrue
+g_bDecodeFunctions['F'] = bDecodeFalse
+
+
+def bEncodeString(sValue, eList):
+  """ Binary encoding of strings """
+  eList.extend(('s', _structUInt.pack(len(sValue)), sValue))
+
+
+def bDecodeString(data, i):
+  """ Binary decoding of strings """
+  length = _structUInt.unpack_from(data, i + 1)[0]
+  i += 5
+  return (data[i:i + length], i + length)
+
+
+g_bEncodeFunctions[types.StringType] = bEncodeString
+g_bDecodeFunctions['s'] = bDecodeString
+
+
+def bEncodeUnicode(sValue, eList):
+  """ Binary encoding of unicode strings """
+  valueStr = sValue.encode('utf-8')
+  eList.extend(('u', _structUInt.pack(len(valueStr)), valueStr))
+
+
+def bDecodeUnicode(data, i):
+  """ Binary decoding of unicode strings """
+  length = _structUInt.unpack_from(data, i + 1)[0]
+  i += 5
+  return (unicode(data[i:i + length], 'utf-8'), i + length)
+
+
+g_bEncodeFunctions[types.UnicodeType] = bEncodeUnicode
+g_bDecodeFunctions['u'] = bDecodeUnicode
+
+
+def bEncodeDateTime(oValue, eList):
+  """ Binary encoding of datetime, date and time """
+  if isinstance(oValue, _dateTimeType):
+    if oValue.tzinfo is None:
+      # Most common case, packed in a fixed size field
+      eList.append('Z')
+      eList.append(_structDateTime.pack(oValue.year, oValue.month, oValue.day,
+                                        oValue.hour, oValue.minute, oValue.second,
+                                        oValue.microsecond))
+      return
+    eList.append("za")
+    bEncodeTuple((oValue.year, oValue.month, oValue.day,
+                  oValue.hour, oValue.minute, oValue.second,
+                  oValue.microsecond, oValue.tzinfo), eList)
+  elif isinstance(oValue, _dateType):
+    eList.append("zd")
+    bEncodeTuple((oValue.year, oValue.month, oValue.day), eList)
+  elif isinstance(oValue, _timeType):
+    eList.append("zt")
+    bEncodeTuple((oValue.hour, oValue.minute, oValue.second, oValue.microsecond, oValue.tzinfo), eList)
+  else:
+    raise Exception("Unexpected type %s while encoding a datetime object" % str(type(oValue)))
+
+
+def bDecodeDateTime(data, i):
+  """ Binary decoding of datetime, date and time """
+  dataType = data[i + 1]
+  tupleObject, i = g_bDecodeFunctions[data[i + 2]](data, i + 2)
+  if dataType == 'a':
+    dtObject = datetime.datetime(*tupleObject)
+  elif dataType == 'd':
+    dtObject = datetime.date(*tupleObject)
+  elif dataType == 't':
+    dtObject = datetime.time(*tupleObject)
+  else:
+    raise Exception("Unexpected type %s while decoding a datetime object" % dataType)
+  return (dtObject, i)
+
+
+def bDecodeNaiveDateTime(data, i):
+  """ Binary decoding of datetime without tzinfo """
+  return (datetime.datetime(*_structDateTime.unpack_from(data, i + 1)), i + 1 + _structDateTime.size)
+
+
+g_bEncodeFunctions[_dateTimeType] = bEncodeDateTime
+g_bEncodeFunctions[_dateType] = bEncodeDateTime
+g_bEncodeFunctions[_timeType] = bEncodeDateTime
+g_bDecodeFunctions['z'] = bDecodeDateTime
+g_bDecodeFunctions['Z'] = bDecodeNaiveDateTime
+
+
+def bEncodeNone(_oValue, eList):
+  """ Binary encoding of None """
+  eList.append('n')
+
+
+def bDecodeNone(_data, i):
+  """ Binary decoding of None """
+  return (None, i + 1)
+
+
+g_bEncodeFunctions[types.NoneType] = bEncodeNone
+g_bDecodeFunctions['n'] = bDecodeNone
+
+
+def _bEncodeSequence(lValue, eList, tag):
+  """ Binary encoding of a list or tuple of arbitrary elements """
+  eList.append(tag)
+  eList.append(_structUInt.pack(len(lValue)))
+  for uObject in lValue:
+    g_bEncodeFunctions[type(uObject)](uObject, eList)
+
+
+def _bDecodeSequence(data, i):
+  """ Binary decoding of a list or tuple of arbitrary elements, i points after the tag """
+  count = _structUInt.unpack_from(data, i)[0]
+  i += 4
+  oL = []
+  for _ in xrange(count):
+    ob, i = g_bDecodeFunctions[data[i]](data, i)
+    oL.append(ob)
+  return oL, i
+
+
+def bEncodeList(lValue, eList):
+  """ Binary encoding of lists, with fast paths for lists of str and of int """
+  if lValue:
+    firstType = type(lValue[0])
+    if firstType is types.StringType and _isHomogeneous(lValue, types.StringType):
+      _bEncodeStrList(lValue, eList, 'S')
+      return
+    if firstType is types.IntType and _isHomogeneous(lValue, types.IntType):
+      try:
+        packed = struct.pack('>%dq' % len(lValue), *lValue)
+      except struct.error:
+        # Some element does not fit in 64 bits
+        pass
+      else:
+        eList.extend(('L', _structUInt.pack(len(lValue)), packed))
+        return
+  _bEncodeSequence(lValue, eList, 'l')
+
+
+def bDecodeList(data, i):
+  """ Binary decoding of generic lists """
+  return _bDecodeSequence(data, i + 1)
+
+
+def bDecodeStrList(data, i):
+  """ Binary decoding of lists of str """
+  return _bDecodeStrList(data, i + 1)
+
+
+def bDecodeIntList(data, i):
+  """ Binary decoding of lists of int """
+  count = _structUInt.unpack_from(data, i + 1)[0]
+  i += 5
+  return (list(struct.unpack_from('>%dq' % count, data, i)), i + 8 * count)
+
+
+g_bEncodeFunctions[types.ListType] = bEncodeList
+g_bDecodeFunctions['l'] = bDecodeList
+g_bDecodeFunctions['S'] = bDecodeStrList
+g_bDecodeFunctions['L'] = bDecodeIntList
+
+
+def bEncodeTuple(lValue, eList):
+  """ Binary encoding of tuples """
+  _bEncodeSequence(lValue, eList, 't')
+
+
+def bDecodeTuple(data, i):
+  """ Binary decoding of tuples """
+  oL, i = _bDecodeSequence(data, i + 1)
+  return (tuple(oL), i)
+
+
+g_bEncodeFunctions[types.TupleType] = bEncodeTuple
+g_bDecodeFunctions['t'] = bDecodeTuple
+
+
+def bEncodeDict(dValue, eList):
+  """ Binary encoding of dictionaries.
+      Dictionaries whose keys are all str have their keys packed in one block ('D'),
+      and if the values are all str as well, the values too ('M').
+  """
+  keys = dValue.keys()
+  if _isHomogeneous(keys, types.StringType):
+    values = dValue.values()
+    if _isHomogeneous(values, types.StringType):
+      _bEncodeStrList(keys, eList, 'M')
+      _bEncodeStrList(values, eList, '')
+      return
+    _bEncodeStrList(keys, eList, 'D')
+    for uObject in values:
+      g_bEncodeFunctions[type(uObject)](uObject, eList)
+    return
+  eList.append('d')
+  eList.append(_structUInt.pack(len(keys)))
+  for key, uObject in dValue.iteritems():
+    g_bEncodeFunctions[type(key)](key, eList)
+    g_bEncodeFunctions[type(uObject)](uObject, eList)
+
+
+def bDecodeDict(data, i):
+  """ Binary decoding of generic dictionaries """
+  count = _structUInt.unpack_from(data, i + 1)[0]
+  i += 5
+  oD = {}
+  for _ in xrange(count):
+    k, i = g_bDecodeFunctions[data[i]](data, i)
+    oD[k], i = g_bDecodeFunctions[data[i]](data, i)
+  return (oD, i)
+
+
+def bDecodeStrKeyDict(data, i):
+  """ Binary decoding of dictionaries with str keys """
+  keys, i = _bDecodeStrList(data, i + 1)
+  values = []
+  for _ in xrange(len(keys)):
+    ob, i = g_bDecodeFunctions[data[i]](data, i)
+    values.append(ob)
+  return (dict(zip(keys, values)), i)
+
+
+def bDecodeStrDict(data, i):
+  """ Binary decoding of dictionaries str -> str """
+  keys, i = _bDecodeStrList(data, i + 1)
+  values, i = _bDecodeStrList(data, i)
+  return (dict(zip(keys, values)), i)
+
+
+g_bEncodeFunctions[types.DictType] = bEncodeDict
+g_bDecodeFunctions['d'] = bDecodeDict
+g_bDecodeFunctions['D'] = bDecodeStrKeyDict
+g_bDecodeFunctions['M'] = bDecodeStrDict
+
+
+def encodeBinary(uObject):
+  """ Binary (version 2) encoding function """
+  eList = [BINARY_MAGIC]
+  g_bEncodeFunctions[type(uObject)](uObject, eList)
+  return "".join(eList)
+
+
+def decodeBinary(data):
+  """ Binary (version 2) decoding function. Same return convention as decode """
+  if not data.startswith(BINARY_MAGIC):
+    raise ValueError("Data is not binary DEncoded")
+  return g_bDecodeFunctions[data[len(BINARY_MAGIC)]](data, len(BINARY_MAGIC))
+
+
+def isBinary(data):
+  """ Tells whether the data was encoded with the binary codec """
+  return data.startswith(BINARY_MAGIC)
+
+
 # Encode function
 def encode(uObject):
   """ Generic encoding function """
@@ -400,6 +795,20 @@ def decode(data):
     raise
 
 
+def encodeVersion(uObject, version=1):
+  """ Encodes with the given wire version """
+  if version == 2:
+    return encodeBinary(uObject)
+  return encode(uObject)
+
+
+def decodeAny(data):
+  """ Decodes data encoded with any of the supported wire versions """
+  if data.startswith(BINARY_MAGIC):
+    return decodeBinary(data)
+  return decode(data)
+
+
 if __name__ == "__main__":
   gObject = {2: "3", True: (3, None), 2.0 * 10 ** 20: 2.0 * 10 ** -10}
   print("Initial: %s" % gObject)
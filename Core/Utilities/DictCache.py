@@ -4,9 +4,19 @@
 __RCSID__ = "$Id$"
 
 import datetime
+import heapq
+import itertools
 import threading
-# DIRAC
-from DIRAC.Core.Utilities.LockRing import LockRing
+import time
+from collections import OrderedDict
+
+try:
+  from time import monotonic
+except ImportError:
+  try:
+    from monotonic import monotonic
+  except ImportError:
+    monotonic = time.time
 
 
 class ThreadLocalDict(threading.local):
@@ -23,15 +33,20 @@ class ThreadLocalDict(threading.local):
     self.cache = {}
 
 
-class MockLockRing(object):
-  """ This mock class is just used to expose the acquire and release method
+class _Shard(object):
+  """ Part of the records of a DictCache, with its own lock
+
+      The records are { cKey : ( expirationTime, value ) }, from the least to the most recently
+      used if the size of the cache is limited. The heap contains ( expirationTime, sequence, cKey )
+      for the records, and also for records replaced or deleted since, which are skipped.
   """
 
-  def doNothing(self, *args, **kwargs):
-    """ Really does nothing !"""
-    pass
+  __slots__ = ('lock', 'records', 'heap')
 
-  acquire = release = doNothing
+  def __init__(self, lru):
+    self.lock = threading.Lock()
+    self.records = OrderedDict() if lru else {}
+    self.heap = []
 
 
 class DictCache(object):
@@ -40,59 +55,115 @@ class DictCache(object):
     The user can decide whether this cache should be shared among the threads or not, but it is always thread safe
     Note that when shared, the access to the cache is protected by a lock, but not necessarily the
     object you are retrieving from it.
+
+    The records of a shared cache are split in shards, each one protected by its own lock. Unless the
+    size of the cache is limited, the valid records are read without taking any lock. The expiration
+    times are taken from a monotonic clock and kept in a heap, so that purging the expired records
+    does not scan the whole cache.
   """
 
-  def __init__(self, deleteFunction=False, threadLocal=False):
+  def __init__(self, deleteFunction=False, threadLocal=False, maxSize=0, shards=16):
     """
     Initialize the dict cache.
 
       :param deleteFunction: if not False, invoked when deleting a cached object
       :param threadLocal: if False, the cache will be shared among all the threads, otherwise,
                           each thread gets its own cache.
+      :param int maxSize: if not 0, maximum number of records, the least recently used records being
+                          deleted beyond it, after the expired ones. The limit is split evenly
+                          between the shards, a shard may evict records before the cache is full.
+      :param int shards: number of independently locked parts of a shared cache
 
     """
 
     self.__threadLocal = threadLocal
 
-    # Placeholder either for a LockRing if the cache is shared,
-    # or a mock class if not.
-    self.__lock = None
+    # A thread local cache is not shared, so not split
+    nShards = 1 if threadLocal else max(1, shards)
+    # Not more shards than records
+    if maxSize and maxSize < nShards:
+      nShards = 1
+    self.__maxSize = maxSize
+    # The limit is enforced per shard, the shards hold at most maxSize records together
+    self.__shardMaxSize = maxSize // nShards if maxSize else 0
 
     # One of the following two objects is returned
-    # by the __cache property, depending on the threadLocal strategy
+    # by the __shards property, depending on the threadLocal strategy
 
     # This is the Placeholder for a shared cache
-    self.__sharedCache = {}
-    # This is the Placeholder for a shared cache
+    self.__sharedShards = [_Shard(maxSize) for _i in xrange(nShards)]
+    # This is the Placeholder for a thread local cache
     self.__threadLocalCache = ThreadLocalDict()
 
+    # Order of the records with the same expiration time in the heaps
+    self.__sequence = itertools.count()
+
     # Function to clean the elements
     self.__deleteFunction = deleteFunction
 
   @property
-  def lock(self):
-    """ Return the lock.
-        In practice, if the cache is shared among threads, it is a LockRing.
-        Otherwise, it is just a mock object.
+  def __shards(self):
+    """ Returns either the shards of the shared cache or the shard of the thread local cache
     """
+    if self.__threadLocal:
+      shards = self.__threadLocalCache.cache.get('shards')
+      if shards is None:
+        shards = self.__threadLocalCache.cache['shards'] = [_Shard(self.__maxSize)]
+      return shards
 
-    if not self.__lock:
-      if not self.__threadLocal:
-        self.__lock = LockRing().getLock(self.__class__.__name__, recursive=True)
-      else:
-        self.__lock = MockLockRing()
+    return self.__sharedShards
 
-    return self.__lock
+  def __shard(self, cKey):
+    shards = self.__shards
+    return shards[hash(cKey) % len(shards)]
 
-  @property
-  def __cache(self):
-    """ Returns either a shared or a thread local cache.
-        In any case, the returned object is a dictionary
+  def __deleteValues(self, values):
+    """ Call the delete function on the values of records removed from the cache.
+        This is done without holding any lock, the function may use the cache
     """
-    if self.__threadLocal:
-      return self.__threadLocalCache.cache
+    if self.__deleteFunction:
+      for value in values:
+        self.__deleteFunction(value)
+
+  def __popExpired(self, shard, limitTime):
+    """ Remove from a shard the records expired at limitTime, the lock of the shard must be held
 
-    return self.__sharedCache
+        :return: list of the values removed
+    """
+    values = []
+    heap = shard.heap
+    records = shard.records
+    while heap and heap[0][0] < limitTime:
+      expTime, _sequence, cKey = heapq.heappop(heap)
+      record = records.get(cKey)
+      if record is not None and record[0] == expTime:
+        del records[cKey]
+        values.append(record[1])
+    return values
+
+  def __getRecord(self, cKey, validSeconds):
+    """ Get a record if it is valid for validSeconds, it is deleted otherwise
+    """
+    shard = self.__shard(cKey)
+    # The records are never modified in place, a record read here is consistent
+    record = shard.records.get(cKey)
+    if record is None:
+      return None
+    if record[0] > monotonic() + validSeconds:
+      if self.__shardMaxSize:
+        with shard.lock:
+          # Now the most recently used
+          if shard.records.get(cKey) is record:
+            del shard.records[cKey]
+            shard.records[cKey] = record
+      return record
+    # Delete expired
+    with shard.lock:
+      if shard.records.get(cKey) is not record:
+        return None
+      del shard.records[cKey]
+    self.__deleteValues([record[1]])
+    return None
 
   def exists(self, cKey, validSeconds=0):
     """
@@ -101,20 +172,7 @@ class DictCache(object):
       :param cKey: identification key of the record
       :param validSeconds: The amount of seconds the key has to be valid for
     """
-    self.lock.acquire()
-    try:
-      # Is the key in the cache?
-      if cKey in self.__cache:
-        expTime = self.__cache[cKey]['expirationTime']
-        # If it's valid return True!
-        if expTime > datetime.datetime.now() + datetime.timedelta(seconds=validSeconds):
-          return True
-        else:
-          # Delete expired
-          self.delete(cKey)
-      return False
-    finally:
-      self.lock.release()
+    return self.__getRecord(cKey, validSeconds) is not None
 
   def delete(self, cKey):
     """
@@ -122,15 +180,11 @@ class DictCache(object):
 
     :param cKey: identification key of the record
     """
-    self.lock.acquire()
-    try:
-      if cKey not in self.__cache:
-        return
-      if self.__deleteFunction:
-        self.__deleteFunction(self.__cache[cKey]['value'])
-      del self.__cache[cKey]
-    finally:
-      self.lock.release()
+    shard = self.__shard(cKey)
+    with shard.lock:
+      record = shard.records.pop(cKey, None)
+    if record is not None:
+      self.__deleteValues([record[1]])
 
   def add(self, cKey, validSeconds, value=None):
     """
@@ -142,13 +196,26 @@ class DictCache(object):
     """
     if max(0, validSeconds) == 0:
       return
-    self.lock.acquire()
-    try:
-      vD = {'expirationTime': datetime.datetime.now() + datetime.timedelta(seconds=validSeconds),
-            'value': value}
-      self.__cache[cKey] = vD
-    finally:
-      self.lock.release()
+    now = monotonic()
+    record = (now + validSeconds, value)
+    shard = self.__shard(cKey)
+    removed = []
+    with shard.lock:
+      records = shard.records
+      if self.__shardMaxSize:
+        # Now the most recently used
+        records.pop(cKey, None)
+      records[cKey] = record
+      heapq.heappush(shard.heap, (record[0], next(self.__sequence), cKey))
+      if self.__shardMaxSize and len(records) > self.__shardMaxSize:
+        removed = self.__popExpired(shard, now)
+        while len(records) > self.__shardMaxSize:
+          removed.append(records.popitem(last=False)[1][1])
+      # Rebuild the heap if it is mostly made of replaced or deleted records
+      if len(shard.heap) > 2 * len(records) + 64:
+        shard.heap = [(expTime, next(self.__sequence), key) for key, (expTime, _value) in records.iteritems()]
+        heapq.heapify(shard.heap)
+    self.__deleteValues(removed)
 
   def get(self, cKey, validSeconds=0):
     """
@@ -157,86 +224,64 @@ class DictCache(object):
     :param cKey: identification key of the record
     :param validSeconds: The amount of seconds the key has to be valid for
     """
-    self.lock.acquire()
-    try:
-      # Is the key in the cache?
-      if cKey in self.__cache:
-        expTime = self.__cache[cKey]['expirationTime']
-        # If it's valid return True!
-        if expTime > datetime.datetime.now() + datetime.timedelta(seconds=validSeconds):
-          return self.__cache[cKey]['value']
-        else:
-          # Delete expired
-          self.delete(cKey)
+    record = self.__getRecord(cKey, validSeconds)
+    if record is None:
       return None
-    finally:
-      self.lock.release()
+    return record[1]
 
   def showContentsInString(self):
     """
     Return a human readable string to represent the contents
     """
-    self.lock.acquire()
-    try:
-      data = []
-      for cKey in self.__cache:
+    data = []
+    for shard in self.__shards:
+      with shard.lock:
+        records = shard.records.items()
+      now = monotonic()
+      for cKey, (expTime, value) in records:
         data.append("%s:" % str(cKey))
-        data.append("\tExp: %s" % self.__cache[cKey]['expirationTime'])
-        if self.__cache[cKey]['value']:
-          data.append("\tVal: %s" % self.__cache[cKey]['value'])
-      return "\n".join(data)
-    finally:
-      self.lock.release()
+        data.append("\tExp: %s" % (datetime.datetime.now() + datetime.timedelta(seconds=expTime - now)))
+        if value:
+          data.append("\tVal: %s" % value)
+    return "\n".join(data)
 
   def getKeys(self, validSeconds=0):
     """
     Get keys for all contents
     """
-    self.lock.acquire()
-    try:
-      keys = []
-      limitTime = datetime.datetime.now() + datetime.timedelta(seconds=validSeconds)
-      for cKey in self.__cache:
-        if self.__cache[cKey]['expirationTime'] > limitTime:
-          keys.append(cKey)
-      return keys
-    finally:
-      self.lock.release()
+    keys = []
+    limitTime = monotonic() + validSeconds
+    for shard in self.__shards:
+      with shard.lock:
+        keys.extend(cKey for cKey, record in shard.records.iteritems() if record[0] > limitTime)
+    return keys
 
   def purgeExpired(self, expiredInSeconds=0):
     """
     Purge all entries that are expired or will be expired in <expiredInSeconds>
     """
-    self.lock.acquire()
-    try:
-      keys = []
-      limitTime = datetime.datetime.now() + datetime.timedelta(seconds=expiredInSeconds)
-      for cKey in self.__cache:
-        if self.__cache[cKey]['expirationTime'] < limitTime:
-          keys.append(cKey)
-      for cKey in keys:
-        if self.__deleteFunction:
-          self.__deleteFunction(self.__cache[cKey]['value'])
-        del self.__cache[cKey]
-    finally:
-      self.lock.release()
+    limitTime = monotonic() + expiredInSeconds
+    for shard in self.__shards:
+      with shard.lock:
+        values = self.__popExpired(shard, limitTime)
+      self.__deleteValues(values)
 
   def purgeAll(self, useLock=True):
     """
     Purge all entries
     CAUTION: useLock parameter should ALWAYS be True except when called from __del__
     """
-    if useLock:
-      self.lock.acquire()
-    try:
-      keys = self.__cache.keys()
-      for cKey in keys:
-        if self.__deleteFunction:
-          self.__deleteFunction(self.__cache[cKey]['value'])
-        del self.__cache[cKey]
-    finally:
+    for shard in self.__shards:
       if useLock:
-        self.lock.release()
+        shard.lock.acquire()
+      try:
+        values = [record[1] for record in shard.records.itervalues()]
+        shard.records.clear()
+        del shard.heap[:]
+      finally:
+        if useLock:
+          shard.lock.release()
+      self.__deleteValues(values)
 
   def __del__(self):
     """ When the DictCache is deleted, all the entries should be purged.
@@ -246,8 +291,7 @@ class DictCache(object):
         (https://docs.python.org/2/reference/datamodel.html#object.__del__)
     """
     self.purgeAll(useLock=False)
-    del self.__lock
     if self.__threadLocal:
       del self.__threadLocalCache
     else:
-      del self.__sharedCache
+      del self.__sharedShards
@@ -8,15 +8,19 @@ from __future__ import absolute_import
 import six
 __RCSID__ = "$Id$"
 
+import itertools
+import threading
+import time
 from datetime import datetime
 from datetime import timedelta
+from six.moves import queue
 
 import certifi
 
 from elasticsearch import Elasticsearch
 from elasticsearch_dsl import Search, Q, A
 from elasticsearch.exceptions import ConnectionError, TransportError, NotFoundError, RequestError
-from elasticsearch.helpers import BulkIndexError, bulk
+from elasticsearch.helpers import streaming_bulk
 
 from DIRAC import gLogger, S_OK, S_ERROR
 from DIRAC.Core.Utilities import Time, DErrno
@@ -32,8 +36,16 @@ class ElasticSearchDB(object):
   :param str gDebugFile: is used to save the debug information to a file
   :param int timeout: the default time out to Elasticsearch
   :param int RESULT_SIZE: The number of data points which will be returned by the query.
+  :param int BULK_CHUNK_BYTES: maximum size of the documents sent in a bulk request.
+  :param int BULK_THREADS: number of bulk requests sent in parallel.
+  :param int BULK_RETRIES: number of times the documents rejected by a full cluster are sent again.
+  :param int BULK_BACKOFF: seconds before sending again rejected documents, doubled at each retry.
   """
   __chunk_size = 1000
+  BULK_CHUNK_BYTES = 10 * 1024 * 1024
+  BULK_THREADS = 4
+  BULK_RETRIES = 3
+  BULK_BACKOFF = 2
   __url = ""
   __timeout = 120
   clusterName = ''
@@ -275,12 +287,12 @@ class ElasticSearchDB(object):
     """
     :param str indexPrefix: index name.
     :param str doc_type: the type of the document
-    :param list data: contains a list of dictionary
+    :param data: contains a list, or an iterator, of dictionary
     :param dict mapping: the mapping used by elasticsearch
     :param str period: We can specify which kind of indices will be created.
                        Currently only daily and monthly indexes are supported.
+    :return: S_OK(number of documents indexed) if all the documents are indexed
     """
-    gLogger.info("%d records will be insert to %s" % (len(data), doc_type))
     if mapping is None:
       mapping = {}
 
@@ -290,15 +302,69 @@ class ElasticSearchDB(object):
       retVal = self.createIndex(indexprefix, mapping, period)
       if not retVal['OK']:
         return retVal
-    docs = []
-    for row in data:
-      body = {
-          '_index': indexName,
-          '_type': doc_type,
-          '_source': {}
-      }
-      body['_source'] = row
 
+    result = self.streamingBulkIndex(indexName, doc_type, data)
+    if not result['OK']:
+      return result
+    stats = result['Value']
+    gLogger.info("%d records inserted to %s" % (stats['Indexed'], doc_type))
+    if stats['Failed']:
+      return S_ERROR("%d documents out of %d not indexed: %s" % (stats['Failed'],
+                                                                 stats['Failed'] + stats['Indexed'],
+                                                                 stats['Errors'][:1]))
+    return S_OK(stats['Indexed'])
+
+  def streamingBulkIndex(self, indexName, doc_type, data, chunkSize=None, maxChunkBytes=None, threads=None,
+                         maxRetries=None):
+    """
+    Index documents read from an iterator, with bulk requests of at most chunkSize documents and
+    maxChunkBytes bytes. Up to 'threads' requests are sent in parallel, and the documents rejected
+    because the cluster is overloaded are sent again up to maxRetries times, with an exponential backoff.
+    Only a few chunks are in memory at the same time.
+
+    :param str indexName: the full name of the index, which must exist
+    :param str doc_type: the type of the documents
+    :param data: list or iterator of dictionaries
+    :param int chunkSize: maximum number of documents per bulk request
+    :param int maxChunkBytes: maximum size of a bulk request
+    :param int threads: number of bulk requests sent in parallel
+    :param int maxRetries: number of retries of the rejected documents
+    :return: S_OK(dict) with the number of documents 'Indexed' and 'Failed', some 'Errors',
+             and the statistics of each request in 'Chunks'
+    """
+    chunkSize = chunkSize or self.__chunk_size
+    maxChunkBytes = maxChunkBytes or self.BULK_CHUNK_BYTES
+    threads = self.BULK_THREADS if threads is None else threads
+    maxRetries = self.BULK_RETRIES if maxRetries is None else maxRetries
+
+    chunks = enumerate(self.__bulkChunks(self.__bulkActions(indexName, doc_type, data), chunkSize, maxChunkBytes))
+    firstChunks = list(itertools.islice(chunks, 2))
+    chunks = itertools.chain(firstChunks, chunks)
+    try:
+      if threads > 1 and len(firstChunks) > 1:
+        chunkStats = self.__indexChunksInParallel(chunks, threads, maxRetries)
+      else:
+        chunkStats = [self.__indexChunk(chunkNumber, chunk, maxRetries) for chunkNumber, chunk in chunks]
+    except Exception as e:  # pylint: disable=broad-except
+      gLogger.exception("Failed to prepare the documents", lException=e)
+      return S_ERROR(e)
+
+    stats = {'Indexed': 0, 'Failed': 0, 'Errors': [], 'Chunks': chunkStats}
+    for chunk in chunkStats:
+      stats['Indexed'] += chunk['Indexed']
+      stats['Failed'] += chunk['Failed']
+      stats['Errors'].extend(chunk['Errors'])
+    return S_OK(stats)
+
+  def __bulkActions(self, indexName, doc_type, data):
+    """
+    Generate the bulk actions indexing the documents, with their size.
+    The sources are serialized here, once, the bulk helpers send them as they are.
+    """
+    serializer = self.__client.transport.serializer
+    # The action line and the 2 newlines added by the bulk helpers
+    actionSize = len(serializer.dumps({'index': {'_index': indexName, '_type': doc_type}})) + 2
+    for row in data:
       if 'timestamp' not in row:
         gLogger.warn("timestamp is not given! Note: the actual time is used!")
 
@@ -306,28 +372,99 @@ class ElasticSearchDB(object):
       timestamp = row.get('timestamp', int(Time.toEpoch()))
       try:
         if isinstance(timestamp, datetime):
-          body['_source']['timestamp'] = int(timestamp.strftime('%s')) * 1000
+          row['timestamp'] = int(timestamp.strftime('%s')) * 1000
         elif isinstance(timestamp, six.string_types):
           timeobj = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S.%f')
-          body['_source']['timestamp'] = int(timeobj.strftime('%s')) * 1000
+          row['timestamp'] = int(timeobj.strftime('%s')) * 1000
         else:  # we assume  the timestamp is an unix epoch time (integer).
-          body['_source']['timestamp'] = timestamp * 1000
+          row['timestamp'] = timestamp * 1000
       except (TypeError, ValueError) as e:
         # in case we are not able to convert the timestamp to epoch time....
         gLogger.error("Wrong timestamp", e)
-        body['_source']['timestamp'] = int(Time.toEpoch()) * 1000
-      docs += [body]
+        row['timestamp'] = int(Time.toEpoch()) * 1000
+      source = serializer.dumps(row)
+      yield {'_index': indexName, '_type': doc_type, '_source': source}, actionSize + len(source)
+
+  @staticmethod
+  def __bulkChunks(actions, chunkSize, maxChunkBytes):
+    """
+    Group the actions in chunks of at most chunkSize actions and maxChunkBytes bytes,
+    a bigger action being alone in its chunk
+
+    :return: generator of ( list of actions, size in bytes )
+    """
+    chunk = []
+    chunkBytes = 0
+    for action, actionBytes in actions:
+      if chunk and (len(chunk) == chunkSize or chunkBytes + actionBytes > maxChunkBytes):
+        yield chunk, chunkBytes
+        chunk = []
+        chunkBytes = 0
+      chunk.append(action)
+      chunkBytes += actionBytes
+    if chunk:
+      yield chunk, chunkBytes
+
+  def __indexChunksInParallel(self, chunks, threads, maxRetries):
+    """
+    Index the chunks with 'threads' threads, reading the chunks as the threads are ready for them
+
+    :return: list of the statistics of the chunks
+    """
+    chunkQueue = queue.Queue(threads)
+    chunkStats = []
+
+    def indexChunks():
+      while True:
+        item = chunkQueue.get()
+        if item is None:
+          return
+        chunkNumber, chunk = item
+        chunkStats.append(self.__indexChunk(chunkNumber, chunk, maxRetries))
+
+    workers = [threading.Thread(target=indexChunks) for _i in xrange(threads)]
+    for worker in workers:
+      worker.setDaemon(True)
+      worker.start()
     try:
-      res = bulk(self.__client, docs, chunk_size=self.__chunk_size)
-    except BulkIndexError as e:
-      return S_ERROR(e)
+      for item in chunks:
+        chunkQueue.put(item)
+    finally:
+      for _worker in workers:
+        chunkQueue.put(None)
+      for worker in workers:
+        worker.join()
+    return sorted(chunkStats, key=lambda chunk: chunk['Chunk'])
 
-    if res[0] == len(docs):
-      # we have inserted all documents...
-      return S_OK(len(docs))
-    else:
-      return S_ERROR(res)
-    return res
+  def __indexChunk(self, chunkNumber, chunk, maxRetries):
+    """
+    Send a chunk of actions in a bulk request
+
+    :return: dict with the statistics of the chunk
+    """
+    actions, chunkBytes = chunk
+    stats = {'Chunk': chunkNumber, 'Documents': len(actions), 'Bytes': chunkBytes,
+             'Indexed': 0, 'Failed': 0, 'Errors': []}
+    start = time.time()
+    try:
+      # The chunk is already sized, the helper must not split it
+      for ok, item in streaming_bulk(self.__client, actions, chunk_size=len(actions),
+                                     max_chunk_bytes=2 * chunkBytes + 1024,
+                                     raise_on_error=False, raise_on_exception=False,
+                                     max_retries=maxRetries, initial_backoff=self.BULK_BACKOFF):
+        if ok:
+          stats['Indexed'] += 1
+        else:
+          stats['Failed'] += 1
+          # Enough to understand the problem
+          if len(stats['Errors']) < 10:
+            stats['Errors'].append(item)
+    except Exception as e:  # pylint: disable=broad-except
+      gLogger.error("Bulk request failed", repr(e))
+      stats['Failed'] = len(actions) - stats['Indexed']
+      stats['Errors'].append(repr(e))
+    stats['Time'] = time.time() - start
+    return stats
 
   def getUniqueValue(self, indexName, key, orderBy=False):
     """
@@ -152,6 +152,7 @@ import collections
 import time
 import threading
 import MySQLdb
+import MySQLdb.cursors
 
 from DIRAC import gLogger
 from DIRAC import S_OK, S_ERROR
@@ -171,6 +172,8 @@ __RCSID__ = "$Id$"
 
 
 MAXCONNECTRETRY = 10
+# Default number of rows per statement of insertMany and upsertMany
+MULTIROWCHUNKSIZE = 1000
 
 def _checkFields( inFields, inValues ):
   """
@@ -292,6 +295,18 @@ class MySQL( object ):
       return S_OK( conn )
 
 
+    def getDedicated( self, dbName ):
+      """
+      Get a new connection, not shared with the other queries of the thread.
+      The caller has to close it
+      """
+      try:
+        conn = self.__newConn()
+        conn.select_db( dbName )
+      except MySQLdb.MySQLError as excp:
+        return S_ERROR( DErrno.EMYSQL, "Could not connect: %s" % excp )
+      return S_OK( conn )
+
     def __ping( self, conn ):
       try:
         conn.ping( True )
@@ -556,7 +571,7 @@ class MySQL( object ):
           tupleValues.append( retDict['Value'] )
         inEscapeValues.append( '(' + ', '.join( tupleValues ) + ')' )
       elif isinstance( value, bool ):
-        inEscapeValues = [str( value )]
+        inEscapeValues.append( str( value ) )
       else:
         retDict = self.__escapeString( str( value ) )
         if not retDict['OK']:
@@ -658,6 +673,62 @@ class MySQL( object ):
     return retDict
 
 
+  def _streamQuery( self, cmd, chunkSize = 1000 ):
+    """
+    execute MySQL query command with a server side cursor
+    return S_OK with a generator of tuples of at most chunkSize rows
+    return S_ERROR upon error
+
+    The rows are transferred from the server as the generator is consumed, so that
+    the memory used does not depend on the size of the result. The query runs on its own
+    connection, the other queries can be done while iterating. The connection is closed
+    when the generator is exhausted or deleted. Errors while reading the rows raise
+    MySQLdb.MySQLError
+    """
+    self.logger.verbose( '_streamQuery: %s' % self._safeCmd( cmd )[:min( len( cmd ) , 512 )] )
+
+    if not self.__initialized:
+      error = 'DB not properly initialized'
+      gLogger.error( error )
+      return S_ERROR( DErrno.EMYSQL, error )
+
+    retDict = self.__connectionPool.getDedicated( self.__dbName )
+    if not retDict['OK']:
+      return retDict
+    connection = retDict[ 'Value' ]
+
+    try:
+      cursor = connection.cursor( MySQLdb.cursors.SSCursor )
+      cursor.execute( cmd )
+    except BaseException as x:
+      self.log.warn( '_streamQuery: %s' % self._safeCmd( cmd ) )
+      retDict = self._except( '_streamQuery', x, 'Execution failed.' )
+      try:
+        connection.close()
+      except BaseException:
+        pass
+      return retDict
+
+    return S_OK( self.__fetchChunks( connection, cursor, chunkSize ) )
+
+  @staticmethod
+  def __fetchChunks( connection, cursor, chunkSize ):
+    """
+    Generator of the rows of a server side cursor, by chunks
+    """
+    try:
+      while True:
+        rows = cursor.fetchmany( chunkSize )
+        if not rows:
+          break
+        yield rows
+    finally:
+      try:
+        cursor.close()
+        connection.close()
+      except BaseException:
+        pass
+
   def _update( self, cmd, conn = None, debug = False ):
     """ execute MySQL update command
         return S_OK with number of updated registers upon success
@@ -1273,19 +1344,15 @@ class MySQL( object ):
     return condition
 
 #############################################################################
-  def getFields( self, tableName, outFields = None,
-                 condDict = None,
-                 limit = False, conn = None,
-                 older = None, newer = None,
-                 timeStamp = None, orderAttribute = None,
-                 greater = None, smaller = None ):
+  def __buildSelect( self, tableName, outFields = None,
+                     condDict = None,
+                     limit = False,
+                     older = None, newer = None,
+                     timeStamp = None, orderAttribute = None,
+                     greater = None, smaller = None ):
     """
-      Select "outFields" from "tableName" with condDict
-      N records can match the condition
-      return S_OK( tuple(Field,Value) )
-      if outFields is None all fields in "tableName" are returned
-      if limit is not False, the given limit is set
-      inValues are properly escaped using the _escape_string method, they can be single values or lists of values.
+      Build the SELECT statement of getFields and streamFields
+      return S_OK( statement )
     """
     table = _quotedList( [tableName] )
     if not table:
@@ -1319,8 +1386,46 @@ class MySQL( object ):
     except Exception as x:
       return S_ERROR( DErrno.EMYSQL, x )
 
-    return self._query( 'SELECT %s FROM %s %s' %
-                        ( quotedOutFields, table, condition ), conn, debug = True )
+    return S_OK( 'SELECT %s FROM %s %s' % ( quotedOutFields, table, condition ) )
+
+  def getFields( self, tableName, outFields = None,
+                 condDict = None,
+                 limit = False, conn = None,
+                 older = None, newer = None,
+                 timeStamp = None, orderAttribute = None,
+                 greater = None, smaller = None ):
+    """
+      Select "outFields" from "tableName" with condDict
+      N records can match the condition
+      return S_OK( tuple(Field,Value) )
+      if outFields is None all fields in "tableName" are returned
+      if limit is not False, the given limit is set
+      inValues are properly escaped using the _escape_string method, they can be single values or lists of values.
+    """
+    result = self.__buildSelect( tableName, outFields = outFields, condDict = condDict, limit = limit,
+                                 older = older, newer = newer, timeStamp = timeStamp,
+                                 orderAttribute = orderAttribute, greater = greater, smaller = smaller )
+    if not result['OK']:
+      return result
+    return self._query( result['Value'], conn, debug = True )
+
+  def streamFields( self, tableName, outFields = None,
+                    condDict = None,
+                    limit = False,
+                    older = None, newer = None,
+                    timeStamp = None, orderAttribute = None,
+                    greater = None, smaller = None,
+                    chunkSize = 1000 ):
+    """
+      Same as getFields, but the rows are streamed, see _streamQuery
+      return S_OK( generator of tuples of at most chunkSize rows )
+    """
+    result = self.__buildSelect( tableName, outFields = outFields, condDict = condDict, limit = limit,
+                                 older = older, newer = newer, timeStamp = timeStamp,
+                                 orderAttribute = orderAttribute, greater = greater, smaller = smaller )
+    if not result['OK']:
+      return result
+    return self._streamQuery( result['Value'], chunkSize = chunkSize )
 
 #############################################################################
   def deleteEntries( self, tableName,
@@ -1480,6 +1585,90 @@ class MySQL( object ):
                          ( table, inFieldString, inValueString ), conn, debug = True )
 
 
+  def __insertRows( self, method, tableName, inFields, inValuesList, suffix, chunkSize, atomic ):
+    """
+      Insert rows with multi-row INSERT statements of at most chunkSize rows, followed by suffix
+      return S_OK( number of affected rows )
+    """
+    table = _quotedList( [tableName] )
+    if not table:
+      error = 'Invalid tableName argument'
+      self.log.warn( '%s:' % method, error )
+      return S_ERROR( DErrno.EMYSQL, error )
+
+    inFieldString = _quotedList( inFields )
+    if inFieldString is None:
+      error = 'Invalid inFields arguments'
+      self.log.warn( '%s:' % method, error )
+      return S_ERROR( DErrno.EMYSQL, error )
+
+    rowStrings = []
+    for inValues in inValuesList:
+      if len( inValues ) != len( inFields ):
+        error = 'Mismatch between inFields and a row of inValuesList'
+        self.log.warn( '%s:' % method, '%s: %s %s' % ( error, inFields, inValues ) )
+        return S_ERROR( DErrno.EMYSQL, error )
+      retDict = self._escapeValues( inValues )
+      if not retDict['OK']:
+        self.log.warn( '%s:' % method, retDict['Message'] )
+        return retDict
+      rowStrings.append( '( %s )' % ', '.join( retDict['Value'] ) )
+    if not rowStrings:
+      return S_OK( 0 )
+
+    self.log.verbose( '%s:' % method, 'inserting %d rows into table %s' % ( len( rowStrings ), table ) )
+
+    chunks = [ rowStrings[i:i + chunkSize] for i in xrange( 0, len( rowStrings ), max( 1, chunkSize ) ) ]
+    atomic = atomic and len( chunks ) > 1
+    if atomic:
+      retDict = self.transactionStart()
+      if not retDict['OK']:
+        return retDict
+    affectedRows = 0
+    for chunk in chunks:
+      retDict = self._update( 'INSERT INTO %s ( %s ) VALUES %s%s' % ( table, inFieldString,
+                                                                      ', '.join( chunk ), suffix ),
+                              debug = True )
+      if not retDict['OK']:
+        if atomic:
+          self.transactionRollback()
+        return retDict
+      affectedRows += retDict['Value']
+    if atomic:
+      retDict = self.transactionCommit()
+      if not retDict['OK']:
+        return retDict
+    return S_OK( affectedRows )
+
+  def insertMany( self, tableName, inFields, inValuesList, chunkSize = MULTIROWCHUNKSIZE, atomic = False ):
+    """
+      Insert several rows in "tableName", assigning to the fields "inFields" the values of
+      each element of "inValuesList", with INSERT statements of at most chunkSize rows.
+      String type values will be appropriately escaped.
+      If atomic is True, the statements are executed in a single transaction.
+      return S_OK( number of inserted rows )
+    """
+    return self.__insertRows( 'insertMany', tableName, inFields, inValuesList, '', chunkSize, atomic )
+
+  def upsertMany( self, tableName, inFields, inValuesList, updateFields = None,
+                  chunkSize = MULTIROWCHUNKSIZE, atomic = False ):
+    """
+      Same as insertMany, but the rows with an existing key are updated with the new values
+      of the fields in "updateFields" ( all the fields by default ), using
+      INSERT ... ON DUPLICATE KEY UPDATE.
+      return S_OK( number of affected rows, as counted by MySQL: 1 per insert, 2 per update )
+    """
+    if updateFields is None:
+      updateFields = inFields
+    quotedUpdateFields = [ _quotedList( [field] ) for field in updateFields ]
+    if not quotedUpdateFields or None in quotedUpdateFields:
+      error = 'Invalid updateFields arguments'
+      self.log.warn( 'upsertMany:', error )
+      return S_ERROR( DErrno.EMYSQL, error )
+    suffix = ' ON DUPLICATE KEY UPDATE %s' % ', '.join( '%s = VALUES( %s )' % ( field, field )
+                                                        for field in quotedUpdateFields )
+    return self.__insertRows( 'upsertMany', tableName, inFields, inValuesList, suffix, chunkSize, atomic )
+
   def executeStoredProcedure( self, packageName, parameters, outputIds ):
     conDict = self._getConnection()
     if not conDict['OK']:
@@ -1529,3 +1718,12 @@ class MySQL( object ):
       pass
 
     return retDict
+
+  def executeStoredProcedureWithStream( self, packageName, parameters, chunkSize = 1000 ):
+    """
+      Same as executeStoredProcedureWithCursor, but the rows are streamed, see _streamQuery
+      return S_OK( generator of tuples of at most chunkSize rows )
+    """
+    execStr = "call %s(%s);" % ( packageName, ",".join( ["\"%s\"" % param if isinstance( param, basestring )
+                                                          else str( param ) for param in parameters] ) )
+    return self._streamQuery( execStr, chunkSize = chunkSize )
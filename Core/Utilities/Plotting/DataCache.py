@@ -1,16 +1,45 @@
 """ Accounting Cache
+
+    The report data is kept in memory in a LRU cache bounded in bytes. The concurrent requests
+    of the same report wait for the one that generates it instead of querying the DB again.
+    The buckets retrieved for a plot are cached as well, so that the next plot of the same
+    query over a later time range ( a "last N hours" plot ) only retrieves the missing tail.
 """
 
 __RCSID__ = "$Id$"
 
 import os.path
+import sys
 import time
 import threading
+from collections import OrderedDict
 
 from DIRAC import S_OK, S_ERROR, gLogger, rootPath, gConfig
 from DIRAC.Core.Utilities.DictCache import DictCache
 
 
+def getObjectSize( obj ):
+  """ Approximate size in memory of an object and its contents, in bytes
+  """
+  size = sys.getsizeof( obj )
+  if isinstance( obj, dict ):
+    for key, value in obj.iteritems():
+      size += getObjectSize( key ) + getObjectSize( value )
+  elif isinstance( obj, ( list, tuple, set, frozenset ) ):
+    for value in obj:
+      size += getObjectSize( value )
+  return size
+
+
+class _Flight( object ):
+  """ A report being generated, the requests of the same report wait for its result
+  """
+
+  def __init__( self ):
+    self.event = threading.Event()
+    self.result = None
+
+
 class DataCache( object ):
 
   def __init__( self, dirName = 'accountingPlots' ):
@@ -20,7 +49,14 @@ class DataCache( object ):
     self.purgeThread = threading.Thread( target = self.purgeExpired )
     self.purgeThread.setDaemon( 1 )
     self.purgeThread.start()
-    self.__dataCache = DictCache()
+    # key -> ( expiration time, size, data ), least recently used first
+    self.__dataCache = OrderedDict()
+    self.__dataCacheSize = 0
+    self.__maxDataCacheSize = 256 * 1024 * 1024
+    self.__dataLock = threading.Lock()
+    # report hash -> _Flight
+    self.__flights = {}
+    self.__stats = { 'hits' : 0, 'misses' : 0, 'coalesced' : 0, 'tailHits' : 0, 'evictions' : 0 }
     self.__graphCache = DictCache( deleteFunction = self._deleteGraph )
     self.__dataLifeTime = 600
     self.__graphLifeTime = 3600
@@ -33,24 +69,157 @@ class DataCache( object ):
         gLogger.verbose( "Purging %s" % graphLocation )
         os.unlink( graphLocation )
 
+  def setDataCacheSize( self, maxSize ):
+    """
+    Set the maximum size in bytes of the data kept in memory
+    """
+    with self.__dataLock:
+      self.__maxDataCacheSize = maxSize
+      self.__evictData()
+
   def purgeExpired( self ):
     while self.alive:
       time.sleep( 600 )
       self.__graphCache.purgeExpired()
-      self.__dataCache.purgeExpired()
+      self.__purgeExpiredData()
+      gLogger.info( "Report data cache", ", ".join( "%s: %s" % item for item in sorted( self.getStats().items() ) ) )
+
+  def getStats( self ):
+    """
+    Get the counters of the report data cache
+    """
+    with self.__dataLock:
+      stats = dict( self.__stats )
+      stats[ 'entries' ] = len( self.__dataCache )
+      stats[ 'size' ] = self.__dataCacheSize
+      stats[ 'maxSize' ] = self.__maxDataCacheSize
+    return stats
+
+  def __getData( self, key ):
+    """
+    Get data from the cache, the lock has to be held
+    """
+    if key not in self.__dataCache:
+      return None
+    expirationTime, _size, data = self.__dataCache[ key ]
+    if expirationTime < time.time():
+      self.__deleteData( key )
+      return None
+    # Most recently used
+    del self.__dataCache[ key ]
+    self.__dataCache[ key ] = ( expirationTime, _size, data )
+    return data
+
+  def __addData( self, key, data, expirationTime = None ):
+    """
+    Add data to the cache, evicting the least recently used data beyond the size limit
+    """
+    size = getObjectSize( data )
+    if not expirationTime:
+      expirationTime = time.time() + self.__dataLifeTime
+    with self.__dataLock:
+      self.__deleteData( key )
+      if size > self.__maxDataCacheSize:
+        return
+      self.__dataCache[ key ] = ( expirationTime, size, data )
+      self.__dataCacheSize += size
+      self.__evictData()
+
+  def __deleteData( self, key ):
+    if key in self.__dataCache:
+      self.__dataCacheSize -= self.__dataCache.pop( key )[1]
+
+  def __evictData( self ):
+    while self.__dataCacheSize > self.__maxDataCacheSize:
+      _key, ( _expirationTime, size, _data ) = self.__dataCache.popitem( last = False )
+      self.__dataCacheSize -= size
+      self.__stats[ 'evictions' ] += 1
+
+  def __purgeExpiredData( self ):
+    now = time.time()
+    with self.__dataLock:
+      for key in [ key for key, entry in self.__dataCache.iteritems() if entry[0] < now ]:
+        self.__deleteData( key )
 
   def getReportData( self, reportRequest, reportHash, dataFunc ):
     """
-    Get report data from cache if exists, else generate it
+    Get report data from cache if exists, else generate it. The requests of a report being
+    generated wait for it.
     """
-    reportData = self.__dataCache.get( reportHash )   
-    if not reportData:
+    leader = False
+    with self.__dataLock:
+      reportData = self.__getData( reportHash )
+      if reportData is not None:
+        self.__stats[ 'hits' ] += 1
+        return S_OK( reportData )
+      flight = self.__flights.get( reportHash )
+      if flight:
+        self.__stats[ 'coalesced' ] += 1
+      else:
+        self.__stats[ 'misses' ] += 1
+        flight = _Flight()
+        self.__flights[ reportHash ] = flight
+        leader = True
+    if not leader:
+      flight.event.wait()
+      return flight.result
+    try:
       retVal = dataFunc( reportRequest )
-      if not retVal[ 'OK' ]:
-        return retVal
-      reportData = retVal[ 'Value' ]
-      self.__dataCache.add( reportHash, self.__dataLifeTime, reportData )
-    return S_OK( reportData )
+      if retVal[ 'OK' ]:
+        self.__addData( reportHash, retVal[ 'Value' ] )
+      flight.result = retVal
+    except Exception as e:
+      gLogger.exception( "Exception while generating report data", lException = e )
+      flight.result = S_ERROR( "Exception while generating report data: %s" % repr( e ) )
+    finally:
+      with self.__dataLock:
+        del self.__flights[ reportHash ]
+      flight.event.set()
+    return flight.result
+
+  def getBucketedData( self, queryHash, startTime, endTime, granularity, queryFunc, timeIndex = 1 ):
+    """
+    Get the buckets of a query, retrieving only the tail of the time range if the buckets of
+    the same query over a previous time range are cached
+
+      - queryHash -> hash of the query, without the time range
+      - startTime & endTime -> epochs
+      - granularity -> bucket length at startTime
+      - queryFunc -> function( startTime, endTime ) returning S_OK( list of buckets )
+      - timeIndex -> position of the bucket start time in the buckets
+    """
+    with self.__dataLock:
+      cached = self.__getData( queryHash )
+      if cached:
+        expirationTime = self.__dataCache[ queryHash ][0]
+    # The buckets after splitTime are retrieved again, they are still being filled
+    if cached and cached[ 'granularity' ] == granularity and \
+       cached[ 'startTime' ] <= startTime and cached[ 'endTime' ] < endTime:
+      splitTime = cached[ 'endTime' ] - cached[ 'endTime' ] % granularity - granularity
+      if splitTime > startTime:
+        retVal = queryFunc( splitTime, endTime )
+        if not retVal[ 'OK' ]:
+          return retVal
+        tail = [ tuple( bucket ) for bucket in retVal[ 'Value' ] ]
+        if tail:
+          splitTime = min( bucket[ timeIndex ] for bucket in tail )
+        firstBucketTime = startTime - startTime % granularity
+        buckets = [ bucket for bucket in cached[ 'buckets' ]
+                    if firstBucketTime <= bucket[ timeIndex ] < splitTime ] + tail
+        with self.__dataLock:
+          self.__stats[ 'tailHits' ] += 1
+        # The cached buckets are not refreshed beyond the life time of the first retrieval
+        self.__addData( queryHash, { 'startTime' : startTime, 'endTime' : endTime,
+                                     'granularity' : granularity, 'buckets' : buckets },
+                        expirationTime )
+        return S_OK( buckets )
+    retVal = queryFunc( startTime, endTime )
+    if not retVal[ 'OK' ]:
+      return retVal
+    buckets = [ tuple( bucket ) for bucket in retVal[ 'Value' ] ]
+    self.__addData( queryHash, { 'startTime' : startTime, 'endTime' : endTime,
+                                 'granularity' : granularity, 'buckets' : buckets } )
+    return S_OK( buckets )
 
   def getReportPlot( self, reportRequest, reportHash, reportData, plotFunc ):
     """
@@ -0,0 +1,140 @@
+""" Test the ClassAd JDL parser against the previous character scanning one
+"""
+
+# pylint: disable=protected-access
+
+import glob
+import os
+
+import pytest
+
+import DIRAC.Core.Utilities.ClassAd.ClassAdLight as moduleTested
+from DIRAC.Core.Utilities.ClassAd.ClassAdLight import ClassAd, parseJDL
+from DIRAC.Core.Utilities.DictCache import DictCache
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..', '..')
+
+JDLS = [
+    '[ Executable = "my.sh"; Arguments = "-o LogLevel=DEBUG"; CPUTime = 1000; ]',
+    '[Executable="my.sh";InputData={"/lfn/a","/lfn/b"};Site = ANY]',
+    """[
+    Requirements = other.Site == "LCG.CERN.ch" && other.Platform == "x86_64";
+    Parameters = {"a", "b", "c"};
+    JobRequirements =
+      [
+        OwnerDN = "/DC=ch/CN=user";
+        Sites = {"LCG.CERN.ch"};
+        Nested = [ A = 1; ];
+      ];
+    JobName = "job_%n";
+  ]""",
+    '[ A = 1; B = 2; A = 3; ]',
+    '[ A = 1; trailing ]',
+    '[ A =; ]',
+    'A = 1;',
+    '',
+]
+
+
+def legacyAnalyseJDL(jdl):
+  """ The character scanning parser the ClassAd used to have
+  """
+  jdl = jdl.strip()
+  if not jdl or jdl[0] != '[' or jdl[-1] != ']':
+    return {}
+
+  def findSubJDL(body, index):
+    depth = 0
+    ind = index
+    while depth < 10:
+      ind1 = body.find(']', ind + 1)
+      ind2 = body.find('[', ind + 1)
+      if ind2 != -1 and ind2 < ind1:
+        depth += 1
+        ind = ind2
+      else:
+        if depth > 0:
+          depth -= 1
+          ind = ind1
+        else:
+          if body[ind1 + 1] == ";":
+            return body[index:ind1 + 1], ind1 + 2
+          return body[index:ind1 + 1], 0
+    return '', 0
+
+  result = {}
+  body = jdl[1:-1]
+  index = 0
+  while index < len(body):
+    ind = body.find("=", index)
+    if ind == -1:
+      break
+    name = body[index:ind]
+    index = ind + 1
+    ind1 = body.find("[", index)
+    ind2 = body.find(";", index)
+    if ind1 != -1 and ind1 < ind2:
+      value, newind = findSubJDL(body, ind1)
+    elif ind1 == -1 and ind2 == -1:
+      value = body[index:]
+      newind = len(body)
+    else:
+      if index == ind2:
+        return {}
+      value = body[index:ind2]
+      newind = ind2 + 1
+    result[name.strip()] = value.strip().replace('\n', '')
+    index = newind
+  return result
+
+
+def repoJDLs():
+  """ The JDLs of the test suites """
+  jdls = []
+  for jdlFile in glob.glob(os.path.join(ROOT, 'tests', 'Integration', 'WorkloadManagementSystem', 'testJDLs', '*.jdl')):
+    with open(jdlFile) as fd:
+      jdls.append(fd.read())
+  for jdlFile in glob.glob(os.path.join(ROOT, 'Interfaces', 'API', 'test', '*.jdl')):
+    with open(jdlFile) as fd:
+      jdls.append('[' + fd.read() + ']')
+  return jdls
+
+
+@pytest.mark.parametrize('jdl', JDLS + repoJDLs())
+def test_parity(jdl):
+  assert ClassAd(jdl).contents == legacyAnalyseJDL(jdl)
+  assert dict(parseJDL(jdl)) == legacyAnalyseJDL(jdl)
+
+
+def test_quotedSeparators():
+  """ The ; and [ in the quoted strings do not end the values """
+  classAd = ClassAd('[ Arguments = "a;b [c]"; Requirements = other.Site == "x[1]"; JobName = "n"; ]')
+  assert classAd.getAttributeString('Arguments') == 'a;b [c]'
+  assert classAd.get_expression('Requirements') == 'other.Site == "x[1]"'
+  assert classAd.getAttributeString('JobName') == 'n'
+
+  # The previous parser used to loop forever on this one
+  classAd = ClassAd('[ Sub = [ A = 1 ] ; B = 2 ]')
+  assert classAd.get_expression('Sub') == '[ A = 1 ]'
+  assert classAd.getAttributeInt('B') == 2
+
+
+def test_cache(monkeypatch):
+  monkeypatch.setattr(moduleTested, '_parsedJDLs', DictCache(maxSize=2, shards=1))
+
+  first = ClassAd(JDLS[0])
+  assert moduleTested._parsedJDLs.getKeys() == [JDLS[0]]
+  # The instances do not share their contents
+  first.insertAttributeInt('CPUTime', 10)
+  assert ClassAd(JDLS[0]).getAttributeInt('CPUTime') == 1000
+  assert ClassAd(JDLS[0]).contents is not first.contents
+
+  # The invalid JDLs are not cached
+  assert not ClassAd('A = 1;').isOK()
+  assert len(moduleTested._parsedJDLs.getKeys()) == 1
+
+  # The least recently used JDL is dropped
+  ClassAd(JDLS[1])
+  ClassAd(JDLS[0])
+  ClassAd(JDLS[2])
+  assert sorted(moduleTested._parsedJDLs.getKeys()) == sorted([JDLS[0], JDLS[2]])
@@ -0,0 +1,89 @@
+""" Test the report data cache of the plotting utilities
+"""
+
+import threading
+import time
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities.Plotting.DataCache import DataCache, getObjectSize
+
+__RCSID__ = "$Id$"
+
+
+def test_coalescing():
+  dataCache = DataCache()
+  calls = []
+  started = threading.Event()
+  release = threading.Event()
+
+  def dataFunc(reportRequest):
+    calls.append(reportRequest)
+    started.set()
+    release.wait()
+    return S_OK({'data': reportRequest})
+
+  results = []
+  threads = [threading.Thread(target=lambda: results.append(dataCache.getReportData('req', 'hash', dataFunc)))
+             for _ in xrange(10)]
+  threads[0].start()
+  started.wait()
+  for thread in threads[1:]:
+    thread.start()
+  # Let the followers reach the flight of the first request
+  while dataCache.getStats()['coalesced'] < 9:
+    time.sleep(0.01)
+  release.set()
+  for thread in threads:
+    thread.join()
+
+  assert len(calls) == 1
+  assert results == [S_OK({'data': 'req'})] * 10
+  assert dataCache.getReportData('req', 'hash', dataFunc) == S_OK({'data': 'req'})
+  stats = dataCache.getStats()
+  assert (stats['misses'], stats['coalesced'], stats['hits'], stats['entries']) == (1, 9, 1, 1)
+
+  # Errors are not cached
+  assert not dataCache.getReportData('req', 'other', lambda _req: S_ERROR('DB down'))['OK']
+  assert dataCache.getStats()['entries'] == 1
+
+
+def test_sizeBound():
+  dataCache = DataCache()
+  report = dict((i, float(i)) for i in xrange(100))
+  dataCache.setDataCacheSize(getObjectSize(dict(report)) * 2)
+  for reportHash in ('a', 'b', 'a', 'c'):
+    dataCache.getReportData(None, reportHash, lambda _req: S_OK(dict(report)))
+  stats = dataCache.getStats()
+  # b was the least recently used
+  assert (stats['misses'], stats['hits'], stats['evictions'], stats['entries']) == (3, 1, 1, 2)
+  assert stats['size'] <= stats['maxSize']
+  dataCache.getReportData(None, 'a', None)
+  assert dataCache.getStats()['hits'] == 2
+
+
+def test_bucketTail():
+  dataCache = DataCache()
+  queries = []
+
+  def queryFunc(startTime, endTime):
+    queries.append((startTime, endTime))
+    # Buckets of 900 s of two sites, the last one still being filled
+    return S_OK([(site, bucketTime, 900, float(bucketTime % 7)) for bucketTime in xrange(startTime - startTime % 900,
+                                                                                         endTime, 900)
+                 for site in ('CERN', 'CNAF')])
+
+  startTime = 1500000000
+  full = dataCache.getBucketedData('query', startTime, startTime + 86400, 3600, queryFunc)['Value']
+  # A "last day" plot one hour later only retrieves the tail
+  buckets = dataCache.getBucketedData('query', startTime + 3600, startTime + 90000, 3600, queryFunc)['Value']
+  assert len(queries) == 2
+  assert queries[1][0] > startTime + 80000
+  assert buckets == queryFunc(startTime + 3600 - startTime % 3600, startTime + 90000)['Value']
+  assert set(full[8:]) < set(buckets)
+  assert dataCache.getStats()['tailHits'] == 1
+
+  # A different granularity, or an earlier time range, need the full query
+  dataCache.getBucketedData('query', startTime + 3600, startTime + 93600, 86400, queryFunc)
+  dataCache.getBucketedData('query', startTime, startTime + 93600, 86400, queryFunc)
+  assert queries[3:] == [(startTime + 3600, startTime + 93600), (startTime, startTime + 93600)]
+  assert dataCache.getStats()['tailHits'] == 1
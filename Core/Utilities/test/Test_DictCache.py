@@ -0,0 +1,153 @@
+""" Test the DictCache
+"""
+
+# pylint: disable=protected-access
+
+import threading
+import unittest
+from mock import patch
+
+import DIRAC.Core.Utilities.DictCache as moduleTested
+from DIRAC.Core.Utilities.DictCache import DictCache
+
+
+class FakeClock(object):
+  """ Monotonic clock moved by hand
+  """
+
+  def __init__(self):
+    self.now = 1000.
+
+  def __call__(self):
+    return self.now
+
+
+class DictCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.clock = FakeClock()
+    patcher = patch.object(moduleTested, 'monotonic', self.clock)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    self.deleted = []
+
+  def test_addGet(self):
+    cache = DictCache(self.deleted.append)
+    cache.add('a', 10, 1)
+    cache.add('b', 20, 2)
+    # Not added without a lifetime
+    cache.add('c', 0, 3)
+    self.assertEqual(cache.get('a'), 1)
+    self.assertEqual(cache.get('c'), None)
+    self.assertTrue(cache.exists('b', validSeconds=15))
+    self.assertEqual(sorted(cache.getKeys()), ['a', 'b'])
+
+    # Not valid for long enough: deleted
+    self.assertEqual(cache.get('a', validSeconds=15), None)
+    self.assertFalse(cache.exists('a'))
+    self.assertEqual(self.deleted, [1])
+
+    # Expired
+    self.clock.now += 20
+    self.assertEqual(cache.getKeys(), [])
+    self.assertFalse(cache.exists('b'))
+    self.assertEqual(self.deleted, [1, 2])
+
+    # Replaced values are not deleted
+    cache.add('a', 10, 1)
+    cache.add('a', 10, 4)
+    self.assertEqual(cache.get('a'), 4)
+    self.assertEqual(self.deleted, [1, 2])
+    cache.delete('a')
+    self.assertEqual(self.deleted, [1, 2, 4])
+
+  def test_purge(self):
+    cache = DictCache(self.deleted.append)
+    for i in xrange(1000):
+      cache.add(i, i + 1, i)
+    # Replaced records stay in the heap until it is rebuilt
+    for i in xrange(0, 1000, 2):
+      cache.add(i, 2000, i)
+    cache.purgeExpired(expiredInSeconds=500)
+    self.assertEqual(sorted(self.deleted), range(1, 499, 2))
+    self.assertEqual(len(cache.getKeys()), 751)
+
+    self.clock.now += 1001
+    cache.purgeExpired()
+    self.assertEqual(sorted(cache.getKeys()), range(0, 1000, 2))
+    self.assertEqual(sorted(self.deleted), range(1, 1000, 2))
+
+    cache.purgeAll()
+    self.assertEqual(cache.getKeys(), [])
+    self.assertEqual(sorted(self.deleted), range(1000))
+
+  def test_maxSize(self):
+    cache = DictCache(self.deleted.append, maxSize=4, shards=1)
+    for key in 'abcd':
+      cache.add(key, 100, key)
+    # 'a' becomes the most recently used
+    self.assertEqual(cache.get('a'), 'a')
+    cache.add('e', 100, 'e')
+    self.assertEqual(self.deleted, ['b'])
+    self.assertEqual(sorted(cache.getKeys()), ['a', 'c', 'd', 'e'])
+
+    # The expired records go first
+    cache.add('f', 1, 'f')
+    self.assertEqual(self.deleted, ['b', 'c'])
+    self.clock.now += 10
+    cache.add('g', 100, 'g')
+    self.assertEqual(self.deleted, ['b', 'c', 'f'])
+    self.assertEqual(sorted(cache.getKeys()), ['a', 'd', 'e', 'g'])
+
+  def test_maxSizeShards(self):
+    # The cache never holds more than maxSize records, whatever the number of shards
+    for maxSize, shards in ((5, 16), (100, 16), (1000, 7)):
+      cache = DictCache(maxSize=maxSize, shards=shards)
+      for key in xrange(3 * maxSize):
+        cache.add(key, 100, key)
+        self.assertLessEqual(len(cache.getKeys()), maxSize)
+      self.assertGreater(len(cache.getKeys()), 0)
+    # Less records than shards: a single shard keeps all of them
+    cache = DictCache(maxSize=5)
+    for key in xrange(15):
+      cache.add(key, 100, key)
+    self.assertEqual(sorted(cache.getKeys()), range(10, 15))
+
+  def test_threadLocal(self):
+    cache = DictCache(threadLocal=True)
+    cache.add('a', 10, 1)
+    values = []
+    thread = threading.Thread(target=lambda: values.append(cache.get('a')))
+    thread.start()
+    thread.join()
+    self.assertEqual(values, [None])
+    self.assertEqual(cache.get('a'), 1)
+
+  def test_concurrency(self):
+    cache = DictCache(self.deleted.append, maxSize=500)
+    errors = []
+
+    def worker(offset):
+      try:
+        for i in xrange(2000):
+          key = (offset + i) % 1000
+          if cache.get(key) not in (None, key):
+            errors.append(key)
+          cache.add(key, 1 + i % 5, key)
+          if i % 100 == 0:
+            cache.purgeExpired()
+      except Exception as x:  # pylint: disable=broad-except
+        errors.append(x)
+
+    threads = [threading.Thread(target=worker, args=(offset * 100,)) for offset in xrange(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(errors, [])
+    self.assertLessEqual(len(cache.getKeys()), 512)
+
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase(DictCacheTest)
+  unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,144 @@
+""" Test the bulk indexing of the ElasticSearchDB against a local stand-in of an Elasticsearch server
+"""
+
+import json
+import threading
+import time
+import unittest
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from DIRAC.Core.Utilities.ElasticSearchDB import ElasticSearchDB
+
+
+class FakeElasticsearch(ThreadingMixIn, HTTPServer):
+  """ Answers the bulk requests, rejecting once the documents with 'reject' in their Product,
+      and failing the documents with 'fail' in their Product
+  """
+  daemon_threads = True
+
+  def __init__(self):
+    HTTPServer.__init__(self, ('localhost', 0), FakeElasticsearchHandler)
+    self.lock = threading.Lock()
+    self.bulkRequests = []
+    self.documents = []
+    self.rejected = set()
+    self.concurrent = 0
+    self.maxConcurrent = 0
+    self.delay = 0
+
+
+class FakeElasticsearchHandler(BaseHTTPRequestHandler):
+
+  def log_message(self, *args):  # pylint: disable=arguments-differ
+    pass
+
+  def reply(self, code, body=None):
+    data = json.dumps(body) if body is not None else ''
+    self.send_response(code)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    if self.command != 'HEAD':
+      self.wfile.write(data)
+
+  def do_HEAD(self):
+    self.reply(200, {})
+
+  def do_GET(self):
+    self.reply(200, {'cluster_name': 'fake', 'version': {'number': '6.8.0'}})
+
+  def do_POST(self):
+    server = self.server
+    lines = self.rfile.read(int(self.headers['Content-Length'])).splitlines()
+    with server.lock:
+      server.concurrent += 1
+      server.maxConcurrent = max(server.maxConcurrent, server.concurrent)
+    time.sleep(server.delay)
+
+    items = []
+    with server.lock:
+      server.bulkRequests.append(len(lines) / 2)
+      for source in lines[1::2]:
+        document = json.loads(source)
+        if 'fail' in document['Product']:
+          items.append({'index': {'status': 400, 'error': 'mapper_parsing_exception'}})
+        elif 'reject' in document['Product'] and document['Product'] not in server.rejected:
+          server.rejected.add(document['Product'])
+          items.append({'index': {'status': 429, 'error': 'es_rejected_execution_exception'}})
+        else:
+          server.documents.append(document)
+          items.append({'index': {'status': 201, '_id': str(len(server.documents))}})
+      server.concurrent -= 1
+    self.reply(200, {'took': 1, 'errors': any(item['index']['status'] != 201 for item in items), 'items': items})
+
+
+class BulkIndexTest(unittest.TestCase):
+
+  def setUp(self):
+    self.server = FakeElasticsearch()
+    thread = threading.Thread(target=self.server.serve_forever)
+    thread.setDaemon(True)
+    thread.start()
+    self.addCleanup(self.server.server_close)
+    self.addCleanup(self.server.shutdown)
+    self.db = ElasticSearchDB('localhost', self.server.server_address[1], useSSL=False)
+    self.db.BULK_BACKOFF = 0.01
+
+  def documents(self, number, product='p'):
+    """ Generator of documents """
+    for i in xrange(number):
+      yield {'Product': '%s%d' % (product, i), 'quantity': i, 'timestamp': 1500000000 + i}
+
+  def test_chunks(self):
+    """ The documents of an iterator are sent by chunks of at most chunkSize documents and maxChunkBytes
+    """
+    result = self.db.streamingBulkIndex('index', 'type', self.documents(2500), chunkSize=1000, threads=1)
+    self.assertTrue(result['OK'])
+    self.assertEqual(result['Value']['Indexed'], 2500)
+    self.assertEqual(self.server.bulkRequests, [1000, 1000, 500])
+    self.assertEqual([chunk['Documents'] for chunk in result['Value']['Chunks']], [1000, 1000, 500])
+    self.assertEqual(self.server.documents[42]['timestamp'], 1500000042000)
+
+    self.server.bulkRequests = []
+    result = self.db.streamingBulkIndex('index', 'type', self.documents(100), chunkSize=1000, maxChunkBytes=3000)
+    self.assertEqual(result['Value']['Indexed'], 100)
+    self.assertEqual(sum(self.server.bulkRequests), 100)
+    self.assertGreater(len(self.server.bulkRequests), 3)
+    for chunk in result['Value']['Chunks']:
+      self.assertLessEqual(chunk['Bytes'], 3000)
+
+  def test_parallel(self):
+    """ Several bulk requests are sent at the same time
+    """
+    self.server.delay = 0.1
+    result = self.db.streamingBulkIndex('index', 'type', self.documents(1000), chunkSize=100, threads=4)
+    self.assertEqual(result['Value']['Indexed'], 1000)
+    self.assertEqual(len(self.server.documents), 1000)
+    self.assertEqual([chunk['Chunk'] for chunk in result['Value']['Chunks']], range(10))
+    self.assertGreater(self.server.maxConcurrent, 1)
+    self.assertLessEqual(self.server.maxConcurrent, 4)
+
+  def test_errors(self):
+    """ The rejected documents are sent again, the failed ones are reported
+    """
+    documents = list(self.documents(200)) + [{'Product': 'reject%d' % i, 'timestamp': 1} for i in xrange(5)]
+    documents.append({'Product': 'fail', 'timestamp': 1})
+    result = self.db.streamingBulkIndex('index', 'type', documents, chunkSize=50, threads=2)
+    self.assertEqual(result['Value']['Indexed'], 205)
+    self.assertEqual(result['Value']['Failed'], 1)
+    self.assertEqual(len(result['Value']['Errors']), 1)
+
+    result = self.db.streamingBulkIndex('index', 'type', [{'Product': 'reject', 'timestamp': 1}], maxRetries=0)
+    self.assertEqual(result['Value']['Failed'], 1)
+
+    # bulk_index fails if a document is not indexed
+    result = self.db.bulk_index('index', 'type', documents, period='month')
+    self.assertFalse(result['OK'])
+    result = self.db.bulk_index('index', 'type', self.documents(10), period='month')
+    self.assertEqual(result['Value'], 10)
+
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase(BulkIndexTest)
+  unittest.TextTestRunner(verbosity=2).run(suite)
@@ -14,6 +14,7 @@ import sys
 
 
 from DIRAC.Core.Utilities.DEncode import encode as disetEncode, decode as disetDecode, g_dEncodeFunctions
+from DIRAC.Core.Utilities.DEncode import encodeBinary, decodeBinary, decodeAny
 from DIRAC.Core.Utilities.JEncode import encode as jsonEncode, decode as jsonDecode, JSerializable
 
 from hypothesis import given
@@ -30,9 +31,10 @@ parametrize = mark.parametrize
 # function, and add the tuple here
 
 disetTuple = (disetEncode, disetDecode)
+binaryTuple = (encodeBinary, decodeBinary)
 jsonTuple = (jsonEncode, jsonDecode)
 
-enc_dec_imp = (disetTuple, jsonTuple)
+enc_dec_imp = (disetTuple, binaryTuple, jsonTuple)
 
 
 # We define a custom datetime strategy in order
@@ -128,7 +130,7 @@ def test_BaseType_DateTime(enc_dec, data):
 
 
 # Json does not serialize keys as integers but as string
-@parametrize('enc_dec', [disetTuple])
+@parametrize('enc_dec', [disetTuple, binaryTuple])
 @given(data=dictionaries(integers(), integers()))
 def test_BaseType_Dict(enc_dec, data):
   """ Test for basic dict"""
@@ -185,7 +187,7 @@ def test_BaseType_String(enc_dec, data):
 
 
 # Tuple are not serialized in JSON
-@parametrize('enc_dec', [disetTuple])
+@parametrize('enc_dec', [disetTuple, binaryTuple])
 @given(data=tuples(integers()))
 def test_BaseType_Tuple(enc_dec, data):
   """ Test basic tuple """
@@ -200,7 +202,7 @@ def test_BaseType_Unicode(enc_dec, data):
 
 
 # Json will not pass this because of tuples and integers as dict keys
-@parametrize('enc_dec', [disetTuple])
+@parametrize('enc_dec', [disetTuple, binaryTuple])
 @given(data=nestedStrategy)
 def test_nestedStructure(enc_dec, data):
   """ Test nested structure """
@@ -286,3 +288,34 @@ def test_nestedSerializable(data):
   subObj = Serializable(instAttr=data)
   objData = Serializable(instAttr=subObj)
   agnosticTestFunction(jsonTuple, objData)
+
+
+@given(data=nestedStrategy)
+def test_decodeAny(data):
+  """ decodeAny understands both DISET wire versions """
+  for encode in (disetEncode, encodeBinary):
+    encodedData = encode(data)
+    decodedData, lenData = decodeAny(encodedData)
+    assert data == decodedData
+    assert lenData == len(encodedData)
+
+
+@given(data=dictionaries(text(printable), lists(text(printable))))
+def test_binaryHomogeneousContainers(data):
+  """ Test the fast paths of the binary encoding: lists of str, dicts of str """
+  data = dict((str(key), [str(item) for item in value]) for key, value in data.iteritems())
+  agnosticTestFunction(binaryTuple, data)
+  strDict = dict((key, ''.join(value)) for key, value in data.iteritems())
+  agnosticTestFunction(binaryTuple, strDict)
+
+
+@given(data=lists(integers()))
+def test_binaryIntList(data):
+  """ Lists of ints, including the ones that do not fit in 64 bits """
+  agnosticTestFunction(binaryTuple, data)
+
+
+def test_binaryFloatIsExact():
+  """ Unlike version 1, floats are transmitted bit for bit """
+  data = [0.1, 1. / 3, 2.0 * 10 ** 20, 2.0 * 10 ** -10]
+  assert decodeBinary(encodeBinary(data))[0] == data
@@ -0,0 +1,59 @@
+""" Test the multi-row statements of the MySQL class, without a DB
+"""
+
+# pylint: disable=protected-access
+
+from mock import MagicMock, patch
+
+from DIRAC import S_OK
+from DIRAC.Core.Utilities.MySQL import MySQL
+
+
+def escapeValues(inValues):
+  return S_OK(['"%s"' % value for value in inValues])
+
+
+def getDB():
+  with patch.object(MySQL, '_connect', return_value=S_OK()):
+    db = MySQL(dbName='TestDB')
+  db._escapeValues = MagicMock(side_effect=escapeValues)
+  db._update = MagicMock(side_effect=lambda cmd, debug=False: S_OK(cmd.count('), (') + 1))
+  db.transactionStart = MagicMock(return_value=S_OK())
+  db.transactionCommit = MagicMock(return_value=S_OK())
+  db.transactionRollback = MagicMock(return_value=S_OK())
+  return db
+
+
+def test_insertMany():
+  db = getDB()
+  rows = [[i, 'name%d' % i] for i in xrange(5)]
+  result = db.insertMany('Table', ['ID', 'Name'], rows, chunkSize=2)
+  assert result['OK'], result
+  assert result['Value'] == 5
+  statements = [call[0][0] for call in db._update.call_args_list]
+  assert statements[0] == 'INSERT INTO `Table` ( `ID`, `Name` ) VALUES ( "0", "name0" ), ( "1", "name1" )'
+  assert len(statements) == 3
+  assert not db.transactionStart.called
+
+  assert db.insertMany('Table', ['ID', 'Name'], [])['Value'] == 0
+  assert not db.insertMany('Table', ['ID', 'Name'], [[1]])['OK']
+
+
+def test_atomic():
+  db = getDB()
+  assert db.insertMany('Table', ['ID'], [[i] for i in xrange(5)], chunkSize=2, atomic=True)['OK']
+  assert db.transactionStart.called and db.transactionCommit.called
+
+  db = getDB()
+  db._update.side_effect = [S_OK(2), {'OK': False, 'Message': 'Duplicate entry'}]
+  assert not db.insertMany('Table', ['ID'], [[i] for i in xrange(5)], chunkSize=2, atomic=True)['OK']
+  assert db.transactionRollback.called
+  assert not db.transactionCommit.called
+
+
+def test_upsertMany():
+  db = getDB()
+  assert db.upsertMany('Table', ['ID', 'Name', 'Value'], [[1, 'a', 'b']], updateFields=['Value'])['OK']
+  assert db._update.call_args[0][0] == 'INSERT INTO `Table` ( `ID`, `Name`, `Value` ) VALUES ( "1", "a", "b" )' \
+                                       ' ON DUPLICATE KEY UPDATE `Value` = VALUES( `Value` )'
+  assert not db.upsertMany('Table', ['ID'], [[1]], updateFields=[])['OK']
@@ -11,6 +11,7 @@ This module consists of DataManager and related classes.
 
 # # imports
 from datetime import datetime, timedelta
+from multiprocessing.pool import ThreadPool
 import fnmatch
 import os
 import time
@@ -24,6 +25,8 @@ from DIRAC.Core.Utilities.Adler import fileAdler, compareAdler
 from DIRAC.Core.Utilities.File import makeGuid, getSize
 from DIRAC.Core.Utilities.List import randomize, breakListIntoChunks
 from DIRAC.Core.Utilities.ReturnValues import returnSingleResult
+from DIRAC.Core.Utilities.DictCache import DictCache
+from DIRAC.Core.DISET.ThreadConfig import ThreadConfig
 from DIRAC.Core.Security.ProxyInfo import getProxyInfo
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.AccountingSystem.Client.DataStoreClient import gDataStoreClient
@@ -36,6 +39,9 @@ from DIRAC.ResourceStatusSystem.Client.ResourceStatus import ResourceStatus
 # # RSCID
 __RCSID__ = "$Id$"
 
+# ( vo, SE, protocols, LFN ) -> URL, shared by the DataManager instances of the process
+gURLCache = DictCache()
+
 
 def _isOlderThan(stringTime, days):
   """ Check if a time stamp is older than a given number of days """
@@ -107,6 +113,12 @@ class DataManager(object):
         'DataManagement/IgnoreMissingInFC', False)
     self.useCatalogPFN = Operations(vo=self.voName).getValue(
         'DataManagement/UseCatalogPFN', True)
+    # Number of chunks of LFNs whose replicas are queried concurrently
+    self.replicaQueryThreads = Operations(vo=self.voName).getValue(
+        'DataManagement/ReplicaQueryThreads', 1)
+    # Lifetime of the URLs of the replicas in gURLCache, 0 for no cache
+    self.urlCacheLifetime = Operations(vo=self.voName).getValue(
+        'DataManagement/ReplicaURLCacheLifetime', 0)
     self.dmsHelper = DMSHelpers(vo=vo)
     self.registrationProtocol = self.dmsHelper.getRegistrationProtocols()
     self.thirdPartyProtocols = self.dmsHelper.getThirdPartyProtocols()
@@ -1681,39 +1693,85 @@ class DataManager(object):
     """ returns the value of a certain SE status flag (access or other) """
     return StorageElement(se, vo=self.voName).status().get(status, False)
 
+  def __getCatalogReplicas(self, lfns, allStatus):
+    """ Get the replicas from the catalog by chunks of LFNs, concurrently
+    if ReplicaQueryThreads is more than 1
+
+    :return: generator of the catalog results of the chunks, as they arrive
+    """
+    lfnChunks = breakListIntoChunks(lfns, 1000)
+    nThreads = min(self.replicaQueryThreads, len(lfnChunks))
+    if nThreads < 2:
+      for lfnChunk in lfnChunks:
+        yield self.fileCatalog.getReplicas(lfnChunk, allStatus=allStatus)
+      return
+
+    # The credentials of a call on behalf of somebody else are thread local
+    threadConfig = ThreadConfig().dump()
+
+    def getChunkReplicas(lfnChunk):
+      ThreadConfig().load(threadConfig)
+      return self.fileCatalog.getReplicas(lfnChunk, allStatus=allStatus)
+
+    pool = ThreadPool(nThreads)
+    try:
+      for res in pool.imap_unordered(getChunkReplicas, lfnChunks):
+        yield res
+    finally:
+      # Drop the chunks not queried yet if we stopped before the end
+      pool.terminate()
+
+  def __setReplicaURLs(self, replicas, seObjects):
+    """ Set the URLs of the registration protocols as values of the replicas,
+    taking them from gURLCache if possible
+    The input argument is modified
+
+    :param dict replicas: { lfn : { se : catalog PFN } }
+    :param dict seObjects: StorageElement objects already created, by name
+    """
+    protocols = tuple(self.registrationProtocol)
+    # We group the query to getURL by storage element to gain in speed
+    se_lfn = {}
+    for lfn, lfnReplicas in replicas.iteritems():
+      for se in lfnReplicas:
+        url = gURLCache.get((self.voName, se, protocols, lfn)) if self.urlCacheLifetime else None
+        if url is None:
+          se_lfn.setdefault(se, []).append(lfn)
+        else:
+          lfnReplicas[se] = url
+
+    for se, seLFNs in se_lfn.iteritems():
+      seObj = seObjects.get(se)
+      if seObj is None:
+        seObj = seObjects[se] = StorageElement(se, vo=self.voName)
+      succPfn = seObj.getURL(seLFNs,
+                             protocol=self.registrationProtocol).get('Value', {}).get('Successful', {})
+      for lfn, url in succPfn.iteritems():
+        replicas[lfn][se] = url
+        if self.urlCacheLifetime:
+          gURLCache.add((self.voName, se, protocols, lfn), self.urlCacheLifetime, url)
+
   def getReplicas(self, lfns, allStatus=True, getUrl=True, diskOnly=False, preferDisk=False, active=False):
     """ get replicas from catalogue and filter if requested
     Warning: all filters are independent, hence active and preferDisk should be set if using forJobs
+
+    The catalog is queried by chunks of 1000 LFNs, ReplicaQueryThreads chunks at a time,
+    and the URLs of the replicas of a chunk are computed as soon as it arrives
     """
     catalogReplicas = {}
     failed = {}
-    for lfnChunk in breakListIntoChunks(lfns, 1000):
-      res = self.fileCatalog.getReplicas(lfnChunk, allStatus=allStatus)
-      if res['OK']:
-        catalogReplicas.update(res['Value']['Successful'])
-        failed.update(res['Value']['Failed'])
-      else:
+    seObjects = {}
+    for res in self.__getCatalogReplicas(lfns, allStatus):
+      if not res['OK']:
         return res
-    if not getUrl:
-      for lfn in catalogReplicas:
-        catalogReplicas[lfn] = dict.fromkeys(catalogReplicas[lfn], True)
-    elif not self.useCatalogPFN:
-      if res['OK']:
-        se_lfn = {}
-
-        # We group the query to getURL by storage element to gain in speed
-        for lfn in catalogReplicas:
-          for se in catalogReplicas[lfn]:
-            se_lfn.setdefault(se, []).append(lfn)
-
-        for se in se_lfn:
-          seObj = StorageElement(se, vo=self.voName)
-          succPfn = seObj.getURL(se_lfn[se],
-                                 protocol=self.registrationProtocol).get('Value', {}).get('Successful', {})
-          for lfn in succPfn:
-            # catalogReplicas still points res["value"]["Successful"] so res
-            # will be updated
-            catalogReplicas[lfn][se] = succPfn[lfn]
+      chunkReplicas = res['Value']['Successful']
+      if not getUrl:
+        for lfn in chunkReplicas:
+          chunkReplicas[lfn] = dict.fromkeys(chunkReplicas[lfn], True)
+      elif not self.useCatalogPFN:
+        self.__setReplicaURLs(chunkReplicas, seObjects)
+      catalogReplicas.update(chunkReplicas)
+      failed.update(res['Value']['Failed'])
 
     result = {'Successful': catalogReplicas, 'Failed': failed}
     if active:
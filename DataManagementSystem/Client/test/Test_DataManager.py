@@ -0,0 +1,122 @@
+""" Unit tests for the getReplicas method of the DataManager
+"""
+
+# pylint: disable=protected-access
+
+import threading
+import time
+import unittest
+from mock import MagicMock, patch
+
+from DIRAC import S_OK
+from DIRAC.Core.Utilities.DictCache import DictCache
+import DIRAC.DataManagementSystem.Client.DataManager as moduleTested
+
+
+class FakeCatalog(object):
+  """ Catalog returning 2 replicas for the LFNs, and failing the ones containing 'missing'
+  """
+
+  def __init__(self):
+    self.calls = 0
+    self.concurrent = 0
+    self.maxConcurrent = 0
+    self.lock = threading.Lock()
+
+  def getReplicas(self, lfns, allStatus=False):  # pylint: disable=unused-argument
+    with self.lock:
+      self.calls += 1
+      self.concurrent += 1
+      self.maxConcurrent = max(self.maxConcurrent, self.concurrent)
+    time.sleep(0.05)
+    with self.lock:
+      self.concurrent -= 1
+    successful = dict((lfn, {'SE1': 'pfn1:%s' % lfn, 'SE2': 'pfn2:%s' % lfn}) for lfn in lfns if 'missing' not in lfn)
+    failed = dict((lfn, 'No such file or directory') for lfn in lfns if 'missing' in lfn)
+    return S_OK({'Successful': successful, 'Failed': failed})
+
+
+def fakeStorageElement(seName, vo=None):  # pylint: disable=unused-argument
+  """ StorageElement building the URLs from the SE name
+  """
+  seObj = MagicMock()
+  seObj.getURL.side_effect = lambda lfns, protocol=None: S_OK({'Successful': dict((lfn, '%s://%s' % (seName, lfn))
+                                                                                  for lfn in lfns),
+                                                               'Failed': {}})
+  return seObj
+
+
+class GetReplicas(unittest.TestCase):
+  """ Tests of DataManager.getReplicas
+  """
+
+  def setUp(self):
+    for name in ('FileCatalog', 'ResourceStatus', 'Operations', 'DMSHelpers'):
+      patcher = patch.object(moduleTested, name)
+      patcher.start()
+      self.addCleanup(patcher.stop)
+    patcher = patch.object(moduleTested, 'StorageElement', side_effect=fakeStorageElement)
+    self.mockSE = patcher.start()
+    self.addCleanup(patcher.stop)
+    patcher = patch.object(moduleTested, 'gURLCache', DictCache())
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+    self.dm = moduleTested.DataManager()
+    self.catalog = FakeCatalog()
+    self.dm.fileCatalog = self.catalog
+    self.dm.useCatalogPFN = False
+    self.dm.registrationProtocol = ['srm']
+    self.dm.replicaQueryThreads = 1
+    self.dm.urlCacheLifetime = 0
+    self.lfns = ['/vo/file%d' % i for i in xrange(4500)] + ['/vo/missing']
+
+  def __checkResult(self, res):
+    self.assertTrue(res['OK'])
+    self.assertEqual(sorted(res['Value']['Successful']), sorted(self.lfns[:-1]))
+    self.assertEqual(res['Value']['Failed'].keys(), ['/vo/missing'])
+    for lfn, replicas in res['Value']['Successful'].iteritems():
+      self.assertEqual(replicas, {'SE1': 'SE1://%s' % lfn, 'SE2': 'SE2://%s' % lfn})
+
+  def test_sequential(self):
+    self.__checkResult(self.dm.getReplicas(self.lfns))
+    self.assertEqual(self.catalog.calls, 5)
+    self.assertEqual(self.catalog.maxConcurrent, 1)
+    # One StorageElement object per SE
+    self.assertEqual(self.mockSE.call_count, 2)
+
+    # Without URLs
+    res = self.dm.getReplicas(self.lfns, getUrl=False)
+    self.assertEqual(res['Value']['Successful']['/vo/file0'], {'SE1': True, 'SE2': True})
+
+  def test_concurrent(self):
+    self.dm.replicaQueryThreads = 3
+    self.__checkResult(self.dm.getReplicas(self.lfns))
+    self.assertEqual(self.catalog.calls, 5)
+    self.assertGreater(self.catalog.maxConcurrent, 1)
+    self.assertLessEqual(self.catalog.maxConcurrent, 3)
+
+  def test_catalogError(self):
+    self.dm.replicaQueryThreads = 3
+    self.catalog.getReplicas = MagicMock(return_value={'OK': False, 'Message': 'Catalog down'})
+    res = self.dm.getReplicas(self.lfns)
+    self.assertFalse(res['OK'])
+    self.assertEqual(res['Message'], 'Catalog down')
+
+  def test_urlCache(self):
+    self.dm.urlCacheLifetime = 60
+    self.__checkResult(self.dm.getReplicas(self.lfns))
+    getURLCalls = self.mockSE.call_count
+    # The URLs come from the cache the second time
+    self.__checkResult(self.dm.getReplicas(self.lfns))
+    self.assertEqual(self.mockSE.call_count, getURLCalls)
+
+    # Other protocols, other URLs
+    self.dm.registrationProtocol = ['root']
+    self.__checkResult(self.dm.getReplicas(self.lfns))
+    self.assertGreater(self.mockSE.call_count, getURLCalls)
+
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase(GetReplicas)
+  unittest.TextTestRunner(verbosity=2).run(suite)
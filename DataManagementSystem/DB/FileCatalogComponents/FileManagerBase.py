@@ -1354,3 +1354,18 @@ class FileManagerBase(object):
         :returns: S_OK with list of tuples (lfn, checksum, size)
     """
     return S_ERROR("To be implemented on derived class")
+
+  def streamSEDump(self, seName, chunkSize=10000):
+    """
+         Same as getSEDump, by chunks of files. Managers that can't stream return
+         the whole dump as a single chunk
+
+        :param seName: name of the StorageElement
+        :param int chunkSize: number of files per chunk
+
+        :returns: S_OK with an iterable of lists of tuples (lfn, checksum, size)
+    """
+    res = self.getSEDump(seName)
+    if not res['OK']:
+      return res
+    return S_OK([res['Value']])
@@ -937,3 +937,20 @@ class FileManagerPs(FileManagerBase):
     seID = res['Value']
 
     return self.db.executeStoredProcedureWithCursor('ps_get_se_dump', (seID,))
+
+  def streamSEDump(self, seName, chunkSize=10000):
+    """
+         Same as getSEDump, the files are read from the DB as they are consumed
+
+        :param seName: name of the StorageElement
+        :param int chunkSize: number of files per chunk
+
+        :returns: S_OK with a generator of lists of tuples (lfn, checksum, size)
+    """
+
+    res = self.db.seManager.findSE(seName)
+    if not res['OK']:
+      return res
+    seID = res['Value']
+
+    return self.db.executeStoredProcedureWithStream('ps_get_se_dump', (seID,), chunkSize=chunkSize)
@@ -1186,3 +1186,14 @@ class FileCatalogDB(DB):
         :returns: S_OK with list of tuples (lfn, checksum, size)
     """
     return self.fileManager.getSEDump(seName)
+
+  def streamSEDump(self, seName, chunkSize=10000):
+    """
+         Same as getSEDump, but the files are read from the DB as they are consumed
+
+        :param seName: name of the StorageElement
+        :param int chunkSize: number of files per chunk
+
+        :returns: S_OK with a generator of lists of tuples (lfn, checksum, size)
+    """
+    return self.fileManager.streamSEDump(seName, chunkSize=chunkSize)
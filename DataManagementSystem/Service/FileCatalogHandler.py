@@ -740,10 +740,24 @@ class FileCatalogHandler(RequestHandler):
     """
     return gFileCatalogDB.getSEDump(seName)['Value']
 
+  @staticmethod
+  def __formatSEDump(chunks):
+    """ Format the chunks of the SEDump as CSV with '|' separation, one chunk at a time
+    """
+    for chunk in chunks:
+      csvOutput = cStringIO.StringIO()
+      writer = csv.writer(csvOutput, delimiter='|')
+      writer.writerows(chunk)
+      yield csvOutput.getvalue()
+      csvOutput.close()
+
   def transfer_toClient(self, seName, token, fileHelper):
     """ This method used to transfer the SEDump to the client,
         formated as CSV with '|' separation
 
+        The files are read from the DB, formatted and sent by chunks, the dump is never
+        entirely in memory
+
         :param seName: name of the se to dump
 
         :returns: the result of the FileHelper
@@ -751,21 +765,13 @@ class FileCatalogHandler(RequestHandler):
 
     """
 
-    retVal = self.getSEDump(seName)
+    retVal = gFileCatalogDB.streamSEDump(seName)
+    if not retVal['OK']:
+      fileHelper.markAsTransferred()
+      return retVal
 
     try:
-      csvOutput = cStringIO.StringIO()
-      writer = csv.writer(csvOutput, delimiter='|')
-      for lfn in retVal:
-        writer.writerow(lfn)
-
-      csvOutput.seek(0)
-
-      ret = fileHelper.DataSourceToNetwork(csvOutput)
-      return ret
-
+      return fileHelper.iterableToNetwork(self.__formatSEDump(retVal['Value']))
     except Exception as e:
       gLogger.exception("Exception while sending seDump", repr(e))
       return S_ERROR("Exception while sendind seDump: %s" % repr(e))
-    finally:
-      csvOutput.close()
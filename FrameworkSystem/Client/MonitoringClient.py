@@ -5,6 +5,7 @@
 
 __RCSID__ = "$Id"
 
+import threading
 import time
 import types
 
@@ -53,8 +54,23 @@ class MonitoringFlusher( object ):
 
 gMonitoringFlusher = MonitoringFlusher()
 
+class MarksAccumulator( object ):
+  """
+  Marks added by a thread, aggregated per activity and bucket as [ number of marks, sum of the values ].
+  Only the thread and the flush take its lock, so that the threads adding marks do not wait for each other.
+  """
+  __slots__ = ( 'lock', 'marks', 'thread' )
+
+  def __init__( self ):
+    self.lock = threading.Lock()
+    self.marks = {}
+    self.thread = threading.current_thread()
+
 class MonitoringClient( object ):
   """ It accumulates monitoring info from components before flushing using gMonitoringFlusher
+
+      Each thread aggregates its marks per activity and bucket in its own MarksAccumulator,
+      they are merged when flushing.
   """
 
   # Different types of operations
@@ -85,6 +101,12 @@ class MonitoringClient( object ):
     self.__compCommitExtraDict = {}
     self.__activitiesLock = None  # threading.Lock()
     self.__flushingLock = None  # threading.Lock()
+    # Accumulator of the marks of the current thread
+    self.__threadMarks = threading.local()
+    # Accumulators of all the threads, protected by the activities lock
+    self.__accumulators = []
+    # ( wall clock second, epoch in seconds ) of the last step time computed
+    self.__lastEpoch = ( None, 0 )
     self.timeStep = 60
     self.__initialized = False
     self.__enabled = True
@@ -207,9 +229,29 @@ class MonitoringClient( object ):
 
   def __UTCStepTime( self, acName ):
     stepLength = self.activitiesDefinitions[ acName ][ 'bucketLength' ]
-    nowEpoch = int( Time.toEpoch() )
+    # The epoch changes only once per second
+    now = int( time.time() )
+    lastEpoch = self.__lastEpoch
+    if lastEpoch[0] != now:
+      lastEpoch = ( now, int( Time.toEpoch() ) )
+      self.__lastEpoch = lastEpoch
+    nowEpoch = lastEpoch[1]
     return nowEpoch - nowEpoch % stepLength
 
+  def __getAccumulator( self ):
+    """ Get the accumulator of the marks of the current thread, creating it the first time
+    """
+    accumulator = getattr( self.__threadMarks, 'accumulator', None )
+    if accumulator is None:
+      accumulator = MarksAccumulator()
+      self.activitiesLock.acquire()
+      try:
+        self.__accumulators.append( accumulator )
+      finally:
+        self.activitiesLock.release()
+      self.__threadMarks.accumulator = accumulator
+    return accumulator
+
   def addMark( self, name, value = 1 ):
     """
     Add a new mark to the specified activity
@@ -229,22 +271,46 @@ class MonitoringClient( object ):
     if type( value ) not in self.__validMonitoringValues:
       raise MonitoringClientActivityValueTypeError( "Activity '%s' value's type (%s) is not valid" % ( name, type( value ) ) )
       # raise Exception( "Value's type %s is not valid" % value )
-    self.activitiesLock.acquire()
-    try:
-      self.logger.debug( "Adding mark to %s" % name )
-      markTime = self.__UTCStepTime( name )
-      if markTime in self.activitiesMarks[ name ]:
-        self.activitiesMarks[ name ][ markTime ].append( value )
+    markTime = self.__UTCStepTime( name )
+    accumulator = self.__getAccumulator()
+    with accumulator.lock:
+      activityMarks = accumulator.marks.get( name )
+      if activityMarks is None:
+        activityMarks = accumulator.marks[ name ] = {}
+      bucket = activityMarks.get( markTime )
+      if bucket is None:
+        activityMarks[ markTime ] = [ 1, value ]
       else:
-        self.activitiesMarks[ name ][ markTime ] = [ value ]
-    finally:
-      self.activitiesLock.release()
+        bucket[0] += 1
+        bucket[1] += value
+
+  def __collectMarks( self ):
+    """
+      Merge the marks of all the threads in activitiesMarks, the activities lock must be held
+    """
+    for accumulator in list( self.__accumulators ):
+      with accumulator.lock:
+        threadMarks = accumulator.marks
+        accumulator.marks = {}
+      for acName, activityMarks in threadMarks.iteritems():
+        marks = self.activitiesMarks.setdefault( acName, {} )
+        for markTime, ( count, totalValue ) in activityMarks.iteritems():
+          bucket = marks.get( markTime )
+          if bucket is None:
+            marks[ markTime ] = [ count, totalValue ]
+          else:
+            bucket[0] += count
+            bucket[1] += totalValue
+      # A dead thread does not add marks anymore
+      if not accumulator.thread.is_alive():
+        self.__accumulators.remove( accumulator )
 
   def __consolidateMarks( self, allData ):
     """
       Copies all marks except last step ones
       and consolidates them
     """
+    self.__collectMarks()
     consolidatedMarks = {}
     remainderMarks = {}
     for key in self.activitiesMarks:
@@ -259,13 +325,10 @@ class MonitoringClient( object ):
         if markTime >= lastStepToSend:
           remainderMarks[ key ][ markTime ] = markValue
         else:
-          consolidatedMarks[ key ][ markTime ] = markValue
           # Consolidate the copied ones
-          totalValue = 0
-          for mark in consolidatedMarks[ key ][ markTime ]:
-            totalValue += mark
+          count, totalValue = markValue
           if self.activitiesDefinitions[ key ][ 'type' ] == self.OP_MEAN:
-            totalValue /= len( consolidatedMarks[ key ][ markTime ] )
+            totalValue /= count
           consolidatedMarks[ key ][ markTime ] = totalValue
       if len( consolidatedMarks[ key ] ) == 0:
         del( consolidatedMarks[ key ] )
@@ -0,0 +1,79 @@
+""" Test the aggregation of the marks of the MonitoringClient
+"""
+
+# pylint: disable=protected-access
+
+import threading
+import unittest
+from mock import MagicMock, patch
+
+import DIRAC.FrameworkSystem.Client.MonitoringClient as moduleTested
+from DIRAC.FrameworkSystem.Client.MonitoringClient import MonitoringClient
+
+
+class MonitoringClientTest(unittest.TestCase):
+
+  def setUp(self):
+    self.now = 1000
+    fakeTime = MagicMock()
+    fakeTime.time.side_effect = lambda: self.now
+    fakeTime.toEpoch.side_effect = lambda: self.now
+    for module in ('time', 'Time'):
+      patcher = patch.object(moduleTested, module, fakeTime)
+      patcher.start()
+      self.addCleanup(patcher.stop)
+
+    self.monitor = MonitoringClient()
+    self.monitor.setComponentType(MonitoringClient.COMPONENT_SCRIPT)
+    self.monitor.initialize()
+    self.monitor.registerActivity('acum', 'Acum', 'Test', 'marks', MonitoringClient.OP_ACUM)
+    self.monitor.registerActivity('mean', 'Mean', 'Test', 'marks', MonitoringClient.OP_MEAN)
+
+  def consolidate(self, allData=False):
+    return self.monitor._MonitoringClient__consolidateMarks(allData)
+
+  def test_threads(self):
+    """ The marks of all the threads are aggregated
+    """
+    def worker():
+      for i in xrange(1000):
+        self.monitor.addMark('acum')
+        self.monitor.addMark('mean', float(i % 10))
+
+    threads = [threading.Thread(target=worker) for _i in xrange(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.monitor.addMark('acum', 2)
+
+    # The current bucket is not sent
+    self.assertEqual(self.consolidate(), {})
+    self.now = 1070
+    self.assertEqual(self.consolidate(), {'acum': {960: 8002}, 'mean': {960: 4.5}})
+    # The accumulators of the finished threads are dropped
+    self.assertEqual(len(self.monitor._MonitoringClient__accumulators), 1)
+
+  def test_buckets(self):
+    """ The marks go in the bucket of their time, the current bucket is sent with all the data
+    """
+    self.monitor.addMark('mean', 1)
+    self.monitor.addMark('mean', 2)
+    self.now = 1030
+    self.monitor.addMark('mean', 3)
+    self.now = 1090
+    self.monitor.addMark('mean', 5)
+    self.assertEqual(self.consolidate(), {'mean': {960: 1, 1020: 3}})
+    self.monitor.addMark('mean', 7)
+    self.now = 1091
+    self.assertEqual(self.consolidate(allData=True), {'mean': {1080: 6}})
+    self.assertEqual(self.consolidate(allData=True), {})
+
+  def test_errors(self):
+    self.assertRaises(moduleTested.MonitoringClientActivityNotDefined, self.monitor.addMark, 'unknown')
+    self.assertRaises(moduleTested.MonitoringClientActivityValueTypeError, self.monitor.addMark, 'acum', '1')
+
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase(MonitoringClientTest)
+  unittest.TextTestRunner(verbosity=2).run(suite)
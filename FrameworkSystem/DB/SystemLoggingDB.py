@@ -454,6 +454,68 @@ class SystemLoggingDB( DB ):
 
     return self.insertFields( 'MessageRepository', fieldsList, messageList )
 
+  def insertMessages( self, messages, site, nodeFQDN, userDN, userGroup, remoteAddress ):
+    """ This function inserts a list of Log messages coming from the same client into the DB.
+        The auxiliary tables are queried once per distinct value, and the messages are
+        inserted with multi-row statements.
+    """
+    result = self.__insertIntoAuxiliaryTable( 'UserDNs', [ 'UserDNID' ], [ 'OwnerDN', 'OwnerGroup' ],
+                                              [ userDN, userGroup ] )
+    if not result['OK']:
+      return result
+    userDNIDKey = result['Value']
+
+    result = self.__insertIntoAuxiliaryTable( 'Sites', [ 'SiteID' ], [ 'SiteName' ], [ site or 'Unknown' ] )
+    if not result['OK']:
+      return result
+    result = self.__insertIntoAuxiliaryTable( 'ClientIPs', [ 'ClientIPNumberID' ],
+                                              [ 'ClientIPNumberString' , 'ClientFQDN', 'SiteID' ],
+                                              [ remoteAddress, nodeFQDN, result['Value'] ] )
+    if not result['OK']:
+      return result
+    clientIPIDKey = result['Value']
+
+    # ( table, value ) -> ID of the value in the table
+    auxiliaryIDs = {}
+    auxiliaryTables = { 'Systems' : ( [ 'SystemID' ], [ 'SystemName' ] ),
+                        'SubSystems' : ( [ 'SubSystemID' ], [ 'SubSystemName', 'SystemID' ] ),
+                        'FixedTextMessages' : ( [ 'FixedTextID' ], [ 'FixedTextString', 'SubSystemID' ] ) }
+
+    def getAuxiliaryID( tableName, inValues ):
+      """ Get the ID of the values in an auxiliary table, inserting them if needed
+      """
+      key = ( tableName, tuple( inValues ) )
+      if key not in auxiliaryIDs:
+        outFields, inFields = auxiliaryTables[tableName]
+        result = self.__insertIntoAuxiliaryTable( tableName, outFields, inFields, inValues )
+        if not result['OK']:
+          return result
+        auxiliaryIDs[key] = result['Value']
+      return S_OK( auxiliaryIDs[key] )
+
+    fieldsList = [ 'MessageTime', 'VariableText', 'UserDNID', 'ClientIPNumberID', 'LogLevel', 'FixedTextID' ]
+    messageRows = []
+    for message in messages:
+      messageDate = Time.toString( message.getTime() )
+      messageDate = messageDate[:messageDate.find( '.' )]
+
+      result = getAuxiliaryID( 'Systems', [ message.getName() or 'Unknown' ] )
+      if not result['OK']:
+        return result
+      result = getAuxiliaryID( 'SubSystems', [ message.getSubSystemName() or 'Unknown', result['Value'] ] )
+      if not result['OK']:
+        return result
+      result = getAuxiliaryID( 'FixedTextMessages', [ message.getFixedMessage(), result['Value'] ] )
+      if not result['OK']:
+        return result
+
+      messageRows.append( [ messageDate, message.getVariableMessage(), userDNIDKey, clientIPIDKey,
+                            message.getLevel(), result['Value'] ] )
+
+    if not messageRows:
+      return S_OK( 0 )
+    return self.insertMany( 'MessageRepository', fieldsList, messageRows )
+
   def _insertDataIntoAgentTable( self, agentName, data ):
     """Insert the persistent data needed by the agents running on top of
        the SystemLoggingDB.
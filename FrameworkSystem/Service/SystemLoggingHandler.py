@@ -5,12 +5,16 @@ in the DISET framework.
 The following methods are available in the Service interface::
 
     addMessages()
+    addMessagesCompressed()
 
 """
 
 __RCSID__ = "$Id$"
 
+import zlib
+
 from DIRAC import S_OK, S_ERROR, gLogger
+from DIRAC.Core.Utilities import DEncode
 from DIRAC.Core.DISET.RequestHandler import RequestHandler
 from DIRAC.FrameworkSystem.private.standardLogging.Message import tupleToMessage
 from DIRAC.FrameworkSystem.DB.SystemLoggingDB import SystemLoggingDB
@@ -36,10 +40,10 @@ class SystemLoggingHandler(RequestHandler):
   """ This is server
   """
 
-  def __addMessage(self, messageObject, site, nodeFQDN):
+  def __addMessages(self, messagesList, site, nodeFQDN):
     """
-    This is the function that actually adds the Message to
-    the log Database
+    This is the function that actually adds the Messages to
+    the log Database, all together
     """
     credentials = self.getRemoteCredentials()
     if 'DN' in credentials:
@@ -52,7 +56,13 @@ class SystemLoggingHandler(RequestHandler):
       userGroup = 'unknown'
 
     remoteAddress = self.getRemoteAddress()[0]
-    return gLogDB.insertMessage(messageObject, site, nodeFQDN, userDN, userGroup, remoteAddress)
+    messageObjects = [tupleToMessage(messageTuple) for messageTuple in messagesList]
+    result = gLogDB.insertMessages(messageObjects, site, nodeFQDN, userDN, userGroup, remoteAddress)
+    if not result['OK']:
+      gLogger.error('The Log Messages could not be inserted into the DB',
+                    'because: "%s"' % result['Message'])
+      return S_ERROR(result['Message'])
+    return S_OK()
 
   types_addMessages = [list, basestring, basestring]
 
@@ -69,11 +79,18 @@ class SystemLoggingHandler(RequestHandler):
       S_ERROR if an exception was raised
 
     """
-    for messageTuple in messagesList:
-      messageObject = tupleToMessage(messageTuple)
-      result = self.__addMessage(messageObject, site, nodeFQDN)
-      if not result['OK']:
-        gLogger.error('The Log Message could not be inserted into the DB',
-                      'because: "%s"' % result['Message'])
-        return S_ERROR(result['Message'])
-    return S_OK()
+    return self.__addMessages(messagesList, site, nodeFQDN)
+
+  types_addMessagesCompressed = [basestring, basestring, basestring]
+
+  def export_addMessagesCompressed(self, data, site, nodeFQDN):
+    """
+    Same as addMessages, for a list of Message Objects DEncoded and compressed with zlib
+    """
+    try:
+      messagesList = DEncode.decode(zlib.decompress(data))[0]
+    except Exception as x:  # pylint: disable=broad-except
+      return S_ERROR('Cannot decode the messages: %s' % repr(x))
+    if not isinstance(messagesList, list):
+      return S_ERROR('The messages are not a list')
+    return self.__addMessages(messagesList, site, nodeFQDN)
@@ -5,10 +5,12 @@ System Logging Handler
 __RCSID__ = "$Id$"
 
 import logging
-import Queue
 import threading
+import zlib
+from collections import OrderedDict
 
-from DIRAC.Core.Utilities import Network
+from DIRAC.Core.Utilities import DEncode, Network
+from DIRAC.Core.Utilities.List import breakListIntoChunks
 
 
 class ServerHandler(logging.Handler, threading.Thread):
@@ -19,11 +21,14 @@ class ServerHandler(logging.Handler, threading.Thread):
   It is useful to send log messages to a destination, like the StreamHandler to a stream, the FileHandler to a file.
   Here, this handler send log messages to a DIRAC service: SystemLogging which store log messages in a database.
 
-  This handler send only log messages superior to WARN. It works in a thread, and send messages every 'sleepTime'.
-  When a message must be emit, it is added to queue before sending.  
+  This handler send only log messages superior to WARN. It works in a thread, and send messages every 'sleepTime',
+  or as soon as 'maxBundledLogs' different messages are waiting.
+  When a message must be emit, it is added to queue before sending. The identical messages waiting are
+  sent once, with the number of repetitions, and the new messages are dropped when 'maxQueueSize' messages
+  are waiting, so that an error storm does not fill the memory.
   """
 
-  def __init__(self, sleepTime, interactive, site):
+  def __init__(self, sleepTime, interactive, site, maxBundledLogs=1000, maxQueueSize=10000, compress=True):
     """
     Initialization of the ServerHandler.
     The queue is initialized with the hostname and the start of the thread.
@@ -31,18 +36,29 @@ class ServerHandler(logging.Handler, threading.Thread):
     :params sleepTime: integer, representing time in seconds where the handler can send messages.
     :params interactive: not used at the moment.
     :params site: the site where the log messages come from.
+    :params maxBundledLogs: integer, maximum number of messages sent in a call to the service.
+    :params maxQueueSize: integer, maximum number of messages waiting to be sent.
+    :params compress: boolean, send the messages compressed.
     """
     super(ServerHandler, self).__init__()
     threading.Thread.__init__(self)
-    self.__logQueue = Queue.Queue()
+    # log tuple without the time -> [ log tuple, number of identical messages ]
+    self.__pendingLogs = OrderedDict()
+    # Protects the pending logs and the statistics, notified when a bundle is full
+    self.__condition = threading.Condition()
 
     self.__sleepTime = sleepTime
     self.__interactive = interactive
     self.__site = site
     self.__transactions = []
+    # Number of messages in the transactions
+    self.__transactionsLength = 0
     self.__hostname = Network.getFQDN()
     self.__alive = True
-    self.__maxBundledLogs = 20
+    self.__maxBundledLogs = max(1, maxBundledLogs)
+    self.__maxQueueSize = max(1, maxQueueSize)
+    self.__compress = compress
+    self.__stats = {'Received': 0, 'Aggregated': 0, 'Dropped': 0, 'Sent': 0}
 
     self.setDaemon(True)
     self.start()
@@ -53,60 +69,102 @@ class ServerHandler(logging.Handler, threading.Thread):
 
     :params record: log record object
     """
-    self.__logQueue.put(record)
+    logTuple = (record.componentname, record.levelname, record.created, record.getMessage(), record.varmessage,
+                record.pathname + ":" + str(record.lineno), record.name)
+    key = logTuple[:2] + logTuple[3:]
+    with self.__condition:
+      self.__stats['Received'] += 1
+      pending = self.__pendingLogs.get(key)
+      if pending is not None:
+        pending[1] += 1
+        self.__stats['Aggregated'] += 1
+      elif len(self.__pendingLogs) + self.__transactionsLength >= self.__maxQueueSize:
+        self.__stats['Dropped'] += 1
+      else:
+        self.__pendingLogs[key] = [logTuple, 1]
+        if len(self.__pendingLogs) >= self.__maxBundledLogs:
+          self.__condition.notify()
+
+  def getStats(self):
+    """
+    Get the counters of the messages: received, aggregated with an identical message, dropped
+    because the queue was full and sent to the service.
+
+    :return: dictionary
+    """
+    with self.__condition:
+      return dict(self.__stats)
 
   def run(self):
-    import time
     while self.__alive:
+      with self.__condition:
+        if len(self.__pendingLogs) < self.__maxBundledLogs:
+          self.__condition.wait(float(self.__sleepTime))
       self.__bundleLogs()
-      time.sleep(float(self.__sleepTime))
 
   def __bundleLogs(self):
     """
     Prepare the log to the sending.
-    This method create a tuple based on the record and add it to the bundle for the sending.
+    This method create the bundles of log tuples from the messages waiting, and send them.
 
-    A tuple is necessary for because the service manage messages under this form. 
+    A tuple is necessary for because the service manage messages under this form.
     """
-    while not self.__logQueue.empty():
-      bundle = []
-      while (len(bundle) < self.__maxBundledLogs) and (not self.__logQueue.empty()):
-        record = self.__logQueue.get()
-        self.format(record)
-        logTuple = (record.componentname, record.levelname, record.created, record.getMessage(), record.varmessage,
-                    record.pathname + ":" + str(record.lineno), record.name)
-        bundle.append(logTuple)
-
-      if bundle:
-        self.__sendLogToServer(bundle)
+    with self.__condition:
+      pendingLogs = self.__pendingLogs
+      self.__pendingLogs = OrderedDict()
+
+    logTuples = []
+    for logTuple, count in pendingLogs.itervalues():
+      if count > 1:
+        varMessage = ("%s [repeated %d times]" % (logTuple[4], count)).strip()
+        logTuple = logTuple[:4] + (varMessage,) + logTuple[5:]
+      logTuples.append(logTuple)
+
+    for bundle in breakListIntoChunks(logTuples, self.__maxBundledLogs):
+      self.__transactions.append(bundle)
+      self.__transactionsLength += len(bundle)
 
     if self.__transactions:
       self.__sendLogToServer()
 
-  def __sendLogToServer(self, logBundle=None):
+  def __sendLogToServer(self):
     """
-    Send log to the SystemLogging service.
-
-    :params logBundle: list of logs ready to be send to the service
+    Send the bundles of logs to the SystemLogging service.
+    The bundles are kept if they can not be sent, the oldest ones being dropped beyond maxQueueSize messages.
     """
     from DIRAC.Core.DISET.RPCClient import RPCClient
-    if logBundle:
-      self.__transactions.append(logBundle)
-    transactionsLength = len(self.__transactions)
-    if transactionsLength > 100:
-      del self.__transactions[:transactionsLength - 100]
-      transactionsLength = 100
+    while self.__transactionsLength > self.__maxQueueSize:
+      self.__dropTransaction('Dropped')
 
     try:
       oSock = RPCClient("Framework/SystemLogging")
     except Exception:
       return False
 
-    while transactionsLength:
-      result = oSock.addMessages(self.__transactions[0], self.__site, self.__hostname)
-      if result['OK']:
-        transactionsLength = transactionsLength - 1
-        self.__transactions.pop(0)
-      else:
+    while self.__transactions:
+      result = self.__sendBundle(oSock, self.__transactions[0])
+      if not result['OK']:
         return False
+      self.__dropTransaction('Sent')
     return True
+
+  def __dropTransaction(self, counter):
+    bundle = self.__transactions.pop(0)
+    with self.__condition:
+      self.__transactionsLength -= len(bundle)
+      self.__stats[counter] += len(bundle)
+
+  def __sendBundle(self, oSock, logBundle):
+    """
+    Send a bundle of logs, compressed if possible.
+
+    :params oSock: RPCClient to the service
+    :params logBundle: list of logs ready to be send to the service
+    """
+    if self.__compress:
+      result = oSock.addMessagesCompressed(zlib.compress(DEncode.encode(logBundle)), self.__site, self.__hostname)
+      if result['OK'] or 'Unknown method' not in result['Message']:
+        return result
+      # The service does not accept compressed messages yet
+      self.__compress = False
+    return oSock.addMessages(logBundle, self.__site, self.__hostname)
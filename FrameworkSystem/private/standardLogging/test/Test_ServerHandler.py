@@ -0,0 +1,136 @@
+"""
+Test the ServerHandler
+"""
+
+__RCSID__ = "$Id$"
+
+# pylint: disable=protected-access
+
+import logging
+import threading
+import time
+import unittest
+import zlib
+from mock import MagicMock, patch
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities import DEncode
+from DIRAC.FrameworkSystem.private.standardLogging.Handler.ServerHandler import ServerHandler
+
+
+def makeRecord(message, varmessage=''):
+  """
+  Create a log record as the Logging objects do
+  """
+  record = logging.LogRecord('dirac.log', logging.ERROR, '/path/file.py', 42, message, None, None)
+  record.componentname = 'Framework/Test'
+  record.varmessage = varmessage
+  return record
+
+
+class Test_ServerHandler(unittest.TestCase):
+  """
+  Test the bundling of the log records sent to the SystemLogging service
+  """
+
+  def setUp(self):
+    self.rpc = MagicMock()
+    self.rpc.addMessagesCompressed.return_value = S_OK()
+    self.rpc.addMessages.return_value = S_OK()
+    patcher = patch('DIRAC.Core.DISET.RPCClient.RPCClient', return_value=self.rpc)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    # The bundles are sent by the tests rather than by the thread
+    patcher = patch.object(ServerHandler, 'start')
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def sentBundles(self):
+    """
+    Get the bundles of logs received by the service
+    """
+    bundles = [DEncode.decode(zlib.decompress(call[0][0]))[0] for call in self.rpc.addMessagesCompressed.call_args_list]
+    return bundles + [call[0][0] for call in self.rpc.addMessages.call_args_list]
+
+  def test_aggregation(self):
+    """
+    The identical messages are sent once, with their number
+    """
+    handler = ServerHandler(3600, False, 'Site', maxBundledLogs=2)
+    for _i in xrange(3):
+      handler.emit(makeRecord('message', 'var'))
+    handler.emit(makeRecord('other'))
+    handler._ServerHandler__bundleLogs()
+
+    bundles = self.sentBundles()
+    self.assertEqual(len(bundles), 1)
+    self.assertEqual([(log[3], log[4]) for log in bundles[0]], [('message', 'var [repeated 3 times]'), ('other', '')])
+    self.assertEqual(handler.getStats(), {'Received': 4, 'Aggregated': 2, 'Dropped': 0, 'Sent': 2})
+
+  def test_bundles(self):
+    """
+    The messages are sent by bundles of at most maxBundledLogs
+    """
+    handler = ServerHandler(3600, False, 'Site', maxBundledLogs=1000, compress=False)
+    for i in xrange(2500):
+      handler.emit(makeRecord('message %d' % i))
+    handler._ServerHandler__bundleLogs()
+
+    self.assertEqual(sorted(len(bundle) for bundle in self.sentBundles()), [500, 1000, 1000])
+    self.assertEqual(handler.getStats()['Sent'], 2500)
+    self.assertFalse(self.rpc.addMessagesCompressed.called)
+
+  def test_fullBundle(self):
+    """
+    The thread sends a full bundle without waiting for sleepTime
+    """
+    handler = ServerHandler(3600, False, 'Site', maxBundledLogs=2)
+    threading.Thread.start(handler)
+    handler.emit(makeRecord('message'))
+    handler.emit(makeRecord('other'))
+    for _i in xrange(50):
+      if handler.getStats()['Sent'] == 2:
+        break
+      time.sleep(0.1)
+    self.assertEqual(handler.getStats()['Sent'], 2)
+
+  def test_queueSize(self):
+    """
+    The new messages are dropped when the queue is full, and kept while the service is not available
+    """
+    self.rpc.addMessagesCompressed.return_value = S_ERROR('Service not available')
+    handler = ServerHandler(3600, False, 'Site', maxBundledLogs=1000, maxQueueSize=10)
+    for i in xrange(15):
+      handler.emit(makeRecord('message %d' % i))
+    # Identical messages are still counted
+    handler.emit(makeRecord('message 0'))
+    handler._ServerHandler__bundleLogs()
+    self.assertEqual(handler.getStats(), {'Received': 16, 'Aggregated': 1, 'Dropped': 5, 'Sent': 0})
+
+    handler.emit(makeRecord('message 15'))
+    self.assertEqual(handler.getStats()['Dropped'], 6)
+
+    self.rpc.addMessagesCompressed.return_value = S_OK()
+    handler._ServerHandler__bundleLogs()
+    self.assertEqual(handler.getStats()['Sent'], 10)
+    self.assertEqual(self.sentBundles()[-1][0][4], '[repeated 2 times]')
+
+  def test_uncompressedFallback(self):
+    """
+    The messages are sent uncompressed to a service not knowing addMessagesCompressed
+    """
+    self.rpc.addMessagesCompressed.return_value = S_ERROR('Unknown method addMessagesCompressed')
+    handler = ServerHandler(3600, False, 'Site')
+    handler.emit(makeRecord('message'))
+    handler._ServerHandler__bundleLogs()
+    handler.emit(makeRecord('other'))
+    handler._ServerHandler__bundleLogs()
+
+    self.assertEqual(self.rpc.addMessagesCompressed.call_count, 1)
+    self.assertEqual([bundle[0][3] for bundle in self.sentBundles()[1:]], ['message', 'other'])
+    self.assertEqual(handler.getStats()['Sent'], 2)
+
+
+if __name__ == '__main__':
+  suite = unittest.defaultTestLoader.loadTestsFromTestCase(Test_ServerHandler)
+  unittest.TextTestRunner(verbosity=2).run(suite)
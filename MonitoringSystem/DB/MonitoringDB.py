@@ -327,9 +327,8 @@ class MonitoringDB(ElasticDB):
     """
     It is used to insert the data to El.
 
-    :param records: it is a list of documents (dictionary)
+    :param records: it is a list, or an iterator, of documents (dictionary)
     :param str monitoringType: is the type of the monitoring
-    :type records: python:list
     """
     mapping = self.getMapping(monitoringType)
     gLogger.debug("Mapping used to create an index:", mapping)
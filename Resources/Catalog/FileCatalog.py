@@ -39,15 +39,26 @@
     additional check of the structure of the LFNs argument and no corresponding
     processing of the results.
 
+    If the parallel execution is enabled ( ParallelExecution option ), the plug-ins are
+    called concurrently, each one in its own thread: for the "read" methods all of them,
+    and for the "write" methods the Master plug-in first, then all the others. A plug-in
+    not answering within its Timeout is considered failed. The results are merged in the
+    same way as in the sequential execution.
+
     For the actual methods that can be called vie the File Catalog object, see
     the documentation of the respective FileCatalog plug-ins ( client classes )
 
 """
 
 import re
+import copy
+import errno
+import threading
+import time
 
 from DIRAC                                               import gLogger, gConfig, S_OK, S_ERROR
 from DIRAC.Core.Utilities                                import DErrno
+from DIRAC.Core.DISET.ThreadConfig                       import ThreadConfig
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.Core.Security.ProxyInfo                       import getVOfromProxyGroup
 from DIRAC.Resources.Catalog.Utilities                   import checkArgumentFormat
@@ -58,11 +69,19 @@ from DIRAC.Resources.Catalog.FCConditionParser           import FCConditionParse
 class FileCatalog( object ):
 
 
-  def __init__( self, catalogs = None, vo = None ):
+  def __init__( self, catalogs = None, vo = None, parallel = None ):
     """ Default constructor
+
+        :param parallel: call the catalogs concurrently, by default the
+                         /Operations/Services/Catalogs/ParallelExecution option
     """
     self.valid = True
     self.timeout = 180
+    # Timeout of each catalog in the parallel execution
+    self.catalogTimeouts = {}
+    # catalogName -> { 'Calls', 'Timeouts', 'TotalTime', 'MaxTime' }
+    self.__latencies = {}
+    self.__latenciesLock = threading.Lock()
 
     self.ro_methods = set()
     self.write_methods = set()
@@ -75,6 +94,9 @@ class FileCatalog( object ):
     self.log = gLogger.getSubLogger( "FileCatalog" )
 
     self.opHelper = Operations( vo = self.vo )
+    if parallel is None:
+      parallel = self.opHelper.getValue( '/Services/Catalogs/ParallelExecution', False )
+    self.parallel = parallel
 
     catalogList = []
     if isinstance( catalogs, basestring ):
@@ -152,6 +174,75 @@ class FileCatalog( object ):
     masterNames = [catalogName for catalogName, oCatalog, master in self.writeCatalogs if master]
     return S_OK( masterNames )
 
+  def getCatalogLatencies( self ):
+    """ Returns the number of calls, of timeouts, and the total and maximum execution times
+        of the calls to each catalog
+
+        :return: S_OK( { catalogName : { 'Calls', 'Timeouts', 'TotalTime', 'MaxTime' } } )
+    """
+    with self.__latenciesLock:
+      return S_OK( copy.deepcopy( self.__latencies ) )
+
+  def __recordLatency( self, catalogName, callTime, timedOut = False ):
+    with self.__latenciesLock:
+      latency = self.__latencies.setdefault( catalogName, { 'Calls' : 0, 'Timeouts' : 0,
+                                                            'TotalTime' : 0., 'MaxTime' : 0. } )
+      latency['Calls'] += 1
+      latency['TotalTime'] += callTime
+      latency['MaxTime'] = max( latency['MaxTime'], callTime )
+      if timedOut:
+        latency['Timeouts'] += 1
+
+  def __timedCall( self, catalogName, method, args, kws ):
+    """ Call a catalog method and record its execution time
+    """
+    startTime = time.time()
+    try:
+      return method( *args, **kws )
+    finally:
+      self.__recordLatency( catalogName, time.time() - startTime )
+
+  def __executeCalls( self, calls ):
+    """ Execute catalog method calls, concurrently in parallel mode
+
+        :param list calls: [ ( catalogName, method, args, kws ) ]
+        :return: generator of ( catalogName, result ), in the order of the calls
+    """
+    if not self.parallel or len( calls ) < 2:
+      for catalogName, method, args, kws in calls:
+        yield catalogName, self.__timedCall( catalogName, method, args, kws )
+      return
+
+    results = {}
+    # The credentials of a call on behalf of somebody else are thread local
+    threadConfig = ThreadConfig().dump()
+
+    def execute( catalogName, method, args, kws ):
+      ThreadConfig().load( threadConfig )
+      try:
+        results[catalogName] = self.__timedCall( catalogName, method, args, kws )
+      except Exception as x:  # pylint: disable=broad-except
+        self.log.exception( "Exception calling catalog", catalogName, lException = x )
+        results[catalogName] = S_ERROR( DErrno.EFCERR, "Exception calling %s: %s" % ( catalogName, repr( x ) ) )
+
+    startTime = time.time()
+    threads = []
+    for call in calls:
+      thread = threading.Thread( target = execute, args = call )
+      # A catalog not answering must not prevent the process from exiting
+      thread.daemon = True
+      thread.start()
+      threads.append( ( call[0], thread ) )
+    for catalogName, thread in threads:
+      timeout = self.catalogTimeouts.get( catalogName, self.timeout )
+      thread.join( max( 0, startTime + timeout - time.time() ) )
+      result = results.get( catalogName )
+      if result is None:
+        self.log.warn( "Catalog did not answer in time", "%s after %s seconds" % ( catalogName, timeout ) )
+        self.__recordLatency( catalogName, time.time() - startTime, timedOut = True )
+        result = S_ERROR( errno.ETIMEDOUT, "%s did not answer within %s seconds" % ( catalogName, timeout ) )
+      yield catalogName, result
+
 
   def __getattr__( self, name ):
     self.call = name
@@ -193,6 +284,7 @@ class FileCatalog( object ):
     lfnMapDict = {}
     masterResult = {}
     parms1 = []
+    fileInfo = {}
     if self.call not in self.no_lfn_methods:
       fileInfo = parms[0]
       result = checkArgumentFormat( fileInfo, generateMap = True )
@@ -204,78 +296,53 @@ class FileCatalog( object ):
       allLfns = fileInfo.keys()
       parms1 = parms[1:]
 
-    for catalogName, oCatalog, master in self.writeCatalogs:
-
-      # Skip if the method is not implemented in this catalog
-      # NOTE: it is impossible for the master since the write method list is populated
-      # only from the master catalog, and if the method is not there, __getattr__
-      # would raise an exception
-      if not oCatalog.hasCatalogMethod( self.call ):
-        continue
+    if self.parallel:
+      # The master first, so that the files it failed are not attempted on the others
+      catalogGroups = [[catalog for catalog in self.writeCatalogs if catalog[2]],
+                       [catalog for catalog in self.writeCatalogs if not catalog[2]]]
+    else:
+      catalogGroups = [[catalog] for catalog in self.writeCatalogs]
+
+    for catalogGroup in catalogGroups:
+      calls = []
+      for catalogName, oCatalog, master in catalogGroup:
+        result = self.__prepareWriteCall( catalogName, oCatalog, master, parms, parms1, kws,
+                                          fileInfo, specialConditions )
+        if not result['OK']:
+          return result
+        if result['Value']:
+          calls.append( result['Value'] )
+      masters = dict( ( catalogName, master ) for catalogName, _oCatalog, master in catalogGroup )
 
-      method = getattr( oCatalog, self.call )
+      for catalogName, result in self.__executeCalls( calls ):
+        master = masters[catalogName]
 
-      if self.call in self.no_lfn_methods:
-        result = method( *parms, **kws )
-      else:
-        if isinstance( specialConditions, dict ):
-          condition = specialConditions.get( catalogName )
-        else:
-          condition = specialConditions
-        # Check whether this catalog should be used for this method
-        res = self.condParser( catalogName, self.call, fileInfo, condition = condition )
-        # condParser never returns S_ERROR
-        condEvals = res['Value']['Successful']
-        # For a master catalog, ALL the lfns should be valid
         if master:
-          if any([not valid for valid in condEvals.values()]):
-            gLogger.error( "The master catalog is not valid for some LFNS", condEvals )
-            return S_ERROR( "The master catalog is not valid for some LFNS %s" % condEvals )
-
-        validLFNs = dict( ( lfn, fileInfo[lfn] ) for lfn in condEvals if condEvals[lfn] )
-
-        # We can skip the execution without worry,
-        # since at this level it is for sure not a master catalog
-        if not validLFNs:
-          gLogger.debug( "No valid LFN, skipping the call" )
-          continue
-
-        invalidLFNs = [lfn for lfn in condEvals if not condEvals[lfn]]
-
-        if invalidLFNs:
-          gLogger.debug( "Some LFNs are not valid for operation '%s' on catalog '%s' : %s" % ( self.call, catalogName,
-                                                                                               invalidLFNs ) )
-
-
-        result = method( validLFNs, *parms1, **kws )
+          masterResult = result
 
-
-      if master:
-        masterResult = result
-
-      if not result['OK']:
-        if master:
-          # If this is the master catalog and it fails we don't want to continue with the other catalogs
-          self.log.error( "Failed to execute call on master catalog",
-                          "%s on %s: %s" % ( self.call, catalogName, result['Message'] ) )
-          return result
+        if not result['OK']:
+          if master:
+            # If this is the master catalog and it fails we don't want to continue with the other catalogs
+            self.log.error( "Failed to execute call on master catalog",
+                            "%s on %s: %s" % ( self.call, catalogName, result['Message'] ) )
+            return result
+          else:
+            # Otherwise we keep the failed catalogs so we can update their state later
+            failedCatalogs[catalogName] = result['Message']
         else:
-          # Otherwise we keep the failed catalogs so we can update their state later
-          failedCatalogs[catalogName] = result['Message']
-      else:
-        successfulCatalogs[catalogName] = result['Value']
-
-      if allLfns:
-        if result['OK']:
-          for lfn, message in result['Value']['Failed'].items():
-            # Save the error message for the failed operations
-            failed.setdefault( lfn, {} )[catalogName] = message
-            if master:
-              # If this is the master catalog then we should not attempt the operation on other catalogs
-              fileInfo.pop( lfn, None )
-          for lfn, result in result['Value']['Successful'].items():
-            # Save the result return for each file for the successful operations
-            successful.setdefault( lfn, {} )[catalogName] = result
+          successfulCatalogs[catalogName] = result['Value']
+
+        if allLfns:
+          if result['OK']:
+            for lfn, message in result['Value']['Failed'].items():
+              # Save the error message for the failed operations
+              failed.setdefault( lfn, {} )[catalogName] = message
+              if master:
+                # If this is the master catalog then we should not attempt the operation on other catalogs
+                fileInfo.pop( lfn, None )
+            for lfn, result in result['Value']['Successful'].items():
+              # Save the result return for each file for the successful operations
+              successful.setdefault( lfn, {} )[catalogName] = result
 
     if allLfns:
       # This recovers the states of the files that completely failed i.e. when S_ERROR is returned by a catalog
@@ -296,19 +363,69 @@ class FileCatalog( object ):
       return masterResult
 
 
+  def __prepareWriteCall( self, catalogName, oCatalog, master, parms, parms1, kws, fileInfo, specialConditions ):
+    """ Get the call of the write method on a catalog, with the LFNs valid for it
+
+        :return: S_OK( ( catalogName, method, args, kws ) ), S_OK( None ) if the catalog is not called,
+                 S_ERROR if some LFNs are not valid for the master catalog
+    """
+    # Skip if the method is not implemented in this catalog
+    # NOTE: it is impossible for the master since the write method list is populated
+    # only from the master catalog, and if the method is not there, __getattr__
+    # would raise an exception
+    if not oCatalog.hasCatalogMethod( self.call ):
+      return S_OK()
+
+    method = getattr( oCatalog, self.call )
+
+    if self.call in self.no_lfn_methods:
+      return S_OK( ( catalogName, method, parms, kws ) )
+
+    if isinstance( specialConditions, dict ):
+      condition = specialConditions.get( catalogName )
+    else:
+      condition = specialConditions
+    # Check whether this catalog should be used for this method
+    res = self.condParser( catalogName, self.call, fileInfo, condition = condition )
+    # condParser never returns S_ERROR
+    condEvals = res['Value']['Successful']
+    # For a master catalog, ALL the lfns should be valid
+    if master:
+      if any([not valid for valid in condEvals.values()]):
+        gLogger.error( "The master catalog is not valid for some LFNS", condEvals )
+        return S_ERROR( "The master catalog is not valid for some LFNS %s" % condEvals )
+
+    validLFNs = dict( ( lfn, fileInfo[lfn] ) for lfn in condEvals if condEvals[lfn] )
+
+    # We can skip the execution without worry,
+    # since at this level it is for sure not a master catalog
+    if not validLFNs:
+      gLogger.debug( "No valid LFN, skipping the call" )
+      return S_OK()
+
+    invalidLFNs = [lfn for lfn in condEvals if not condEvals[lfn]]
+
+    if invalidLFNs:
+      gLogger.debug( "Some LFNs are not valid for operation '%s' on catalog '%s' : %s" % ( self.call, catalogName,
+                                                                                           invalidLFNs ) )
+
+    return S_OK( ( catalogName, method, ( validLFNs, ) + tuple( parms1 ), kws ) )
+
   def r_execute( self, *parms, **kws ):
     """ Read method executor.
     """
     successful = {}
     failed = {}
-    for _catalogName, oCatalog, _master in self.readCatalogs:
+    calls = []
+    for catalogName, oCatalog, _master in self.readCatalogs:
 
       # Skip if the method is not implemented in this catalog
       if not oCatalog.hasCatalogMethod( self.call ):
         continue
 
-      method = getattr( oCatalog, self.call )
-      res = method( *parms, **kws )
+      calls.append( ( catalogName, getattr( oCatalog, self.call ), parms, kws ) )
+
+    for _catalogName, res in self.__executeCalls( calls ):
       if res['OK']:
         if 'Successful' in res['Value']:
           for key, item in res['Value']['Successful'].items():
@@ -379,6 +496,7 @@ class FileCatalog( object ):
       if not result['OK']:
         return result
       oCatalog = result['Value']
+      self.catalogTimeouts[catalogName] = float( catalogConfig.get( 'Timeout', self.timeout ) )
       if re.search( 'Read', catalogConfig['AccessType'] ):
         if catalogConfig['Master']:
           self.readCatalogs.insert( 0, ( catalogName, oCatalog, catalogConfig['Master'] ) )
@@ -434,6 +552,7 @@ class FileCatalog( object ):
           return res
         oCatalog = res['Value']
         master = catalogConfig['Master']
+        self.catalogTimeouts[catalogName] = float( catalogConfig.get( 'Timeout', self.timeout ) )
         # If the catalog is read type
         if re.search( 'Read', catalogConfig['AccessType'] ):
           if master:
@@ -3,6 +3,7 @@
 """
 
 import sys
+import time
 import unittest
 import mock
 
@@ -84,6 +85,9 @@ class GenericCatalog( object ):
         retType = lfnSplit[idName + 1]
         if retType == "Error":
           return S_ERROR("%s.%s did not go well"%(self.name, self.call))
+        elif retType == "Sleep":
+          time.sleep( 0.5 )
+          successful[lfn] = "yeah"
         elif retType == "Failed":
           failed[lfn] = "%s.%s failed for %s" % ( self.name, self.call, lfn )
       except ValueError:
@@ -409,9 +413,89 @@ class TestRead( unittest.TestCase ):
     self.assertEqual( ['c1'], res['Value']['Successful'][lfn].keys() )
     self.assertEqual( ['c2'], res['Value']['Failed'][lfn].keys() )
 
+
+def mock_operations( vo = None ):
+  """ Operations helper enabling the parallel execution
+  """
+  opHelper = mock.MagicMock()
+  opHelper.getValue.side_effect = lambda option, default = None: \
+      True if option == '/Services/Catalogs/ParallelExecution' else default
+  return opHelper
+
+
+class TestParallelWrite( TestWrite ):
+  """ Tests of the w_execute method, with the catalogs called in parallel"""
+
+  def setUp( self ):
+    patcher = mock.patch( 'DIRAC.Resources.Catalog.FileCatalog.Operations', side_effect = mock_operations )
+    patcher.start()
+    self.addCleanup( patcher.stop )
+
+  @mock.patch.object( DIRAC.Resources.Catalog.FileCatalog.FileCatalog, '_getSelectedCatalogs',
+                      side_effect = mock_fc_getSelectedCatalogs, autospec = True ) # autospec is for the binding of the method...
+  @mock.patch.object( DIRAC.Resources.Catalog.FileCatalog.FileCatalog, '_getEligibleCatalogs',
+                      side_effect = mock_fc_getEligibleCatalogs, autospec = True )  # autospec is for the binding of the method...
+  def test_04_timeout( self, mk_getSelectedCatalogs, mk_getEligibleCatalogs ):
+    """ Test a non master catalog not answering in time """
+
+    fc = FileCatalog( catalogs = ['c1_True_True_True_2_0_2_0', 'c2_False_True_True_3_0_1_0',
+                                  'c3_False_True_True_3_0_1_0'] )
+    self.assertTrue( fc.parallel )
+    fc.catalogTimeouts['c2'] = 0.1
+
+    # c2 times out, c3 is not waited for
+    lfn = '/lhcb/c2/Sleep'
+    startTime = time.time()
+    res = fc.write1( lfn )
+    self.assertLess( time.time() - startTime, 0.5 )
+    self.assertTrue( res['OK'] )
+    self.assertEqual( sorted( res['Value']['Successful'][lfn] ), ['c1', 'c3'] )
+    self.assertEqual( ['c2'], res['Value']['Failed'][lfn].keys() )
+
+    latencies = fc.getCatalogLatencies()['Value']
+    self.assertEqual( latencies['c2']['Timeouts'], 1 )
+    self.assertEqual( latencies['c1']['Calls'], 1 )
+    self.assertEqual( latencies['c3']['Timeouts'], 0 )
+
+
+class TestParallelRead( TestRead ):
+  """ Tests of the r_execute method, with the catalogs called in parallel"""
+
+  def setUp( self ):
+    patcher = mock.patch( 'DIRAC.Resources.Catalog.FileCatalog.Operations', side_effect = mock_operations )
+    patcher.start()
+    self.addCleanup( patcher.stop )
+
+  @mock.patch.object( DIRAC.Resources.Catalog.FileCatalog.FileCatalog, '_getSelectedCatalogs',
+                      side_effect = mock_fc_getSelectedCatalogs, autospec = True )  # autospec is for the binding of the method...
+  @mock.patch.object( DIRAC.Resources.Catalog.FileCatalog.FileCatalog, '_getEligibleCatalogs',
+                      side_effect = mock_fc_getEligibleCatalogs, autospec = True )  # autospec is for the binding of the method...
+  def test_02_concurrent( self, mk_getSelectedCatalogs, mk_getEligibleCatalogs ):
+    """ Test that the catalogs are read concurrently, and the results merged """
+
+    fc = FileCatalog( catalogs = ['c1_True_True_True_2_0_2_0', 'c2_False_True_True_3_0_1_0'] )
+
+    # Both catalogs take 0.5 second
+    lfns = ['/lhcb/c1/Sleep/c2/Sleep', '/lhcb/c2/Failed']
+    startTime = time.time()
+    res = fc.read1( lfns )
+    self.assertLess( time.time() - startTime, 0.9 )
+    self.assertTrue( res['OK'] )
+    self.assertEqual( sorted( res['Value']['Successful'] ), sorted( lfns ) )
+    self.assertFalse( res['Value']['Failed'] )
+
+    # Only the second catalog has read3
+    res = fc.read3( lfns )
+    self.assertTrue( res['OK'] )
+    self.assertEqual( res['Value']['Successful'].keys(), lfns[:1] )
+    self.assertEqual( res['Value']['Failed'].keys(), lfns[1:] )
+
+
 if __name__ == '__main__':
   suite = unittest.defaultTestLoader.loadTestsFromTestCase( TestInitialization )
   suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( TestWrite ) )
   suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( TestRead ) )
+  suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( TestParallelWrite ) )
+  suite.addTest( unittest.defaultTestLoader.loadTestsFromTestCase( TestParallelRead ) )
 
   unittest.TextTestRunner( verbosity = 2 ).run( suite )
@@ -29,11 +29,17 @@ class ServerBackend(AbstractBackend):
     :params __site: string representing the site where the log messages are from.
     :params __interactive: not used at the moment.
     :params __sleepTime: the time separating the log messages sending, in seconds.
+    :params __maxBundledLogs: the maximum number of log messages sent together.
+    :params __maxQueueSize: the maximum number of log messages waiting to be sent.
+    :params __compress: send the log messages compressed.
     """
     super(ServerBackend, self).__init__(None, BaseFormatter)
     self.__site = None
     self.__interactive = True
     self.__sleepTime = 150
+    self.__maxBundledLogs = 1000
+    self.__maxQueueSize = 10000
+    self.__compress = True
 
   def createHandler(self, parameters=None):
     """
@@ -44,9 +50,14 @@ class ServerBackend(AbstractBackend):
     if parameters is not None:
       self.__interactive = parameters.get('Interactive', self.__interactive)
       self.__sleepTime = parameters.get('SleepTime', self.__sleepTime)
+      self.__maxBundledLogs = int(parameters.get('MaxBundledLogs', self.__maxBundledLogs))
+      self.__maxQueueSize = int(parameters.get('MaxQueueSize', self.__maxQueueSize))
+      self.__compress = str(parameters.get('Compress', self.__compress)).lower() in ('true', 'yes', 'y')
       self.__site = DIRAC.siteName()
 
-    self._handler = ServerHandler(self.__sleepTime, self.__interactive, self.__site)
+    self._handler = ServerHandler(self.__sleepTime, self.__interactive, self.__site,
+                                  maxBundledLogs=self.__maxBundledLogs, maxQueueSize=self.__maxQueueSize,
+                                  compress=self.__compress)
     self._handler.setLevel(LogLevels.ERROR)
 
   def setLevel(self, level):
@@ -0,0 +1,309 @@
+""" Replica caches of the TransformationAgent
+
+    The TransformationAgent caches the replicas it got from the catalogs for the files of each
+    transformation, for ReplicaCacheValidity days. Two backends, selected by the
+    ReplicaCacheBackend option of the agent, share the same interface:
+
+    - Pickle: the cache of each transformation is in memory and pickled in a file
+      (ReplicaCache_<transID>.pkl) when it is flushed. Good for small transformations.
+    - SQLite: a single SQLite database (ReplicaCache.sqlite) indexed by transformation and
+      LFN. Insertions, removals and expirations are incremental and committed immediately,
+      and only the replicas asked for are read, so that the memory used and the time spent
+      do not grow with the size of the transformations.
+"""
+
+__RCSID__ = "$Id$"
+
+import os
+import time
+import datetime
+import pickle
+import sqlite3
+import threading
+
+from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC.Core.Utilities.List import breakListIntoChunks
+
+# SQLite accepts at most 999 parameters per statement
+_maxParameters = 900
+
+
+class PickleReplicaCache(object):
+  """ In memory cache of the replicas, written to one pickle file per transformation
+
+      The cache of a transformation is { updateTime : { lfn : [ SEs ] } }, the format used
+      historically by the TransformationAgent. An index lfn -> updateTime avoids scanning
+      all the update times when removing files.
+  """
+
+  def __init__(self, workDirectory):
+    self.log = gLogger.getSubLogger("PickleReplicaCache")
+    self.__workDirectory = workDirectory
+    self.__cache = {}
+    self.__lfnIndex = {}
+    self.__modified = set()
+    self.__lock = threading.RLock()
+
+  def __cacheFile(self, transID):
+    return os.path.join(self.__workDirectory, 'ReplicaCache_%s.pkl' % str(transID))
+
+  def __load(self, transID):
+    """ Read the cache of a transformation from its file, if not yet done
+    """
+    if transID in self.__cache:
+      return
+    cache = {}
+    fileName = self.__cacheFile(transID)
+    if os.path.exists(fileName):
+      try:
+        with open(fileName, 'r') as fd:
+          cache = pickle.load(fd)
+        self.log.info("Successfully loaded replica cache from file",
+                      "%s (%d files)" % (fileName, sum(len(lfns) for lfns in cache.itervalues())))
+      except Exception as x:  # pylint: disable=broad-except
+        self.log.exception("Failed to load replica cache from file %s" % fileName, lException=x)
+        cache = {}
+    # Keep only the most recent replicas of an LFN
+    lfnIndex = {}
+    for updateTime in sorted(cache):
+      for lfn in cache[updateTime]:
+        previousTime = lfnIndex.get(lfn)
+        if previousTime is not None:
+          del cache[previousTime][lfn]
+        lfnIndex[lfn] = updateTime
+    self.__cache[transID] = cache
+    self.__lfnIndex[transID] = lfnIndex
+
+  def countLFNs(self, transID):
+    with self.__lock:
+      self.__load(transID)
+      return len(self.__lfnIndex[transID])
+
+  def getReplicas(self, transID, lfns):
+    """ Get the cached replicas of some LFNs
+
+        :return: { lfn : [ SEs ] } for the LFNs in the cache
+    """
+    with self.__lock:
+      self.__load(transID)
+      cache = self.__cache[transID]
+      lfnIndex = self.__lfnIndex[transID]
+      return dict((lfn, cache[lfnIndex[lfn]][lfn]) for lfn in lfns if lfn in lfnIndex)
+
+  def addReplicas(self, transID, replicas):
+    """ Add replicas obtained now
+
+        :param dict replicas: { lfn : [ SEs ] }
+    """
+    if not replicas:
+      return
+    with self.__lock:
+      self.__load(transID)
+      self.__removeLFNs(transID, replicas)
+      updateTime = datetime.datetime.utcnow()
+      self.__cache[transID].setdefault(updateTime, {}).update(replicas)
+      self.__lfnIndex[transID].update(dict.fromkeys(replicas, updateTime))
+      self.__modified.add(transID)
+
+  def __removeLFNs(self, transID, lfns):
+    cache = self.__cache[transID]
+    lfnIndex = self.__lfnIndex[transID]
+    removed = 0
+    for lfn in lfns:
+      updateTime = lfnIndex.pop(lfn, None)
+      if updateTime is not None:
+        cache[updateTime].pop(lfn, None)
+        removed += 1
+    return removed
+
+  def removeLFNs(self, transID, lfns):
+    """ Remove LFNs from the cache
+
+        :return: number of LFNs removed
+    """
+    with self.__lock:
+      self.__load(transID)
+      removed = self.__removeLFNs(transID, lfns)
+      if removed:
+        self.__modified.add(transID)
+      return removed
+
+  def expire(self, transID, validityDays):
+    """ Remove the replicas older than validityDays
+
+        :return: number of LFNs removed
+    """
+    with self.__lock:
+      self.__load(transID)
+      cache = self.__cache[transID]
+      lfnIndex = self.__lfnIndex[transID]
+      timeLimit = datetime.datetime.utcnow() - datetime.timedelta(days=validityDays)
+      removed = 0
+      for updateTime in [updateTime for updateTime in cache if updateTime < timeLimit or not cache[updateTime]]:
+        for lfn in cache.pop(updateTime):
+          lfnIndex.pop(lfn, None)
+          removed += 1
+        self.__modified.add(transID)
+      return removed
+
+  def clear(self, transID):
+    """ Remove all the replicas of a transformation
+    """
+    with self.__lock:
+      self.__cache[transID] = {}
+      self.__lfnIndex[transID] = {}
+      self.__modified.add(transID)
+
+  def flush(self, transID=None):
+    """ Write the modified caches to their files
+
+        :param transID: transformation to write, all of them if None
+        :return: S_OK( number of files written ) / S_ERROR
+    """
+    with self.__lock:
+      transList = [transID] if transID is not None else list(self.__modified)
+      startTime = time.time()
+      nCache = 0
+      filesInCache = 0
+      for tID in transList:
+        if tID not in self.__modified:
+          continue
+        cache = dict((updateTime, lfns) for updateTime, lfns in self.__cache[tID].iteritems() if lfns)
+        # write to a temporary file in order to avoid corrupted files
+        cacheFile = self.__cacheFile(tID)
+        tmpFile = cacheFile + '.tmp'
+        try:
+          with open(tmpFile, 'w') as fd:
+            pickle.dump(cache, fd)
+          os.rename(tmpFile, cacheFile)
+        except Exception as x:  # pylint: disable=broad-except
+          self.log.exception("Could not write replica cache file %s" % cacheFile, lException=x)
+          return S_ERROR("Could not write replica cache file %s: %s" % (cacheFile, repr(x)))
+        self.__modified.discard(tID)
+        filesInCache += len(self.__lfnIndex[tID])
+        nCache += 1
+      if nCache:
+        self.log.info("Successfully wrote replica cache file(s)",
+                      "%d files, %d LFNs in %.1f seconds" % (nCache, filesInCache, time.time() - startTime))
+      return S_OK(nCache)
+
+  def close(self):
+    return self.flush()
+
+
+class SQLiteReplicaCache(object):
+  """ Replica cache in a SQLite database, see the module documentation
+  """
+
+  def __init__(self, workDirectory):
+    self.log = gLogger.getSubLogger("SQLiteReplicaCache")
+    self.__dbFile = os.path.join(workDirectory, 'ReplicaCache.sqlite')
+    # The agent threads share the connection, the lock serializes the statements
+    self.__lock = threading.RLock()
+    self.__conn = sqlite3.connect(self.__dbFile, check_same_thread=False)
+    self.__conn.text_factory = str
+    with self.__lock:
+      # Write ahead log: the database survives a crash of the agent in the middle of an update
+      self.__conn.execute("PRAGMA journal_mode=WAL")
+      self.__conn.execute("PRAGMA synchronous=NORMAL")
+      self.__conn.execute("""CREATE TABLE IF NOT EXISTS Replicas(
+                             TransformationID INTEGER NOT NULL,
+                             LFN TEXT NOT NULL,
+                             SEs TEXT NOT NULL,
+                             UpdateTime REAL NOT NULL,
+                             PRIMARY KEY (TransformationID, LFN))""")
+      self.__conn.execute("""CREATE INDEX IF NOT EXISTS ReplicasTime ON Replicas(TransformationID, UpdateTime)""")
+      self.__conn.commit()
+
+  def __execute(self, query, parameters=()):
+    """ Execute and commit a modification
+
+        :return: number of rows modified
+    """
+    with self.__lock:
+      with self.__conn:
+        return self.__conn.execute(query, parameters).rowcount
+
+  def countLFNs(self, transID):
+    with self.__lock:
+      return self.__conn.execute("SELECT COUNT(*) FROM Replicas WHERE TransformationID = ?",
+                                 (transID,)).fetchone()[0]
+
+  def getReplicas(self, transID, lfns):
+    """ Get the cached replicas of some LFNs
+
+        :return: { lfn : [ SEs ] } for the LFNs in the cache
+    """
+    result = {}
+    for chunk in breakListIntoChunks(list(lfns), _maxParameters):
+      query = "SELECT LFN, SEs FROM Replicas WHERE TransformationID = ? AND LFN IN (%s)" % \
+          ','.join('?' * len(chunk))
+      with self.__lock:
+        rows = self.__conn.execute(query, [transID] + chunk).fetchall()
+      result.update((lfn, ses.split(',') if ses else []) for lfn, ses in rows)
+    return result
+
+  def addReplicas(self, transID, replicas):
+    """ Add replicas obtained now
+
+        :param dict replicas: { lfn : [ SEs ] }
+    """
+    if not replicas:
+      return
+    now = time.time()
+    with self.__lock:
+      with self.__conn:
+        self.__conn.executemany("INSERT OR REPLACE INTO Replicas (TransformationID, LFN, SEs, UpdateTime) "
+                                "VALUES (?, ?, ?, ?)",
+                                ((transID, lfn, ','.join(ses), now) for lfn, ses in replicas.iteritems()))
+
+  def removeLFNs(self, transID, lfns):
+    """ Remove LFNs from the cache
+
+        :return: number of LFNs removed
+    """
+    removed = 0
+    for chunk in breakListIntoChunks(list(lfns), _maxParameters):
+      removed += self.__execute("DELETE FROM Replicas WHERE TransformationID = ? AND LFN IN (%s)" %
+                                ','.join('?' * len(chunk)), [transID] + chunk)
+    return removed
+
+  def expire(self, transID, validityDays):
+    """ Remove the replicas older than validityDays
+
+        :return: number of LFNs removed
+    """
+    return self.__execute("DELETE FROM Replicas WHERE TransformationID = ? AND UpdateTime < ?",
+                          (transID, time.time() - validityDays * 86400))
+
+  def clear(self, transID):
+    """ Remove all the replicas of a transformation
+    """
+    self.__execute("DELETE FROM Replicas WHERE TransformationID = ?", (transID,))
+
+  def flush(self, transID=None):
+    """ Everything is committed already
+    """
+    return S_OK(0)
+
+  def close(self):
+    with self.__lock:
+      self.__conn.close()
+    return S_OK(0)
+
+
+def getReplicaCache(backend, workDirectory):
+  """ Create the replica cache
+
+      :param str backend: Pickle or SQLite
+      :param str workDirectory: directory of the cache files
+      :return: S_OK( cache object ) / S_ERROR
+  """
+  if backend == 'Pickle':
+    return S_OK(PickleReplicaCache(workDirectory))
+  if backend == 'SQLite':
+    try:
+      return S_OK(SQLiteReplicaCache(workDirectory))
+    except sqlite3.Error as x:
+      return S_ERROR("Cannot open the SQLite replica cache: %s" % repr(x))
+  return S_ERROR("Unknown replica cache backend %s" % backend)
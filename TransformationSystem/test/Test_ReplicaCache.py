@@ -0,0 +1,43 @@
+""" Test the replica caches of the TransformationAgent """
+
+import pytest
+
+from DIRAC.TransformationSystem.Utilities.ReplicaCache import getReplicaCache
+
+__RCSID__ = "$Id$"
+
+
+@pytest.mark.parametrize("backend", ['Pickle', 'SQLite'])
+def test_replicaCache(tmpdir, backend):
+  cache = getReplicaCache(backend, str(tmpdir))['Value']
+  replicas = dict(('/lhcb/file%d' % i, ['CERN-DISK', 'CNAF-DISK']) for i in xrange(1000))
+  cache.addReplicas(1, replicas)
+  cache.addReplicas(2, {'/lhcb/file1': ['RAL-DISK']})
+  assert cache.countLFNs(1) == 1000
+  assert cache.getReplicas(1, ['/lhcb/file1', '/lhcb/other']) == {'/lhcb/file1': ['CERN-DISK', 'CNAF-DISK']}
+  assert cache.getReplicas(2, replicas) == {'/lhcb/file1': ['RAL-DISK']}
+
+  # Newer replicas replace the cached ones
+  cache.addReplicas(1, {'/lhcb/file1': ['PIC-DISK']})
+  assert cache.getReplicas(1, ['/lhcb/file1']) == {'/lhcb/file1': ['PIC-DISK']}
+  assert cache.countLFNs(1) == 1000
+
+  assert cache.removeLFNs(1, ['/lhcb/file%d' % i for i in xrange(500)] + ['/lhcb/other']) == 500
+  assert cache.countLFNs(1) == 500
+  assert cache.expire(1, 1) == 0
+  assert cache.flush()['OK']
+  cache.close()
+
+  # Persistent
+  cache = getReplicaCache(backend, str(tmpdir))['Value']
+  assert cache.countLFNs(1) == 500
+  assert cache.getReplicas(2, ['/lhcb/file1']) == {'/lhcb/file1': ['RAL-DISK']}
+  assert cache.expire(1, 0) == 500
+  assert cache.countLFNs(1) == 0
+  cache.clear(2)
+  assert cache.getReplicas(2, ['/lhcb/file1']) == {}
+  cache.close()
+
+
+def test_unknownBackend(tmpdir):
+  assert not getReplicaCache('Memcached', str(tmpdir))['OK']
@@ -24,6 +24,7 @@ import os
 
 from DIRAC import S_OK, gLogger
 from DIRAC.Core.Base.AgentModule import AgentModule
+from DIRAC.Core.Utilities.List import breakListIntoChunks
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
 from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import TaskQueueDB
@@ -63,6 +64,8 @@ class JobCleaningAgent(AgentModule):
     self.maxJobsAtOnce = 100
     self.jobByJob = False
     self.throttlingPeriod = 0.
+    self.removalChunkSize = 100
+    self.maxRowsPerSecond = 0
 
     self.prodTypes = []
 
@@ -89,6 +92,8 @@ class JobCleaningAgent(AgentModule):
     self.maxJobsAtOnce = self.am_getOption('MaxJobsAtOnce', 500)
     self.jobByJob = self.am_getOption('JobByJob', False)
     self.throttlingPeriod = self.am_getOption('ThrottlingPeriod', 0.)
+    self.removalChunkSize = self.am_getOption('RemovalChunkSize', 100)
+    self.maxRowsPerSecond = self.am_getOption('MaxRowsPerSecond', 0)
 
     self.removeStatusDelay['Done'] = self.am_getOption('RemoveStatusDelay/Done', 7)
     self.removeStatusDelay['Killed'] = self.am_getOption('RemoveStatusDelay/Killed', 7)
@@ -145,6 +150,13 @@ class JobCleaningAgent(AgentModule):
 
   def removeJobsByStatus(self, condDict, delay=False):
     """ Remove deleted jobs
+
+        At most MaxJobsAtOnce jobs are removed, by chunks of RemovalChunkSize jobs (1 if JobByJob)
+        going each through the whole pipeline: sandboxes, TaskQueueDB, JobLoggingDB and finally JobDB,
+        each chunk being removed from JobDB in one transaction. A chunk not removed from JobDB is selected
+        again at the next cycle. The removal is slowed down to remove at most MaxRowsPerSecond rows per second.
+
+        :return: S_OK( removal statistics ) / S_OK() if there is nothing to remove / S_ERROR
     """
     if delay:
       gLogger.verbose("Removing jobs with %s and older than %s day(s)" % (condDict, delay))
@@ -164,8 +176,35 @@ class JobCleaningAgent(AgentModule):
 
     self.log.notice("Deleting %s jobs for %s" % (len(jobList), condDict))
 
-    count = 0
-    error_count = 0
+    # TODO: we should not remove a job if it still has requests in the RequestManager.
+    # But this logic should go in the client or in the service, and right now no service expose jobDB.removeJobFromDB
+
+    stats = {'Jobs': 0, 'Rows': 0, 'Errors': 0}
+    start = time.time()
+    for jobChunk in breakListIntoChunks(jobList, 1 if self.jobByJob else self.removalChunkSize):
+      result = self.__removeJobs(jobChunk, stats)
+      if not result['OK']:
+        return result
+      elapsed = time.time() - start
+      # Respect the rows/s budget on average since the start
+      if self.maxRowsPerSecond > 0 and stats['Rows'] / float(self.maxRowsPerSecond) > elapsed:
+        time.sleep(stats['Rows'] / float(self.maxRowsPerSecond) - elapsed)
+      if self.throttlingPeriod:
+        time.sleep(self.throttlingPeriod)
+
+    stats['Time'] = time.time() - start
+    gLogger.info('Deleted %d jobs from JobDB, %d errors' % (stats['Jobs'], stats['Errors']),
+                 'in %.1f s: %.1f jobs/s, %.1f rows/s' % (stats['Time'], stats['Jobs'] / max(stats['Time'], 1e-3),
+                                                          stats['Rows'] / max(stats['Time'], 1e-3)))
+    return S_OK(stats)
+
+  def __removeJobs(self, jobList, stats):
+    """ Remove a chunk of jobs from the sandboxes and the DBs, JobDB being the last one
+
+        :param list jobList: job IDs
+        :param dict stats: removed jobs and rows and errors, updated
+        :return: S_OK / S_ERROR if the jobs are not removed and the removal should stop
+    """
     result = SandboxStoreClient(useCertificates=True).unassignJobs(jobList)
     if not result['OK']:
       gLogger.error("Cannot unassign jobs to sandboxes", result['Message'])
@@ -178,56 +217,29 @@ class JobCleaningAgent(AgentModule):
       return result
 
     failedJobs = result['Value']['Failed']
-    for job in failedJobs:
-      jobList.pop(jobList.index(job))
+    jobList = [jobID for jobID in jobList if jobID not in failedJobs]
+    stats['Errors'] += len(failedJobs)
+    if not jobList:
+      return S_OK()
 
-    # TODO: we should not remove a job if it still has requests in the RequestManager.
-    # But this logic should go in the client or in the service, and right now no service expose jobDB.removeJobFromDB
+    for jobID in jobList:
+      resultTQ = self.taskQueueDB.deleteJob(jobID)
+      if not resultTQ['OK']:
+        gLogger.warn('Failed to remove job %d from TaskQueueDB' % jobID, resultTQ['Message'])
 
-    if self.jobByJob:
-      for jobID in jobList:
-        resultJobDB = self.jobDB.removeJobFromDB(jobID)
-        resultTQ = self.taskQueueDB.deleteJob(jobID)
-        resultLogDB = self.jobLoggingDB.deleteJob(jobID)
-        errorFlag = False
-        if not resultJobDB['OK']:
-          gLogger.warn('Failed to remove job %d from JobDB' % jobID, result['Message'])
-          errorFlag = True
-        if not resultTQ['OK']:
-          gLogger.warn('Failed to remove job %d from TaskQueueDB' % jobID, result['Message'])
-          errorFlag = True
-        if not resultLogDB['OK']:
-          gLogger.warn('Failed to remove job %d from JobLoggingDB' % jobID, result['Message'])
-          errorFlag = True
-        if errorFlag:
-          error_count += 1
-        else:
-          count += 1
-        if self.throttlingPeriod:
-          time.sleep(self.throttlingPeriod)
+    result = self.jobLoggingDB.deleteJob(jobList)
+    if not result['OK']:
+      gLogger.error('Failed to delete %d jobs from JobLoggingDB' % len(jobList), result['Message'])
     else:
-      result = self.jobDB.removeJobFromDB(jobList)
-      if not result['OK']:
-        gLogger.error('Failed to delete %d jobs from JobDB' % len(jobList))
-      else:
-        gLogger.info('Deleted %d jobs from JobDB' % len(jobList))
-
-      for jobID in jobList:
-        resultTQ = self.taskQueueDB.deleteJob(jobID)
-        if not resultTQ['OK']:
-          gLogger.warn('Failed to remove job %d from TaskQueueDB' % jobID, resultTQ['Message'])
-          error_count += 1
-        else:
-          count += 1
+      stats['Rows'] += result['Value']
 
-      result = self.jobLoggingDB.deleteJob(jobList)
-      if not result['OK']:
-        gLogger.error('Failed to delete %d jobs from JobLoggingDB' % len(jobList))
-      else:
-        gLogger.info('Deleted %d jobs from JobLoggingDB' % len(jobList))
-
-    if count > 0 or error_count > 0:
-      gLogger.info('Deleted %d jobs from JobDB, %d errors' % (count, error_count))
+    result = self.jobDB.removeJobFromDB(jobList, chunkSize=len(jobList))
+    if not result['OK']:
+      gLogger.error('Failed to delete %d jobs from JobDB' % len(jobList), result['Message'])
+      stats['Errors'] += len(jobList)
+    else:
+      stats['Jobs'] += len(jobList)
+      stats['Rows'] += result['Value']
     return S_OK()
 
   def deleteJobOversizedSandbox(self, jobIDList):
@@ -14,9 +14,11 @@ from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
 from DIRAC.WorkloadManagementSystem.DB.JobLoggingDB import JobLoggingDB
 from DIRAC.Core.Base.AgentModule import AgentModule
 from DIRAC.Core.Utilities.Time import fromString, toEpoch, dateTime, second
+from DIRAC.Core.Utilities.List import breakListIntoChunks
 from DIRAC import S_OK, S_ERROR, gConfig
 from DIRAC.Core.DISET.RPCClient import RPCClient
 from DIRAC.AccountingSystem.Client.Types.Job import Job
+from DIRAC.AccountingSystem.Client.DataStoreClient import gDataStoreClient
 from DIRAC.Core.Utilities.ClassAd.ClassAdLight import ClassAd
 from DIRAC.ConfigurationSystem.Client.Helpers import cfgPath
 from DIRAC.ConfigurationSystem.Client.PathFinder import getSystemInstance
@@ -46,6 +48,10 @@ for the agent restart
     self.rescheduledTime = 600
     self.completedTime = 86400
     self.submittingTime = 300
+    self.stalledJobsTolerantSites = []
+    self.stalledJobsToleranceTime = 0
+    # Number of jobs updated by a single query
+    self.maxJobsInQuery = 1000
 
   #############################################################################
   def initialize(self):
@@ -118,34 +124,43 @@ for the agent restart
   #############################################################################
   def _markStalledJobs(self, stalledTime):
     """ Identifies stalled jobs running without update longer than stalledTime.
+        The stalled jobs are selected and set to Stalled by a few set-based queries,
+        the jobs running at the StalledJobsTolerantSites get StalledJobsToleranceTime more seconds.
 """
+    # ( stalled time, sites, excluded sites )
+    jobGroups = [(stalledTime, None, self.stalledJobsTolerantSites)]
+    if self.stalledJobsTolerantSites:
+      jobGroups.append((stalledTime + self.stalledJobsToleranceTime, self.stalledJobsTolerantSites, None))
+
     stalledCounter = 0
-    runningCounter = 0
-    result = self.jobDB.selectJobs({'Status': 'Running'})
-    if not result['OK']:
-      return result
-    if not result['Value']:
-      return S_OK()
-    jobs = result['Value']
-    self.log.info('%s Running jobs will be checked for being stalled' % (len(jobs)))
-    jobs.sort()
-# jobs = jobs[:10] #for debugging
-    for job in jobs:
-      site = self.jobDB.getJobAttribute(job, 'site')['Value']
-      if site in self.stalledJobsTolerantSites:
-        result = self.__getStalledJob(job, stalledTime + self.stalledJobsToleranceTime)
-      else:
-        result = self.__getStalledJob(job, stalledTime)
-      if result['OK']:
-        self.log.verbose('Updating status to Stalled for job %s' % (job))
-        self.__updateJobStatus(job, 'Stalled')
-        stalledCounter += 1
-      else:
-        self.log.verbose(result['Message'])
-        runningCounter += 1
+    for groupTime, sites, excludedSites in jobGroups:
+      result = self.jobDB.getStalledJobs(groupTime, sites=sites, excludedSites=excludedSites)
+      if not result['OK']:
+        return result
+      stalledJobs = result['Value']
+      if not stalledJobs:
+        continue
+      self.log.info('%s Running jobs identified as stalled' % len(stalledJobs),
+                    'with last update > %s secs ago' % groupTime)
 
-    self.log.info('Total jobs: %s, Stalled job count: %s, Running job count: %s' %
-                  (len(jobs), stalledCounter, runningCounter))
+      for jobIDs in breakListIntoChunks(sorted(stalledJobs), self.maxJobsInQuery):
+        if self.am_getOption('Enable', True):
+          result = self.jobDB.setJobsStalled(jobIDs, groupTime)
+          if not result['OK']:
+            self.log.error('Failed to set jobs Stalled', result['Message'])
+            continue
+          if result['Value'] < len(jobIDs):
+            # Some jobs were updated since they were selected, find out which ones are Stalled
+            result = self.jobDB.getAttributesForJobList(jobIDs, ['Status'])
+            if not result['OK']:
+              self.log.error('Failed to get the status of the jobs', result['Message'])
+              continue
+            jobIDs = [jobID for jobID in jobIDs if result['Value'].get(jobID, {}).get('Status') == 'Stalled']
+        # Retain last minor status for stalled jobs
+        self.__addLoggingRecords(jobIDs, 'Stalled', stalledJobs)
+        stalledCounter += len(jobIDs)
+
+    self.log.info('Stalled job count: %s' % stalledCounter)
     return S_OK()
 
   #############################################################################
@@ -156,15 +171,23 @@ for the agent restart
     result = self.jobDB.selectJobs({'Status': 'Stalled'})
     if not result['OK']:
       return result
-    jobs = result['Value']
+    jobs = [int(jobID) for jobID in result['Value']]
 
     failedCounter = 0
     minorStalledStatuses = ("Job stalled: pilot not running", 'Stalling for more than %d sec' % failedTime)
 
     if jobs:
       self.log.info('%s Stalled jobs will be checked for failure' % (len(jobs)))
+      result = self.jobDB.getAttributesForJobList(jobs, ['HeartBeatTime', 'LastUpdateTime', 'OwnerDN', 'OwnerGroup'])
+      if not result['OK']:
+        return result
+      jobDicts = result['Value']
 
+      # minor status -> [ jobID ]
+      failedJobs = {}
       for job in jobs:
+        if job not in jobDicts:
+          continue
         setFailed = False
         # Check if the job pilot is lost
         result = self.__getJobPilotStatus(job)
@@ -176,7 +199,7 @@ for the agent restart
           setFailed = minorStalledStatuses[0]
         else:
 
-          result = self.__getLatestUpdateTime(job)
+          result = self.__getLatestUpdateTime(job, jobDicts[job])
           if not result['OK']:
             self.log.error('Failed to get job update time', result['Message'])
             continue
@@ -184,14 +207,20 @@ for the agent restart
           if elapsedTime > failedTime:
             setFailed = minorStalledStatuses[1]
 
-        # Set the jobs Failed, send them a kill signal in case they are not really dead and send accounting info
         if setFailed:
-          self.__sendKillCommand(job)
-          self.__updateJobStatus( job, 'Failed', setFailed )
-          failedCounter += 1
-          result = self.__sendAccounting(job)
-          if not result['OK']:
-            self.log.error('Failed to send accounting', result['Message'])
+          failedJobs.setdefault(setFailed, []).append(job)
+
+      # Set the jobs Failed, send them a kill signal in case they are not really dead and send accounting info
+      if failedJobs:
+        self.__sendKillCommand(dict((job, jobDicts[job]) for jobIDs in failedJobs.values() for job in jobIDs))
+      for minor, jobIDs in failedJobs.items():
+        result = self.__updateJobStatus(jobIDs, 'Failed', minor)
+        if not result['OK']:
+          continue
+        failedCounter += len(jobIDs)
+        result = self.__sendAccounting(jobIDs)
+        if not result['OK']:
+          self.log.error('Failed to send accounting', result['Message'])
 
     recoverCounter = 0
 
@@ -200,17 +229,13 @@ for the agent restart
       if not result['OK']:
         return result
       if result['Value']:
-        jobs = result['Value']
+        jobs = [int(jobID) for jobID in result['Value']]
         self.log.info('%s Stalled jobs will be Accounted' % (len(jobs)))
-        for job in jobs:
-          result = self.__sendAccounting(job)
-          if not result['OK']:
-            self.log.error('Failed to send accounting', result['Message'])
-            continue
-
-          recoverCounter += 1
-      if not result['OK']:
-        break
+        result = self.__sendAccounting(jobs)
+        if not result['OK']:
+          self.log.error('Failed to send accounting', result['Message'])
+          break
+        recoverCounter += len(result['Value'])
 
     if failedCounter:
       self.log.info('%d jobs set to Failed' % failedCounter)
@@ -244,47 +269,22 @@ for the agent restart
     return S_OK(pilotStatus)
 
   #############################################################################
-  def __getStalledJob(self, job, stalledTime):
-    """ Compares the most recent of LastUpdateTime and HeartBeatTime against
-the stalledTime limit.
-"""
-    result = self.__getLatestUpdateTime(job)
-    if not result['OK']:
-      return result
-
-    currentTime = toEpoch()
-    lastUpdate = result['Value']
-
-    elapsedTime = currentTime - lastUpdate
-    self.log.verbose('(CurrentTime-LastUpdate) = %s secs' % (elapsedTime))
-    if elapsedTime > stalledTime:
-      self.log.info('Job %s is identified as stalled with last update > %s secs ago' % (job, elapsedTime))
-      return S_OK('Stalled')
-
-    return S_ERROR('Job %s is running and will be ignored' % job)
-
-  #############################################################################
-  def __getLatestUpdateTime(self, job):
+  def __getLatestUpdateTime(self, job, jobDict):
     """ Returns the most recent of HeartBeatTime and LastUpdateTime
-"""
-    result = self.jobDB.getJobAttributes(job, ['HeartBeatTime', 'LastUpdateTime'])
-    if not result['OK']:
-      self.log.error('Failed to get job attributes', result['Message'])
-    if not result['OK'] or not result['Value']:
-      self.log.error('Could not get attributes for job', '%s' % job)
-      return S_ERROR('Could not get attributes for job')
 
-    self.log.verbose(result)
+        :param int job: job ID
+        :param dict jobDict: attributes of the job, with at least HeartBeatTime and LastUpdateTime
+"""
     latestUpdate = 0
-    if not result['Value']['HeartBeatTime'] or result['Value']['HeartBeatTime'] == 'None':
+    if not jobDict['HeartBeatTime'] or jobDict['HeartBeatTime'] == 'None':
       self.log.verbose('HeartBeatTime is null for job %s' % job)
     else:
-      latestUpdate = toEpoch(fromString(result['Value']['HeartBeatTime']))
+      latestUpdate = toEpoch(fromString(jobDict['HeartBeatTime']))
 
-    if not result['Value']['LastUpdateTime'] or result['Value']['LastUpdateTime'] == 'None':
+    if not jobDict['LastUpdateTime'] or jobDict['LastUpdateTime'] == 'None':
       self.log.verbose('LastUpdateTime is null for job %s' % job)
     else:
-      lastUpdate = toEpoch(fromString(result['Value']['LastUpdateTime']))
+      lastUpdate = toEpoch(fromString(jobDict['LastUpdateTime']))
       if latestUpdate < lastUpdate:
         latestUpdate = lastUpdate
 
@@ -295,32 +295,39 @@ the stalledTime limit.
       return S_OK(latestUpdate)
 
   #############################################################################
-  def __updateJobStatus(self, job, status, minorstatus=None):
-    """ This method updates the job status in the JobDB, this should only be
-used to fail jobs due to the optimizer chain.
+  def __updateJobStatus(self, jobIDs, status, minorstatus=None):
+    """ This method updates the status of the jobs in the JobDB, with one query for all of them,
+        this should only be used to fail jobs due to the optimizer chain.
 """
-    self.log.verbose("self.jobDB.setJobAttribute(%s,'Status','%s',update=True)" % (job, status))
+    self.log.verbose("self.jobDB.setJobAttributes(%s,'Status','%s',update=True)" % (jobIDs, status))
 
     if self.am_getOption('Enable', True):
-      result = self.jobDB.setJobAttribute(job, 'Status', status, update=True)
-    else:
-      result = S_OK('DisabledMode')
-
-    if result['OK']:
       if minorstatus:
-        self.log.verbose("self.jobDB.setJobAttribute(%s,'MinorStatus','%s',update=True)" % (job, minorstatus))
-        result = self.jobDB.setJobAttribute(job, 'MinorStatus', minorstatus, update=True)
+        result = self.jobDB.setJobAttributes(jobIDs, ['Status', 'MinorStatus'], [status, minorstatus], update=True)
+      else:
+        result = self.jobDB.setJobAttributes(jobIDs, ['Status'], [status], update=True)
+      if not result['OK']:
+        self.log.error('Failed to update job status', result['Message'])
+        return result
 
+    minorStatuses = {}
     if not minorstatus:  # Retain last minor status for stalled jobs
-      result = self.jobDB.getJobAttributes(job, ['MinorStatus'])
+      result = self.jobDB.getAttributesForJobList(jobIDs, ['MinorStatus'])
       if result['OK']:
-        minorstatus = result['Value']['MinorStatus']
+        minorStatuses = dict((jobID, jobDict['MinorStatus']) for jobID, jobDict in result['Value'].items())
+
+    return self.__addLoggingRecords(jobIDs, status, minorStatuses, minorstatus)
 
-    logStatus = status
-    result = self.logDB.addLoggingRecord(job, status=logStatus, minor=minorstatus, source='StalledJobAgent')
+  def __addLoggingRecords(self, jobIDs, status, minorStatuses, minorstatus=None):
+    """ Log the new status of the jobs in the JobLoggingDB
+
+        :param dict minorStatuses: jobID -> minor status to log, if minorstatus is not given
+    """
+    records = [(jobID, status, minorstatus or minorStatuses.get(jobID, 'idem'), 'idem', None, 'StalledJobAgent')
+               for jobID in jobIDs]
+    result = self.logDB.addLoggingRecords(records)
     if not result['OK']:
       self.log.warn(result)
-
     return result
 
   def __getProcessingType(self, jobID):
@@ -336,19 +343,53 @@ used to fail jobs due to the optimizer chain.
     return processingType
 
   #############################################################################
-  def __sendAccounting(self, jobID):
-    """ Send WMS accounting data for the given job
+  def __sendAccounting(self, jobIDs):
+    """ Send WMS accounting data for the given jobs, in one bundle, and flag them as accounted
+
+        :return: S_OK( list of accounted job IDs ) / S_ERROR
+    """
+    result = self.jobDB.getAttributesForJobList(jobIDs)
+    if not result['OK']:
+      return result
+    jobDicts = result['Value']
+
+    accountedJobs = []
+    for jobID in jobIDs:
+      if jobID not in jobDicts:
+        self.log.error('Could not get attributes for job', '%s' % jobID)
+        continue
+      result = self.__getAccountingReport(jobID, jobDicts[jobID])
+      if result['OK']:
+        result = gDataStoreClient.addRegister(result['Value'])
+      if not result['OK']:
+        self.log.error('Failed to prepare accounting report', 'Job: %d, Error: %s' % (int(jobID), result['Message']))
+        continue
+      accountedJobs.append(jobID)
+
+    if not accountedJobs:
+      return S_OK(accountedJobs)
+
+    result = gDataStoreClient.commit()
+    if not result['OK']:
+      self.log.error('Failed to send accounting reports', 'of %d jobs: %s' % (len(accountedJobs), result['Message']))
+      return result
+    result = self.jobDB.setJobAttributes(accountedJobs, ['AccountedFlag'], ['True'])
+    if not result['OK']:
+      self.log.error('Failed to set the accounted flag', result['Message'])
+    return S_OK(accountedJobs)
+
+  def __getAccountingReport(self, jobID, jobDict):
+    """ Prepare the WMS accounting report of a job
+
+        :param int jobID: job ID
+        :param dict jobDict: attributes of the job
+        :return: S_OK( Job accounting report ) / S_ERROR
     """
     try:
       accountingReport = Job()
       endTime = 'Unknown'
       lastHeartBeatTime = 'Unknown'
 
-      result = self.jobDB.getJobAttributes(jobID)
-      if not result['OK']:
-        return result
-      jobDict = result['Value']
-
       startTime, endTime = self.__checkLoggingInfo(jobID, jobDict)
       lastCPUTime, lastWallTime, lastHeartBeatTime = self.__checkHeartBeat(jobID, jobDict)
       lastHeartBeatTime = fromString(lastHeartBeatTime)
@@ -363,7 +404,7 @@ used to fail jobs due to the optimizer chain.
         cpuNormalization = float(result['Value'].get('CPUNormalizationFactor'))
 
     except Exception:
-      self.log.exception("Exception in __sendAccounting for job %s: endTime=%s, lastHBTime %s" %
+      self.log.exception("Exception in __getAccountingReport for job %s: endTime=%s, lastHBTime %s" %
                          (str(jobID), str(endTime), str(lastHeartBeatTime)), '', False)
       return S_ERROR("Exception")
     processingType = self.__getProcessingType(jobID)
@@ -403,13 +444,7 @@ used to fail jobs due to the optimizer chain.
     self.log.verbose('Accounting Report is:')
     self.log.verbose(acData)
     accountingReport.setValuesFromDict(acData)
-
-    result = accountingReport.commit()
-    if result['OK']:
-      self.jobDB.setJobAttribute(jobID, 'AccountedFlag', 'True')
-    else:
-      self.log.error('Failed to send accounting report', 'Job: %d, Error: %s' % (int(jobID), result['Message']))
-    return result
+    return S_OK(accountingReport)
 
   def __checkHeartBeat(self, jobID, jobDict):
     """ Get info from HeartBeat
@@ -489,7 +524,7 @@ used to fail jobs due to the optimizer chain.
       self.log.error('Failed to select jobs', result['Message'])
       return result
 
-    jobIDs = result['Value']
+    jobIDs = [int(jobID) for jobID in result['Value']]
     if jobIDs:
       self.log.info('Rescheduling %d jobs stuck in Matched status' % len(jobIDs))
       result = self.jobDB.rescheduleJobs(jobIDs)
@@ -502,7 +537,7 @@ used to fail jobs due to the optimizer chain.
       self.log.error('Failed to select jobs', result['Message'])
       return result
 
-    jobIDs = result['Value']
+    jobIDs = [int(jobID) for jobID in result['Value']]
     if jobIDs:
       self.log.info('Rescheduling %d jobs stuck in Rescheduled status' % len(jobIDs))
       result = self.jobDB.rescheduleJobs(jobIDs)
@@ -528,27 +563,24 @@ used to fail jobs due to the optimizer chain.
       self.log.error('Failed to select jobs', result['Message'])
       return result
 
-    jobIDs = result['Value']
+    jobIDs = [int(jobID) for jobID in result['Value']]
     if not jobIDs:
       return S_OK()
 
     # Remove those with Minor Status "Pending Requests"
-    for jobID in jobIDs:
-      result = self.jobDB.getJobAttributes(jobID, ['Status', 'MinorStatus'])
-      if not result['OK']:
-        self.log.error('Failed to get job attributes', result['Message'])
-        continue
-      if result['Value']['Status'] != "Completed":
-        continue
-      if result['Value']['MinorStatus'] == "Pending Requests":
-        continue
+    result = self.jobDB.getAttributesForJobList(jobIDs, ['Status', 'MinorStatus'])
+    if not result['OK']:
+      self.log.error('Failed to get job attributes', result['Message'])
+      return result
+    jobIDs = [jobID for jobID, jobDict in sorted(result['Value'].items())
+              if jobDict['Status'] == "Completed" and jobDict['MinorStatus'] != "Pending Requests"]
+    if not jobIDs:
+      return S_OK()
 
-      result = self.__updateJobStatus(jobID, 'Failed',
-                                      "Job died during finalization")
-      result = self.__sendAccounting(jobID)
-      if not result['OK']:
-        self.log.error('Failed to send accounting', result['Message'])
-        continue
+    result = self.__updateJobStatus(jobIDs, 'Failed', "Job died during finalization")
+    result = self.__sendAccounting(jobIDs)
+    if not result['OK']:
+      self.log.error('Failed to send accounting', result['Message'])
 
     return S_OK()
 
@@ -564,32 +596,28 @@ used to fail jobs due to the optimizer chain.
       self.log.error('Failed to select jobs', result['Message'])
       return result
 
-    jobIDs = result['Value']
+    jobIDs = [int(jobID) for jobID in result['Value']]
     if not jobIDs:
       return S_OK()
 
-    for jobID in jobIDs:
-      result = self.__updateJobStatus(jobID, 'Failed')
-      if not result['OK']:
-        self.log.error('Failed to update job status', result['Message'])
-        continue
+    for jobIDChunk in breakListIntoChunks(jobIDs, self.maxJobsInQuery):
+      self.__updateJobStatus(jobIDChunk, 'Failed')
 
     return S_OK()
 
-  def __sendKillCommand(self, job):
-    """Send a kill signal to the job such that it cannot continue running.
+  def __sendKillCommand(self, jobDicts):
+    """Send a kill signal to the jobs such that they cannot continue running,
+    with one call per owner.
 
-    :param int job: ID of job to send kill command
+    :param dict jobDicts: job ID -> attributes of the job, with at least OwnerDN and OwnerGroup
     """
-    ownerDN = self.jobDB.getJobAttribute(job, 'OwnerDN')
-    ownerGroup = self.jobDB.getJobAttribute(job, 'OwnerGroup')
-    if ownerDN['OK'] and ownerGroup['OK']:
-      wmsClient = WMSClient(useCertificates=True, delegatedDN=ownerDN['Value'], delegatedGroup=ownerGroup['Value'])
-      resKill = wmsClient.killJob(job)
+    ownerJobs = {}
+    for job, jobDict in jobDicts.items():
+      ownerJobs.setdefault((jobDict['OwnerDN'], jobDict['OwnerGroup']), []).append(job)
+    for (ownerDN, ownerGroup), jobIDs in ownerJobs.items():
+      wmsClient = WMSClient(useCertificates=True, delegatedDN=ownerDN, delegatedGroup=ownerGroup)
+      resKill = wmsClient.killJob(sorted(jobIDs))
       if not resKill['OK']:
-        self.log.error("Failed to send kill command to job", "%s: %s" % (job, resKill['Message']))
-    else:
-      self.log.error("Failed to get ownerDN or Group for job:", "%s: %s, %s" %
-                     (job, ownerDN.get('Message', ''), ownerGroup.get('Message', '')))
+        self.log.error("Failed to send kill command to jobs", "%s: %s" % (sorted(jobIDs), resKill['Message']))
 
 # EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#EOF#
@@ -120,3 +120,77 @@ def test_deleteJobOversizedSandbox(mocker, inputs, params, expected):
   result = jobCleaningAgent.deleteJobOversizedSandbox(inputs)
 
   assert result == expected
+
+
+def test_removeJobsByStatusPipeline(mocker):
+  """ The jobs are removed by chunks, from JobDB last, at most MaxRowsPerSecond rows per second
+  """
+  options = {'MaxJobsAtOnce': 250, 'RemovalChunkSize': 100, 'MaxRowsPerSecond': 1000}
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.JobCleaningAgent.AgentModule.__init__")
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.JobCleaningAgent.AgentModule.am_getOption",
+               side_effect=lambda option, default=None: options.get(option, default))
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.JobCleaningAgent.TaskQueueDB")
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.JobCleaningAgent.JobDB")
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.JobCleaningAgent.JobLoggingDB")
+  sandboxStoreClient = mocker.patch("DIRAC.WorkloadManagementSystem.Agent.JobCleaningAgent.SandboxStoreClient")
+  sleep = mocker.patch("DIRAC.WorkloadManagementSystem.Agent.JobCleaningAgent.time.sleep")
+
+  jobCleaningAgent = JobCleaningAgent()
+  jobCleaningAgent.log = gLogger
+  jobCleaningAgent._AgentModule__configDefaults = {}
+  jobCleaningAgent.initialize()
+  # The oversized sandbox of job 3 can not be removed
+  jobCleaningAgent.deleteJobOversizedSandbox = MagicMock(
+      side_effect=lambda jobs: {'OK': True, 'Value': {'Successful': {},
+                                                      'Failed': dict((job, 'lfn') for job in jobs if job == 3)}})
+
+  calls = []
+  sandboxStoreClient.return_value.unassignJobs.side_effect = lambda jobs: calls.append(('SB', jobs)) or {'OK': True}
+  jobCleaningAgent.taskQueueDB.deleteJob.return_value = {'OK': True, 'Value': True}
+  jobCleaningAgent.jobLoggingDB.deleteJob.side_effect = lambda jobs: calls.append(('Logging', jobs)) or \
+      {'OK': True, 'Value': 5 * len(jobs)}
+  jobCleaningAgent.jobDB.removeJobFromDB.side_effect = lambda jobs, chunkSize: calls.append(('JobDB', jobs)) or \
+      {'OK': True, 'Value': 5 * len(jobs)}
+  jobCleaningAgent.jobDB.selectJobs.return_value = {'OK': True, 'Value': range(300)}
+
+  result = jobCleaningAgent.removeJobsByStatus({'Status': 'Done'})
+  assert result['OK']
+  assert result['Value']['Jobs'] == 249
+  assert result['Value']['Rows'] == 2490
+  assert result['Value']['Errors'] == 1
+  assert [(name, len(jobs)) for name, jobs in calls] == [('SB', 100), ('Logging', 99), ('JobDB', 99),
+                                                         ('SB', 100), ('Logging', 100), ('JobDB', 100),
+                                                         ('SB', 50), ('Logging', 50), ('JobDB', 50)]
+  # 1 s per 1000 rows since the start, time.sleep being mocked the time does not go by
+  assert [round(call[0][0], 1) for call in sleep.call_args_list] == [1., 2., 2.5]
+
+  # The removal stops when the sandboxes can not be unassigned
+  sandboxStoreClient.return_value.unassignJobs.side_effect = None
+  sandboxStoreClient.return_value.unassignJobs.return_value = {'OK': False, 'Message': 'No service'}
+  jobCleaningAgent.jobDB.removeJobFromDB.reset_mock()
+  assert not jobCleaningAgent.removeJobsByStatus({'Status': 'Done'})['OK']
+  assert not jobCleaningAgent.jobDB.removeJobFromDB.called
+
+
+def test_removeJobFromDB(mocker):
+  """ Each chunk of jobs is removed from all the tables in a transaction
+  """
+  from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
+  mocker.patch("DIRAC.WorkloadManagementSystem.DB.JobDB.JobDB.__init__", side_effect=mockNone)
+  jobDB = JobDB()
+  jobDB.transactionStart = MagicMock(return_value={'OK': True})
+  jobDB.transactionCommit = MagicMock(return_value={'OK': True})
+  jobDB.transactionRollback = MagicMock(return_value={'OK': True})
+  jobDB._update = MagicMock(side_effect=lambda cmd: {'OK': False, 'Message': 'Lock wait timeout'}
+                            if 'Jobs WHERE JobID in (3,4)' in cmd else {'OK': True, 'Value': 1})
+
+  result = jobDB.removeJobFromDB([1, 2, 3, 4, 5], chunkSize=2)
+  assert not result['OK']
+  assert result['FailedJobs'] == [3, 4]
+  assert result['FailedTables'] == ['Jobs']
+  assert jobDB.transactionStart.call_count == 3
+  assert jobDB.transactionCommit.call_count == 2
+  assert jobDB.transactionRollback.call_count == 1
+
+  jobDB._update = MagicMock(return_value={'OK': True, 'Value': 1})
+  assert jobDB.removeJobFromDB([1, 2, 3], chunkSize=2) == {'OK': True, 'Value': 18}
@@ -5,6 +5,8 @@
 from __future__ import absolute_import
 from mock import MagicMock
 
+from DIRAC import S_OK, S_ERROR
+
 # DIRAC Components
 from DIRAC.WorkloadManagementSystem.Agent.StalledJobAgent import StalledJobAgent
 from DIRAC import gLogger
@@ -116,7 +118,110 @@ def test__markStalledJobs(mocker):
   stalledJobAgent.jobDB.log = gLogger
   stalledJobAgent.log = gLogger
   stalledJobAgent.log.setLevel('DEBUG')
+  stalledJobAgent.jobDB.getStalledJobs = MagicMock(return_value=S_ERROR('No DB'))
 
   result = stalledJobAgent._markStalledJobs(0)
 
   assert not result['OK']
+
+
+def _getAgent(mocker):
+  """ StalledJobAgent with mocked DBs
+  """
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.StalledJobAgent.AgentModule.__init__")
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.StalledJobAgent.AgentModule.am_getOption",
+               side_effect=lambda option, default=None: default)
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.StalledJobAgent.JobDB", MagicMock())
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.StalledJobAgent.JobLoggingDB", MagicMock())
+
+  stalledJobAgent = StalledJobAgent()
+  stalledJobAgent._AgentModule__configDefaults = {}
+  stalledJobAgent.initialize()
+  stalledJobAgent.log = gLogger
+  stalledJobAgent.logDB.addLoggingRecords.return_value = S_OK()
+  return stalledJobAgent
+
+
+def test__markStalledJobsBulk(mocker):
+  """ The stalled jobs are selected and updated by chunks, the tolerant sites get more time
+  """
+  stalledJobAgent = _getAgent(mocker)
+  stalledJobAgent.maxJobsInQuery = 2
+  stalledJobAgent.stalledJobsTolerantSites = ['LCG.Tolerant.ch']
+  stalledJobAgent.stalledJobsToleranceTime = 100
+  jobDB = stalledJobAgent.jobDB
+  jobDB.getStalledJobs.side_effect = [S_OK({1: 'Application', 2: 'Input', 3: 'Application'}),
+                                      S_OK({4: 'Output'})]
+  # Job 2 sent a heart beat in the meantime
+  jobDB.setJobsStalled.side_effect = [S_OK(1), S_OK(1), S_OK(1)]
+  jobDB.getAttributesForJobList.return_value = S_OK({1: {'Status': 'Stalled'}, 2: {'Status': 'Running'}})
+
+  assert stalledJobAgent._markStalledJobs(1000)['OK']
+
+  assert [call[0] + (call[1],) for call in jobDB.getStalledJobs.call_args_list] == \
+      [(1000, {'sites': None, 'excludedSites': ['LCG.Tolerant.ch']}),
+       (1100, {'sites': ['LCG.Tolerant.ch'], 'excludedSites': None})]
+  assert [call[0] for call in jobDB.setJobsStalled.call_args_list] == [([1, 2], 1000), ([3], 1000), ([4], 1100)]
+  records = [record for call in stalledJobAgent.logDB.addLoggingRecords.call_args_list for record in call[0][0]]
+  assert [(record[0], record[1], record[2]) for record in records] == [(1, 'Stalled', 'Application'),
+                                                                       (3, 'Stalled', 'Application'),
+                                                                       (4, 'Stalled', 'Output')]
+
+
+def test__failStalledJobsBulk(mocker):
+  """ The jobs are killed by owner, failed and accounted with a few calls
+  """
+  stalledJobAgent = _getAgent(mocker)
+  wmsClient = MagicMock()
+  wmsClient.return_value.killJob.return_value = S_OK()
+  mocker.patch("DIRAC.WorkloadManagementSystem.Agent.StalledJobAgent.WMSClient", wmsClient)
+  dataStoreClient = mocker.patch("DIRAC.WorkloadManagementSystem.Agent.StalledJobAgent.gDataStoreClient")
+  dataStoreClient.addRegister.return_value = S_OK()
+  dataStoreClient.commit.return_value = S_OK(2)
+  pilotStatus = {1: 'Done', 2: 'Running', 3: 'Running', 4: 'Done'}
+  stalledJobAgent._StalledJobAgent__getJobPilotStatus = lambda job: S_OK(pilotStatus[job])
+  stalledJobAgent._StalledJobAgent__getAccountingReport = lambda job, jobDict: S_OK(MagicMock())
+
+  jobDB = stalledJobAgent.jobDB
+  # As JobDB.selectJobs, the job IDs are strings, job 5 is a job failed but not accounted yet
+  jobDB.selectJobs.side_effect = [S_OK(['1', '2', '3', '4']), S_OK(['5']), S_OK([])]
+  jobDicts = {1: {'HeartBeatTime': 'None', 'LastUpdateTime': '2019-01-01 00:00:00'},
+              2: {'HeartBeatTime': '2019-01-01 00:00:00', 'LastUpdateTime': '2019-01-01 00:00:00'},
+              3: {'HeartBeatTime': '2100-01-01 00:00:00', 'LastUpdateTime': '2019-01-01 00:00:00'},
+              4: {'HeartBeatTime': 'None', 'LastUpdateTime': '2019-01-01 00:00:00'},
+              5: {'HeartBeatTime': 'None', 'LastUpdateTime': '2019-01-01 00:00:00'}}
+  for jobID, jobDict in jobDicts.items():
+    jobDict.update({'OwnerDN': '/DN/%d' % (jobID % 2), 'OwnerGroup': 'group'})
+  jobDB.getAttributesForJobList.return_value = S_OK(jobDicts)
+  jobDB.setJobAttributes.return_value = S_OK()
+
+  result = stalledJobAgent._failStalledJobs(3600)
+  assert result == S_OK(3)
+
+  # One kill per owner
+  assert sorted(call[0][0] for call in wmsClient.return_value.killJob.call_args_list) == [[1], [2, 4]]
+  assert sorted((call[0][0], call[0][2]) for call in jobDB.setJobAttributes.call_args_list) == \
+      [([1, 4], ['Failed', 'Job stalled: pilot not running']),
+       ([1, 4], ['True']),
+       ([2], ['Failed', 'Stalling for more than 3600 sec']),
+       ([2], ['True']),
+       ([5], ['True'])]
+  assert dataStoreClient.addRegister.call_count == 4
+  assert dataStoreClient.commit.call_count == 3
+
+
+def test__failSubmittingJobsMinorStatus(mocker):
+  """ The last minor status of the jobs is logged
+  """
+  stalledJobAgent = _getAgent(mocker)
+  jobDB = stalledJobAgent.jobDB
+  jobDB.selectJobs.return_value = S_OK(['1', '2'])
+  jobDB.setJobAttributes.return_value = S_OK()
+  jobDB.getAttributesForJobList.return_value = S_OK({1: {'MinorStatus': 'Bulk transaction confirmation'},
+                                                     2: {'MinorStatus': 'Job accepted'}})
+
+  assert stalledJobAgent._failSubmittingJobs()['OK']
+  assert jobDB.setJobAttributes.call_args[0][:3] == ([1, 2], ['Status'], ['Failed'])
+  records = stalledJobAgent.logDB.addLoggingRecords.call_args[0][0]
+  assert [record[:3] for record in records] == [(1, 'Failed', 'Bulk transaction confirmation'),
+                                                (2, 'Failed', 'Job accepted')]
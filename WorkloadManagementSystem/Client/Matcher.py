@@ -65,21 +65,7 @@ class Matcher(object):
     startTime = time.time()
 
     resourceDict = self._getResourceDict(resourceDescription, credDict)
-
-    # Make a nice print of the resource matching parameters
-    toPrintDict = dict(resourceDict)
-    if "MaxRAM" in resourceDescription:
-      toPrintDict['MaxRAM'] = resourceDescription['MaxRAM']
-    if "NumberOfProcessors" in resourceDescription:
-      toPrintDict['NumberOfProcessors'] = resourceDescription['NumberOfProcessors']
-    toPrintDict['Tag'] = []
-    if "Tag" in resourceDict:
-      for tag in resourceDict['Tag']:
-        if not tag.endswith('GB') and not tag.endswith('Processors'):
-          toPrintDict['Tag'].append(tag)
-    if not toPrintDict['Tag']:
-      toPrintDict.pop('Tag')
-    gLogger.info('Resource description for matching', printDict(toPrintDict))
+    self._printResourceDict(resourceDescription, resourceDict)
 
     negativeCond = self.limiter.getNegativeCondForSite(resourceDict['Site'])
     result = self.tqDB.matchAndGetJob(resourceDict, negativeCond=negativeCond)
@@ -143,6 +129,98 @@ class Matcher(object):
 
     return resultDict
 
+  def selectJobs(self, resourceDescription, credDict, maxJobs):
+    """ Select up to maxJobs jobs matching the resource capacity, for pilots with several slots.
+        The jobs are taken out of the task queues together, and their attributes, JDLs and
+        optimizer parameters are read with one query each.
+
+        :return: list of dictionaries, as returned by selectJob, possibly empty
+    """
+
+    startTime = time.time()
+
+    resourceDict = self._getResourceDict(resourceDescription, credDict)
+    self._printResourceDict(resourceDescription, resourceDict)
+
+    negativeCond = self.limiter.getNegativeCondForSite(resourceDict['Site'])
+    result = self.tqDB.matchAndGetJobs(resourceDict, maxJobs, negativeCond=negativeCond)
+
+    if not result['OK']:
+      raise RuntimeError(result['Message'])
+    result = result['Value']
+    if not result['matchFound']:
+      self.log.info("No match found")
+      return []
+
+    jobIDs = [jobID for jobID, _tqID in result['jobs']]
+    resAtt = self.jobDB.getAttributesForJobList(jobIDs, ['OwnerDN', 'OwnerGroup', 'Status'])
+    if not resAtt['OK']:
+      raise RuntimeError('Could not retrieve job attributes')
+    jobsAttributes = resAtt['Value']
+    waitingJobIDs = []
+    for jobID in jobIDs:
+      if jobID not in jobsAttributes:
+        self.log.error("No attributes returned for job", str(jobID))
+      elif jobsAttributes[jobID]['Status'] != 'Waiting':
+        self.log.error('Job matched by the TQ is not in Waiting state', str(jobID))
+      else:
+        waitingJobIDs.append(jobID)
+    if not waitingJobIDs:
+      raise RuntimeError("Jobs %s are not in Waiting state" % ",".join(str(jobID) for jobID in jobIDs))
+
+    self._reportStatus(resourceDict, waitingJobIDs)
+
+    result = self.jobDB.getJobsJDL(waitingJobIDs)
+    if not result['OK']:
+      raise RuntimeError("Failed to get the jobs JDL")
+    jdls = result['Value']
+    resOpt = self.jobDB.getJobsOptParameters(waitingJobIDs)
+    optParameters = resOpt['Value'] if resOpt['OK'] else {}
+
+    checkMatchingDelay = self.opsHelper.getValue("JobScheduling/CheckMatchingDelay", True)
+    pilotInfoReportedFlag = resourceDict.get('PilotInfoReportedFlag', False)
+    if not pilotInfoReportedFlag:
+      self._updatePilotInfo(resourceDict)
+
+    resultList = []
+    for jobID in waitingJobIDs:
+      if jobID not in jdls:
+        self.log.error("Failed to get the job JDL", str(jobID))
+        continue
+      resultDict = dict(optParameters.get(jobID, {}))
+      resultDict['JDL'] = jdls[jobID]
+      resultDict['JobID'] = jobID
+      resultDict['DN'] = jobsAttributes[jobID]['OwnerDN']
+      resultDict['Group'] = jobsAttributes[jobID]['OwnerGroup']
+      resultDict['PilotInfoReportedFlag'] = True
+      if checkMatchingDelay:
+        self.limiter.updateDelayCounters(resourceDict['Site'], jobID)
+      self._updatePilotJobMapping(resourceDict, jobID)
+      resultList.append(resultDict)
+
+    matchTime = time.time() - startTime
+    self.log.info("Match time for %s jobs: [%s]" % (len(resultList), str(matchTime)))
+    gMonitor.addMark("matchTime", matchTime)
+
+    return resultList
+
+  def _printResourceDict(self, resourceDescription, resourceDict):
+    """ Make a nice print of the resource matching parameters
+    """
+    toPrintDict = dict(resourceDict)
+    if "MaxRAM" in resourceDescription:
+      toPrintDict['MaxRAM'] = resourceDescription['MaxRAM']
+    if "NumberOfProcessors" in resourceDescription:
+      toPrintDict['NumberOfProcessors'] = resourceDescription['NumberOfProcessors']
+    toPrintDict['Tag'] = []
+    if "Tag" in resourceDict:
+      for tag in resourceDict['Tag']:
+        if not tag.endswith('GB') and not tag.endswith('Processors'):
+          toPrintDict['Tag'].append(tag)
+    if not toPrintDict['Tag']:
+      toPrintDict.pop('Tag')
+    gLogger.info('Resource description for matching', printDict(toPrintDict))
+
   def _getResourceDict(self, resourceDescription, credDict):
     """ from resourceDescription to resourceDict (just various mods)
     """
@@ -217,12 +295,13 @@ class Matcher(object):
     return resourceDict
 
   def _reportStatus(self, resourceDict, jobID):
-    """ Reports the status of the matched job in jobDB and jobLoggingDB
+    """ Reports the status of the matched job(s) in jobDB and jobLoggingDB
 
         Do not fail if errors happen here
     """
     attNames = ['Status', 'MinorStatus', 'ApplicationStatus', 'Site']
     attValues = ['Matched', 'Assigned', 'Unknown', resourceDict['Site']]
+    # setJobAttributes updates a list of jobs in a single statement
     result = self.jobDB.setJobAttributes(jobID, attNames, attValues)
     if not result['OK']:
       self.log.error("Problem reporting job status",
@@ -230,10 +309,13 @@ class Matcher(object):
     else:
       self.log.verbose("Set job attributes for jobID %s" % jobID)
 
-    result = self.jlDB.addLoggingRecord(jobID,
-                                        status='Matched',
-                                        minor='Assigned',
-                                        source='Matcher')
+    if not isinstance(jobID, list):
+      result = self.jlDB.addLoggingRecord(jobID,
+                                          status='Matched',
+                                          minor='Assigned',
+                                          source='Matcher')
+    else:
+      result = self.jlDB.addLoggingRecords([(jID, 'Matched', 'Assigned', 'idem', '', 'Matcher') for jID in jobID])
     if not result['OK']:
       self.log.error("Problem reporting job status",
                      "addLoggingRecord, jobID = %s: %s" % (jobID, result['Message']))
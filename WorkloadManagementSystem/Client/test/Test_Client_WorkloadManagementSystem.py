@@ -148,6 +148,37 @@ class MatcherTestCase(ClientsTestCase):
 
     self.assertEqual(res, resExpected)
 
+  def test_selectJobs(self):
+
+    resourceDict = {'Setup': 'LHCb-Certification', 'CPUTime': 1080000, 'Site': 'DIRAC.Jenkins.ch'}
+    self.matcher._getResourceDict = MagicMock(return_value=resourceDict)
+    self.matcher.limiter = MagicMock()
+    self.tqDBMock.matchAndGetJobs.return_value = S_OK({'matchFound': True,
+                                                       'jobs': [(1, 10), (2, 10), (3, 11)],
+                                                       'tqMatch': resourceDict})
+    self.jobDBMock.getAttributesForJobList.return_value = S_OK({
+        1: {'JobID': 1, 'OwnerDN': '/DN/user', 'OwnerGroup': 'user', 'Status': 'Waiting'},
+        2: {'JobID': 2, 'OwnerDN': '/DN/user', 'OwnerGroup': 'user', 'Status': 'Killed'},
+        3: {'JobID': 3, 'OwnerDN': '/DN/prod', 'OwnerGroup': 'prod', 'Status': 'Waiting'}})
+    self.jobDBMock.getJobsJDL.return_value = S_OK({1: '[JDL1]', 3: '[JDL3]'})
+    self.jobDBMock.getJobsOptParameters.return_value = S_OK({1: {'CPUTime': '100'}, 3: {}})
+
+    res = self.matcher.selectJobs({}, {}, 3)
+    self.tqDBMock.matchAndGetJobs.assert_called_once()
+    self.assertEqual(self.tqDBMock.matchAndGetJobs.call_args[0][1], 3)
+    # The job not in Waiting state is not served, the others are fetched in bulk
+    self.jobDBMock.getJobsJDL.assert_called_once_with([1, 3])
+    self.assertEqual([jobDict['JobID'] for jobDict in res], [1, 3])
+    self.assertEqual(res[0]['JDL'], '[JDL1]')
+    self.assertEqual(res[0]['CPUTime'], '100')
+    self.assertEqual(res[1]['DN'], '/DN/prod')
+    self.assertEqual(res[1]['Group'], 'prod')
+    self.jobDBMock.setJobAttributes.assert_called_once()
+    self.assertEqual(self.jobDBMock.setJobAttributes.call_args[0][0], [1, 3])
+
+    self.tqDBMock.matchAndGetJobs.return_value = S_OK({'matchFound': False, 'tqMatch': resourceDict})
+    self.assertEqual(self.matcher.selectJobs({}, {}, 3), [])
+
 #############################################################################
 
 
@@ -28,6 +28,7 @@
     setInputData()
 
     insertNewJobIntoDB()
+    insertNewJobsIntoDB()
     removeJobFromDB()
 
     rescheduleJob()
@@ -51,6 +52,7 @@ from DIRAC.Core.Utilities import DErrno
 from DIRAC.Core.Utilities.ClassAd.ClassAdLight import ClassAd
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.Utilities import Time
+from DIRAC.Core.Utilities.List import breakListIntoChunks
 from DIRAC.Core.Utilities.DErrno import EWMSSUBM
 from DIRAC.Core.Utilities.ObjectLoader import ObjectLoader
 from DIRAC.ConfigurationSystem.Client.Config import gConfig
@@ -65,6 +67,8 @@ from DIRAC.ResourceStatusSystem.Client.SiteStatus import SiteStatus
 JOB_STATES = ['Submitting', 'Received', 'Checking', 'Staging', 'Waiting', 'Matched',
               'Running', 'Stalled', 'Done', 'Completed', 'Failed']
 JOB_FINAL_STATES = ['Done', 'Completed', 'Failed']
+# States set to Running by a heart beat
+HEARTBEAT_RUNNING_STATES = ['Matched', 'Running', 'Stalled']
 
 
 class JobDB(DB):
@@ -524,6 +528,33 @@ class JobDB(DB):
     else:
       return S_ERROR('JobDB.getJobOptParameters: failed to retrieve parameters')
 
+#############################################################################
+  def getJobsOptParameters(self, jobIDList, paramList=None):
+    """ Get optimizer parameters for a list of jobs in a single query.
+        Returns S_OK( { jobID: { name: value } } ), with an entry for every job
+    """
+    if not jobIDList:
+      return S_OK({})
+    jobs = ','.join(str(int(jobID)) for jobID in jobIDList)
+    cmd = "SELECT JobID, Name, Value from OptimizerParameters WHERE JobID in (%s)" % jobs
+    if paramList:
+      ret = self._escapeValues(paramList)
+      if not ret['OK']:
+        return ret
+      cmd += " and Name in (%s)" % ','.join(ret['Value'])
+
+    result = self._query(cmd)
+    if not result['OK']:
+      return S_ERROR('JobDB.getJobsOptParameters: failed to retrieve parameters')
+    resultDict = dict((int(jobID), {}) for jobID in jobIDList)
+    for jobID, name, value in result['Value']:
+      try:
+        value = value.tostring()
+      except BaseException:
+        pass
+      resultDict[int(jobID)][name] = value
+    return S_OK(resultDict)
+
 #############################################################################
 
   def getInputData(self, jobID):
@@ -637,6 +668,70 @@ class JobDB(DB):
       return S_OK([])
     return S_OK([self._to_value(i) for i in res['Value']])
 
+  def streamJobs(self, condDict, older=None, newer=None, timeStamp='LastUpdateTime',
+                 orderAttribute=None, limit=None, chunkSize=1000):
+    """ Same as selectJobs, but the job IDs are read from the DB as they are consumed,
+        for selections over the whole history of jobs.
+
+        :return: S_OK( generator of lists of at most chunkSize job IDs ) / S_ERROR
+    """
+    res = self.streamFields('Jobs', ['JobID'], condDict=condDict, limit=limit,
+                            older=older, newer=newer, timeStamp=timeStamp, orderAttribute=orderAttribute,
+                            chunkSize=chunkSize)
+    if not res['OK']:
+      return res
+    return S_OK([self._to_value(row) for row in rows] for rows in res['Value'])
+
+#############################################################################
+  @staticmethod
+  def __notUpdatedCondition(seconds):
+    """ SQL condition selecting the jobs with a heart beat or an update time, both older than seconds ago
+    """
+    limit = "DATE_SUB( UTC_TIMESTAMP(), INTERVAL %d SECOND )" % int(seconds)
+    return "( HeartBeatTime IS NOT NULL OR LastUpdateTime IS NOT NULL )" + \
+        "".join(" AND ( %s IS NULL OR %s < %s )" % (column, column, limit)
+                for column in ('HeartBeatTime', 'LastUpdateTime'))
+
+  def getStalledJobs(self, stalledTime, sites=None, excludedSites=None):
+    """ Select the Running jobs without heart beat nor update for more than stalledTime seconds,
+        the jobs without any heart beat or update time are not selected
+
+        :param int stalledTime: seconds
+        :param list sites: only the jobs running at these sites, if given
+        :param list excludedSites: not the jobs running at these sites
+        :return: S_OK( { jobID : MinorStatus } ) / S_ERROR
+    """
+    conditions = ["Status = 'Running'", self.__notUpdatedCondition(stalledTime)]
+    for siteList, operator in ((sites, 'IN'), (excludedSites, 'NOT IN')):
+      if siteList is None:
+        continue
+      ret = self._escapeValues(siteList)
+      if not ret['OK']:
+        return ret
+      if ret['Value']:
+        conditions.append("Site %s ( %s )" % (operator, ', '.join(ret['Value'])))
+      elif operator == 'IN':
+        # No site
+        return S_OK({})
+
+    result = self._query("SELECT JobID, MinorStatus FROM Jobs WHERE %s" % " AND ".join(conditions))
+    if not result['OK']:
+      return result
+    return S_OK(dict((int(jobID), minorStatus) for jobID, minorStatus in result['Value']))
+
+  def setJobsStalled(self, jobIDs, stalledTime):
+    """ Set to Stalled the jobs among jobIDs still Running without heart beat nor update
+        for more than stalledTime seconds
+
+        :return: S_OK( number of jobs set to Stalled ) / S_ERROR
+    """
+    if not jobIDs:
+      return S_OK(0)
+    cmd = "UPDATE Jobs SET Status = 'Stalled', LastUpdateTime = UTC_TIMESTAMP() " \
+          "WHERE JobID IN ( %s ) AND Status = 'Running' AND %s" % (', '.join(str(int(jobID)) for jobID in jobIDs),
+                                                                  self.__notUpdatedCondition(stalledTime))
+    return self._update(cmd)
+
 #############################################################################
   def setJobAttribute(self, jobID, attrName, attrValue, update=False, myDate=None):
     """ Set an attribute value for job specified by jobID.
@@ -1040,6 +1135,20 @@ class JobDB(DB):
       return S_OK(result['Value'][0][0])
     return result
 
+#############################################################################
+  def getJobsJDL(self, jobIDList, original=False):
+    """ Get the JDL of a list of jobs in a single query.
+        Returns S_OK( { jobID: JDL } ), jobs without JDL are not in the dictionary
+    """
+    if not jobIDList:
+      return S_OK({})
+    jobs = ','.join(str(int(jobID)) for jobID in jobIDList)
+    column = 'OriginalJDL' if original else 'JDL'
+    result = self._query("SELECT JobID, %s FROM JobJDLs WHERE JobID in (%s)" % (column, jobs))
+    if not result['OK']:
+      return result
+    return S_OK(dict((int(jobID), jdl) for jobID, jdl in result['Value']))
+
 #############################################################################
   def insertNewJobIntoDB(self, jdl, owner, ownerDN, ownerGroup, diracSetup,
                          initialStatus="Received",
@@ -1057,6 +1166,170 @@ class JobDB(DB):
         :param str initialMinorStatus: optional initial minor job status
         :return: new job ID
     """
+    result = self.__loadJobManifest(jdl, owner, ownerDN, ownerGroup, diracSetup)
+    if not result['OK']:
+      return result
+    jobManifest = result['Value']
+
+    # 1.- insert original JDL on DB and get new JobID
+    # Fix the possible lack of the brackets in the JDL
+    if jdl.strip()[0].find('[') != 0:
+      jdl = '[' + jdl + ']'
+    result = self.__insertNewJDL(jdl)
+    if not result['OK']:
+      return S_ERROR(EWMSSUBM, 'Failed to insert JDL in to DB')
+    jobID = result['Value']
+
+    # 2.- Check JDL and Prepare DIRAC JDL
+    result = self.__prepareNewJob(jobID, jobManifest, owner, ownerDN, ownerGroup, diracSetup,
+                                  initialStatus, initialMinorStatus)
+    if not result['OK']:
+      return result
+    newJob = result['Value']
+    jobAttrNames, jobAttrValues = newJob['Attributes']
+
+    retVal = S_OK(jobID)
+    retVal['JobID'] = jobID
+    retVal['Status'] = newJob['Status']
+    retVal['MinorStatus'] = newJob['MinorStatus']
+
+    if newJob['JDL']:
+      result = self.setJobJDL(jobID, newJob['JDL'])
+      if not result['OK']:
+        return result
+
+    # Adding the job in the Jobs table
+    result = self.insertFields('Jobs', jobAttrNames, jobAttrValues)
+    if not result['OK']:
+      return result
+    if not newJob['JDL']:
+      return retVal
+
+    # Setting the Job parameters
+    result = self.setJobParameters(jobID, newJob['Parameters'])
+    if not result['OK']:
+      return result
+
+    # Adding the Input Data
+    result = self.insertMany('InputData', ['JobID', 'LFN'], [(jobID, lfn) for lfn in newJob['InputData']])
+    if not result['OK']:
+      return result
+
+    return retVal
+
+  def insertNewJobsIntoDB(self, jdlList, owner, ownerDN, ownerGroup, diracSetup,
+                          initialStatus="Received",
+                          initialMinorStatus="Job accepted",
+                          chunkSize=1000):
+    """ Insert several new jobs, typically the jobs of a parametric job, as insertNewJobIntoDB does for
+        a single job, but with a few multi-row statements per chunk of chunkSize jobs, each chunk in
+        a transaction. All the JDLs are checked before inserting any job.
+
+        :param list jdlList: job description JDLs
+        :param int chunkSize: maximum number of jobs inserted in a transaction
+        :return: S_OK( [ ( jobID, status, minorStatus ) ] ) / S_ERROR, with the already inserted JobIDs
+    """
+    newJDLs = []
+    for jdl in jdlList:
+      result = self.__loadJobManifest(jdl, owner, ownerDN, ownerGroup, diracSetup)
+      if not result['OK']:
+        return result
+      # Fix the possible lack of the brackets in the JDL
+      if jdl.strip()[0].find('[') != 0:
+        jdl = '[' + jdl + ']'
+      newJDLs.append((jdl, result['Value']))
+
+    # The CS lookups done for each job are the same for the whole bunch
+    cache = {}
+    newJobs = []
+    for chunk in breakListIntoChunks(newJDLs, chunkSize):
+      result = self.transactionStart()
+      if result['OK']:
+        result = self.__insertNewJobs(chunk, owner, ownerDN, ownerGroup, diracSetup,
+                                      initialStatus, initialMinorStatus, cache)
+      if result['OK']:
+        chunkJobs = result['Value']
+        result = self.transactionCommit()
+      if not result['OK']:
+        self.transactionRollback()
+        result['JobIDs'] = [jobID for jobID, _status, _minor in newJobs]
+        return result
+      newJobs.extend(chunkJobs)
+      self.log.info('JobDB: New JobIDs served', '%d to %d' % (chunkJobs[0][0], chunkJobs[-1][0]))
+
+    return S_OK(newJobs)
+
+  def __insertNewJobs(self, newJDLs, owner, ownerDN, ownerGroup, diracSetup,
+                      initialStatus, initialMinorStatus, cache):
+    """ Insert new jobs with multi-row statements, see insertNewJobsIntoDB
+
+        :param list newJDLs: ( JDL, JobManifest ) of the jobs
+        :return: S_OK( [ ( jobID, status, minorStatus ) ] ) / S_ERROR
+    """
+    # 1.- insert original JDLs on DB and get a block of new JobIDs:
+    # the rows of a multi-row INSERT are given consecutive auto-increment values,
+    # separated by auto_increment_increment (e.g. with Galera or multi-primary replication)
+    result = self._query("SELECT @@auto_increment_increment")
+    if not result['OK']:
+      return result
+    jobIDStep = int(result['Value'][0][0]) if result['Value'] else 1
+    result = self._escapeValues([jdl for jdl, _jobManifest in newJDLs])
+    if not result['OK']:
+      return result
+    cmd = "INSERT INTO JobJDLs (JDL, JobRequirements, OriginalJDL) VALUES %s" % \
+        ', '.join("('', '', %s)" % jdl for jdl in result['Value'])
+    result = self._update(cmd)
+    if not result['OK']:
+      return result
+    if 'lastRowId' not in result:
+      return S_ERROR('JobDB.__insertNewJobs: Failed to retrieve new Ids.')
+    firstJobID = int(result['lastRowId'])
+
+    # 2.- Check JDLs and Prepare DIRAC JDLs
+    jobRows = {}
+    jdlRows = []
+    parameterRows = []
+    inputDataRows = []
+    newJobs = []
+    jobIDs = range(firstJobID, firstJobID + len(newJDLs) * jobIDStep, jobIDStep)
+    for jobID, (jdl, jobManifest) in zip(jobIDs, newJDLs):
+      result = self.__prepareNewJob(jobID, jobManifest, owner, ownerDN, ownerGroup, diracSetup,
+                                    initialStatus, initialMinorStatus, cache)
+      if not result['OK']:
+        return result
+      newJob = result['Value']
+      jobAttrNames, jobAttrValues = newJob['Attributes']
+      jobRows.setdefault(tuple(jobAttrNames), []).append(jobAttrValues)
+      if newJob['JDL']:
+        jdlRows.append((jobID, newJob['JDL'], '', jdl))
+        parameterRows.extend((jobID, name, value) for name, value in newJob['Parameters'])
+        inputDataRows.extend((jobID, lfn) for lfn in newJob['InputData'])
+      newJobs.append((jobID, newJob['Status'], newJob['MinorStatus']))
+
+    # 3.- Write the jobs
+    result = self.upsertMany('JobJDLs', ['JobID', 'JDL', 'JobRequirements', 'OriginalJDL'], jdlRows,
+                             updateFields=['JDL'])
+    if not result['OK']:
+      return result
+    for jobAttrNames, rows in jobRows.items():
+      result = self.insertMany('Jobs', list(jobAttrNames), rows)
+      if not result['OK']:
+        return result
+    result = self.insertMany('JobParameters', ['JobID', 'Name', 'Value'], parameterRows)
+    if not result['OK']:
+      return result
+    result = self.insertMany('InputData', ['JobID', 'LFN'], inputDataRows)
+    if not result['OK']:
+      return result
+
+    return S_OK(newJobs)
+
+  @staticmethod
+  def __loadJobManifest(jdl, owner, ownerDN, ownerGroup, diracSetup):
+    """ Load and check the JDL of a new job
+
+        :return: S_OK( JobManifest ) / S_ERROR
+    """
     jobManifest = JobManifest()
     result = jobManifest.load(jdl)
     if not result['OK']:
@@ -1068,18 +1341,19 @@ class JobDB(DB):
     result = jobManifest.check()
     if not result['OK']:
       return result
+    return S_OK(jobManifest)
+
+  def __prepareNewJob(self, jobID, jobManifest, owner, ownerDN, ownerGroup, diracSetup,
+                      initialStatus, initialMinorStatus, cache=None):
+    """ Prepare what is written in the DB for a new job
+
+        :return: S_OK( dict ) with the Attributes ( names, values ) of the job, its JDL (None if the JDL
+                 is not valid), its initial Parameters ( name, value ), its InputData LFNs, its Status and
+                 MinorStatus / S_ERROR
+    """
     jobAttrNames = []
     jobAttrValues = []
 
-    # 1.- insert original JDL on DB and get new JobID
-    # Fix the possible lack of the brackets in the JDL
-    if jdl.strip()[0].find('[') != 0:
-      jdl = '[' + jdl + ']'
-    result = self.__insertNewJDL(jdl)
-    if not result['OK']:
-      return S_ERROR(EWMSSUBM, 'Failed to insert JDL in to DB')
-    jobID = result['Value']
-
     jobManifest.setOption('JobID', jobID)
 
     jobAttrNames.append('JobID')
@@ -1103,7 +1377,6 @@ class JobDB(DB):
     jobAttrNames.append('DIRACSetup')
     jobAttrValues.append(diracSetup)
 
-    # 2.- Check JDL and Prepare DIRAC JDL
     jobJDL = jobManifest.dumpAsJDL()
 
     # Replace the JobID placeholder if any
@@ -1112,8 +1385,7 @@ class JobDB(DB):
 
     classAdJob = ClassAd(jobJDL)
     classAdReq = ClassAd('[]')
-    retVal = S_OK(jobID)
-    retVal['JobID'] = jobID
+    newJob = {'Attributes': (jobAttrNames, jobAttrValues), 'JDL': None, 'Parameters': [], 'InputData': []}
     if not classAdJob.isOK():
       jobAttrNames.append('Status')
       jobAttrValues.append('Failed')
@@ -1121,19 +1393,15 @@ class JobDB(DB):
       jobAttrNames.append('MinorStatus')
       jobAttrValues.append('Error in JDL syntax')
 
-      result = self.insertFields('Jobs', jobAttrNames, jobAttrValues)
-      if not result['OK']:
-        return result
-
-      retVal['Status'] = 'Failed'
-      retVal['MinorStatus'] = 'Error in JDL syntax'
-      return retVal
+      newJob['Status'] = 'Failed'
+      newJob['MinorStatus'] = 'Error in JDL syntax'
+      return S_OK(newJob)
 
     classAdJob.insertAttributeInt('JobID', jobID)
     result = self.__checkAndPrepareJob(jobID, classAdJob, classAdReq,
                                        owner, ownerDN,
                                        ownerGroup, diracSetup,
-                                       jobAttrNames, jobAttrValues)
+                                       jobAttrNames, jobAttrValues, cache)
     if not result['OK']:
       return result
 
@@ -1170,63 +1438,35 @@ class JobDB(DB):
     reqJDL = classAdReq.asJDL()
     classAdJob.insertAttributeInt('JobRequirements', reqJDL)
 
-    jobJDL = classAdJob.asJDL()
+    newJob['JDL'] = classAdJob.asJDL()
 
-    result = self.setJobJDL(jobID, jobJDL)
-    if not result['OK']:
-      return result
-
-    # Adding the job in the Jobs table
-    result = self.insertFields('Jobs', jobAttrNames, jobAttrValues)
-    if not result['OK']:
-      return result
-
-    # Setting the Job parameters
-    result = self.__setInitialJobParameters(classAdJob, jobID)
-    if not result['OK']:
-      return result
+    # The initial Job parameters
+    if classAdJob.lookupAttribute("Parameters"):
+      newJob['Parameters'] = list(classAdJob.getDictionaryFromSubJDL("Parameters").items())
 
     # Looking for the Input Data
-    inputData = []
     if classAdJob.lookupAttribute('InputData'):
-      inputData = classAdJob.getListFromExpression('InputData')
-    values = []
-
-    ret = self._escapeString(jobID)
-    if not ret['OK']:
-      return ret
-    e_jobID = ret['Value']
-
-    for lfn in inputData:
       # some jobs are setting empty string as InputData
-      if not lfn:
-        continue
-      ret = self._escapeString(lfn.strip())
-      if not ret['OK']:
-        return ret
-      lfn = ret['Value']
+      newJob['InputData'] = [lfn.strip() for lfn in classAdJob.getListFromExpression('InputData') if lfn]
 
-      values.append('(%s, %s )' % (e_jobID, lfn))
-
-    if values:
-      cmd = 'INSERT INTO InputData (JobID,LFN) VALUES %s' % ', '.join(values)
-      result = self._update(cmd)
-      if not result['OK']:
-        return result
-
-    retVal['Status'] = initialStatus
-    retVal['MinorStatus'] = initialMinorStatus
-
-    return retVal
+    newJob['Status'] = initialStatus
+    newJob['MinorStatus'] = initialMinorStatus
+    return S_OK(newJob)
 
   def __checkAndPrepareJob(self, jobID, classAdJob, classAdReq, owner, ownerDN,
-                           ownerGroup, diracSetup, jobAttrNames, jobAttrValues):
+                           ownerGroup, diracSetup, jobAttrNames, jobAttrValues, cache=None):
     """
       Check Consistency of Submitted JDL and set some defaults
       Prepare subJDL with Job Requirements
+
+      The configuration values are kept in cache, if given, for the next jobs of the same owner
     """
+    if cache is None:
+      cache = {}
     error = ''
-    vo = getVOForGroup(ownerGroup)
+    if 'VO' not in cache:
+      cache['VO'] = getVOForGroup(ownerGroup)
+    vo = cache['VO']
 
     jdlDiracSetup = classAdJob.getAttributeString('DIRACSetup')
     jdlOwner = classAdJob.getAttributeString('Owner')
@@ -1260,8 +1500,10 @@ class JobDB(DB):
     if vo:
       classAdReq.insertAttributeString('VirtualOrganization', vo)
 
-    setup = gConfig.getValue('/DIRAC/Setup', '')
-    voPolicyDict = gConfig.getOptionsDict('/DIRAC/VOPolicy/%s/%s' % (vo, setup))
+    if 'VOPolicy' not in cache:
+      setup = gConfig.getValue('/DIRAC/Setup', '')
+      cache['VOPolicy'] = gConfig.getOptionsDict('/DIRAC/VOPolicy/%s/%s' % (vo, setup))
+    voPolicyDict = cache['VOPolicy']
     # voPolicyDict = gConfig.getOptionsDict('/DIRAC/VOPolicy')
     if voPolicyDict['OK']:
       voPolicy = voPolicyDict['Value']
@@ -1283,15 +1525,20 @@ class JobDB(DB):
       if cpuTime is not None:
         classAdJob.insertAttributeInt('CPUTime', cpuTime)
       else:
-        opsHelper = Operations(group=ownerGroup,
-                               setup=diracSetup)
-        cpuTime = opsHelper.getValue('JobDescription/DefaultCPUTime', 86400)
+        if 'DefaultCPUTime' not in cache:
+          opsHelper = Operations(group=ownerGroup,
+                                 setup=diracSetup)
+          cache['DefaultCPUTime'] = opsHelper.getValue('JobDescription/DefaultCPUTime', 86400)
+        cpuTime = cache['DefaultCPUTime']
     classAdReq.insertAttributeInt('CPUTime', cpuTime)
 
     # platform(s)
     platformList = classAdJob.getListFromExpression('Platform')
     if platformList:
-      result = self.getDIRACPlatform(platformList)
+      platformKey = ('Platforms',) + tuple(platformList)
+      if platformKey not in cache:
+        cache[platformKey] = self.getDIRACPlatform(platformList)
+      result = cache[platformKey]
       if not result['OK']:
         return result
       if result['Value']:
@@ -1319,11 +1566,16 @@ class JobDB(DB):
     return S_OK()
 
 #############################################################################
-  def removeJobFromDB(self, jobIDs):
+  def removeJobFromDB(self, jobIDs, chunkSize=1000):
     """Remove job from DB
 
        Remove job from the Job DB and clean up all the job related data
-       in various tables
+       in various tables. The jobs are removed by chunks of at most chunkSize jobs,
+       each chunk in its own transaction: a chunk is removed from all the tables or from none.
+
+       :param jobIDs: one or more job IDs
+       :param int chunkSize: maximum number of jobs removed in a transaction
+       :return: S_OK( number of removed rows ) / S_ERROR, with the FailedTables and the FailedJobs
     """
 
     # ret = self._escapeString(jobID)
@@ -1337,26 +1589,44 @@ class JobDB(DB):
       jobIDList = jobIDs
 
     failedTablesList = []
-    jobIDString = ','.join([str(j) for j in jobIDList])
-    for table in ['InputData',
-                  'JobParameters',
-                  'AtticJobParameters',
-                  'HeartBeatLoggingInfo',
-                  'OptimizerParameters',
-                  'JobCommands',
-                  'Jobs',
-                  'JobsStatus',
-                  'JobJDLs']:
-
-      cmd = 'DELETE FROM %s WHERE JobID in (%s)' % (table, jobIDString)
-      result = self._update(cmd)
+    failedJobs = []
+    removedRows = 0
+    for jobChunk in breakListIntoChunks(jobIDList, chunkSize):
+      jobIDString = ','.join([str(j) for j in jobChunk])
+      result = self.transactionStart()
+      if not result['OK']:
+        failedJobs.extend(jobChunk)
+        continue
+      chunkRows = 0
+      for table in ['InputData',
+                    'JobParameters',
+                    'AtticJobParameters',
+                    'HeartBeatLoggingInfo',
+                    'OptimizerParameters',
+                    'JobCommands',
+                    'Jobs',
+                    'JobsStatus',
+                    'JobJDLs']:
+
+        cmd = 'DELETE FROM %s WHERE JobID in (%s)' % (table, jobIDString)
+        result = self._update(cmd)
+        if not result['OK']:
+          failedTablesList.append(table)
+          break
+        chunkRows += result['Value']
+      if result['OK']:
+        result = self.transactionCommit()
       if not result['OK']:
-        failedTablesList.append(table)
+        self.transactionRollback()
+        failedJobs.extend(jobChunk)
+        continue
+      removedRows += chunkRows
 
-    result = S_OK()
-    if failedTablesList:
+    result = S_OK(removedRows)
+    if failedJobs:
       result = S_ERROR('Errors while job removal')
-      result['FailedTables'] = failedTablesList
+      result['FailedTables'] = sorted(set(failedTablesList))
+      result['FailedJobs'] = failedJobs
 
     return result
 
@@ -2028,6 +2298,67 @@ class JobDB(DB):
       return S_OK()
     return S_ERROR('Failed to store some or all the parameters')
 
+#####################################################################################
+  def setHeartBeatsData(self, heartBeats):
+    """ Add the heart beat data of several jobs to the database, with multi-row statements
+
+        :param dict heartBeats: { jobID : { 'HeartBeatTime' : datetime of the last heart beat,
+                                            'StaticData' : dict of job parameters,
+                                            'DynamicData' : list of ( datetime, dict ) } }
+    """
+    if not heartBeats:
+      return S_OK()
+
+    # A job removed in the meantime would make the whole statements fail
+    jobIDs = []
+    for jobChunk in breakListIntoChunks(sorted(heartBeats), 1000):
+      result = self._query("SELECT JobID FROM Jobs WHERE JobID IN (%s)" % ','.join(str(jobID) for jobID in jobChunk))
+      if not result['OK']:
+        return result
+      jobIDs.extend(row[0] for row in result['Value'])
+    if len(jobIDs) < len(heartBeats):
+      self.log.verbose('Heart beats of unknown jobs ignored', len(heartBeats) - len(jobIDs))
+    jobIDs.sort()
+
+    ok = True
+    for jobChunk in breakListIntoChunks(jobIDs, 1000):
+      cases = ' '.join("WHEN %d THEN '%s'" % (jobID, heartBeats[jobID]['HeartBeatTime'].replace(microsecond=0))
+                       for jobID in jobChunk)
+      # The job may have reached a final state since the heart beat was received
+      req = "UPDATE Jobs SET HeartBeatTime=CASE JobID %s END, " \
+            "Status=CASE WHEN Status IN (%s) THEN 'Running' ELSE Status END WHERE JobID IN (%s)" % \
+          (cases, ','.join("'%s'" % status for status in HEARTBEAT_RUNNING_STATES),
+           ','.join(str(jobID) for jobID in jobChunk))
+      result = self._update(req)
+      if not result['OK']:
+        return S_ERROR('Failed to set the heart beat time: ' + result['Message'])
+
+    # FIXME: It is rather not optimal to use parameters to store the heartbeat info, must find a proper solution
+    parameters = [(jobID, name, value) for jobID in jobIDs
+                  for name, value in heartBeats[jobID]['StaticData'].items()]
+    result = self.upsertMany('JobParameters', ['JobID', 'Name', 'Value'], parameters)
+    if not result['OK']:
+      ok = False
+      self.log.warn(result['Message'])
+
+    # Only one value per second for a job and a name
+    logValues = {}
+    for jobID in jobIDs:
+      for heartBeatTime, dynamicDataDict in heartBeats[jobID]['DynamicData']:
+        heartBeatTime = str(heartBeatTime.replace(microsecond=0))
+        for key, value in dynamicDataDict.items():
+          logValues[(jobID, key, heartBeatTime)] = value
+    result = self.insertMany('HeartBeatLoggingInfo', ['JobID', 'Name', 'Value', 'HeartBeatTime'],
+                             [(jobID, key, value, heartBeatTime)
+                              for (jobID, key, heartBeatTime), value in logValues.iteritems()])
+    if not result['OK']:
+      ok = False
+      self.log.warn(result['Message'])
+
+    if ok:
+      return S_OK()
+    return S_ERROR('Failed to store some or all the parameters')
+
 #####################################################################################
   def getHeartBeatData(self, jobID):
     """ Retrieve the job's heart beat data
@@ -2,6 +2,7 @@
     The following methods are provided
 
     addLoggingRecord()
+    addLoggingRecords()
     getJobLoggingInfo()
     deleteJob()
     getWMSTimeStamps()
@@ -53,6 +54,34 @@ class JobLoggingDB(DB):
     event = 'status/minor/app=%s/%s/%s' % (status, minor, application)
     self.gLogger.info("Adding record for job " + str(jobID) + ": '" + event + "' from " + source)
 
+    _date, time_order = self.__getStatusTime(date)
+
+    cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
+          "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')" % \
+        (int(jobID), status, minor, application[:255],
+         str(_date), time_order, source)
+
+    return self._update(cmd)
+
+#############################################################################
+  def addLoggingRecords(self, records):
+    """ Add several entries to the JobLoggingDB table, in a few multi-row statements
+
+        :param list records: tuples ( jobID, status, minor, application, date, source ),
+                             with the same meaning as the parameters of addLoggingRecord
+        :return: S_OK/S_ERROR
+    """
+    rows = []
+    for jobID, status, minor, application, date, source in records:
+      _date, time_order = self.__getStatusTime(date)
+      rows.append([int(jobID), status, minor, application[:255], str(_date), '%f' % time_order, source])
+    self.gLogger.info("Adding %d logging records" % len(rows))
+    return self.insertMany('LoggingInfo', ['JobId', 'Status', 'MinorStatus', 'ApplicationStatus',
+                                           'StatusTime', 'StatusTimeOrder', 'StatusSource'], rows)
+
+  def __getStatusTime(self, date):
+    """ Get the time stamp of a logging record and its order number, see addLoggingRecord
+    """
     if not date:
       # Make the UTC datetime string and float
       _date = Time.dateTime()
@@ -80,13 +109,7 @@ class JobLoggingDB(DB):
         _date = Time.dateTime()
         epoc = time.mktime(_date.timetuple()) - MAGIC_EPOC_NUMBER
         time_order = round(epoc, 3)
-
-    cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
-          "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')" % \
-        (int(jobID), status, minor, application[:255],
-         str(_date), time_order, source)
-
-    return self._update(cmd)
+    return _date, time_order
 
 #############################################################################
   def getJobLoggingInfo(self, jobID):
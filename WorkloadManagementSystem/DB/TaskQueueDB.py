@@ -59,6 +59,7 @@ class TaskQueueDB(DB):
     self.__opsHelper = Operations()
     self.__ensureInsertionIsSingle = False
     self.__sharesCorrector = SharesCorrector(self.__opsHelper)
+    self.__tqIndex = None
     result = self.__initializeDB()
     if not result['OK']:
       raise Exception("Can't create tables: %s" % result['Message'])
@@ -76,6 +77,12 @@ class TaskQueueDB(DB):
       return result
     return S_OK([row[0] for row in result['Value']])
 
+  def setTaskQueueIndex(self, tqIndex):
+    """ Use an in-memory index (see WorkloadManagementSystem.private.TaskQueueIndex)
+        to select the task queues when matching jobs
+    """
+    self.__tqIndex = tqIndex
+
   def isSharesCorrectionEnabled(self):
     return self.__getCSOption("EnableSharesCorrection", False)
 
@@ -507,6 +514,8 @@ ORDER BY COUNT( `tq_Jobs`.JobID ) ASC" % (sqlCmd, result['Value'])
     """
     if negativeCond is None:
       negativeCond = {}
+    # The index works on the values before escaping
+    rawMatchDict = tqMatchDict
     # Make a copy to avoid modification of original if escaping needs to be done
     tqMatchDict = dict(tqMatchDict)
     retVal = self._checkMatchDefinition(tqMatchDict)
@@ -531,6 +540,10 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
                                            skipMatchDictDef=True,
                                            connObj=connObj)
         preJobSQL = "%s AND `tq_Jobs`.JobId = %s " % (preJobSQL, tqMatchDict['JobID'])
+      elif self.__tqIndex:
+        retVal = self.__tqIndex.matchTaskQueues(rawMatchDict,
+                                                numQueuesToGet=numQueuesPerTry,
+                                                negativeCond=negativeCond)
       else:
         retVal = self.matchAndGetTaskQueue(tqMatchDict,
                                            numQueuesToGet=numQueuesPerTry,
@@ -550,6 +563,8 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
           return S_ERROR("Can't retrieve winning priority for matching job: %s" % retVal['Message'])
         if not retVal['Value']:
           noJobsFound = True
+          if self.__tqIndex:
+            self.__tqIndex.removeTaskQueues([tqId])
           continue
         prio = retVal['Value'][0][0]
         retVal = self._query("%s %s" % (preJobSQL % (tqId, prio), postJobSQL), conn=connObj)
@@ -559,6 +574,8 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
         if not jobTQList:
           self.log.info("Task queue %s seems to be empty, triggering a cleaning" % tqId)
           self.__deleteTQWithDelay.add(tqId, 300, (tqId, tqOwnerDN, tqOwnerGroup))
+          if self.__tqIndex:
+            self.__tqIndex.removeTaskQueues([tqId])
         while jobTQList:
           jobId, tqId = jobTQList.pop(random.randint(0, len(jobTQList) - 1))
           self.log.info("Trying to extract job %s from TQ %s" % (jobId, tqId))
@@ -578,6 +595,108 @@ WHERE `tq_Jobs`.TQId = %s ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT 1"
     self.log.info("Could not find a match after %s match retries" % self.__maxMatchRetry)
     return S_ERROR("Could not find a match after %s match retries" % self.__maxMatchRetry)
 
+  def matchAndGetJobs(self, tqMatchDict, maxJobs, numQueuesPerTry=10, negativeCond=None):
+    """ Match several jobs based on requirements, all of them are extracted from the
+        task queues in a single transaction
+
+        :param dict tqMatchDict: dict for TQ match
+        :param int maxJobs: maximum number of jobs to extract
+        :returns: S_OK( { 'matchFound': bool, 'jobs': [ ( jobId, tqId ) ], 'tqMatch': tqMatchDict } ) / S_ERROR
+    """
+    if 'JobID' in tqMatchDict or maxJobs <= 1:
+      result = self.matchAndGetJob(tqMatchDict, numQueuesPerTry=numQueuesPerTry, negativeCond=negativeCond)
+      if not result['OK']:
+        return result
+      result = result['Value']
+      jobs = [(result['jobId'], result['taskQueueId'])] if result['matchFound'] else []
+      return S_OK({'matchFound': bool(jobs), 'jobs': jobs, 'tqMatch': result['tqMatch']})
+
+    if negativeCond is None:
+      negativeCond = {}
+    # The index works on the values before escaping
+    rawMatchDict = tqMatchDict
+    # Make a copy to avoid modification of original if escaping needs to be done
+    tqMatchDict = dict(tqMatchDict)
+    retVal = self._checkMatchDefinition(tqMatchDict)
+    if not retVal['OK']:
+      self.log.error("TQ match request check failed", retVal['Message'])
+      return retVal
+    candidateSQL = "SELECT `tq_Jobs`.JobId FROM `tq_Jobs` WHERE `tq_Jobs`.TQId = %s \
+ORDER BY RAND() / `tq_Jobs`.RealPriority ASC LIMIT %s"
+    extracted = []
+    for _ in xrange(self.__maxMatchRetry):
+      if self.__tqIndex:
+        retVal = self.__tqIndex.matchTaskQueues(rawMatchDict,
+                                                numQueuesToGet=numQueuesPerTry,
+                                                negativeCond=negativeCond)
+      else:
+        retVal = self.matchAndGetTaskQueue(tqMatchDict,
+                                           numQueuesToGet=numQueuesPerTry,
+                                           skipMatchDictDef=True,
+                                           negativeCond=negativeCond)
+      if not retVal['OK']:
+        return retVal
+      tqList = retVal['Value']
+      if not tqList:
+        self.log.info("No TQ matches requirements")
+        break
+      # Pick the candidates in the TQs order, weighted by the job priorities inside a TQ
+      candidates = []
+      tqOwners = {}
+      for tqId, tqOwnerDN, tqOwnerGroup in tqList:
+        tqOwners[tqId] = (tqId, tqOwnerDN, tqOwnerGroup)
+        retVal = self._query(candidateSQL % (tqId, maxJobs - len(extracted) - len(candidates)))
+        if not retVal['OK']:
+          return S_ERROR("Can't retrieve jobs to match: %s" % retVal['Message'])
+        if not retVal['Value']:
+          self.log.info("Task queue %s seems to be empty, triggering a cleaning" % tqId)
+          self.__deleteTQWithDelay.add(tqId, 300, tqOwners[tqId])
+          if self.__tqIndex:
+            self.__tqIndex.removeTaskQueues([tqId])
+        candidates.extend(row[0] for row in retVal['Value'])
+        if len(extracted) + len(candidates) >= maxJobs:
+          break
+      if not candidates:
+        break
+      retVal = self.__extractJobs(candidates)
+      if not retVal['OK']:
+        return retVal
+      for tqId in set(tqId for _jobId, tqId in retVal['Value']):
+        self.__deleteTQWithDelay.add(tqId, 300, tqOwners.get(tqId, (tqId, False, False)))
+      extracted.extend(retVal['Value'])
+      self.log.info("Extracted %s jobs out of %s candidates" % (len(retVal['Value']), len(candidates)))
+      # Candidates are only lost if other matchers took them in between
+      if len(extracted) >= maxJobs or len(retVal['Value']) == len(candidates):
+        break
+    return S_OK({'matchFound': bool(extracted), 'jobs': extracted, 'tqMatch': tqMatchDict})
+
+  def __extractJobs(self, jobIdList):
+    """ Take jobs out of the task queues in a single transaction
+
+        :return: S_OK( [ ( jobId, tqId ) ] ) with the jobs that were still in the task queues
+    """
+    jobs = ", ".join(str(int(jobId)) for jobId in jobIdList)
+    retVal = self.transactionStart()
+    if not retVal['OK']:
+      return retVal
+    retVal = self._query("SELECT JobId, TQId FROM `tq_Jobs` WHERE JobId in ( %s ) FOR UPDATE" % jobs)
+    if retVal['OK'] and retVal['Value']:
+      extracted = [(row[0], row[1]) for row in retVal['Value']]
+      retVal = self._update("DELETE FROM `tq_Jobs` WHERE JobId in ( %s )" %
+                            ", ".join(str(jobId) for jobId, _tqId in extracted))
+    if not retVal['OK']:
+      self.transactionRollback()
+      return S_ERROR("Could not take jobs out from the TQs: %s" % retVal['Message'])
+    if not retVal['Value']:
+      # Nothing left to extract
+      self.transactionRollback()
+      return S_OK([])
+    retVal = self.transactionCommit()
+    if not retVal['OK']:
+      self.transactionRollback()
+      return retVal
+    return S_OK(extracted)
+
   def matchAndGetTaskQueue(self, tqMatchDict, numQueuesToGet=1, skipMatchDictDef=False,
                            negativeCond=None, connObj=False):
     """ Get a queue that matches the requirements
@@ -993,6 +1112,8 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
       if not retVal['OK']:
         return retVal
       self.recalculateTQSharesForEntity(tqOwnerDN, tqOwnerGroup, connObj=connObj)
+      if self.__tqIndex:
+        self.__tqIndex.removeTaskQueues([tqId])
       self.log.info("Deleted empty and enabled TQ %s" % tqId)
       return S_OK()
     return S_OK(False)
@@ -1030,6 +1151,8 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
         return retVal
     if delTQ > 0:
       self.recalculateTQSharesForEntity(tqOwnerDN, tqOwnerGroup, connObj=connObj)
+      if self.__tqIndex:
+        self.__tqIndex.removeTaskQueues([tqId])
       return S_OK(True)
     return S_OK(False)
 
@@ -1106,6 +1229,37 @@ WHERE j.JobId = %s AND t.TQId = j.TQId" %
       self.cleanOrphanedTaskQueues()
     return S_OK(tqData)
 
+  def getTaskQueueDefinitions(self, tqIdList=None, multiValues=True):
+    """ Get the definition of the task queues, without looking at their jobs
+
+        :param list tqIdList: task queues to get, all of them if None
+        :param bool multiValues: get also the multi value fields (Sites, Tags...)
+        :return: S_OK( { tqId : { 'Priority', 'Enabled', <singleValueDefFields>, <multiValueDefFields> } } )
+    """
+    if tqIdList is not None and not tqIdList:
+      return S_OK({})
+    fields = ['TQId', 'Priority', 'Enabled'] + list(singleValueDefFields)
+    sqlCmd = "SELECT %s FROM `tq_TaskQueues`" % ", ".join(fields)
+    sqlTQCond = ""
+    if tqIdList is not None:
+      sqlTQCond = " WHERE TQId in ( %s )" % ", ".join([str(int(tqId)) for tqId in tqIdList])
+    retVal = self._query(sqlCmd + sqlTQCond)
+    if not retVal['OK']:
+      return S_ERROR("Can't retrieve task queues definition: %s" % retVal['Message'])
+    tqData = {}
+    for record in retVal['Value']:
+      tqData[record[0]] = dict(zip(fields[1:], record[1:]))
+    if not multiValues:
+      return S_OK(tqData)
+    for field in multiValueDefFields:
+      retVal = self._query("SELECT TQId, Value FROM `tq_TQTo%s`%s" % (field, sqlTQCond))
+      if not retVal['OK']:
+        return S_ERROR("Can't retrieve task queues field %s info: %s" % (field, retVal['Message']))
+      for tqId, value in retVal['Value']:
+        if tqId in tqData:
+          tqData[tqId].setdefault(field, []).append(value)
+    return S_OK(tqData)
+
   def __updateGlobalShares(self):
     """
     Update internal structure for shares
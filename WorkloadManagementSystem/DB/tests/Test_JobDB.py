@@ -6,7 +6,9 @@ from __future__ import print_function
 import unittest
 from mock import MagicMock, patch
 
-from DIRAC import S_OK
+from DIRAC import S_OK, S_ERROR
+from DIRAC.Core.Utilities.ClassAd.ClassAdLight import ClassAd
+from DIRAC.WorkloadManagementSystem.Utilities.ParametricJob import generateParametricJobs
 
 MODULE_NAME = "DIRAC.WorkloadManagementSystem.DB.JobDB"
 
@@ -35,3 +37,114 @@ class JobDBTest( unittest.TestCase ):
     print(result)
     self.assertTrue( result['OK'] )
     self.assertEqual( result['Value'], [ '/vo/user/lfn1', '/vo/user/lfn2' ] )
+
+
+PARAMETRIC_JDL = """[
+    Executable = "my.sh";
+    Arguments = "%s %j";
+    JobName = "job_%n";
+    Parameters = {"a", "b", "c"};
+    InputData = {"/lfn/%s"};
+    CPUTime = 1000;
+]"""
+
+
+class InsertNewJobsTest( unittest.TestCase ):
+  """ Bulk insertion of the jobs of a parametric job, the first new JobID being 100
+  """
+
+  def setUp( self ):
+
+    def mockInit(self ):
+      self.log = MagicMock()
+      self.jdl2DBParameters = ['JobName', 'JobType', 'JobGroup']
+
+    from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
+    with patch( MODULE_NAME+".JobDB.__init__", new=mockInit):
+      self.jobDB = JobDB()
+    self.jobDB.getDIRACPlatform = MagicMock( return_value=S_OK( ['Linux'] ) )
+    self.jobDB._escapeValues = lambda values: S_OK( ["'%s'" % value for value in values] )
+    self.jobDB.transactionStart = MagicMock( return_value=S_OK() )
+    self.jobDB.transactionCommit = MagicMock( return_value=S_OK() )
+    self.jobDB.transactionRollback = MagicMock( return_value=S_OK() )
+    self.jobDB.setJobAttributes = MagicMock( return_value=S_OK() )
+    self.jobDB.upsertMany = MagicMock( return_value=S_OK() )
+    self.jobDB.insertMany = MagicMock( return_value=S_OK() )
+    self.nextJobID = 100
+    self.jobIDStep = 1
+    self.jobDB._update = MagicMock( side_effect=self.reserveJobIDs )
+    self.jobDB._query = MagicMock( side_effect=lambda cmd: S_OK( ( ( self.jobIDStep, ), ) ) )
+
+  def reserveJobIDs( self, cmd ):
+    """ The auto-increment values of a multi-row INSERT """
+    result = S_OK( cmd.count( "('', ''" ) )
+    result['lastRowId'] = self.nextJobID
+    self.nextJobID += result['Value'] * self.jobIDStep
+    return result
+
+  def test_insertNewJobsIntoDB( self ):
+    jdlList = generateParametricJobs( ClassAd( PARAMETRIC_JDL ) )['Value']
+    result = self.jobDB.insertNewJobsIntoDB( jdlList, 'owner', '/DN/owner', 'group', 'Setup',
+                                             initialStatus='Submitting',
+                                             initialMinorStatus='Bulk transaction confirmation' )
+    self.assertTrue( result['OK'] )
+    self.assertEqual( result['Value'], [ ( jobID, 'Submitting', 'Bulk transaction confirmation' )
+                                         for jobID in ( 100, 101, 102 ) ] )
+    self.assertEqual( self.jobDB.transactionCommit.call_count, 1 )
+
+    # The JobIDs are reserved with one INSERT
+    self.assertEqual( self.jobDB._update.call_count, 1 )
+    jdlRows = self.jobDB.upsertMany.call_args[0][2]
+    self.assertEqual( [ row[0] for row in jdlRows ], [ 100, 101, 102 ] )
+    self.assertIn( 'Arguments = "b 101"', jdlRows[1][1] )
+    self.assertIn( 'JobID = 101', jdlRows[1][1] )
+    self.assertEqual( jdlRows[1][3], jdlList[1] )
+
+    inserts = dict( ( call[0][0], call[0][1:] ) for call in self.jobDB.insertMany.call_args_list )
+    jobFields, jobRows = inserts['Jobs']
+    self.assertEqual( len( jobRows ), 3 )
+    self.assertEqual( dict( zip( jobFields, jobRows[2] ) )['JobName'], 'job_2' )
+    self.assertEqual( dict( zip( jobFields, jobRows[2] ) )['Status'], 'Submitting' )
+    self.assertEqual( inserts['InputData'][1], [ ( 100, '/lfn/a' ), ( 101, '/lfn/b' ), ( 102, '/lfn/c' ) ] )
+
+    # The platform is looked up once for the bunch
+    jdlList = generateParametricJobs( ClassAd( PARAMETRIC_JDL.replace( 'CPUTime', 'Platform = "Linux"; CPUTime' ) ) )
+    self.assertTrue( self.jobDB.insertNewJobsIntoDB( jdlList['Value'], 'owner', '/DN/owner', 'group', 'Setup' )['OK'] )
+    self.assertEqual( self.jobDB.getDIRACPlatform.call_count, 1 )
+
+  def test_autoIncrementIncrement( self ):
+    # The JobIDs of the jobs are the ones reserved, with auto_increment_increment = 3
+    self.jobIDStep = 3
+    jdlList = generateParametricJobs( ClassAd( PARAMETRIC_JDL ) )['Value']
+    result = self.jobDB.insertNewJobsIntoDB( jdlList, 'owner', '/DN/owner', 'group', 'Setup' )
+    self.assertTrue( result['OK'] )
+    self.assertEqual( [ jobID for jobID, _status, _minor in result['Value'] ], [ 100, 103, 106 ] )
+    self.assertEqual( [ row[0] for row in self.jobDB.upsertMany.call_args[0][2] ], [ 100, 103, 106 ] )
+    inserts = dict( ( call[0][0], call[0][1:] ) for call in self.jobDB.insertMany.call_args_list )
+    self.assertEqual( inserts['InputData'][1], [ ( 100, '/lfn/a' ), ( 103, '/lfn/b' ), ( 106, '/lfn/c' ) ] )
+
+  def test_chunks( self ):
+    jdlList = generateParametricJobs( ClassAd( PARAMETRIC_JDL.replace( '"c"', '"c", "d", "e"' ) ) )['Value']
+    # The third chunk fails
+    self.jobDB.insertMany.side_effect = lambda table, *_args: S_ERROR( 'Lock wait timeout' ) \
+        if table == 'Jobs' and self.jobDB.transactionStart.call_count == 3 else S_OK()
+
+    result = self.jobDB.insertNewJobsIntoDB( jdlList, 'owner', '/DN/owner', 'group', 'Setup', chunkSize=2 )
+    self.assertFalse( result['OK'] )
+    self.assertEqual( result['JobIDs'], [ 100, 101, 102, 103 ] )
+    self.assertEqual( self.jobDB.transactionCommit.call_count, 2 )
+    self.assertEqual( self.jobDB.transactionRollback.call_count, 1 )
+
+  def test_checks( self ):
+    jdlList = generateParametricJobs( ClassAd( PARAMETRIC_JDL ) )['Value']
+    # Nothing is inserted if a JDL is not correct
+    result = self.jobDB.insertNewJobsIntoDB( jdlList + [ '[ Executable = "my.sh"; CPUTime = "a lot"; ]' ],
+                                             'owner', '/DN/owner', 'group', 'Setup' )
+    self.assertFalse( result['OK'] )
+    self.assertFalse( self.jobDB.transactionStart.called )
+
+    # The job owner is checked
+    result = self.jobDB.insertNewJobsIntoDB( [ PARAMETRIC_JDL.replace( 'CPUTime', 'Owner = "owner"; CPUTime' ) ],
+                                             'other', '/DN/other', 'group', 'Setup' )
+    self.assertFalse( result['OK'] )
+    self.assertEqual( self.jobDB.transactionRollback.call_count, 1 )
@@ -163,27 +163,33 @@ class JobManagerHandler(RequestHandler):
       if not result['OK']:
         return result
       jobDescList = result['Value']
-    else:
-      # if we are here, then jobDesc was the description of a single job.
-      jobDescList = [jobDesc]
-
-    jobIDList = []
 
     if parametricJob:
-      initialStatus = 'Submitting'
-      initialMinorStatus = 'Bulk transaction confirmation'
-    else:
-      initialStatus = 'Received'
-      initialMinorStatus = 'Job accepted'
+      # The jobs of a parametric job are inserted together
+      result = gJobDB.insertNewJobsIntoDB(jobDescList,
+                                          self.owner,
+                                          self.ownerDN,
+                                          self.ownerGroup,
+                                          self.diracSetup,
+                                          initialStatus='Submitting',
+                                          initialMinorStatus='Bulk transaction confirmation')
+      if not result['OK']:
+        return result
+      newJobs = result['Value']
+      jobIDList = [jobID for jobID, _status, _minorStatus in newJobs]
+      gLogger.info('%d jobs added to the JobDB for %s/%s' % (len(jobIDList), self.ownerDN, self.ownerGroup),
+                   '%s to %s' % (jobIDList[0], jobIDList[-1]))
 
-    for jobDescription in jobDescList:  # jobDescList because there might be a list generated by a parametric job
-      result = gJobDB.insertNewJobIntoDB(jobDescription,
+      gJobLoggingDB.addLoggingRecords([(jobID, status, minorStatus, 'idem', '', 'JobManager')
+                                       for jobID, status, minorStatus in newJobs])
+    else:
+      result = gJobDB.insertNewJobIntoDB(jobDesc,
                                          self.owner,
                                          self.ownerDN,
                                          self.ownerGroup,
                                          self.diracSetup,
-                                         initialStatus=initialStatus,
-                                         initialMinorStatus=initialMinorStatus)
+                                         initialStatus='Received',
+                                         initialMinorStatus='Job accepted')
       if not result['OK']:
         return result
 
@@ -192,7 +198,7 @@ class JobManagerHandler(RequestHandler):
 
       gJobLoggingDB.addLoggingRecord(jobID, result['Status'], result['MinorStatus'], source='JobManager')
 
-      jobIDList.append(jobID)
+      jobIDList = [jobID]
 
     # Set persistency flag
     retVal = gProxyManager.getUserPersistence(self.ownerDN, self.ownerGroup)
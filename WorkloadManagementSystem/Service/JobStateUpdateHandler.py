@@ -10,12 +10,13 @@
 # from types import *
 from __future__ import absolute_import
 import time
-from DIRAC.Core.DISET.RequestHandler import RequestHandler
+from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
 from DIRAC.Core.Utilities import Time
 from DIRAC import gLogger, S_OK, S_ERROR
 from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
 from DIRAC.WorkloadManagementSystem.DB.ElasticJobDB import ElasticJobDB
 from DIRAC.WorkloadManagementSystem.DB.JobLoggingDB import JobLoggingDB
+from DIRAC.WorkloadManagementSystem.private.HeartBeatBuffer import HeartBeatBuffer
 import six
 from six.moves import range
 
@@ -25,6 +26,7 @@ __RCSID__ = "$Id$"
 jobDB = False
 logDB = False
 elasticJobDB = False
+heartBeatBuffer = None
 
 JOB_FINAL_STATES = ['Done', 'Completed', 'Failed']
 
@@ -33,8 +35,18 @@ def initializeJobStateUpdateHandler(serviceInfo):
 
   global jobDB
   global logDB
+  global heartBeatBuffer
   jobDB = JobDB()
   logDB = JobLoggingDB()
+
+  flushPeriod = getServiceOption(serviceInfo, 'HeartBeatFlushPeriod', 10)
+  if flushPeriod > 0:
+    # The heart beats are written to JobDB together, every flushPeriod seconds
+    heartBeatBuffer = HeartBeatBuffer(jobDB, flushPeriod=flushPeriod,
+                                      maxJobs=getServiceOption(serviceInfo, 'HeartBeatBufferSize', 10000))
+    result = heartBeatBuffer.startPeriodicFlush()
+    if not result['OK']:
+      return result
   return S_OK()
 
 
@@ -229,6 +241,7 @@ class JobStateUpdateHandler(RequestHandler):
       result = jobDB.setStartExecTime(jobID, startDate)
 
     # Update the JobLoggingDB records
+    records = []
     for date in dates:
       sDict = statusDict[date]
       status = sDict['Status']
@@ -241,7 +254,9 @@ class JobStateUpdateHandler(RequestHandler):
       if not application:
         application = 'idem'
       source = sDict['Source']
-      result = logDB.addLoggingRecord(jobID, status, minor, application, date, source)
+      records.append((jobID, status, minor, application, date, source))
+    if records:
+      result = logDB.addLoggingRecords(records)
       if not result['OK']:
         return result
 
@@ -357,9 +372,12 @@ class JobStateUpdateHandler(RequestHandler):
     """ Send a heart beat sign of life for a job jobID
     """
 
-    result = jobDB.setHeartBeatData(int(jobID), staticData, dynamicData)
-    if not result['OK']:
-      gLogger.warn('Failed to set the heart beat data for job %d ' % int(jobID))
+    if heartBeatBuffer:
+      heartBeatBuffer.addHeartBeat(int(jobID), staticData, dynamicData)
+    else:
+      result = jobDB.setHeartBeatData(int(jobID), staticData, dynamicData)
+      if not result['OK']:
+        gLogger.warn('Failed to set the heart beat data for job %d ' % int(jobID))
 
     # Restore the Running status if necessary
     # result = jobDB.getJobAttributes(jobID,['Status'])
@@ -10,7 +10,7 @@ from DIRAC import gLogger, S_OK, S_ERROR
 
 from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.Core.Utilities.Decorators import deprecated
-from DIRAC.Core.DISET.RequestHandler import RequestHandler
+from DIRAC.Core.DISET.RequestHandler import RequestHandler, getServiceOption
 
 from DIRAC.FrameworkSystem.Client.MonitoringClient import gMonitor
 
@@ -21,10 +21,12 @@ from DIRAC.WorkloadManagementSystem.DB.PilotAgentsDB import PilotAgentsDB
 
 from DIRAC.WorkloadManagementSystem.Client.Matcher import Matcher
 from DIRAC.WorkloadManagementSystem.Client.Limiter import Limiter
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations import Operations
 
 gJobDB = False
 gTaskQueueDB = False
+gMaxJobsPerMatch = 1
 
 
 def initializeMatcherHandler(serviceInfo):
@@ -33,6 +35,7 @@ def initializeMatcherHandler(serviceInfo):
 
   global gJobDB
   global gTaskQueueDB
+  global gMaxJobsPerMatch
   global jlDB
   global pilotAgentsDB
 
@@ -41,6 +44,8 @@ def initializeMatcherHandler(serviceInfo):
   jlDB = JobLoggingDB()
   pilotAgentsDB = PilotAgentsDB()
 
+  gMaxJobsPerMatch = getServiceOption(serviceInfo, 'MaxJobsPerMatch', 16)
+
   gMonitor.registerActivity('matchTime', "Job matching time",
                             'Matching', "secs", gMonitor.OP_MEAN, 300)
   gMonitor.registerActivity('matchesDone', "Job Match Request",
@@ -50,6 +55,18 @@ def initializeMatcherHandler(serviceInfo):
   gMonitor.registerActivity('numTQs', "Number of Task Queues",
                             'Matching', "tqsk queues", gMonitor.OP_MEAN, 300)
 
+  if getServiceOption(serviceInfo, 'UseTaskQueueIndex', False):
+    # Select the task queues in memory, MySQL is only used to extract the jobs
+    tqIndex = TaskQueueIndex(gTaskQueueDB,
+                             refreshPeriod=getServiceOption(serviceInfo, 'TaskQueueIndexRefreshPeriod', 10))
+    result = tqIndex.refresh()
+    if not result['OK']:
+      return result
+    result = tqIndex.startPeriodicRefresh()
+    if not result['OK']:
+      return result
+    gTaskQueueDB.setTaskQueueIndex(tqIndex)
+
   gTaskQueueDB.recalculateTQSharesForAll()
   gThreadScheduler.addPeriodicTask(120, gTaskQueueDB.recalculateTQSharesForAll)
   gThreadScheduler.addPeriodicTask(60, sendNumTaskQueues)
@@ -103,6 +120,38 @@ class MatcherHandler(RequestHandler):
     # FIXME: This is correctly interpreted by the JobAgent, but DErrno should be used instead
     return S_ERROR("No match found")
 
+##############################################################################
+  types_requestJobs = [[basestring, dict], (int, long)]
+
+  def export_requestJobs(self, resourceDescription, maxJobs):
+    """ Serve up to maxJobs jobs to an agent with several slots, taken out of the
+        task queues at once. The number of jobs is limited by the MaxJobsPerMatch option.
+
+        :return: S_OK( [ dictionary per job, as in requestJob ] ) / S_ERROR
+    """
+
+    resourceDescription['Setup'] = self.serviceInfoDict['clientSetup']
+    credDict = self.getRemoteCredentials()
+    maxJobs = max(1, min(maxJobs, gMaxJobsPerMatch))
+
+    try:
+      opsHelper = Operations(group=credDict['group'])
+      matcher = Matcher(pilotAgentsDB=pilotAgentsDB,
+                        jobDB=gJobDB,
+                        tqDB=gTaskQueueDB,
+                        jlDB=jlDB,
+                        opsHelper=opsHelper)
+      result = matcher.selectJobs(resourceDescription, credDict, maxJobs)
+    except RuntimeError as rte:
+      self.log.error("Error requesting jobs: ", rte)
+      return S_ERROR("Error requesting jobs")
+
+    if result:
+      gMonitor.addMark("matchesDone")
+      gMonitor.addMark("matchesOK", len(result))
+      return S_OK(result)
+    return S_ERROR("No match found")
+
 ##############################################################################
   types_getActiveTaskQueues = []
 
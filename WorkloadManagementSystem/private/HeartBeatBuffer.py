@@ -0,0 +1,93 @@
+""" Buffer of the heart beats of the running jobs, used by the JobStateUpdate service.
+
+    Instead of updating JobDB for each heart beat, the heart beats are kept in memory and
+    written periodically with a few multi-row statements (see JobDB.setHeartBeatsData).
+    The heart beats of a job received between two flushes are coalesced: the last heart beat
+    time and the last value of each static parameter are written, and all the dynamic data
+    are logged with their time.
+
+    The heart beats of the last flushPeriod seconds are lost if the service stops.
+"""
+
+__RCSID__ = "$Id$"
+
+import threading
+
+from DIRAC import gLogger, S_OK
+from DIRAC.Core.Utilities import Time
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
+
+
+class HeartBeatBuffer(object):
+  """ Heart beats waiting to be written to JobDB, see the module documentation
+  """
+
+  def __init__(self, jobDB, flushPeriod=10, maxJobs=10000):
+    """ c'tor
+
+        :param jobDB: JobDB instance
+        :param int flushPeriod: seconds between two writes to the DB
+        :param int maxJobs: number of jobs with pending heart beats triggering a write
+    """
+    self.log = gLogger.getSubLogger("HeartBeatBuffer")
+    self.__jobDB = jobDB
+    self.__flushPeriod = flushPeriod
+    self.__maxJobs = maxJobs
+    # jobID -> { 'HeartBeatTime' : datetime, 'StaticData' : dict, 'DynamicData' : [ ( datetime, dict ) ] }
+    self.__heartBeats = {}
+    self.__heartBeatsLock = threading.Lock()
+    # Only one flush at a time, the heart beats keep coming in the meantime
+    self.__flushLock = threading.Lock()
+
+  def startPeriodicFlush(self):
+    """ Write the heart beats to the DB in the background every flushPeriod seconds
+    """
+    result = gThreadScheduler.addPeriodicTask(self.__flushPeriod, self.flush)
+    if not result['OK']:
+      return result
+    return S_OK()
+
+  def addHeartBeat(self, jobID, staticData, dynamicData):
+    """ Add the heart beat of a job, it is written to the DB at the next flush, or now
+        if too many jobs have pending heart beats
+
+        :param int jobID: job ID
+        :param dict staticData: parameters of the job
+        :param dict dynamicData: values to log
+    """
+    now = Time.dateTime()
+    with self.__heartBeatsLock:
+      heartBeat = self.__heartBeats.get(jobID)
+      if heartBeat is None:
+        heartBeat = self.__heartBeats[jobID] = {'StaticData': {}, 'DynamicData': []}
+      heartBeat['HeartBeatTime'] = now
+      heartBeat['StaticData'].update(staticData)
+      if dynamicData:
+        heartBeat['DynamicData'].append((now, dynamicData))
+      full = len(self.__heartBeats) >= self.__maxJobs
+    if full:
+      self.flush()
+
+  def getPendingJobs(self):
+    """ Number of jobs with heart beats not written yet
+    """
+    with self.__heartBeatsLock:
+      return len(self.__heartBeats)
+
+  def flush(self):
+    """ Write the pending heart beats to the DB
+
+        :return: S_OK( number of jobs ) / S_ERROR
+    """
+    with self.__flushLock:
+      with self.__heartBeatsLock:
+        heartBeats = self.__heartBeats
+        self.__heartBeats = {}
+      if not heartBeats:
+        return S_OK(0)
+      result = self.__jobDB.setHeartBeatsData(heartBeats)
+      if not result['OK']:
+        self.log.error("Failed to set the heart beat data", "of %d jobs: %s" % (len(heartBeats), result['Message']))
+        return result
+      self.log.verbose("Heart beats written", "for %d jobs" % len(heartBeats))
+      return S_OK(len(heartBeats))
@@ -0,0 +1,297 @@
+""" In-memory index of the task queues, used by the Matcher to select the task queues
+    matching a resource without querying TaskQueueDB.
+
+    The index keeps, for every task queue, its definition (Setup, CPUTime, owner and
+    multi value fields) and inverted indexes value -> task queues for each field.
+    Matching a resource intersects those sets, and only the extraction of the job
+    (see TaskQueueDB.matchAndGetJob) goes to MySQL.
+
+    The definition of a task queue does not change once created, so a refresh only reads
+    the list of task queues with their priorities, and the full definition of the new ones.
+    The index is refreshed periodically, and TaskQueueDB notifies it of the task queues
+    it deletes or finds empty.
+
+    The selection follows the same rules as the SQL generated by TaskQueueDB.
+"""
+
+__RCSID__ = "$Id$"
+
+import time
+import random
+import string
+import threading
+
+from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC.Core.Security import Properties, CS
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
+from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import singleValueDefFields, multiValueMatchFields, \
+    bannedJobMatchFields
+
+
+def _isAny(value):
+  """ True if the match value means "anything", as TaskQueueDB understands it
+  """
+  if isinstance(value, basestring):
+    return value.lower().translate(None, string.punctuation) == 'any'
+  return any(isinstance(v, basestring) and v.lower().translate(None, string.punctuation) == 'any'
+             for v in value)
+
+
+def _toList(value):
+  if isinstance(value, (list, tuple)):
+    return [str(v).strip() for v in value]
+  return [str(value).strip()]
+
+
+class _IndexSnapshot(object):
+  """ Immutable view of the task queues: matching threads work on a snapshot
+      while the refresh builds the next one
+  """
+
+  def __init__(self, tqDefs):
+    """ :param dict tqDefs: tqId -> definition, as returned by TaskQueueDB.getTaskQueueDefinitions
+    """
+    self.tqDefs = tqDefs
+    self.allTQs = frozenset(tqDefs)
+    self.bySetup = {}
+    self.byGroup = {}
+    self.byCPUTime = {}
+    # field -> value -> set of TQs, for the multi value fields
+    self.byValue = dict((field, {}) for field in multiValueMatchFields)
+    self.byBannedValue = dict((field, {}) for field in bannedJobMatchFields)
+    # field -> TQs without any value for that field
+    self.unconstrained = dict((field, set()) for field in multiValueMatchFields)
+    for tqId, tqDef in tqDefs.iteritems():
+      self.bySetup.setdefault(tqDef['Setup'], set()).add(tqId)
+      self.byGroup.setdefault(tqDef['OwnerGroup'], set()).add(tqId)
+      self.byCPUTime.setdefault(tqDef['CPUTime'], set()).add(tqId)
+      for field in multiValueMatchFields:
+        values = tqDef.get('%ss' % field)
+        if not values:
+          self.unconstrained[field].add(tqId)
+        for value in values or []:
+          self.byValue[field].setdefault(value, set()).add(tqId)
+      for field in bannedJobMatchFields:
+        for value in tqDef.get('Banned%ss' % field) or []:
+          self.byBannedValue[field].setdefault(value, set()).add(tqId)
+
+  def __union(self, index, values):
+    result = set()
+    for value in values:
+      result.update(index.get(value, ()))
+    return result
+
+  def __intersection(self, index, values):
+    result = None
+    for value in values:
+      tqs = index.get(value, set())
+      result = set(tqs) if result is None else result & tqs
+      if not result:
+        break
+    return result or set()
+
+  def match(self, tqMatchDict, negativeCond):
+    """ Get the ids of the task queues matching the resource, see TaskQueueDB.__generateTQMatchSQL
+
+        :return: S_OK( set of tqIds ) / S_ERROR
+    """
+    candidates = set(self.allTQs)
+
+    if 'Setup' in tqMatchDict:
+      candidates &= self.__union(self.bySetup, _toList(tqMatchDict['Setup']))
+    if 'CPUTime' in tqMatchDict:
+      # As the SQL: tq.CPUTime <= value, or-ed over the values
+      maxCPUTime = max(int(cpuTime) for cpuTime in _toList(tqMatchDict['CPUTime']))
+      candidates &= self.__union(self.byCPUTime, [cpuTime for cpuTime in self.byCPUTime
+                                                  if cpuTime <= maxCPUTime])
+    if 'OwnerGroup' in tqMatchDict:
+      candidates &= self.__union(self.byGroup, _toList(tqMatchDict['OwnerGroup']))
+    if not candidates:
+      return S_OK(candidates)
+
+    # Same default as the SQL: no Tag and no RequiredTag means TQs without tags
+    if 'Tag' not in tqMatchDict and 'RequiredTag' not in tqMatchDict:
+      tqMatchDict = dict(tqMatchDict)
+      tqMatchDict['Tag'] = []
+
+    tags = []
+    for field in multiValueMatchFields:
+      if field not in tqMatchDict:
+        continue
+      if field == 'Tag':
+        tags = _toList(tqMatchDict['Tag']) if tqMatchDict['Tag'] else []
+        if _isAny(tags):
+          continue
+        # All the tags of the TQ have to be provided by the resource
+        tagSet = set(tags)
+        candidates = set(tqId for tqId in candidates
+                         if tagSet.issuperset(self.tqDefs[tqId].get('Tags') or ()))
+      else:
+        values = tqMatchDict[field]
+        if not values or _isAny(values):
+          continue
+        values = _toList(values)
+        candidates &= self.unconstrained[field] | self.__union(self.byValue[field], values)
+        if field in bannedJobMatchFields:
+          # TQs banning all the values of the resource are excluded
+          candidates -= self.__intersection(self.byBannedValue[field], values)
+      if not candidates:
+        return S_OK(candidates)
+
+    requiredTags = tqMatchDict.get('RequiredTag', [])
+    if requiredTags and not _isAny(requiredTags):
+      requiredTags = _toList(requiredTags)
+      if not set(requiredTags).issubset(set(tags)):
+        return S_ERROR('Wrong conditions')
+      candidates &= self.__intersection(self.byValue['Tag'], requiredTags)
+
+    for field in multiValueMatchFields:
+      bannedValues = tqMatchDict.get('Banned%s' % field)
+      if not bannedValues or _isAny(bannedValues):
+        continue
+      candidates -= self.__intersection(self.byValue[field], _toList(bannedValues))
+
+    if 'OwnerDN' in tqMatchDict:
+      candidates = self.__filterOwners(candidates, tqMatchDict)
+
+    if negativeCond:
+      candidates = set(tqId for tqId in candidates if self.__checkNegativeCond(self.tqDefs[tqId], negativeCond))
+
+    return S_OK(candidates)
+
+  def __filterOwners(self, candidates, tqMatchDict):
+    dns = set(_toList(tqMatchDict['OwnerDN']))
+    if 'OwnerGroup' not in tqMatchDict:
+      return set(tqId for tqId in candidates if self.tqDefs[tqId]['OwnerDN'] in dns)
+    # Groups with JOB_SHARING match the jobs of any DN of the group
+    sharingGroups = set(group for group in _toList(tqMatchDict['OwnerGroup'])
+                        if Properties.JOB_SHARING in CS.getPropertiesForGroup(group))
+    return set(tqId for tqId in candidates
+               if self.tqDefs[tqId]['OwnerGroup'] in sharingGroups or self.tqDefs[tqId]['OwnerDN'] in dns)
+
+  def __checkNegativeCond(self, tqDef, negativeCond):
+    """ Evaluate the negative conditions of the Limiter for a TQ, see TaskQueueDB.__generateNotSQL
+    """
+    if isinstance(negativeCond, (list, tuple)):
+      return any(self.__checkNegativeCond(tqDef, condDict) for condDict in negativeCond)
+    condList = []
+    for field, values in negativeCond.iteritems():
+      if field in multiValueMatchFields:
+        tqValues = tqDef.get('%ss' % field) or []
+        condList.append(all(value not in tqValues for value in _toList(values)))
+      elif field in singleValueDefFields:
+        condList.extend(str(value).strip() != str(tqDef[field]) for value in values)
+    return any(condList)
+
+
+class TaskQueueIndex(object):
+  """ Index of the task queues of a TaskQueueDB, see the module documentation
+  """
+
+  def __init__(self, tqDB, refreshPeriod=10):
+    """ c'tor
+
+        :param tqDB: TaskQueueDB instance
+        :param int refreshPeriod: seconds between two refreshes from the DB
+    """
+    self.log = gLogger.getSubLogger("TaskQueueIndex")
+    self.__tqDB = tqDB
+    self.__refreshPeriod = refreshPeriod
+    self.__refreshLock = threading.Lock()
+    self.__snapshot = None
+    self.__lastRefresh = 0
+
+  def startPeriodicRefresh(self):
+    """ Refresh the index in the background every refreshPeriod seconds
+    """
+    result = gThreadScheduler.addPeriodicTask(self.__refreshPeriod, self.refresh)
+    if not result['OK']:
+      return result
+    return S_OK()
+
+  def refresh(self):
+    """ Load the new task queues and the priorities from the DB, forget the deleted ones
+
+        :return: S_OK( number of indexed task queues ) / S_ERROR
+    """
+    with self.__refreshLock:
+      result = self.__tqDB.getTaskQueueDefinitions(multiValues=False)
+      if not result['OK']:
+        self.log.error("Cannot refresh the task queue index", result['Message'])
+        return result
+      summary = result['Value']
+      known = self.__snapshot.tqDefs if self.__snapshot else {}
+      newIds = [tqId for tqId in summary if tqId not in known]
+      newDefs = {}
+      if newIds:
+        result = self.__tqDB.getTaskQueueDefinitions(newIds)
+        if not result['OK']:
+          self.log.error("Cannot refresh the task queue index", result['Message'])
+          return result
+        newDefs = result['Value']
+      tqDefs = {}
+      for tqId, tqSummary in summary.iteritems():
+        if tqId in known:
+          tqDef = dict(known[tqId])
+        elif tqId in newDefs:
+          tqDef = newDefs[tqId]
+        else:
+          # Deleted in between
+          continue
+        tqDef['Priority'] = tqSummary['Priority']
+        tqDef['Enabled'] = tqSummary['Enabled']
+        tqDefs[tqId] = tqDef
+      self.__snapshot = _IndexSnapshot(tqDefs)
+      self.__lastRefresh = time.time()
+      self.log.verbose("Task queue index refreshed", "%s TQs, %s new" % (len(tqDefs), len(newDefs)))
+      return S_OK(len(tqDefs))
+
+  def removeTaskQueues(self, tqIdList):
+    """ Drop task queues from the index, until the next refresh brings them back if they still exist
+    """
+    with self.__refreshLock:
+      if not self.__snapshot:
+        return
+      tqIdList = [tqId for tqId in tqIdList if tqId in self.__snapshot.tqDefs]
+      if not tqIdList:
+        return
+      tqDefs = dict(self.__snapshot.tqDefs)
+      for tqId in tqIdList:
+        tqDefs.pop(tqId)
+      self.__snapshot = _IndexSnapshot(tqDefs)
+
+  def getNumTaskQueues(self):
+    snapshot = self.__snapshot
+    return len(snapshot.tqDefs) if snapshot else 0
+
+  def matchTaskQueues(self, tqMatchDict, numQueuesToGet=1, negativeCond=None):
+    """ Select task queues for a resource, same as TaskQueueDB.matchAndGetTaskQueue
+
+        :param dict tqMatchDict: match definition, not escaped
+        :param int numQueuesToGet: maximum number of task queues, 0 for all of them
+        :param negativeCond: conditions from the Limiter
+        :return: S_OK( [ ( tqId, ownerDN, ownerGroup ) ] ), sorted by a random pick weighted by priority
+    """
+    snapshot = self.__snapshot
+    if snapshot is None or time.time() - self.__lastRefresh > 3 * self.__refreshPeriod:
+      # Never loaded, or the periodic refresh is not running
+      result = self.refresh()
+      if not result['OK']:
+        return result
+      snapshot = self.__snapshot
+    try:
+      result = snapshot.match(tqMatchDict, negativeCond)
+    except (ValueError, TypeError, KeyError) as excp:
+      return S_ERROR("Invalid match definition: %s" % excp)
+    if not result['OK']:
+      return result
+    ranked = []
+    for tqId in result['Value']:
+      priority = snapshot.tqDefs[tqId]['Priority']
+      # Same ordering as ORDER BY RAND() / Priority
+      ranked.append((random.random() / priority if priority > 0 else 0, tqId))
+    ranked.sort()
+    if numQueuesToGet:
+      ranked = ranked[:numQueuesToGet]
+    return S_OK([(tqId, snapshot.tqDefs[tqId]['OwnerDN'], snapshot.tqDefs[tqId]['OwnerGroup'])
+                 for _rank, tqId in ranked])
@@ -0,0 +1,104 @@
+""" Test the buffering of the heart beats and their bulk insertion in JobDB
+"""
+
+# pylint: disable=protected-access
+
+import datetime
+import threading
+
+from mock import MagicMock, patch
+
+from DIRAC import S_OK, S_ERROR
+from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
+from DIRAC.WorkloadManagementSystem.private.HeartBeatBuffer import HeartBeatBuffer
+
+
+def test_coalescing():
+  """ The heart beats of a job are written once, with all their dynamic data
+  """
+  jobDB = MagicMock()
+  jobDB.setHeartBeatsData.return_value = S_OK()
+  heartBeatBuffer = HeartBeatBuffer(jobDB)
+  heartBeatBuffer.addHeartBeat(1, {'CPUNormalizationFactor': 10}, {'CPUConsumed': 1})
+  heartBeatBuffer.addHeartBeat(2, {}, {})
+  heartBeatBuffer.addHeartBeat(1, {'LocalJobID': 'abc'}, {'CPUConsumed': 2})
+  assert heartBeatBuffer.getPendingJobs() == 2
+  assert not jobDB.setHeartBeatsData.called
+
+  assert heartBeatBuffer.flush() == S_OK(2)
+  heartBeats = jobDB.setHeartBeatsData.call_args[0][0]
+  assert sorted(heartBeats) == [1, 2]
+  assert heartBeats[1]['StaticData'] == {'CPUNormalizationFactor': 10, 'LocalJobID': 'abc'}
+  assert [dynamicData for _time, dynamicData in heartBeats[1]['DynamicData']] == [{'CPUConsumed': 1},
+                                                                                  {'CPUConsumed': 2}]
+  assert heartBeats[1]['HeartBeatTime'] == heartBeats[1]['DynamicData'][1][0]
+  assert heartBeats[2]['DynamicData'] == []
+
+  # Nothing left
+  assert heartBeatBuffer.flush() == S_OK(0)
+  assert jobDB.setHeartBeatsData.call_count == 1
+
+  jobDB.setHeartBeatsData.return_value = S_ERROR('DB down')
+  heartBeatBuffer.addHeartBeat(1, {}, {})
+  assert not heartBeatBuffer.flush()['OK']
+  assert heartBeatBuffer.getPendingJobs() == 0
+
+
+def test_maxJobs():
+  """ The heart beats are written as soon as maxJobs jobs are waiting, without losing any
+  """
+  written = []
+  jobDB = MagicMock()
+  jobDB.setHeartBeatsData.side_effect = lambda heartBeats: written.append(heartBeats) or S_OK()
+  heartBeatBuffer = HeartBeatBuffer(jobDB, maxJobs=100)
+
+  def sendHeartBeats(first):
+    for jobID in xrange(first, first + 250):
+      heartBeatBuffer.addHeartBeat(jobID, {}, {'Value': jobID})
+
+  threads = [threading.Thread(target=sendHeartBeats, args=(first,)) for first in xrange(0, 1000, 250)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert written
+  assert heartBeatBuffer.getPendingJobs() < 100
+  heartBeatBuffer.flush()
+  assert sorted(jobID for heartBeats in written for jobID in heartBeats) == range(1000)
+
+
+@patch.object(JobDB, '__init__', MagicMock(return_value=None))
+def test_setHeartBeatsData():
+  """ One UPDATE for the heart beat times, one statement for the parameters and one for the log
+  """
+  jobDB = JobDB()
+  jobDB.log = MagicMock()
+  # Job 3 does not exist
+  jobDB._query = MagicMock(return_value=S_OK(((1,), (2,))))
+  jobDB._update = MagicMock(return_value=S_OK(2))
+  jobDB.upsertMany = MagicMock(return_value=S_OK(1))
+  jobDB.insertMany = MagicMock(return_value=S_OK(3))
+
+  beatTime = datetime.datetime(2019, 1, 1, 12, 0, 0, 500000)
+  nextTime = beatTime + datetime.timedelta(seconds=30)
+  heartBeats = {1: {'HeartBeatTime': nextTime, 'StaticData': {'LocalJobID': 'abc'},
+                    'DynamicData': [(beatTime, {'CPU': 1}), (nextTime, {'CPU': 2}),
+                                    # Same second
+                                    (nextTime, {'CPU': 3})]},
+                2: {'HeartBeatTime': beatTime, 'StaticData': {}, 'DynamicData': []},
+                3: {'HeartBeatTime': beatTime, 'StaticData': {'LocalJobID': 'def'},
+                    'DynamicData': [(beatTime, {'CPU': 1})]}}
+  assert jobDB.setHeartBeatsData(heartBeats)['OK']
+
+  req = jobDB._update.call_args[0][0]
+  # A job in a final state when the buffer is flushed is not set back to Running
+  assert req == "UPDATE Jobs SET HeartBeatTime=CASE JobID WHEN 1 THEN '2019-01-01 12:00:30' " \
+                "WHEN 2 THEN '2019-01-01 12:00:00' END, " \
+                "Status=CASE WHEN Status IN ('Matched','Running','Stalled') THEN 'Running' ELSE Status END " \
+                "WHERE JobID IN (1,2)"
+  assert jobDB.upsertMany.call_args[0][2] == [(1, 'LocalJobID', 'abc')]
+  assert sorted(jobDB.insertMany.call_args[0][2]) == [(1, 'CPU', 1, '2019-01-01 12:00:00'),
+                                                      (1, 'CPU', 3, '2019-01-01 12:00:30')]
+
+  jobDB.insertMany.return_value = S_ERROR('Duplicate entry')
+  assert not jobDB.setHeartBeatsData(heartBeats)['OK']
@@ -0,0 +1,119 @@
+""" Test the in-memory task queue index against the matching rules of TaskQueueDB
+"""
+
+# pylint: disable=protected-access
+
+import copy
+
+from mock import MagicMock, patch
+
+from DIRAC import S_OK
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+
+tqDefinitions = {
+    1: {'OwnerDN': '/DN/user', 'OwnerGroup': 'user', 'Setup': 'Prod', 'CPUTime': 3600,
+        'Priority': 1.0, 'Enabled': 1},
+    2: {'OwnerDN': '/DN/prod', 'OwnerGroup': 'prod', 'Setup': 'Prod', 'CPUTime': 86400,
+        'Priority': 1.0, 'Enabled': 1, 'Sites': ['Site.A'], 'Platforms': ['x86_64-slc6']},
+    3: {'OwnerDN': '/DN/prod', 'OwnerGroup': 'prod', 'Setup': 'Prod', 'CPUTime': 3600,
+        'Priority': 1.0, 'Enabled': 1, 'BannedSites': ['Site.A'], 'Tags': ['MultiProcessor']},
+    4: {'OwnerDN': '/DN/prod', 'OwnerGroup': 'prod', 'Setup': 'Cert', 'CPUTime': 3600,
+        'Priority': 1.0, 'Enabled': 1, 'JobTypes': ['MCSimulation']},
+}
+
+
+def getTaskQueueDefinitions(tqIdList=None, multiValues=True):
+  """ Mimic TaskQueueDB.getTaskQueueDefinitions
+  """
+  result = {}
+  for tqId, tqDef in tqDefinitions.iteritems():
+    if tqIdList is not None and tqId not in tqIdList:
+      continue
+    if multiValues:
+      result[tqId] = copy.deepcopy(tqDef)
+    else:
+      result[tqId] = dict((key, tqDef[key]) for key in ('OwnerDN', 'OwnerGroup', 'Setup', 'CPUTime',
+                                                         'Priority', 'Enabled'))
+  return S_OK(result)
+
+
+def getIndex():
+  tqDB = MagicMock()
+  tqDB.getTaskQueueDefinitions.side_effect = getTaskQueueDefinitions
+  tqIndex = TaskQueueIndex(tqDB)
+  assert tqIndex.refresh()['OK']
+  return tqIndex, tqDB
+
+
+def matchedIds(tqIndex, matchDict, negativeCond=None):
+  result = tqIndex.matchTaskQueues(matchDict, numQueuesToGet=0, negativeCond=negativeCond)
+  assert result['OK'], result
+  return sorted(tqTuple[0] for tqTuple in result['Value'])
+
+
+@patch('DIRAC.WorkloadManagementSystem.private.TaskQueueIndex.CS.getPropertiesForGroup',
+       new=MagicMock(return_value=[]))
+def test_match():
+  tqIndex, _tqDB = getIndex()
+  base = {'Setup': 'Prod', 'CPUTime': 100000}
+
+  # No tags: TQs asking for tags are not eligible
+  assert matchedIds(tqIndex, base) == [1, 2]
+  assert matchedIds(tqIndex, dict(base, CPUTime=3600)) == [1]
+  assert matchedIds(tqIndex, dict(base, CPUTime=[3600, 100000])) == [1, 2]
+  assert matchedIds(tqIndex, dict(base, Tag=['MultiProcessor'])) == [1, 2, 3]
+  assert matchedIds(tqIndex, dict(base, Tag=['MultiProcessor'], RequiredTag=['MultiProcessor'])) == [3]
+  assert not tqIndex.matchTaskQueues(dict(base, RequiredTag=['MultiProcessor']))['OK']
+
+  # Site.A is banned by TQ 3, TQ 2 only runs at Site.A
+  assert matchedIds(tqIndex, dict(base, Site='Site.A', Tag=['MultiProcessor'])) == [1, 2]
+  assert matchedIds(tqIndex, dict(base, Site='Site.B', Tag=['MultiProcessor'])) == [1, 3]
+  assert matchedIds(tqIndex, dict(base, Site='ANY', Tag=['MultiProcessor'])) == [1, 2, 3]
+  assert matchedIds(tqIndex, dict(base, Platform=['x86_64-slc6', 'x86_64-centos7'])) == [1, 2]
+  assert matchedIds(tqIndex, dict(base, Platform='x86_64-centos7')) == [1]
+  assert matchedIds(tqIndex, dict(base, BannedSite=['Site.A'])) == [1]
+
+  # Owners
+  assert matchedIds(tqIndex, dict(base, OwnerGroup='prod')) == [2]
+  assert matchedIds(tqIndex, dict(base, OwnerGroup='prod', OwnerDN='/DN/user')) == []
+  assert matchedIds(tqIndex, dict(base, OwnerGroup=['prod', 'user'], OwnerDN='/DN/user')) == [1]
+
+  # Limiter conditions
+  assert matchedIds(tqIndex, dict(base, Setup='Cert', JobType='MCSimulation'),
+                    negativeCond={'JobType': ['MCSimulation']}) == []
+  assert matchedIds(tqIndex, base, negativeCond={'Site': 'Site.A'}) == [1]
+
+
+@patch('DIRAC.WorkloadManagementSystem.private.TaskQueueIndex.CS.getPropertiesForGroup',
+       new=MagicMock(return_value=['JobSharing']))
+def test_jobSharing():
+  tqIndex, _tqDB = getIndex()
+  assert matchedIds(tqIndex, {'Setup': 'Prod', 'CPUTime': 100000,
+                              'OwnerGroup': 'prod', 'OwnerDN': '/DN/user'}) == [2]
+
+
+def test_refresh():
+  tqIndex, tqDB = getIndex()
+  matchDict = {'Setup': 'Prod', 'CPUTime': 100000}
+  assert matchedIds(tqIndex, matchDict) == [1, 2]
+
+  tqIndex.removeTaskQueues([1])
+  assert matchedIds(tqIndex, matchDict) == [2]
+
+  # Only the new TQ definition is loaded, the known ones are kept
+  tqDefinitions[5] = {'OwnerDN': '/DN/user', 'OwnerGroup': 'user', 'Setup': 'Prod', 'CPUTime': 60,
+                      'Priority': 1.0, 'Enabled': 1}
+  try:
+    tqDB.getTaskQueueDefinitions.reset_mock()
+    assert tqIndex.refresh()['Value'] == 5
+    assert tqDB.getTaskQueueDefinitions.call_args_list[-1][0][0] == [1, 5]
+    assert matchedIds(tqIndex, matchDict) == [1, 2, 5]
+  finally:
+    del tqDefinitions[5]
+  assert tqIndex.refresh()['Value'] == 4
+  assert tqIndex.getNumTaskQueues() == 4
+
+  result = tqIndex.matchTaskQueues(matchDict, numQueuesToGet=1)
+  assert result['OK']
+  assert len(result['Value']) == 1
+  assert result['Value'][0] in [(1, '/DN/user', 'user'), (2, '/DN/prod', 'prod')]
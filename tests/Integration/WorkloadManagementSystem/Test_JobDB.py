@@ -6,6 +6,8 @@
 
 # pylint: disable=wrong-import-position
 
+import datetime
+
 from DIRAC.Core.Base.Script import parseCommandLine
 parseCommandLine()
 
@@ -97,3 +99,85 @@ def test_getCounters():
 
   res = jobDB.getCounters('Jobs', ['Status', 'MinorStatus'], {}, '2007-04-22 00:00:00')
   assert res['OK'] is True
+
+
+def test_stalledJobs():
+
+  res = jobDB.insertNewJobIntoDB(jdl, 'owner', '/DN/OF/owner', 'ownerGroup', 'someSetup')
+  assert res['OK'] is True
+  jobID = res['JobID']
+  res = jobDB.setJobAttributes(jobID, ['Status', 'Site', 'HeartBeatTime', 'LastUpdateTime'],
+                               ['Running', 'LCG.Stalled.ch', '2019-01-01 00:00:00', '2019-01-01 00:00:00'])
+  assert res['OK'] is True
+
+  res = jobDB.getStalledJobs(3600)
+  assert res['OK'] is True
+  assert jobID in res['Value']
+  res = jobDB.getStalledJobs(3600, excludedSites=['LCG.Stalled.ch'])
+  assert res['OK'] is True
+  assert jobID not in res['Value']
+  res = jobDB.getStalledJobs(3600, sites=[])
+  assert res['OK'] is True
+  assert res['Value'] == {}
+
+  res = jobDB.setJobsStalled([jobID], 3600)
+  assert res['OK'] is True
+  assert res['Value'] == 1
+  res = jobDB.getJobAttribute(jobID, 'Status')
+  assert res['OK'] is True
+  assert res['Value'] == 'Stalled'
+  # The job is not Running anymore
+  res = jobDB.setJobsStalled([jobID], 3600)
+  assert res['OK'] is True
+  assert res['Value'] == 0
+
+  res = jobDB.removeJobFromDB(jobID)
+  assert res['OK'] is True
+
+
+def test_setHeartBeatsData():
+
+  res = jobDB.insertNewJobIntoDB(jdl, 'owner', '/DN/OF/owner', 'ownerGroup', 'someSetup')
+  assert res['OK'] is True
+  stalledJobID = res['JobID']
+  res = jobDB.insertNewJobIntoDB(jdl, 'owner', '/DN/OF/owner', 'ownerGroup', 'someSetup')
+  assert res['OK'] is True
+  doneJobID = res['JobID']
+  assert jobDB.setJobAttributes(stalledJobID, ['Status'], ['Stalled'])['OK'] is True
+  # The job finished between its last heart beat and the flush of the heart beats
+  assert jobDB.setJobAttributes(doneJobID, ['Status'], ['Done'])['OK'] is True
+
+  heartBeatTime = datetime.datetime.utcnow()
+  res = jobDB.setHeartBeatsData(dict((jobID, {'HeartBeatTime': heartBeatTime, 'StaticData': {},
+                                              'DynamicData': [(heartBeatTime, {'CPU': 1})]})
+                                     for jobID in (stalledJobID, doneJobID)))
+  assert res['OK'] is True
+  res = jobDB.getAttributesForJobList([stalledJobID, doneJobID], ['Status'])
+  assert res['OK'] is True
+  assert res['Value'][stalledJobID]['Status'] == 'Running'
+  assert res['Value'][doneJobID]['Status'] == 'Done'
+
+  res = jobDB.removeJobFromDB([stalledJobID, doneJobID])
+  assert res['OK'] is True
+
+
+def test_insertNewJobsIntoDB():
+
+  res = jobDB.insertNewJobsIntoDB([jdl] * 5, 'owner', '/DN/OF/owner', 'ownerGroup', 'someSetup',
+                                  initialStatus='Submitting', initialMinorStatus='Bulk transaction confirmation',
+                                  chunkSize=2)
+  assert res['OK'] is True
+  jobIDs = [jobID for jobID, _status, _minorStatus in res['Value']]
+  assert len(jobIDs) == 5
+  res = jobDB.getAttributesForJobList(jobIDs, ['Status', 'JobName'])
+  assert res['OK'] is True
+  assert sorted(res['Value']) == sorted(jobIDs)
+  for jobID in jobIDs:
+    assert res['Value'][jobID]['Status'] == 'Submitting'
+    assert res['Value'][jobID]['JobName'] == 'helloWorld'
+    res2 = jobDB.getJobJDL(jobID)
+    assert res2['OK'] is True
+    assert 'JobID = %d;' % jobID in res2['Value']
+
+  res = jobDB.removeJobFromDB(jobIDs)
+  assert res['OK'] is True
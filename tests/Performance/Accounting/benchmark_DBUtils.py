@@ -0,0 +1,52 @@
+"""
+Measures the regridding of accounting buckets to the granularity of a plot
+(DBUtils._sumToGranularity, _averageToGranularity) and the filling and accumulation
+of the plot data (_fillWithZero, _accumulate), against the bucket by bucket
+implementations they replaced, on year long synthetic datasets.
+
+Usage: python benchmark_DBUtils.py [nbKeys] [nbDays]
+"""
+from __future__ import print_function
+import sys
+import time
+
+from DIRAC.AccountingSystem.private.DBUtils import DBUtils
+from DIRAC.AccountingSystem.private.test.Test_DBUtils import generateBuckets, referenceSpanToGranularity, \
+    referenceAverageToGranularity, referenceFillWithZero
+
+
+def timeIt(func, *args):
+  start = time.time()
+  result = func(*args)
+  return time.time() - start, result
+
+
+def main():
+  nbKeys = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+  nbDays = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+
+  dbUtils = DBUtils(None, 'Benchmark')
+  startEpoch = 1500000000
+  endEpoch = startEpoch + 86400 * nbDays
+  keys = dict(('Site%d' % key, generateBuckets(startEpoch, endEpoch, seed=key)) for key in xrange(nbKeys))
+  print("%d keys, %d buckets" % (nbKeys, sum(len(buckets) for buckets in keys.itervalues())))
+
+  for granularity in (3600, 86400):
+    for name, func, reference in (("sum", dbUtils._spanToGranularity, referenceSpanToGranularity),
+                                  ("average", dbUtils._averageToGranularity, referenceAverageToGranularity)):
+      loops = sum(timeIt(reference, granularity, buckets)[0] for buckets in keys.itervalues())
+      vectorized = sum(timeIt(func, granularity, buckets)[0] for buckets in keys.itervalues())
+      print("%-8s to %6d s: %8.3f s, was %8.3f s" % (name, granularity, vectorized, loops))
+
+    # The plots fill a single field
+    dataDict = dict((key, dict((epoch, values[0]) for epoch, values in
+                               dbUtils._sumToGranularity(granularity, buckets).iteritems()))
+                    for key, buckets in keys.iteritems())
+    referenceDict = dict((key, dict(values)) for key, values in dataDict.iteritems())
+    loops = timeIt(referenceFillWithZero, granularity, startEpoch, endEpoch, referenceDict)[0]
+    vectorized = timeIt(dbUtils._fillWithZero, granularity, startEpoch, endEpoch, dataDict)[0]
+    print("%-8s at %6d s: %8.3f s, was %8.3f s" % ("fill", granularity, vectorized, loops))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,100 @@
+"""
+Measures the cost of a configuration lookup: walking the CFG sections and casting
+the value at every call (CFG.getOption, and what gConfig.getValue used to do),
+against the OptionIndex of the merged configuration with its memoized typed values.
+
+The configuration is generated, with nbSites sites and their CEs and SEs, and the
+lookups hit existing and missing options of it.
+
+Usage: python benchmark_CFG.py [nbSites] [nbLookups]
+"""
+from __future__ import print_function
+import sys
+import time
+
+from DIRAC.Core.Utilities.CFG import CFG
+from DIRAC.ConfigurationSystem.Client.ConfigurationData import gConfigurationData
+from DIRAC.ConfigurationSystem.private.ConfigurationClient import ConfigurationClient
+from DIRAC.ConfigurationSystem.private.OptionIndex import OptionIndex
+
+
+def setOption(cfg, path, value):
+  """ Set an option, creating the sections on the way """
+  levels = path.split("/")
+  for section in levels[:-1]:
+    if not cfg.isSection(section):
+      cfg.createNewSection(section)
+    cfg = cfg[section]
+  cfg.setOption(levels[-1], value)
+
+
+def generateCFG(nbSites):
+  """ Something with the shape of the /Resources section """
+  cfg = CFG()
+  for site in xrange(nbSites):
+    sitePath = "Resources/Sites/LCG/LCG.Site%d.org" % site
+    setOption(cfg, "%s/Name" % sitePath, "Site%d" % site)
+    setOption(cfg, "%s/SE" % sitePath, "SITE%d-DISK, SITE%d-TAPE" % (site, site))
+    for ce in xrange(3):
+      cePath = "%s/CEs/ce%d.site%d.org" % (sitePath, ce, site)
+      setOption(cfg, "%s/CEType" % cePath, "HTCondorCE")
+      setOption(cfg, "%s/Queues/default/maxCPUTime" % cePath, "2880")
+      setOption(cfg, "%s/Queues/default/Tag" % cePath, "MultiProcessor, WholeNode")
+    for se in ("DISK", "TAPE"):
+      sePath = "Resources/StorageElements/SITE%d-%s" % (site, se)
+      setOption(cfg, "%s/BackendType" % sePath, "EOS")
+      setOption(cfg, "%s/ReadAccess" % sePath, "Active")
+      setOption(cfg, "%s/GFAL2_XROOT/Port" % sePath, "1094")
+  return cfg
+
+
+def lookups(nbSites, nbLookups):
+  """ ( path, default ) pairs, a quarter of them missing """
+  result = []
+  for i in xrange(nbLookups):
+    site = i % nbSites
+    kind = i % 4
+    if kind == 0:
+      result.append(("/Resources/Sites/LCG/LCG.Site%d.org/SE" % site, []))
+    elif kind == 1:
+      result.append(("/Resources/Sites/LCG/LCG.Site%d.org/CEs/ce1.site%d.org/Queues/default/maxCPUTime" %
+                     (site, site), 0))
+    elif kind == 2:
+      result.append(("/Resources/StorageElements/SITE%d-DISK/GFAL2_XROOT/Port" % site, 0))
+    else:
+      result.append(("/Resources/StorageElements/SITE%d-DISK/WriteAccess" % site, "Active"))
+  return result
+
+
+def timeIt(func, paths):
+  start = time.time()
+  for path, default in paths:
+    func(path, default)
+  return (time.time() - start) / len(paths)
+
+
+def main():
+  nbSites = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+  nbLookups = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+
+  cfg = generateCFG(nbSites)
+  gConfigurationData.localCFG = CFG()
+  gConfigurationData.remoteCFG = cfg
+  gConfigurationData.sync()
+  gConfig = ConfigurationClient()
+  paths = lookups(nbSites, nbLookups)
+
+  start = time.time()
+  optionIndex = OptionIndex(gConfigurationData.mergedCFG)
+  print("Index of %d options built in %.3f s" % (len(optionIndex), time.time() - start))
+
+  walk = timeIt(gConfigurationData.mergedCFG.getOption, paths)
+  print("CFG.getOption        %8.2f us/lookup" % (walk * 1e6))
+  # First pass fills the typed values cache, the second one is the steady state
+  first = timeIt(gConfig.getValue, paths)
+  steady = timeIt(gConfig.getValue, paths)
+  print("gConfig.getValue     %8.2f us/lookup (first pass %.2f us)" % (steady * 1e6, first * 1e6))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,70 @@
+"""
+Throughput of the ClassAd JDL parsing: the parser alone, and the ClassAd construction when the
+same JDLs are parsed again, as the JobDB, the optimizers and the Matcher do for a job.
+
+Usage: python benchmark_ClassAd.py [nbJDLs] [nbRepetitions]
+"""
+from __future__ import print_function
+import sys
+import time
+
+from DIRAC.Core.Utilities.DictCache import DictCache
+from DIRAC.Core.Utilities.ClassAd import ClassAdLight
+from DIRAC.Core.Utilities.ClassAd.ClassAdLight import ClassAd, parseJDL
+
+JDL = """[
+    Executable = "$DIRACROOT/scripts/dirac-jobexec";
+    Arguments = "jobDescription.xml -o LogLevel=INFO -p JOB_ID=%(jobID)d";
+    JobName = "Job_%(jobID)d";
+    JobGroup = "00071234";
+    JobType = "MCSimulation";
+    Owner = "someuser";
+    OwnerGroup = "lhcb_mc";
+    Priority = 1;
+    CPUTime = 1000000;
+    Site = ANY;
+    BannedSites = {"LCG.Bad.ch", "LCG.Worse.it"};
+    InputSandbox = {"jobDescription.xml", "LFN:/lhcb/user/s/someuser/lib.tar.gz"};
+    OutputSandbox = {"std.out", "std.err", "*.log"};
+    InputData = {"/lhcb/data/2018/RAW/%(jobID)08d_1.raw", "/lhcb/data/2018/RAW/%(jobID)08d_2.raw"};
+    StdOutput = "std.out";
+    StdError = "std.err";
+    JobRequirements =
+      [
+        OwnerDN = "/DC=ch/DC=cern/OU=Users/CN=someuser";
+        OwnerGroup = "lhcb_mc";
+        Setup = "LHCb-Production";
+        CPUTime = 1000000;
+        Sites = {"LCG.CERN.ch", "LCG.CNAF.it"};
+      ];
+]"""
+
+
+def timeIt(func, jdls, repetitions):
+  """ Best wall time of several passes over the JDLs """
+  best = None
+  for _ in xrange(repetitions):
+    start = time.time()
+    for jdl in jdls:
+      func(jdl)
+    elapsed = time.time() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+
+def main():
+  nbJDLs = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+  repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+  jdls = [JDL % {'jobID': jobID} for jobID in xrange(nbJDLs)]
+
+  # Room for all the JDLs, the size of the cache being limited per shard
+  ClassAdLight._parsedJDLs = DictCache(maxSize=4 * nbJDLs)  # pylint: disable=protected-access
+  print("%d JDLs of %d bytes, best of %d passes" % (nbJDLs, len(jdls[0]), repetitions))
+  for name, func in (('parseJDL', parseJDL),
+                     ('ClassAd, cached', ClassAd)):
+    elapsed = timeIt(func, jdls, repetitions)
+    print("%-16s: %8.0f JDLs/s" % (name, nbJDLs / elapsed))
+
+
+if __name__ == '__main__':
+  main()
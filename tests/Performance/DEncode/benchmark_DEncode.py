@@ -0,0 +1,90 @@
+"""
+Compares the version 1 (text) and version 2 (binary) DEncode wire codecs
+on payloads shaped like the ones of the busiest services:
+
+  * DFC getReplicas: {'Successful': {lfn: {se: pfn}}, 'Failed': {}}
+  * DFC getFileMetadata like: {lfn: {'Size': int, 'Checksum': str, ...}}
+  * WMS getJobsAttributes like: {jobID: {attrName: attrValue}}
+  * a long list of LFNs
+
+Usage: python benchmark_DEncode.py [nbEntries] [nbRepetitions]
+"""
+from __future__ import print_function
+import sys
+import time
+import datetime
+
+from DIRAC.Core.Utilities import DEncode
+
+
+def dfcReplicasPayload(nbEntries):
+  """ Shape of the DFC getReplicas answer """
+  successful = {}
+  for i in xrange(nbEntries):
+    lfn = '/lhcb/MC/2018/ALLSTREAMS.DST/00071234/0000/00071234_%08d_7.AllStreams.dst' % i
+    successful[lfn] = dict(('SITE%d-DST' % se, 'root://eos.site%d.ch//eos%s' % (se, lfn)) for se in xrange(3))
+  return {'OK': True, 'Value': {'Successful': successful, 'Failed': {}}}
+
+
+def dfcMetadataPayload(nbEntries):
+  """ Shape of the DFC getFileMetadata answer """
+  successful = {}
+  for i in xrange(nbEntries):
+    lfn = '/lhcb/MC/2018/ALLSTREAMS.DST/00071234/0000/00071234_%08d_7.AllStreams.dst' % i
+    successful[lfn] = {'Size': 3000000000 + i, 'Checksum': '%08x' % i, 'ChecksumType': 'AD',
+                       'GUID': 'A0B1C2D3-0000-0000-0000-%012d' % i, 'Status': 'AprioriGood',
+                       'CreationDate': datetime.datetime(2018, 1, 1, 12, 0, i % 60),
+                       'Mode': 509, 'FileID': i}
+  return {'OK': True, 'Value': {'Successful': successful, 'Failed': {}}}
+
+
+def wmsAttributesPayload(nbEntries):
+  """ Shape of the JobMonitoring getJobsAttributes answer """
+  jobs = {}
+  for i in xrange(nbEntries):
+    jobs[i] = {'Status': 'Running', 'MinorStatus': 'Application', 'Site': 'LCG.CERN.cern',
+               'Owner': 'someuser', 'OwnerGroup': 'lhcb_user', 'JobGroup': '00071234',
+               'LastUpdateTime': '2018-01-01 12:00:00', 'ApplicationNumStatus': '0'}
+  return {'OK': True, 'Value': jobs}
+
+
+def lfnListPayload(nbEntries):
+  """ A plain list of LFNs, as sent to most DMS methods """
+  return ['/lhcb/data/2018/RAW/FULL/LHCb/COLLISION18/%d/%08d.raw' % (i // 1000, i) for i in xrange(nbEntries)]
+
+
+def timeIt(func, arg, repetitions):
+  """ Best wall time of several calls """
+  best = None
+  for _ in xrange(repetitions):
+    start = time.time()
+    result = func(arg)
+    elapsed = time.time() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best, result
+
+
+def main():
+  nbEntries = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+  repetitions = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+  payloads = (('DFC replicas', dfcReplicasPayload),
+              ('DFC metadata', dfcMetadataPayload),
+              ('WMS attributes', wmsAttributesPayload),
+              ('LFN list', lfnListPayload))
+  codecs = (('v1', DEncode.encode, DEncode.decode),
+            ('v2', DEncode.encodeBinary, DEncode.decodeBinary))
+
+  print("%-16s %-4s %12s %12s %12s" % ('Payload', 'Ver', 'Encode (s)', 'Decode (s)', 'Size (B)'))
+  for payloadName, payloadFunc in payloads:
+    payload = payloadFunc(nbEntries)
+    for codecName, encode, decode in codecs:
+      encTime, encoded = timeIt(encode, payload, repetitions)
+      decTime, decoded = timeIt(decode, encoded, repetitions)
+      if decoded[0] != payload:
+        print("ERROR: %s %s does not round trip" % (payloadName, codecName))
+      print("%-16s %-4s %12.4f %12.4f %12d" % (payloadName, codecName, encTime, decTime, len(encoded)))
+
+
+if __name__ == '__main__':
+  main()
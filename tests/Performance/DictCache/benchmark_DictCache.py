@@ -0,0 +1,118 @@
+"""
+Measures the DictCache under many threads doing get and add on a shared cache, and the
+time to purge the expired records of a large cache, against the previous implementation
+(datetime expiration times, whole cache scans and a single lock for all the caches of
+the process), reproduced below as LegacyDictCache.
+
+Usage: python benchmark_DictCache.py [nbThreads] [nbKeys] [nbOperations per thread]
+"""
+from __future__ import print_function
+import datetime
+import random
+import sys
+import threading
+import time
+
+from DIRAC.Core.Utilities.DictCache import DictCache
+
+# The lock of the LockRing shared by all the legacy caches
+gLegacyLock = threading.RLock()
+
+
+class LegacyDictCache(object):
+  """ The previous DictCache, without the thread local mode
+  """
+
+  def __init__(self, deleteFunction=False):
+    self.__cache = {}
+    self.__deleteFunction = deleteFunction
+
+  def delete(self, cKey):
+    with gLegacyLock:
+      if cKey not in self.__cache:
+        return
+      if self.__deleteFunction:
+        self.__deleteFunction(self.__cache[cKey]['value'])
+      del self.__cache[cKey]
+
+  def add(self, cKey, validSeconds, value=None):
+    if max(0, validSeconds) == 0:
+      return
+    with gLegacyLock:
+      self.__cache[cKey] = {'expirationTime': datetime.datetime.now() + datetime.timedelta(seconds=validSeconds),
+                            'value': value}
+
+  def get(self, cKey, validSeconds=0):
+    with gLegacyLock:
+      if cKey in self.__cache:
+        if self.__cache[cKey]['expirationTime'] > datetime.datetime.now() + datetime.timedelta(seconds=validSeconds):
+          return self.__cache[cKey]['value']
+        self.delete(cKey)
+      return None
+
+  def purgeExpired(self, expiredInSeconds=0):
+    with gLegacyLock:
+      limitTime = datetime.datetime.now() + datetime.timedelta(seconds=expiredInSeconds)
+      keys = [cKey for cKey in self.__cache if self.__cache[cKey]['expirationTime'] < limitTime]
+      for cKey in keys:
+        if self.__deleteFunction:
+          self.__deleteFunction(self.__cache[cKey]['value'])
+        del self.__cache[cKey]
+
+
+def contention(cache, nbThreads, nbKeys, nbOperations):
+  """ Each thread gets random keys, adding the missing ones, and purges the cache from time to time
+
+      :return: operations per second
+  """
+  def worker(seed):
+    rand = random.Random(seed)
+    for i in xrange(nbOperations):
+      key = rand.randrange(nbKeys)
+      if cache.get(key) is None:
+        cache.add(key, rand.randint(1, 5), key)
+      if i % 1000 == 0:
+        cache.purgeExpired()
+
+  threads = [threading.Thread(target=worker, args=(seed,)) for seed in xrange(nbThreads)]
+  start = time.time()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  return nbThreads * nbOperations / (time.time() - start)
+
+
+def purge(cache, nbKeys, expiredEvery):
+  """ Fill the cache, one record out of expiredEvery being expired, and purge it
+
+      :return: time of the purge
+  """
+  for key in xrange(nbKeys):
+    cache.add(key, 1 if key % expiredEvery == 0 else 3600, key)
+  time.sleep(1.1)
+  start = time.time()
+  cache.purgeExpired()
+  return time.time() - start
+
+
+def main():
+  nbThreads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+  nbKeys = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+  nbOperations = int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+
+  print("%d threads, %d keys, %d operations per thread" % (nbThreads, nbKeys, nbOperations))
+  legacy = contention(LegacyDictCache(), nbThreads, nbKeys, nbOperations)
+  for name, cache in (("DictCache", DictCache()),
+                      ("DictCache, maxSize %d" % (nbKeys / 2), DictCache(maxSize=nbKeys / 2))):
+    print("%-30s: %10.0f operations/s, was %10.0f" % (name, contention(cache, nbThreads, nbKeys, nbOperations),
+                                                      legacy))
+
+  for expiredEvery in (100, 10):
+    legacy = purge(LegacyDictCache(), nbKeys * 10, expiredEvery)
+    print("%-30s: %10.3f s, was %10.3f s" % ("purge 1/%d of %d records" % (expiredEvery, nbKeys * 10),
+                                            purge(DictCache(), nbKeys * 10, expiredEvery), legacy))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,84 @@
+"""
+Load generator simulating running jobs sending their heart beats to the JobStateUpdate service,
+as the JobWrapper watchdog does, to measure the service and JobDB under the heart beats of many jobs.
+
+The jobs nbJobs jobs firstJobID, firstJobID + 1, ... should exist in JobDB, the heart beats of
+unknown jobs are ignored by the service.
+
+Usage: python heartbeat_load.py [nbJobs] [heartBeatPeriod] [duration] [nbThreads] [firstJobID]
+"""
+from __future__ import print_function
+import random
+import sys
+import threading
+import time
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+
+from DIRAC.WorkloadManagementSystem.Client.JobStateUpdateClient import JobStateUpdateClient
+
+
+def simulateJobs(jobIDs, heartBeatPeriod, endTime, stats, lock):
+  """ Send the heart beats of some jobs until endTime, every heartBeatPeriod seconds per job
+  """
+  client = JobStateUpdateClient()
+  # The jobs do not start together
+  nextBeats = sorted((time.time() + random.uniform(0, heartBeatPeriod), jobID) for jobID in jobIDs)
+  cpuConsumed = dict.fromkeys(jobIDs, 0.)
+  while nextBeats:
+    nextBeat, jobID = nextBeats.pop(0)
+    if nextBeat > endTime:
+      break
+    time.sleep(max(0, nextBeat - time.time()))
+    cpuConsumed[jobID] += heartBeatPeriod * random.uniform(0.5, 1.)
+    dynamicData = {'LoadAverage': random.uniform(0, 16), 'MemoryUsed': random.uniform(1000, 2000),
+                   'Vsize': random.uniform(2000, 4000), 'AvailableDiskSpace': random.uniform(1000, 100000),
+                   'CPUConsumed': cpuConsumed[jobID], 'WallClockTime': time.time() - stats['Start']}
+    start = time.time()
+    result = client.sendHeartBeat(jobID, dynamicData, {})
+    latency = time.time() - start
+    with lock:
+      stats['Latencies'].append(latency)
+      if not result['OK']:
+        stats['Errors'] += 1
+      elif result['Value']:
+        stats['Commands'] += 1
+    nextBeats.append((nextBeat + heartBeatPeriod, jobID))
+    nextBeats.sort()
+
+
+def main():
+  nbJobs = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+  heartBeatPeriod = float(sys.argv[2]) if len(sys.argv) > 2 else 60
+  duration = float(sys.argv[3]) if len(sys.argv) > 3 else 300
+  nbThreads = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+  firstJobID = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+
+  print("%d jobs sending a heart beat every %s seconds during %s seconds, from %d threads" %
+        (nbJobs, heartBeatPeriod, duration, nbThreads))
+  stats = {'Start': time.time(), 'Latencies': [], 'Errors': 0, 'Commands': 0}
+  lock = threading.Lock()
+  endTime = stats['Start'] + duration
+  jobIDs = range(firstJobID, firstJobID + nbJobs)
+  threads = [threading.Thread(target=simulateJobs,
+                              args=(jobIDs[i::nbThreads], heartBeatPeriod, endTime, stats, lock))
+             for i in xrange(nbThreads)]
+  for thread in threads:
+    thread.setDaemon(True)
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  latencies = sorted(stats['Latencies'])
+  elapsed = time.time() - stats['Start']
+  print("%d heart beats, %.1f/s (expected %.1f/s), %d errors, %d job commands received" %
+        (len(latencies), len(latencies) / elapsed, nbJobs / heartBeatPeriod, stats['Errors'], stats['Commands']))
+  if latencies:
+    print("latency: median %.3f s, 95%% %.3f s, max %.3f s" % (latencies[len(latencies) / 2],
+                                                              latencies[int(len(latencies) * 0.95)],
+                                                              latencies[-1]))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,107 @@
+"""
+Replays recorded pilot resource descriptions against TaskQueueDB and compares
+the task queue selection done with SQL (TaskQueueDB.matchAndGetTaskQueue) and
+with the in-memory TaskQueueIndex.
+
+The descriptions file has one JSON resource dictionary per line, as seen by the Matcher
+after Matcher._processResourceDescription (Setup, CPUTime, Site, GridCE, Platform, Tag,
+OwnerGroup...). With "generate", random descriptions are written instead, based on the
+task queues currently in the DB.
+
+Needs a configured TaskQueueDB, no job is extracted.
+
+Usage:
+  python benchmark_Matcher.py <descriptions.json> [nbRepetitions]
+  python benchmark_Matcher.py generate <descriptions.json> [nbDescriptions]
+"""
+from __future__ import print_function
+import sys
+import json
+import time
+import random
+
+from DIRAC.Core.Base import Script
+Script.setUsageMessage(__doc__)
+Script.parseCommandLine()
+
+from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB import TaskQueueDB
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+
+
+def generate(tqDB, fileName, nbDescriptions):
+  """ Write resource descriptions matching, more or less, the existing task queues """
+  result = tqDB.getTaskQueueDefinitions()
+  if not result['OK']:
+    raise RuntimeError(result['Message'])
+  tqDefs = result['Value'].values()
+  if not tqDefs:
+    raise RuntimeError("No task queue in the DB")
+  sites = sorted(set(site for tqDef in tqDefs for site in tqDef.get('Sites', []))) or ['LCG.CERN.cern']
+  platforms = sorted(set(pf for tqDef in tqDefs for pf in tqDef.get('Platforms', []))) or ['x86_64-slc6']
+  with open(fileName, 'w') as fd:
+    for _ in xrange(nbDescriptions):
+      tqDef = random.choice(tqDefs)
+      description = {'Setup': tqDef['Setup'],
+                     'CPUTime': random.choice([3600, 86400, 172800, 1000000]),
+                     'Site': random.choice(sites),
+                     'Platform': random.choice(platforms),
+                     'OwnerGroup': sorted(set(t['OwnerGroup'] for t in tqDefs))}
+      if random.random() < 0.3:
+        description['Tag'] = ['MultiProcessor', '2Processors', '4Processors']
+      fd.write("%s\n" % json.dumps(description))
+
+
+def replay(tqDB, fileName, repetitions):
+  """ Time the selection of all the matching TQs for each description, check both agree """
+  with open(fileName) as fd:
+    descriptions = [json.loads(line) for line in fd if line.strip()]
+  # JSON gives unicode, TaskQueueDB expects str
+  descriptions = [dict((str(key), [str(v) for v in value] if isinstance(value, list) else
+                        str(value) if isinstance(value, basestring) else value)
+                       for key, value in description.iteritems())
+                  for description in descriptions]
+
+  tqIndex = TaskQueueIndex(tqDB)
+  start = time.time()
+  result = tqIndex.refresh()
+  if not result['OK']:
+    raise RuntimeError(result['Message'])
+  print("Index of %s task queues built in %.3f s" % (result['Value'], time.time() - start))
+
+  timings = {'sql': [], 'index': []}
+  mismatches = 0
+  for _ in xrange(repetitions):
+    for description in descriptions:
+      start = time.time()
+      sqlResult = tqDB.matchAndGetTaskQueue(description, numQueuesToGet=0)
+      timings['sql'].append(time.time() - start)
+      start = time.time()
+      indexResult = tqIndex.matchTaskQueues(description, numQueuesToGet=0)
+      timings['index'].append(time.time() - start)
+      if sqlResult['OK'] != indexResult['OK'] or \
+              (sqlResult['OK'] and set(sqlResult['Value']) != set(indexResult['Value'])):
+        mismatches += 1
+
+  print("%d descriptions x %d repetitions, %d mismatches" % (len(descriptions), repetitions, mismatches))
+  for mode in ('sql', 'index'):
+    values = sorted(timings[mode])
+    print("%-6s mean %8.3f ms   p50 %8.3f ms   p99 %8.3f ms" % (mode,
+                                                                1000. * sum(values) / len(values),
+                                                                1000. * values[len(values) // 2],
+                                                                1000. * values[int(len(values) * 0.99)]))
+
+
+def main():
+  args = Script.getPositionalArgs()
+  if not args:
+    Script.showHelp()
+    sys.exit(1)
+  tqDB = TaskQueueDB()
+  if args[0] == 'generate':
+    generate(tqDB, args[1], int(args[2]) if len(args) > 2 else 1000)
+  else:
+    replay(tqDB, args[0], int(args[1]) if len(args) > 1 else 1)
+
+
+if __name__ == "__main__":
+  main()
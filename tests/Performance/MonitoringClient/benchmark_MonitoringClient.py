@@ -0,0 +1,98 @@
+"""
+Measures gMonitor.addMark called concurrently by many threads, as the services do for each
+request, against the previous implementation (one lock shared by all the threads, and the
+values of the marks kept in lists until the flush), reproduced below as LegacyMonitoringClient.
+
+Usage: python benchmark_MonitoringClient.py [nbThreads] [nbMarks per thread]
+"""
+from __future__ import print_function
+import sys
+import threading
+import time
+
+from DIRAC.Core.Utilities import Time
+from DIRAC.FrameworkSystem.Client.MonitoringClient import MonitoringClient
+
+
+class LegacyMonitoringClient(MonitoringClient):
+  """ The previous addMark and consolidation of the marks
+  """
+
+  def __init__(self):
+    super(LegacyMonitoringClient, self).__init__()
+    self.__lock = threading.Lock()
+
+  def __UTCStepTime(self, acName):
+    stepLength = self.activitiesDefinitions[acName]['bucketLength']
+    nowEpoch = int(Time.toEpoch())
+    return nowEpoch - nowEpoch % stepLength
+
+  def addMark(self, name, value=1):
+    if name not in self.activitiesDefinitions:
+      raise Exception("You must register activity %s before adding marks to it" % name)
+    if not isinstance(value, (int, long, float)):
+      raise Exception("Value's type %s is not valid" % value)
+    with self.__lock:
+      self.logger.debug("Adding mark to %s" % name)
+      markTime = self.__UTCStepTime(name)
+      if markTime in self.activitiesMarks[name]:
+        self.activitiesMarks[name][markTime].append(value)
+      else:
+        self.activitiesMarks[name][markTime] = [value]
+
+  def consolidateMarks(self):
+    with self.__lock:
+      marks = self.activitiesMarks
+      self.activitiesMarks = dict((name, {}) for name in marks)
+    return dict((name, dict((markTime, sum(values)) for markTime, values in buckets.iteritems()))
+                for name, buckets in marks.iteritems())
+
+
+def newClient(clientClass):
+  monitor = clientClass()
+  monitor.setComponentType(MonitoringClient.COMPONENT_SCRIPT)
+  monitor.initialize()
+  monitor.registerActivity('Queries', 'Queries', 'Service', 'queries/s', MonitoringClient.OP_RATE)
+  monitor.registerActivity('ServiceTime', 'Time per query', 'Service', 'seconds', MonitoringClient.OP_MEAN)
+  return monitor
+
+
+def addMarks(monitor, nbThreads, nbMarks):
+  """ Each thread adds marks to 2 activities, as a service does per request
+
+      :return: marks per second, time of the consolidation of the marks
+  """
+  def worker():
+    for i in xrange(nbMarks):
+      monitor.addMark('Queries')
+      monitor.addMark('ServiceTime', 0.001 * (i % 100))
+
+  threads = [threading.Thread(target=worker) for _i in xrange(nbThreads)]
+  start = time.time()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  rate = 2 * nbThreads * nbMarks / (time.time() - start)
+
+  start = time.time()
+  if isinstance(monitor, LegacyMonitoringClient):
+    monitor.consolidateMarks()
+  else:
+    monitor._MonitoringClient__consolidateMarks(True)  # pylint: disable=protected-access
+  return rate, time.time() - start
+
+
+def main():
+  nbThreads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+  nbMarks = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+  print("%d threads, %d marks per thread" % (nbThreads, nbMarks))
+  legacyRate, legacyFlush = addMarks(newClient(LegacyMonitoringClient), nbThreads, nbMarks)
+  rate, flush = addMarks(newClient(MonitoringClient), nbThreads, nbMarks)
+  print("addMark     : %10.0f marks/s, was %10.0f marks/s" % (rate, legacyRate))
+  print("consolidate : %10.4f s, was %10.4f s" % (flush, legacyFlush))
+
+
+if __name__ == '__main__':
+  main()
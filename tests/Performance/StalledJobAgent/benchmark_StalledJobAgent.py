@@ -0,0 +1,97 @@
+"""
+Benchmark of the detection of the stalled jobs, as done by the StalledJobAgent, against a synthetic JobDB.
+
+The Running jobs nbJobs jobs firstJobID, firstJobID + 1, ... are inserted in JobDB, a fraction stalledFraction
+of them without heart beat for a day, and some at a tolerant site. The stalled jobs are then found
+job by job, as the StalledJobAgent used to do, and with the set-based JobDB.getStalledJobs.
+The jobs are removed at the end.
+
+Usage: python benchmark_StalledJobAgent.py [nbJobs] [stalledFraction] [firstJobID]
+"""
+from __future__ import print_function
+import random
+import sys
+import time
+
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+
+from DIRAC.Core.Utilities.Time import toEpoch, fromString
+from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
+
+SITES = ['LCG.CERN.ch', 'LCG.CNAF.it', 'LCG.PIC.es', 'LCG.Tolerant.ch']
+TOLERANT_SITES = ['LCG.Tolerant.ch']
+STALLED_TIME = 5400
+TOLERANCE_TIME = 3600
+
+
+def populate(jobDB, jobIDs, stalledFraction):
+  """ Insert the Running jobs, return the stalled ones
+  """
+  result = jobDB.insertMany('JobJDLs', ['JobID', 'JDL', 'JobRequirements', 'OriginalJDL'],
+                            [(jobID, '', '', '') for jobID in jobIDs])
+  if not result['OK']:
+    raise RuntimeError(result['Message'])
+  rows = []
+  stalledJobs = set()
+  for jobID in jobIDs:
+    site = random.choice(SITES)
+    if random.random() < stalledFraction:
+      lastUpdate = '2019-01-01 00:00:00'
+      stalledJobs.add(jobID)
+    else:
+      lastUpdate = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() - random.uniform(0, STALLED_TIME)))
+    rows.append((jobID, 'Running', 'Application', site, lastUpdate, lastUpdate))
+  result = jobDB.insertMany('Jobs', ['JobID', 'Status', 'MinorStatus', 'Site', 'HeartBeatTime', 'LastUpdateTime'],
+                            rows)
+  if not result['OK']:
+    raise RuntimeError(result['Message'])
+  return stalledJobs
+
+
+def perJobDetection(jobDB):
+  """ The stalled jobs found with a few queries per Running job
+  """
+  stalledJobs = set()
+  for jobID in jobDB.selectJobs({'Status': 'Running'})['Value']:
+    site = jobDB.getJobAttribute(jobID, 'Site')['Value']
+    stalledTime = STALLED_TIME + (TOLERANCE_TIME if site in TOLERANT_SITES else 0)
+    attributes = jobDB.getJobAttributes(jobID, ['HeartBeatTime', 'LastUpdateTime'])['Value']
+    latestUpdate = max(toEpoch(fromString(attributes[name])) for name in attributes if attributes[name] != 'None')
+    if toEpoch() - latestUpdate > stalledTime:
+      stalledJobs.add(jobID)
+  return stalledJobs
+
+
+def setBasedDetection(jobDB):
+  """ The stalled jobs found with one query per group of sites
+  """
+  stalledJobs = set(jobDB.getStalledJobs(STALLED_TIME, excludedSites=TOLERANT_SITES)['Value'])
+  stalledJobs.update(jobDB.getStalledJobs(STALLED_TIME + TOLERANCE_TIME, sites=TOLERANT_SITES)['Value'])
+  return stalledJobs
+
+
+def main():
+  nbJobs = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+  stalledFraction = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+  firstJobID = int(sys.argv[3]) if len(sys.argv) > 3 else 100000000
+
+  jobDB = JobDB()
+  jobIDs = range(firstJobID, firstJobID + nbJobs)
+  jobList = ','.join(str(jobID) for jobID in jobIDs)
+  print("Inserting %d Running jobs, %.0f%% of them stalled" % (nbJobs, stalledFraction * 100))
+  try:
+    expected = populate(jobDB, jobIDs, stalledFraction)
+    for name, detection in (('per job', perJobDetection), ('set-based', setBasedDetection)):
+      start = time.time()
+      stalledJobs = detection(jobDB)
+      elapsed = time.time() - start
+      print("%-10s: %d stalled jobs found in %.3f s" % (name, len(stalledJobs & set(jobIDs)), elapsed))
+      assert stalledJobs & set(jobIDs) == expected
+  finally:
+    for table in ('Jobs', 'JobJDLs'):
+      jobDB._update('DELETE FROM %s WHERE JobID IN ( %s )' % (table, jobList))  # pylint: disable=protected-access
+
+
+if __name__ == '__main__':
+  main()